@@ -24,6 +24,7 @@ from app.api.v1.route_models import (
     RoutingRuleOut,
 )
 from app.core.config import get_settings
+from app.core.redis import get_redis
 from app.core.route_exposure import (
     DEFAULT_EXPOSURE_FORMAT,
     EXPLICIT_EXPOSURE_FORMATS,
@@ -43,10 +44,12 @@ from app.db.models import (
 )
 from app.db.session import SessionLocal
 from app.services.admin_auth import verify_admin_session_token
+from app.services.access_key_cache import ResolvedAccessKey, get_access_key_cache
 from app.services.access_keys import hash_access_key
 from app.services.agents import get_agent_by_name, verify_agent_token
 from app.services.health_monitor import HealthProbeResult
-from app.services.model_patterns import model_pattern_matches
+from app.services.routing_snapshot import get_routing_snapshot, refresh_routing_snapshot
+from app.services.rule_options import RuleOptions, parse_rule_options
 from app.services.secrets import (
     mask_oauth_config,
     mask_secret_value,
@@ -164,6 +167,21 @@ def _require_master_auth(request: Request) -> None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+def _is_admin_session_request(request: Request, token: str | None) -> bool:
+    """校验管理员会话 token，同一请求内只计算一次 HMAC。"""
+    checked = getattr(request.state, "admin_session_check", None)
+    if checked is not None and checked[0] == token:
+        return checked[1]
+    verified = verify_admin_session_token(token, get_settings())
+    request.state.admin_session_check = (token, verified)
+    return verified
+
+
+async def _commit_routing_config(session: AsyncSession) -> None:
+    await session.commit()
+    await refresh_routing_snapshot(session, await get_redis())
+
+
 def _issue_rule_access_key() -> str:
     return f"rk-{secrets.token_urlsafe(24)}"
 
@@ -173,9 +191,8 @@ async def _resolve_allowed_rule_groups_from_token(
     request: Request,
 ) -> list[str]:
     """解析对外访问 Key 并返回可访问的规则组列表。"""
-    settings = get_settings()
     token = _extract_route_api_key(request)
-    if token and verify_admin_session_token(token, settings):
+    if token and _is_admin_session_request(request, token):
         request.state.route_allowed_rule_groups = ["default"]
         return ["default"]
 
@@ -183,6 +200,25 @@ async def _resolve_allowed_rule_groups_from_token(
         raise HTTPException(status_code=401, detail="Missing route API key")
 
     token_hash = hash_access_key(token)
+    cache = get_access_key_cache()
+    hit, resolved = cache.get(token_hash)
+    if not hit:
+        generation = cache.generation
+        resolved = await _load_factory_access_key(session, token, token_hash)
+        cache.put(token_hash, resolved, generation=generation)
+    if resolved is None:
+        raise HTTPException(status_code=401, detail="Invalid route API key")
+
+    resolved_groups = list(resolved.rule_groups)
+    request.state.route_allowed_rule_groups = resolved_groups
+    request.state.route_request_timeout_seconds = resolved.request_timeout_seconds
+    request.state.route_access_key_id = resolved.access_key_id
+    return resolved_groups
+
+
+async def _load_factory_access_key(
+    session: AsyncSession, token: str, token_hash: str
+) -> ResolvedAccessKey | None:
     result = await session.execute(
         select(FactoryAccessKey).where(
             FactoryAccessKey.key.in_([token_hash, token]),
@@ -191,7 +227,7 @@ async def _resolve_allowed_rule_groups_from_token(
     )
     factory_key = result.scalars().first()
     if not factory_key:
-        raise HTTPException(status_code=401, detail="Invalid route API key")
+        return None
 
     groups: list[str] = []
     seen: set[str] = set()
@@ -206,9 +242,11 @@ async def _resolve_allowed_rule_groups_from_token(
         seen.add(tokenized)
         groups.append(canonical)
 
-    resolved_groups = groups or ["default"]
-    request.state.route_allowed_rule_groups = resolved_groups
-    return resolved_groups
+    return ResolvedAccessKey(
+        rule_groups=tuple(groups or ["default"]),
+        request_timeout_seconds=factory_key.request_timeout_seconds,
+        access_key_id=factory_key.id,
+    )
 
 
 async def _resolve_rule_group_from_token(
@@ -217,10 +255,9 @@ async def _resolve_rule_group_from_token(
     payload_rule_group: str,
 ) -> str:
     """解析请求中的对外访问 Key，验证权限并返回可用的规则组。"""
-    settings = get_settings()
     token = _extract_route_api_key(request)
     normalized_payload_group = (payload_rule_group or "default").strip() or "default"
-    if token and verify_admin_session_token(token, settings):
+    if token and _is_admin_session_request(request, token):
         return normalized_payload_group
 
     allowed_groups = await _resolve_allowed_rule_groups_from_token(session, request)
@@ -238,30 +275,21 @@ async def _find_dump_rule(
     model_alias: str,
     rule_group: str,
     exposure_format: str = DEFAULT_EXPOSURE_FORMAT,
+    *,
+    redis=None,  # noqa: ANN001
 ) -> RoutingRule | None:
     try:
-        result = await session.execute(
-            select(RoutingRule)
-            .where(
-                RoutingRule.group_name == rule_group,
-                RoutingRule.is_active.is_(True),
-                RoutingRule.dump_enabled.is_(True),
-            )
-            .order_by(RoutingRule.priority.desc(), RoutingRule.id)
-        )
+        snapshot = await get_routing_snapshot(session, redis)
     except (AttributeError, AssertionError):
         return None
 
-    rules = result.scalars().all()
     fallback: RoutingRule | None = None
-    for rule in rules:
-        if not model_pattern_matches(rule.model_pattern, model_alias):
+    for entry in snapshot.matching_rules(rule_group, model_alias):
+        rule = entry.rule
+        if not rule.dump_enabled:
             continue
-        _, _, rule_exposure_format = _deserialize_rule_config_detail(
-            rule.target_key_ids_json
-        )
         match_priority = exposure_format_match_priority(
-            rule_exposure_format, exposure_format
+            list(entry.exposure_formats), exposure_format
         )
         if match_priority == 2:
             return rule
@@ -568,6 +596,7 @@ def _build_api_key_out(api_key: APIKey) -> APIKeyOut:
         rule_groups=api_key.rule_groups,
         weight=api_key.weight,
         rpm_limit=api_key.rpm_limit,
+        tpm_limit=api_key.tpm_limit,
         daily_limit=api_key.daily_limit,
         used_today=api_key.used_today,
         total_usage=api_key.total_usage,
@@ -582,8 +611,10 @@ def _build_endpoint_detail(
     latency_ms: int,
     uptime: float,
     codex_usage_by_key: dict[int, dict[str, object]] | None = None,
+    provider_quota_by_key: dict[int, dict[str, object]] | None = None,
 ) -> EndpointDetailOut:
     codex_usage_by_key = codex_usage_by_key or {}
+    provider_quota_by_key = provider_quota_by_key or {}
     keys = [
         EndpointKeyOut(
             id=key.id,
@@ -596,10 +627,12 @@ def _build_endpoint_detail(
                 APIKey.normalize_rule_groups(fallback=getattr(key, "rule_group", "default")),
             ),
             rpm_limit=key.rpm_limit,
+            tpm_limit=getattr(key, "tpm_limit", None),
             daily_limit=key.daily_limit,
             used_today=key.used_today,
             is_active=key.is_active,
             codex_usage=codex_usage_by_key.get(key.id),
+            provider_quota=provider_quota_by_key.get(key.id),
         )
         for key in (endpoint.api_keys or [])
     ]
@@ -771,12 +804,14 @@ def _serialize_rule_config(
     target_key_ids: list[int],
     strategy: str,
     exposure_formats: list[str],
+    options: RuleOptions = RuleOptions(),
 ) -> str:
     normalized_formats = normalize_exposure_formats(exposure_formats)
     return json.dumps({
         "target_key_ids": target_key_ids,
         "strategy": strategy,
         "exposure_formats": normalized_formats,
+        **options.config_fields(),
     })
 
 
@@ -820,7 +855,10 @@ async def _ensure_default_rule_group(
         changed = False
         if target_key_ids or exposure_formats != list(EXPLICIT_EXPOSURE_FORMATS):
             existing.target_key_ids_json = _serialize_rule_config(
-                [], strategy, list(EXPLICIT_EXPOSURE_FORMATS)
+                [],
+                strategy,
+                list(EXPLICIT_EXPOSURE_FORMATS),
+                parse_rule_options(existing.target_key_ids_json),
             )
             changed = True
         if existing.model_pattern != DEFAULT_RULE_MODEL_PATTERN:
@@ -879,6 +917,7 @@ def _build_routing_rule_out(
         dump_enabled=rule.dump_enabled,
         dump_path=rule.dump_path,
         target_key_ids=target_key_ids,
+        **parse_rule_options(rule.target_key_ids_json).out_fields(),
         request_count=request_count,
         total_tokens=total_tokens,
         avg_ttft_ms=avg_ttft_ms,
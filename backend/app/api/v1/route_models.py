@@ -10,6 +10,7 @@ class EndpointKeyCreate(BaseModel):
     rule_groups: list[str] | None = None
     weight: int = 1
     rpm_limit: int | None = None
+    tpm_limit: int | None = None
     daily_limit: int | None = None
     used_today: int = 0
     total_usage: int = 0
@@ -89,6 +90,7 @@ class APIKeyCreate(BaseModel):
     rule_groups: list[str] | None = None
     weight: int = 1
     rpm_limit: int | None = None
+    tpm_limit: int | None = None
     daily_limit: int | None = None
     used_today: int = 0
     total_usage: int = 0
@@ -102,6 +104,7 @@ class APIKeyUpdate(BaseModel):
     rule_groups: list[str] | None = None
     weight: int | None = None
     rpm_limit: int | None = None
+    tpm_limit: int | None = None
     daily_limit: int | None = None
     used_today: int | None = None
     total_usage: int | None = None
@@ -117,6 +120,7 @@ class APIKeyOut(BaseModel):
     rule_groups: list[str] = Field(default_factory=list)
     weight: int
     rpm_limit: int | None
+    tpm_limit: int | None
     daily_limit: int | None
     used_today: int
     total_usage: int
@@ -133,10 +137,12 @@ class EndpointKeyOut(BaseModel):
     rule_group: str
     rule_groups: list[str] = Field(default_factory=list)
     rpm_limit: int | None
+    tpm_limit: int | None
     daily_limit: int | None
     used_today: int
     is_active: bool
     codex_usage: dict[str, object] | None = None
+    provider_quota: dict[str, object] | None = None
 
 
 class EndpointDetailOut(BaseModel):
@@ -176,6 +182,12 @@ class RoutingRuleCreate(BaseModel):
     dump_enabled: bool = False
     dump_path: str | None = None
     target_key_ids: list[int]
+    hedge_enabled: bool = False
+    hedge_delay_ms: int | None = Field(default=None, ge=0)
+    first_byte_timeout_ms: int | None = Field(default=None, ge=0)
+    response_cache_ttl_seconds: int | None = Field(default=None, ge=0)
+    embedding_batch_size: int | None = Field(default=None, ge=0)
+    embedding_batch_wait_ms: int | None = Field(default=None, ge=0)
 
     model_config = ConfigDict(extra="forbid")
 
@@ -190,6 +202,12 @@ class RoutingRuleUpdate(BaseModel):
     dump_enabled: bool | None = None
     dump_path: str | None = None
     target_key_ids: list[int] | None = None
+    hedge_enabled: bool | None = None
+    hedge_delay_ms: int | None = Field(default=None, ge=0)
+    first_byte_timeout_ms: int | None = Field(default=None, ge=0)
+    response_cache_ttl_seconds: int | None = Field(default=None, ge=0)
+    embedding_batch_size: int | None = Field(default=None, ge=0)
+    embedding_batch_wait_ms: int | None = Field(default=None, ge=0)
 
     model_config = ConfigDict(extra="forbid")
 
@@ -205,6 +223,12 @@ class RoutingRuleOut(BaseModel):
     dump_enabled: bool = False
     dump_path: str | None = None
     target_key_ids: list[int]
+    hedge_enabled: bool = False
+    hedge_delay_ms: int | None = None
+    first_byte_timeout_ms: int | None = None
+    response_cache_ttl_seconds: int | None = None
+    embedding_batch_size: int | None = None
+    embedding_batch_wait_ms: int | None = None
     request_count: int = 0
     total_tokens: int = 0
     avg_ttft_ms: int | None = None
@@ -217,11 +241,13 @@ class RoutingRuleOut(BaseModel):
 class FactoryAccessKeyCreate(BaseModel):
     name: str | None = None
     rule_groups: list[str] = Field(default_factory=lambda: ["default"])
+    request_timeout_seconds: float | None = Field(default=None, gt=0)
 
 
 class FactoryAccessKeyUpdate(BaseModel):
     name: str | None = None
     rule_groups: list[str] | None = None
+    request_timeout_seconds: float | None = Field(default=None, gt=0)
     is_active: bool | None = None
 
 
@@ -231,6 +257,7 @@ class FactoryAccessKeyOut(BaseModel):
     key_preview: str
     key: str | None = None
     rule_groups: list[str] = Field(default_factory=list)
+    request_timeout_seconds: float | None = None
     is_active: bool
     created_at: datetime
 
@@ -242,6 +269,7 @@ class FactoryAccessKeyIssueOut(BaseModel):
     name: str | None
     key: str
     rule_groups: list[str] = Field(default_factory=list)
+    request_timeout_seconds: float | None = None
     is_active: bool
     created_at: datetime
 
@@ -319,6 +347,7 @@ class StatsOverviewOut(BaseModel):
     total_requests: StatsKpiValue
     total_tokens: StatsKpiValue
     cache_hit_rate: StatsKpiValue
+    gateway_cache_hit_rate: StatsKpiValue
     avg_latency_ms: StatsKpiValue
     prompt_tokens: int
     completion_tokens: int
@@ -363,6 +392,15 @@ class StatsTopKeyOut(BaseModel):
     avg_latency_ms: int | None = None
 
 
+class StatsStrategyCacheOut(BaseModel):
+    strategy: str
+    request_count: int
+    prompt_tokens: int
+    cached_tokens: int
+    cache_hit_rate: float
+    cached_token_rate: float
+
+
 class DumpSearchItemOut(BaseModel):
     request_id: str
     trace_id: str
@@ -462,9 +500,12 @@ class RequestLogOut(BaseModel):
     requested_rule_group: str | None = None
     rule_group: str | None
     exposure_format: str | None = None
+    routing_strategy: str | None = None
     prompt_tokens: int | None
     completion_tokens: int | None
     total_tokens: int | None
+    gateway_cache_hit: bool | None = None
+    coalesced: bool | None = None
     latency_ms: int
     ttft_ms: int | None
     tps: float | None
@@ -495,6 +536,8 @@ class RequestAttemptLogOut(BaseModel):
     execution_mode: str | None = None
     agent_node: str | None = None
     upstream_url: str | None = None
+    retry_decision: str | None = None
+    retry_delay_ms: int | None = None
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -534,6 +577,37 @@ class HealthStatusOut(BaseModel):
     circuit_state: str
     circuit_failures: int
     circuit_ttl_seconds: int | None
+    circuit_trips: int = 0
+    circuit_window_requests: int = 0
+    circuit_window_error_rate: float | None = None
+
+
+class CircuitTransitionOut(BaseModel):
+    from_state: str
+    to_state: str
+    reason: str | None
+    at: datetime
+
+
+class CircuitDetailOut(BaseModel):
+    api_key_id: int
+    state: str
+    failures: int
+    ttl_seconds: int | None
+    trips: int
+    window_requests: int
+    window_error_rate: float | None
+    transitions: list[CircuitTransitionOut]
+
+
+class KeyInflightOut(BaseModel):
+    api_key_id: int
+    endpoint_id: int
+    endpoint_name: str
+    local_inflight: int
+    shared_inflight: int | None
+    concurrency_limit: int | None
+    shared_concurrency_limit: int | None
 
 
 class MetricsBucketOut(BaseModel):
@@ -643,6 +717,7 @@ class RouteTestRequest(BaseModel):
     model: str = Field(..., min_length=1)
     rule_group: str = "default"
     exposure_format: str = "any"
+    session_id: str | None = None
 
 
 class RouteCandidateOut(BaseModel):
@@ -16,6 +16,7 @@ from app.api.v1.route_helpers import (
     _build_endpoint_detail,
     _build_endpoint_out,
     _build_routing_rule_out,
+    _commit_routing_config,
     _deserialize_rule_config,
     _deserialize_rule_config_detail,
     _ensure_default_rule_group,
@@ -85,6 +86,7 @@ from app.db.models import (
     RoutingRule,
 )
 from app.db.session import SessionLocal, get_session
+from app.services.access_key_cache import invalidate_access_key
 from app.services.access_keys import (
     access_key_preview,
     hash_access_key,
@@ -109,7 +111,10 @@ from app.services.model_patterns import (
     compile_model_pattern,
     validate_model_pattern,
 )
+from app.services.provider_quota import read_provider_quota_many
+from app.services.rule_options import RULE_OPTION_FIELDS, RuleOptions, parse_rule_options
 from app.services.secrets import (
+    clear_decrypted_secret_cache,
     decrypt_secret_value,
     encrypt_oauth_config,
     encrypt_secret_value,
@@ -817,7 +822,7 @@ async def _sync_probe_model_maps(
             if model.id in delete_ids:
                 await session.delete(model)
 
-    await session.commit()
+    await _commit_routing_config(session)
 
     refreshed_result = await session.execute(
         select(ModelMap).where(ModelMap.endpoint_id == endpoint_id).order_by(ModelMap.id)
@@ -891,7 +896,10 @@ async def _sync_rule_targets_for_api_key(
 
         if changed:
             rule.target_key_ids_json = _serialize_rule_config(
-                sorted(target_key_set), strategy, exposure_formats
+                sorted(target_key_set),
+                strategy,
+                exposure_formats,
+                parse_rule_options(rule.target_key_ids_json),
             )
 
 
@@ -1088,6 +1096,7 @@ async def list_endpoints(session: AsyncSession = Depends(get_session)) -> list[E
     probe_results = await probe_store.read_many(api_key_ids)
     probe_series_map = await probe_store.read_series_many(api_key_ids)
     codex_usage_by_key = await read_codex_usage_many(redis, api_key_ids)
+    provider_quota_by_key = await read_provider_quota_many(redis, api_key_ids)
 
     items: list[EndpointDetailOut] = []
     for endpoint in endpoints:
@@ -1116,6 +1125,7 @@ async def list_endpoints(session: AsyncSession = Depends(get_session)) -> list[E
                 ping_latency,
                 uptime,
                 codex_usage_by_key=codex_usage_by_key,
+                provider_quota_by_key=provider_quota_by_key,
             )
         )
     return items
@@ -1205,7 +1215,7 @@ async def create_endpoint(
             resource_name=_api_key_resource_name(initial_api_key),
             after=initial_api_key,
         )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(endpoint)
     return _build_endpoint_out(endpoint)
 
@@ -1271,7 +1281,7 @@ async def update_endpoint(
         before=before_snapshot,
         after=endpoint,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(endpoint)
     return _build_endpoint_out(endpoint)
 
@@ -1500,7 +1510,8 @@ async def delete_endpoint(
         resource_name=endpoint_name,
         before=before_snapshot,
     )
-    await session.commit()
+    await _commit_routing_config(session)
+    clear_decrypted_secret_cache()
     return DeleteResponse()
 
 
@@ -1545,7 +1556,7 @@ async def create_endpoint_key(
         resource_name=_api_key_resource_name(api_key),
         after=api_key,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(api_key)
     return _build_api_key_out(api_key)
 
@@ -1746,7 +1757,7 @@ async def create_api_key(
         resource_name=_api_key_resource_name(api_key),
         after=api_key,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(api_key)
     return _build_api_key_out(api_key)
 
@@ -1803,7 +1814,9 @@ async def _update_api_key_record(
         before=before_snapshot,
         after=api_key,
     )
-    await session.commit()
+    await _commit_routing_config(session)
+    if "key" in data:
+        clear_decrypted_secret_cache()
     await session.refresh(api_key)
     return _build_api_key_out(api_key)
 
@@ -1858,7 +1871,8 @@ async def delete_api_key(
         resource_name=resource_name,
         before=before_snapshot,
     )
-    await session.commit()
+    await _commit_routing_config(session)
+    clear_decrypted_secret_cache()
     return DeleteResponse()
 
 
@@ -2034,6 +2048,7 @@ async def create_rule(
     group_name = await _ensure_rule_group_available(
         session, payload.group_name, exposure_formats
     )
+    options = RuleOptions().updated(payload.model_dump(include=set(RULE_OPTION_FIELDS)))
     rule = RoutingRule(
         model_pattern=model_pattern,
         group_name=group_name,
@@ -2042,7 +2057,7 @@ async def create_rule(
         dump_enabled=payload.dump_enabled,
         dump_path=dump_path,
         target_key_ids_json=_serialize_rule_config(
-            payload.target_key_ids, payload.strategy, exposure_formats
+            payload.target_key_ids, payload.strategy, exposure_formats, options
         ),
     )
     session.add(rule)
@@ -2064,9 +2079,10 @@ async def create_rule(
             "target_key_ids": payload.target_key_ids,
             "strategy": payload.strategy,
             "exposure_formats": exposure_formats,
+            **options.config_fields(),
         },
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(rule)
     target_key_ids, strategy, exposure_formats = _deserialize_rule_config_detail(
         rule.target_key_ids_json
@@ -2090,11 +2106,13 @@ async def update_rule(
     before_targets, before_strategy, before_exposure_formats = _deserialize_rule_config_detail(
         rule.target_key_ids_json
     )
+    before_options = parse_rule_options(rule.target_key_ids_json)
     before_snapshot = {
         **audit_snapshot(rule),
         "target_key_ids": before_targets,
         "strategy": before_strategy,
         "exposure_formats": before_exposure_formats,
+        **before_options.config_fields(),
     }
     data = payload.model_dump(exclude_unset=True)
     if not data:
@@ -2107,6 +2125,7 @@ async def update_rule(
     next_targets = current_targets
     next_strategy = current_strategy
     next_exposure_formats = current_exposure_formats
+    next_options = before_options
 
     if _is_default_rule_group(rule.group_name):
         if data.get("group_name") is not None and not _is_default_rule_group(
@@ -2144,11 +2163,14 @@ async def update_rule(
                     detail="Default rule group supports all API entry formats",
                 )
             next_exposure_formats = list(EXPLICIT_EXPOSURE_FORMATS)
-    if has_target_update or "strategy" in data or has_exposure_update:
+    option_changes = {field: data.pop(field) for field in RULE_OPTION_FIELDS if field in data}
+    if option_changes:
+        next_options = before_options.updated(option_changes)
+    if has_target_update or "strategy" in data or has_exposure_update or option_changes:
         next_targets = data.pop("target_key_ids", current_targets)
         next_strategy = data.pop("strategy", current_strategy)
         rule.target_key_ids_json = _serialize_rule_config(
-            next_targets, next_strategy, next_exposure_formats
+            next_targets, next_strategy, next_exposure_formats, next_options
         )
 
     requested_group_name = data.get("group_name", rule.group_name)
@@ -2210,9 +2232,10 @@ async def update_rule(
             "target_key_ids": next_targets,
             "strategy": next_strategy,
             "exposure_formats": next_exposure_formats,
+            **next_options.config_fields(),
         },
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(rule)
     target_key_ids, strategy, exposure_formats = _deserialize_rule_config_detail(
         rule.target_key_ids_json
@@ -2260,7 +2283,7 @@ async def delete_rule(
         resource_name=resource_name,
         before=before_snapshot,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     return DeleteResponse()
 
 
@@ -2359,6 +2382,7 @@ async def list_factory_access_keys(
             key_preview=_factory_access_key_preview(item),
             key=None,
             rule_groups=item.rule_groups,
+            request_timeout_seconds=item.request_timeout_seconds,
             is_active=item.is_active,
             created_at=item.created_at,
         )
@@ -2379,6 +2403,7 @@ async def create_factory_access_key(
         name=payload.name,
         key=hash_access_key(raw_key),
         key_preview=access_key_preview(raw_key),
+        request_timeout_seconds=payload.request_timeout_seconds,
         is_active=True,
     )
     item.rule_groups = groups
@@ -2399,6 +2424,7 @@ async def create_factory_access_key(
         name=item.name,
         key=raw_key,
         rule_groups=item.rule_groups,
+        request_timeout_seconds=item.request_timeout_seconds,
         is_active=item.is_active,
         created_at=item.created_at,
     )
@@ -2432,12 +2458,14 @@ async def update_factory_access_key(
     )
     await session.commit()
     await session.refresh(item)
+    await invalidate_access_key(await get_redis(), item.key)
     return FactoryAccessKeyOut(
         id=item.id,
         name=item.name,
         key_preview=_factory_access_key_preview(item),
         key=None,
         rule_groups=item.rule_groups,
+        request_timeout_seconds=item.request_timeout_seconds,
         is_active=item.is_active,
         created_at=item.created_at,
     )
@@ -2453,6 +2481,7 @@ async def rotate_factory_access_key(
     if not item:
         raise HTTPException(status_code=404, detail="Factory access key not found")
     before_snapshot = audit_snapshot(item)
+    previous_key = item.key
     raw_key = f"fk-{secrets.token_urlsafe(24)}"
     item.key = hash_access_key(raw_key)
     item.key_preview = access_key_preview(raw_key)
@@ -2467,11 +2496,13 @@ async def rotate_factory_access_key(
     )
     await session.commit()
     await session.refresh(item)
+    await invalidate_access_key(await get_redis(), previous_key)
     return FactoryAccessKeyIssueOut(
         id=item.id,
         name=item.name,
         key=raw_key,
         rule_groups=item.rule_groups,
+        request_timeout_seconds=item.request_timeout_seconds,
         is_active=item.is_active,
         created_at=item.created_at,
     )
@@ -2486,6 +2517,7 @@ async def delete_factory_access_key(
         raise HTTPException(status_code=404, detail="Factory access key not found")
     before_snapshot = audit_snapshot(item)
     resource_name = item.name
+    stored_key = item.key
     await session.delete(item)
     await record_audit_log(
         session,
@@ -2496,6 +2528,7 @@ async def delete_factory_access_key(
         before=before_snapshot,
     )
     await session.commit()
+    await invalidate_access_key(await get_redis(), stored_key)
     return DeleteResponse()
 
 
@@ -2542,7 +2575,7 @@ async def create_model_map(
         resource_name=_model_map_resource_name(model_map),
         after=model_map,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(model_map)
     return model_map
 
@@ -2572,7 +2605,7 @@ async def update_model_map(
         before=before_snapshot,
         after=model_map,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(model_map)
     return model_map
 
@@ -2594,7 +2627,7 @@ async def delete_model_map(
         resource_name=resource_name,
         before=before_snapshot,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     return DeleteResponse()
 
 
@@ -6,7 +6,11 @@ from fastapi import Depends, HTTPException, Request, Response, WebSocket, WebSoc
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.v1.route_helpers import _authorize_agent_token, _build_agent_install_command
+from app.api.v1.route_helpers import (
+    _authorize_agent_token,
+    _build_agent_install_command,
+    _commit_routing_config,
+)
 from app.api.v1.route_models import (
     AgentBootstrapOut,
     AgentBootstrapRequest,
@@ -341,11 +345,11 @@ async def admin_delete_agent(
             resource_name=resource_name,
             before=before_snapshot,
         )
-        await session.commit()
+        await _commit_routing_config(session)
         return DeleteResponse()
     stmt = delete(Agent).where(Agent.id == agent_id)
     await session.execute(stmt)
-    await session.commit()
+    await _commit_routing_config(session)
     return DeleteResponse()
 
 
@@ -377,7 +381,7 @@ async def admin_update_agent(
         before=before_snapshot,
         after=agent,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(agent)
     return _agent_status_out(agent)
 
@@ -404,7 +408,7 @@ async def _set_agent_state(
         before=before_snapshot,
         after=agent,
     )
-    await session.commit()
+    await _commit_routing_config(session)
     await session.refresh(agent)
     return _agent_status_out(agent)
 
@@ -3,16 +3,20 @@ from fastapi import APIRouter, Depends
 from app.api.v1.route_helpers import _require_master_auth
 from app.api.v1.route_models import (
     AlertPolicyOut,
+    CircuitDetailOut,
     HealthProbeBucketOut,
     HealthStatusOut,
+    KeyInflightOut,
     TelegramConfigOut,
     TelegramTestOut,
 )
 from app.api.v1.route_modules.health_handlers import (
     admin_alert_policies,
     admin_alert_policy_update,
+    admin_circuit_detail,
     admin_health_probe_timeseries,
     admin_health_status,
+    admin_inflight_status,
     admin_telegram_config,
     admin_telegram_config_update,
     admin_telegram_test,
@@ -70,3 +74,17 @@ router.add_api_route(
     response_model=list[HealthStatusOut],
     dependencies=_admin_dependencies,
 )
+router.add_api_route(
+    "/admin/health-status/{api_key_id}/circuit",
+    admin_circuit_detail,
+    methods=["GET"],
+    response_model=CircuitDetailOut,
+    dependencies=_admin_dependencies,
+)
+router.add_api_route(
+    "/admin/inflight",
+    admin_inflight_status,
+    methods=["GET"],
+    response_model=list[KeyInflightOut],
+    dependencies=_admin_dependencies,
+)
@@ -12,8 +12,11 @@ from app.api.v1.route_helpers import (
 from app.api.v1.route_models import (
     AlertPolicyOut,
     AlertPolicyUpdate,
+    CircuitDetailOut,
+    CircuitTransitionOut,
     HealthProbeBucketOut,
     HealthStatusOut,
+    KeyInflightOut,
     TelegramConfigOut,
     TelegramConfigUpdate,
     TelegramTestOut,
@@ -25,6 +28,11 @@ from app.db.session import get_session
 from app.services.audit import record_audit_log
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.health_monitor import HealthProbeStore
+from app.services.concurrency_limit import (
+    get_concurrency_limiter,
+    read_shared_concurrency_limits,
+)
+from app.services.inflight import get_local_inflight, get_shared_inflight
 from app.services.notifications import ALERT_EVENTS, AlertPolicyStore, get_notifier
 
 
@@ -227,11 +235,12 @@ async def admin_health_status(
 
     api_key_ids = [api_key.id for api_key, _ in rows]
     probe_results = await probe_store.read_many(api_key_ids)
+    circuit_statuses = await circuit_breaker.get_statuses(api_key_ids)
 
     statuses: list[HealthStatusOut] = []
     for api_key, endpoint in rows:
         probe = probe_results.get(api_key.id)
-        circuit_status = await circuit_breaker.get_status(api_key.id)
+        circuit_status = circuit_statuses[api_key.id]
         statuses.append(
             HealthStatusOut(
                 api_key_id=api_key.id,
@@ -247,7 +256,72 @@ async def admin_health_status(
                 circuit_state=circuit_status.state,
                 circuit_failures=circuit_status.failures,
                 circuit_ttl_seconds=circuit_status.ttl_seconds,
+                circuit_trips=circuit_status.trips,
+                circuit_window_requests=circuit_status.window_requests,
+                circuit_window_error_rate=circuit_status.window_error_rate,
             )
         )
 
     return statuses
+
+
+async def admin_circuit_detail(
+    api_key_id: int,
+    session: AsyncSession = Depends(get_session),
+) -> CircuitDetailOut:
+    api_key = await session.get(APIKey, api_key_id)
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API key not found")
+    circuit_breaker = CircuitBreaker(await get_redis())
+    circuit_status = await circuit_breaker.get_status(api_key_id)
+    history = await circuit_breaker.get_history(api_key_id)
+    return CircuitDetailOut(
+        api_key_id=api_key_id,
+        state=circuit_status.state,
+        failures=circuit_status.failures,
+        ttl_seconds=circuit_status.ttl_seconds,
+        trips=circuit_status.trips,
+        window_requests=circuit_status.window_requests,
+        window_error_rate=circuit_status.window_error_rate,
+        transitions=[
+            CircuitTransitionOut(
+                from_state=entry.from_state,
+                to_state=entry.to_state,
+                reason=entry.reason,
+                at=entry.at,
+            )
+            for entry in history
+        ],
+    )
+
+
+async def admin_inflight_status(
+    session: AsyncSession = Depends(get_session),
+) -> list[KeyInflightOut]:
+    stmt = (
+        select(APIKey.id, Endpoint.id, Endpoint.name)
+        .join(Endpoint, APIKey.endpoint_id == Endpoint.id)
+        .where(APIKey.is_active.is_(True))
+        .order_by(APIKey.id)
+    )
+    rows = (await session.execute(stmt)).all()
+    api_key_ids = [api_key_id for api_key_id, _, _ in rows]
+    redis = await get_redis()
+    local_counts = get_local_inflight(api_key_ids)
+    shared_counts = await get_shared_inflight(api_key_ids, redis)
+    limiter = get_concurrency_limiter()
+    shared_limits = await read_shared_concurrency_limits(redis, api_key_ids)
+    return [
+        KeyInflightOut(
+            api_key_id=api_key_id,
+            endpoint_id=endpoint_id,
+            endpoint_name=endpoint_name,
+            local_inflight=local_counts.get(api_key_id, 0),
+            shared_inflight=shared_counts.get(api_key_id, 0) if shared_counts is not None else None,
+            concurrency_limit=limiter.limit(api_key_id),
+            shared_concurrency_limit=(
+                shared_limits.get(api_key_id) if shared_limits is not None else None
+            ),
+        )
+        for api_key_id, endpoint_id, endpoint_name in rows
+    ]
@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 import time
 
@@ -13,13 +14,20 @@ from app.api.v1.route_modules.proxy_attempts import (
     reserve_candidate_attempt_or_raise as _reserve_candidate_attempt_or_raise,
 )
 from app.api.v1.route_modules.proxy_context import CandidateRequestContext
+from app.api.v1.route_modules.proxy_deadline import (
+    RequestDeadline,
+    deadline_exceeded,
+    first_event_timeout,
+)
 from app.api.v1.route_modules.proxy_failures import (
     CANDIDATE_FALLBACK_STATUSES,
     CIRCUIT_BREAKER_STATUSES,
     UPSTREAM_CANDIDATE_MAX_ATTEMPTS,
+    circuit_failure_scope,
     parse_json_object_bytes,
+    peek_first_stream_event,
+    decide_same_candidate_retry,
     semantic_failure_reason as detect_semantic_failure_reason,
-    should_retry_same_candidate,
 )
 from app.api.v1.route_modules.proxy_responses import raw_proxy_response_with_dump
 from app.api.v1.route_proxy_helpers import (
@@ -30,10 +38,16 @@ from app.api.v1.route_proxy_helpers import (
 from app.services.agent_transport import AgentRequest, AgentUnavailableError, get_agent_manager
 from app.services.background_tasks import safe_create_task
 from app.services.billing import RequestMetrics, extract_usage, write_request_log
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import (
+    CIRCUIT_SCOPE_ENDPOINT,
+    CIRCUIT_SCOPE_MODEL,
+    CircuitBreaker,
+)
 from app.services.codex_usage import record_codex_usage_from_headers
 from app.services.codex_oauth import apply_codex_auth_headers, resolve_codex_credential
 from app.db.session import SessionLocal
+from app.services.key_latency import observe_request_metrics
+from app.services.provider_quota import provider_cooldown, record_provider_quota
 from app.services.router import ModelRouter, RouteCandidate
 
 
@@ -41,6 +55,7 @@ from app.services.router import ModelRouter, RouteCandidate
 class CandidateProxyResult:
     response: Response | None
     attempt_order: int
+    succeeded: bool = False
 
 
 async def handle_agent_candidate(
@@ -63,6 +78,7 @@ async def handle_agent_candidate(
     session_id: str | None,
     request_start: float,
     attempt_order: int,
+    deadline: RequestDeadline | None = None,
 ) -> CandidateProxyResult:
     upstream_body = candidate_context.upstream_body
     headers = candidate_context.headers
@@ -76,6 +92,35 @@ async def handle_agent_candidate(
     def _record_attempt_log(**kwargs) -> None:  # noqa: ANN003
         _write_attempt_log(exposure_format=exposure_format, **kwargs)
 
+    def _record_deadline_attempt(failure_reason: str, status_code: int | None = None) -> None:
+        _record_attempt_log(
+            request_id=request_id,
+            trace_id=trace_id,
+            model_alias=model_alias,
+            candidate=candidate,
+            requested_rule_group=requested_rule_group,
+            rule_group=effective_group,
+            attempt_order=attempt_order,
+            status_code=status_code,
+            outcome="fallback"
+            if failure_reason == "deadline_skip" and candidate != last_candidate
+            else "error",
+            failure_reason=failure_reason,
+            latency_ms=_elapsed_ms(attempt_start),
+            agent_node=agent_name,
+            upstream_url=url,
+        )
+
+    def _agent_request(request_headers: dict) -> AgentRequest:
+        return AgentRequest(
+            method=request.method,
+            url=url,
+            headers=request_headers,
+            body=upstream_body,
+            stream=is_stream,
+            timeout_seconds=deadline.cap_seconds() if deadline is not None else None,
+        )
+
     if agent_name is None:
         raise HTTPException(status_code=502, detail="Agent unavailable")
 
@@ -83,6 +128,15 @@ async def handle_agent_candidate(
     for attempt_index in range(UPSTREAM_CANDIDATE_MAX_ATTEMPTS):
         attempt_order += 1
         attempt_start = time.perf_counter()
+        if deadline is not None:
+            if deadline.expired():
+                _record_deadline_attempt("deadline_exceeded")
+                raise deadline_exceeded()
+            if deadline.cannot_fit(candidate.api_key.id, is_stream=is_stream):
+                _record_deadline_attempt("deadline_skip")
+                if candidate != last_candidate:
+                    break
+                raise deadline_exceeded()
         if not await _reserve_candidate_attempt_or_raise(
             router_service=router_service,
             candidate=candidate,
@@ -100,15 +154,14 @@ async def handle_agent_candidate(
         ):
             break
         try:
-            agent_request = AgentRequest(
-                method=request.method,
-                url=url,
-                headers=headers,
-                body=upstream_body,
-                stream=is_stream,
-            )
-            agent_response = await agent_manager.send_request(agent_name, agent_request)
+            agent_response = await agent_manager.send_request(agent_name, _agent_request(headers))
         except AgentUnavailableError:
+            if deadline is not None and deadline.expired():
+                _record_deadline_attempt("deadline_exceeded")
+                raise deadline_exceeded()
+            retry = decide_same_candidate_retry(
+                None, attempt_index, endpoint_id=candidate.endpoint.id, deadline=deadline
+            )
             _record_attempt_log(
                 request_id=request_id,
                 trace_id=trace_id,
@@ -119,15 +172,18 @@ async def handle_agent_candidate(
                 attempt_order=attempt_order,
                 status_code=None,
                 outcome="retry"
-                if attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+                if retry is not None and retry.retry
                 else ("fallback" if candidate != last_candidate else "error"),
                 failure_reason="agent_unavailable",
                 latency_ms=_elapsed_ms(attempt_start),
                 agent_node=agent_name,
                 upstream_url=url,
+                retry_decision=retry.reason if retry is not None else None,
+                retry_delay_ms=retry.delay_ms if retry is not None else None,
             )
-            await circuit_breaker.record_failure(candidate.api_key.id)
-            if attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS:
+            await circuit_breaker.record_candidate_failure(candidate, CIRCUIT_SCOPE_ENDPOINT)
+            if retry is not None and retry.retry:
+                await asyncio.sleep(retry.delay_seconds)
                 continue
             if candidate != last_candidate:
                 break
@@ -148,17 +204,15 @@ async def handle_agent_candidate(
                     endpoint=candidate.endpoint,
                 )
                 headers = apply_codex_auth_headers(headers, credential)
-                retry_request = AgentRequest(
-                    method=request.method,
-                    url=url,
-                    headers=headers,
-                    body=upstream_body,
-                    stream=is_stream,
+                agent_response = await agent_manager.send_request(
+                    agent_name, _agent_request(headers)
                 )
-                agent_response = await agent_manager.send_request(agent_name, retry_request)
                 status_code = agent_response.status_code or 500
             except AgentUnavailableError:
-                await circuit_breaker.record_failure(candidate.api_key.id)
+                if deadline is not None and deadline.expired():
+                    _record_deadline_attempt("deadline_exceeded")
+                    raise deadline_exceeded()
+                await circuit_breaker.record_candidate_failure(candidate, CIRCUIT_SCOPE_ENDPOINT)
                 if candidate != last_candidate:
                     break
                 raise HTTPException(status_code=502, detail="Agent unavailable")
@@ -178,17 +232,15 @@ async def handle_agent_candidate(
                     client,
                     force_refresh=True,
                 )
-                retry_request = AgentRequest(
-                    method=request.method,
-                    url=url,
-                    headers=headers,
-                    body=upstream_body,
-                    stream=is_stream,
+                agent_response = await agent_manager.send_request(
+                    agent_name, _agent_request(headers)
                 )
-                agent_response = await agent_manager.send_request(agent_name, retry_request)
                 status_code = agent_response.status_code or 500
             except AgentUnavailableError:
-                await circuit_breaker.record_failure(candidate.api_key.id)
+                if deadline is not None and deadline.expired():
+                    _record_deadline_attempt("deadline_exceeded")
+                    raise deadline_exceeded()
+                await circuit_breaker.record_candidate_failure(candidate, CIRCUIT_SCOPE_ENDPOINT)
                 if candidate != last_candidate:
                     break
                 raise HTTPException(status_code=502, detail="Agent unavailable")
@@ -201,13 +253,30 @@ async def handle_agent_candidate(
                 ) from exc
 
         if status_code in CANDIDATE_FALLBACK_STATUSES:
-            if status_code in CIRCUIT_BREAKER_STATUSES:
-                await circuit_breaker.record_failure(candidate.api_key.id)
             if is_stream:
                 content = await agent_response.read_all()
             else:
                 content = agent_response.body
-            should_retry = should_retry_same_candidate(status_code, attempt_index)
+            failure_scope = circuit_failure_scope(content)
+            quota = await record_provider_quota(
+                redis,
+                api_key_id=candidate.api_key.id,
+                status_code=status_code,
+                headers=agent_response.headers,
+                content=content,
+            )
+            if not provider_cooldown(status_code, quota) and (
+                status_code in CIRCUIT_BREAKER_STATUSES or failure_scope == CIRCUIT_SCOPE_MODEL
+            ):
+                await circuit_breaker.record_candidate_failure(candidate, failure_scope)
+            retry = decide_same_candidate_retry(
+                status_code,
+                attempt_index,
+                endpoint_id=candidate.endpoint.id,
+                headers=agent_response.headers,
+                deadline=deadline,
+            )
+            should_retry = retry is not None and retry.retry
             _record_attempt_log(
                 request_id=request_id,
                 trace_id=trace_id,
@@ -224,8 +293,11 @@ async def handle_agent_candidate(
                 latency_ms=_elapsed_ms(attempt_start),
                 agent_node=agent_name,
                 upstream_url=url,
+                retry_decision=retry.reason if retry is not None else None,
+                retry_delay_ms=retry.delay_ms if retry is not None else None,
             )
             if should_retry:
+                await asyncio.sleep(retry.delay_seconds)
                 continue
             if candidate != last_candidate:
                 break
@@ -251,6 +323,14 @@ async def handle_agent_candidate(
             )
 
         if is_stream:
+            safe_create_task(
+                record_provider_quota(
+                    redis,
+                    api_key_id=candidate.api_key.id,
+                    status_code=status_code,
+                    headers=agent_response.headers,
+                )
+            )
             if candidate_provider == "codex":
                 safe_create_task(
                     record_codex_usage_from_headers(
@@ -259,6 +339,47 @@ async def handle_agent_candidate(
                         headers=agent_response.headers,
                     )
                 )
+            first_byte_timeout = first_event_timeout(
+                router_service.rule_options.first_byte_timeout_ms, deadline
+            )
+            if first_byte_timeout is not None:
+                agent_response, stream_failure = await peek_first_stream_event(
+                    agent_response, first_byte_timeout
+                )
+                if (
+                    stream_failure == "first_byte_timeout"
+                    and deadline is not None
+                    and deadline.expired()
+                ):
+                    _record_deadline_attempt("deadline_exceeded", status_code)
+                    raise deadline_exceeded()
+                if stream_failure and (
+                    candidate != last_candidate or stream_failure != "first_event_error"
+                ):
+                    if stream_failure == "first_event_error":
+                        await agent_response.aclose()
+                    await circuit_breaker.record_candidate_failure(candidate)
+                    _record_attempt_log(
+                        request_id=request_id,
+                        trace_id=trace_id,
+                        model_alias=model_alias,
+                        candidate=candidate,
+                        requested_rule_group=requested_rule_group,
+                        rule_group=effective_group,
+                        attempt_order=attempt_order,
+                        status_code=status_code,
+                        outcome="fallback" if candidate != last_candidate else "error",
+                        failure_reason=stream_failure,
+                        latency_ms=_elapsed_ms(attempt_start),
+                        agent_node=agent_name,
+                        upstream_url=url,
+                    )
+                    if candidate != last_candidate:
+                        break
+                    raise HTTPException(
+                        status_code=504 if stream_failure == "first_byte_timeout" else 502,
+                        detail="Upstream stream failed before first byte",
+                    )
 
             def _record_stream_attempt(
                 outcome: str,
@@ -303,6 +424,8 @@ async def handle_agent_candidate(
                 circuit_breaker=circuit_breaker,
                 router_service=router_service,
                 record_attempt=_record_stream_attempt,
+                inflight_lease=router_service.detach_inflight_lease(),
+                token_reservation=router_service.detach_token_reservation(),
             )
 
             return CandidateProxyResult(
@@ -313,6 +436,7 @@ async def handle_agent_candidate(
                     headers=stream_headers,
                 ),
                 attempt_order=attempt_order,
+                succeeded=True,
             )
 
         latency_ms = int((time.perf_counter() - request_start) * 1000)
@@ -324,7 +448,9 @@ async def handle_agent_candidate(
             candidate_provider,
         )
         if semantic_failure_reason:
-            await circuit_breaker.record_failure(candidate.api_key.id)
+            await circuit_breaker.record_candidate_failure(
+                candidate, circuit_failure_scope(agent_response.body)
+            )
             _record_attempt_log(
                 request_id=request_id,
                 trace_id=trace_id,
@@ -363,8 +489,15 @@ async def handle_agent_candidate(
                 attempt_order=attempt_order,
             )
 
-        await circuit_breaker.record_success(candidate.api_key.id)
-        await router_service.record_candidate_success(candidate)
+        await router_service.record_attempt_success(candidate)
+        safe_create_task(
+            record_provider_quota(
+                redis,
+                api_key_id=candidate.api_key.id,
+                status_code=status_code,
+                headers=agent_response.headers,
+            )
+        )
         if candidate_provider == "codex":
             safe_create_task(
                 record_codex_usage_from_headers(
@@ -392,6 +525,7 @@ async def handle_agent_candidate(
         prompt_tokens, completion_tokens, total_tokens, cached_tokens = extract_usage(
             response_payload
         )
+        await router_service.settle_token_reservation(total_tokens)
         metrics = RequestMetrics(
             request_id=request_id,
             trace_id=trace_id,
@@ -401,6 +535,7 @@ async def handle_agent_candidate(
             requested_rule_group=requested_rule_group,
             rule_group=effective_group,
             exposure_format=exposure_format,
+            routing_strategy=router_service.routing_strategy,
             status_code=status_code,
             latency_ms=latency_ms,
             ttft_ms=None,
@@ -412,7 +547,9 @@ async def handle_agent_candidate(
             execution_mode=candidate.execution_mode,
             agent_node=agent_name,
             upstream_url=url,
+            usage_shares=candidate_context.usage_shares,
         )
+        observe_request_metrics(metrics)
         safe_create_task(write_request_log(metrics))
 
         return CandidateProxyResult(
@@ -438,6 +575,7 @@ async def handle_agent_candidate(
                 latency_ms=latency_ms,
             ),
             attempt_order=attempt_order,
+            succeeded=True,
         )
 
     return CandidateProxyResult(response=None, attempt_order=attempt_order)
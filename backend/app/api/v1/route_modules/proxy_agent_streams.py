@@ -4,12 +4,16 @@ import time
 from typing import AsyncGenerator, Callable
 
 from app.api.v1.route_helpers import _dump_proxy_record
-from app.api.v1.route_proxy_helpers import _calculate_tps, _inspect_stream_chunk
+from app.api.v1.route_proxy_helpers import _calculate_tps
 from app.db.models import RoutingRule
 from app.services.agent_transport import AgentStream
 from app.services.background_tasks import safe_create_task
 from app.services.billing import RequestMetrics, extract_usage, write_request_log
+from app.services.inflight import InflightLease
+from app.services.key_latency import observe_request_metrics
 from app.services.router import RouteCandidate
+from app.services.stream_inspection import SSEStreamInspector
+from app.services.token_budget import TokenReservation
 
 
 logger = logging.getLogger(__name__)
@@ -36,32 +40,28 @@ async def agent_stream_generator(
     circuit_breaker=None,
     router_service=None,
     record_attempt: Callable[[str, str | None], None] | None = None,
+    inflight_lease: InflightLease | None = None,
+    token_reservation: TokenReservation | None = None,
 ) -> AsyncGenerator[bytes, None]:
-    buffer = ""
-    usage_payload = None
+    inspector = SSEStreamInspector()
     first_data_at: float | None = None
     chunks: list[bytes] = []
     stream_complete = False
     stream_failed = False
-    response_completed = False
     failure_reason: str | None = None
     try:
         async for chunk in agent_response.iter_bytes():
             if chunk:
                 if dump_rule is not None:
                     chunks.append(chunk)
-                (
-                    buffer,
-                    usage_payload,
-                    data_seen,
-                    chunk_failed,
-                    chunk_completed,
-                ) = _inspect_stream_chunk(buffer, usage_payload, chunk)
-                stream_failed = stream_failed or chunk_failed
-                response_completed = response_completed or chunk_completed
-                if data_seen and first_data_at is None:
+                inspector.feed(chunk)
+                stream_failed = inspector.failed
+                if first_data_at is None and inspector.data_seen:
                     first_data_at = time.perf_counter()
             yield chunk
+        inspector.close()
+        stream_failed = inspector.failed
+        response_completed = inspector.completed
         requires_completion = exposure_format in {"codex", "response"}
         stream_complete = not stream_failed and (
             response_completed or not requires_completion
@@ -96,6 +96,8 @@ async def agent_stream_generator(
         raise
     finally:
         stream_end = time.perf_counter()
+        if inflight_lease is not None:
+            await inflight_lease.release()
         latency_ms = int((stream_end - request_start) * 1000)
         if record_attempt is not None:
             if stream_complete:
@@ -108,17 +110,20 @@ async def agent_stream_generator(
             if stream_failed:
                 await circuit_breaker.record_failure(candidate.api_key.id)
             elif stream_complete:
-                await circuit_breaker.record_success(candidate.api_key.id)
                 if router_service is not None:
-                    await router_service.record_candidate_success(candidate)
+                    await router_service.record_attempt_success(candidate)
+                else:
+                    await circuit_breaker.record_candidate_success(candidate)
         ttft_ms = (
             int((first_data_at - request_start) * 1000)
             if first_data_at is not None
             else None
         )
         prompt_tokens, completion_tokens, total_tokens, cached_tokens = extract_usage(
-            usage_payload
+            inspector.usage_payload
         )
+        if token_reservation is not None:
+            await token_reservation.settle(total_tokens)
         tps = _calculate_tps(first_data_at, stream_end, completion_tokens)
         metrics = RequestMetrics(
             request_id=request_id,
@@ -129,6 +134,9 @@ async def agent_stream_generator(
             requested_rule_group=requested_rule_group,
             rule_group=effective_group,
             exposure_format=exposure_format,
+            routing_strategy=(
+                router_service.routing_strategy if router_service is not None else None
+            ),
             status_code=status_code,
             latency_ms=latency_ms,
             ttft_ms=ttft_ms,
@@ -141,6 +149,7 @@ async def agent_stream_generator(
             agent_node=agent_name,
             upstream_url=upstream_url,
         )
+        observe_request_metrics(metrics)
         safe_create_task(write_request_log(metrics))
         if dump_rule is not None:
             safe_create_task(
@@ -2,8 +2,11 @@ import time
 
 from fastapi import HTTPException
 
+from app.core.rate_limit import format_retry_after
 from app.services.background_tasks import safe_create_task
 from app.services.billing import RequestAttemptMetrics, write_request_attempt_log
+from app.services.concurrency_limit import concurrency_queue_seconds, get_concurrency_limiter
+from app.services.key_latency import observe_attempt_metrics
 from app.services.router import ModelRouter, RouteCandidate
 
 
@@ -27,6 +30,8 @@ def record_attempt_log(
     agent_node: str | None,
     upstream_url: str,
     exposure_format: str = "any",
+    retry_decision: str | None = None,
+    retry_delay_ms: int | None = None,
 ) -> None:
     metrics = RequestAttemptMetrics(
         request_id=request_id,
@@ -45,7 +50,11 @@ def record_attempt_log(
         execution_mode=candidate.execution_mode,
         agent_node=agent_node,
         upstream_url=upstream_url,
+        retry_decision=retry_decision,
+        retry_delay_ms=retry_delay_ms,
     )
+    observe_attempt_metrics(metrics)
+    get_concurrency_limiter().observe(metrics)
     safe_create_task(write_request_attempt_log(metrics))
 
 
@@ -65,7 +74,8 @@ async def reserve_candidate_attempt_or_raise(
     upstream_url: str,
     exposure_format: str = "any",
 ) -> bool:
-    if await router_service.reserve_candidate_attempt(candidate):
+    queue_seconds = concurrency_queue_seconds() if candidate == last_candidate else 0.0
+    if await router_service.reserve_candidate_attempt(candidate, queue_seconds=queue_seconds):
         return True
     record_attempt_log(
         request_id=request_id,
@@ -77,7 +87,7 @@ async def reserve_candidate_attempt_or_raise(
         attempt_order=attempt_order,
         status_code=None,
         outcome="fallback" if candidate != last_candidate else "error",
-        failure_reason="rpm_limit",
+        failure_reason=router_service.reserve_failure_reason or "rpm_limit",
         latency_ms=elapsed_ms(attempt_start),
         agent_node=agent_node,
         upstream_url=upstream_url,
@@ -85,4 +95,17 @@ async def reserve_candidate_attempt_or_raise(
     )
     if candidate != last_candidate:
         return False
-    raise HTTPException(status_code=429, detail="API key rate limit exceeded")
+    if router_service.rate_limit_retry_after is None and router_service.reserve_failure_reason in {
+        "circuit_half_open",
+        "concurrency_limit",
+    }:
+        raise HTTPException(status_code=503, detail="No available API keys")
+    raise rate_limit_exceeded(router_service)
+
+
+def rate_limit_exceeded(router_service: ModelRouter) -> HTTPException:
+    retry_after = router_service.rate_limit_retry_after
+    headers = {"Retry-After": format_retry_after(retry_after)} if retry_after is not None else None
+    return HTTPException(
+        status_code=429, detail="API key rate limit exceeded", headers=headers
+    )
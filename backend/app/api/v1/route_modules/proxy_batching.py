@@ -0,0 +1,158 @@
+import asyncio
+from dataclasses import dataclass
+import json
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.api.v1.route_modules.proxy_deadline import RequestDeadline, deadline_exceeded
+from app.api.v1.route_modules.proxy_failures import parse_json_object_bytes
+from app.services.billing import UsageShare
+from app.services.embedding_batcher import (
+    BatchMember,
+    EmbeddingBatch,
+    batch_inputs,
+    embedding_batch_key,
+    get_embedding_batcher,
+    split_embedding_response,
+)
+from app.services.rule_options import RuleOptions
+
+EMBEDDINGS_PATH_SUFFIX = "/embeddings"
+# 规则只设置批大小时使用的默认等待时间
+EMBEDDING_BATCH_DEFAULT_WAIT_MS = 5
+
+
+@dataclass(frozen=True)
+class EmbeddingBatchTicket:
+    batch: EmbeddingBatch
+    member: BatchMember
+    leader: bool
+    wait_seconds: float
+
+
+@dataclass(frozen=True)
+class MergedEmbeddingRequest:
+    payload: dict
+    raw_body: bytes
+    usage_shares: tuple[UsageShare, ...]
+
+
+def join_embedding_batch(
+    request: Request,
+    payload: dict,
+    options: RuleOptions | None,
+    *,
+    model_alias: str,
+    effective_group: str,
+    exposure_format: str,
+    request_id: str,
+    trace_id: str,
+) -> EmbeddingBatchTicket | None:
+    """Queue an OpenAI embeddings call on the rule's batch, or None when it goes alone."""
+    max_inputs = options.embedding_batch_size if options is not None else None
+    if not max_inputs or max_inputs < 2:
+        return None
+    if request.method.upper() != "POST" or not request.url.path.endswith(
+        EMBEDDINGS_PATH_SUFFIX
+    ):
+        return None
+    parsed = batch_inputs(payload.get("input"))
+    if parsed is None or len(parsed[1]) >= max_inputs:
+        return None
+    input_kind, inputs = parsed
+    key = embedding_batch_key(
+        path=request.url.path,
+        model_alias=model_alias,
+        rule_group=effective_group,
+        exposure_format=exposure_format,
+        input_kind=input_kind,
+        payload=payload,
+    )
+    member = BatchMember(
+        request_id=request_id,
+        trace_id=trace_id,
+        inputs=inputs,
+        result=asyncio.get_running_loop().create_future(),
+    )
+    batch, leader = get_embedding_batcher().join(key, member, max_inputs)
+    wait_ms = options.embedding_batch_wait_ms or EMBEDDING_BATCH_DEFAULT_WAIT_MS
+    return EmbeddingBatchTicket(
+        batch=batch, member=member, leader=leader, wait_seconds=wait_ms / 1000
+    )
+
+
+async def batched_embedding_response(
+    ticket: EmbeddingBatchTicket,
+    *,
+    deadline: RequestDeadline | None,
+    request_id: str,
+    trace_id: str,
+) -> Response | None:
+    """Wait for this caller's slice of the batch; None when the batch failed."""
+    timeout = deadline.cap_seconds() if deadline is not None else None
+    try:
+        body = await asyncio.wait_for(asyncio.shield(ticket.member.result), timeout)
+    except asyncio.TimeoutError as exc:
+        raise deadline_exceeded() from exc
+    if body is None:
+        return None
+    return Response(
+        content=json.dumps(body, ensure_ascii=False).encode(),
+        media_type="application/json",
+        headers={"x-request-id": request_id, "x-trace-id": trace_id},
+    )
+
+
+async def lead_embedding_batch(
+    ticket: EmbeddingBatchTicket, payload: dict
+) -> MergedEmbeddingRequest | None:
+    """Close the batch and build its upstream request; None when nobody joined."""
+    batch = ticket.batch
+    await get_embedding_batcher().collect(batch, ticket.wait_seconds)
+    if len(batch.members) < 2:
+        return None
+    merged = {**payload, "input": batch.merged_inputs()}
+    return MergedEmbeddingRequest(
+        payload=merged,
+        raw_body=json.dumps(merged, ensure_ascii=False).encode(),
+        usage_shares=batch.usage_shares(),
+    )
+
+
+def release_embedding_batch(ticket: EmbeddingBatchTicket) -> None:
+    """Send every caller still waiting on the batch back to its own upstream call."""
+    for member in ticket.batch.members:
+        if not member.result.done():
+            member.result.set_result(None)
+
+
+def split_batched_response(response: Response, ticket: EmbeddingBatchTicket) -> Response:
+    """Hand each caller its slice and return the leader's own."""
+    members = ticket.batch.members
+    bodies = None
+    if response.status_code == 200 and not isinstance(response, StreamingResponse):
+        body = parse_json_object_bytes(bytes(response.body))
+        if body is not None:
+            bodies = split_embedding_response(
+                body, [len(member.inputs) for member in members]
+            )
+    if bodies is None:
+        release_embedding_batch(ticket)
+        return response
+    own_body = None
+    for member, member_body in zip(members, bodies, strict=True):
+        if member is ticket.member:
+            own_body = member_body
+        elif not member.result.done():
+            member.result.set_result(member_body)
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() != "content-length"
+    }
+    return Response(
+        content=json.dumps(own_body, ensure_ascii=False).encode(),
+        status_code=response.status_code,
+        headers=headers,
+    )
@@ -0,0 +1,369 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+import time
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.route_modules.proxy_deadline import RequestDeadline, deadline_exceeded
+from app.api.v1.route_proxy_helpers import STREAM_EXPLICIT_COMPLETION_EXPOSURES
+from app.core.config import get_settings
+from app.services.background_tasks import safe_create_task
+from app.services.billing import RequestMetrics, write_request_log
+from app.services.response_cache import (
+    CachedResponse,
+    get_response_cache,
+    response_cache_key,
+)
+from app.services.router import ModelRouter, RouteCandidate
+from app.services.rule_options import RuleOptions
+from app.services.routing_snapshot import get_routing_snapshot
+from app.services.single_flight import Flight, StreamFanout, get_single_flight
+from app.services.stream_inspection import SSEStreamInspector
+
+GATEWAY_CACHE_HEADER = "x-gateway-cache"
+
+
+@dataclass(frozen=True)
+class ResponseCacheLookup:
+    key: str
+    ttl_seconds: int | None
+    effective_group: str
+    exposure_format: str
+    is_stream: bool
+
+
+async def resolve_route_options(
+    session: AsyncSession,
+    redis,  # noqa: ANN001
+    *,
+    model_alias: str,
+    rule_group: str,
+    exposure_format: str,
+    allow_default_rule_fallback: bool,
+) -> tuple[RuleOptions | None, str]:
+    """Options of the rule that will serve the request, read without touching routing state."""
+    try:
+        snapshot = await get_routing_snapshot(session, redis)
+    except (AttributeError, AssertionError):
+        return None, rule_group
+    selection, effective_group = ModelRouter.resolve_rule_selection(
+        snapshot,
+        model_alias,
+        rule_group,
+        exposure_format=exposure_format,
+        allow_default_rule_fallback=allow_default_rule_fallback,
+    )
+    return (selection.options if selection is not None else None), effective_group
+
+
+def resolve_response_cache_lookup(
+    request: Request,
+    payload: dict,
+    options: RuleOptions | None,
+    *,
+    model_alias: str,
+    effective_group: str,
+    exposure_format: str,
+) -> ResponseCacheLookup | None:
+    """Canonical key of a cacheable or coalescable request, else None."""
+    if options is None:
+        return None
+    ttl_seconds = options.response_cache_ttl_seconds
+    is_stream = bool(payload.get("stream"))
+    settings = get_settings()
+    coalescing = settings.request_coalescing_enabled and (
+        not is_stream or settings.request_coalescing_stream_enabled
+    )
+    if not ttl_seconds and not coalescing:
+        return None
+    key = response_cache_key(
+        path=request.url.path,
+        model_alias=model_alias,
+        rule_group=effective_group,
+        exposure_format=exposure_format,
+        is_stream=is_stream,
+        payload=payload,
+        access_key_id=getattr(request.state, "route_access_key_id", None),
+    )
+    if key is None:
+        return None
+    return ResponseCacheLookup(
+        key=key,
+        ttl_seconds=ttl_seconds or None,
+        effective_group=effective_group,
+        exposure_format=exposure_format,
+        is_stream=is_stream,
+    )
+
+
+def _log_gateway_response(
+    lookup: ResponseCacheLookup,
+    *,
+    endpoint_id: int,
+    api_key_id: int,
+    is_stream: bool,
+    request_id: str,
+    trace_id: str,
+    model_alias: str,
+    requested_rule_group: str | None,
+    request_start: float,
+    gateway_cache_hit: bool = False,
+    coalesced: bool = False,
+) -> None:
+    latency_ms = int((time.perf_counter() - request_start) * 1000)
+    safe_create_task(
+        write_request_log(
+            RequestMetrics(
+                request_id=request_id,
+                trace_id=trace_id,
+                model_alias=model_alias,
+                endpoint_id=endpoint_id,
+                api_key_id=api_key_id,
+                requested_rule_group=requested_rule_group,
+                rule_group=lookup.effective_group,
+                exposure_format=lookup.exposure_format,
+                status_code=200,
+                latency_ms=latency_ms,
+                ttft_ms=latency_ms if is_stream else None,
+                tps=None,
+                prompt_tokens=None,
+                completion_tokens=None,
+                total_tokens=None,
+                gateway_cache_hit=gateway_cache_hit,
+                coalesced=coalesced,
+            )
+        )
+    )
+
+
+def _gateway_headers(request_id: str, trace_id: str, source: str) -> dict[str, str]:
+    return {"x-request-id": request_id, "x-trace-id": trace_id, GATEWAY_CACHE_HEADER: source}
+
+
+def cached_proxy_response(
+    cached: CachedResponse,
+    lookup: ResponseCacheLookup,
+    *,
+    request_id: str,
+    trace_id: str,
+    model_alias: str,
+    requested_rule_group: str | None,
+    request_start: float,
+) -> Response:
+    _log_gateway_response(
+        lookup,
+        endpoint_id=cached.endpoint_id,
+        api_key_id=cached.api_key_id,
+        is_stream=cached.is_stream,
+        request_id=request_id,
+        trace_id=trace_id,
+        model_alias=model_alias,
+        requested_rule_group=requested_rule_group,
+        request_start=request_start,
+        gateway_cache_hit=True,
+    )
+    return Response(
+        content=cached.body,
+        media_type=cached.media_type,
+        headers=_gateway_headers(request_id, trace_id, "hit"),
+    )
+
+
+def join_single_flight(lookup: ResponseCacheLookup) -> Flight | None:
+    settings = get_settings()
+    if not settings.request_coalescing_enabled:
+        return None
+    if lookup.is_stream and not settings.request_coalescing_stream_enabled:
+        return None
+    return get_single_flight().join(lookup.key)
+
+
+async def coalesced_proxy_response(
+    flight: Flight,
+    lookup: ResponseCacheLookup,
+    *,
+    deadline: RequestDeadline | None,
+    request_id: str,
+    trace_id: str,
+    model_alias: str,
+    requested_rule_group: str | None,
+    request_start: float,
+) -> Response | None:
+    """Wait for the leader; None when it produced nothing shareable."""
+    timeout = deadline.cap_seconds() if deadline is not None else None
+    try:
+        shared = await asyncio.wait_for(asyncio.shield(flight.result), timeout)
+    except asyncio.TimeoutError as exc:
+        raise deadline_exceeded() from exc
+    if shared is None:
+        return None
+    is_stream = isinstance(shared, StreamFanout)
+    if is_stream:
+        # A stream that aborts before its first chunk can still fall back to
+        # this request's own upstream call; later aborts end the response
+        # with an error instead of a clean end.
+        try:
+            started = await asyncio.wait_for(
+                shared.wait_for_start(), timeout or get_settings().http_timeout_seconds
+            )
+        except asyncio.TimeoutError as exc:
+            if timeout is not None:
+                raise deadline_exceeded() from exc
+            return None
+        if not started:
+            return None
+    _log_gateway_response(
+        lookup,
+        endpoint_id=shared.endpoint_id,
+        api_key_id=shared.api_key_id,
+        is_stream=is_stream,
+        request_id=request_id,
+        trace_id=trace_id,
+        model_alias=model_alias,
+        requested_rule_group=requested_rule_group,
+        request_start=request_start,
+        coalesced=True,
+    )
+    headers = _gateway_headers(request_id, trace_id, "coalesced")
+    if isinstance(shared, StreamFanout):
+        return StreamingResponse(
+            shared.subscribe(get_settings().http_timeout_seconds),
+            media_type=shared.media_type,
+            headers=headers,
+        )
+    return Response(content=shared.body, media_type=shared.media_type, headers=headers)
+
+
+def _stream_is_complete(body: bytes, exposure_format: str) -> bool:
+    inspector = SSEStreamInspector()
+    inspector.feed(body)
+    inspector.close()
+    return _inspected_stream_is_complete(inspector, exposure_format)
+
+
+def _inspected_stream_is_complete(inspector: SSEStreamInspector, exposure_format: str) -> bool:
+    return (
+        inspector.data_seen
+        and not inspector.failed
+        and (
+            inspector.completed
+            or exposure_format not in STREAM_EXPLICIT_COMPLETION_EXPOSURES
+        )
+    )
+
+
+def _tee_stream(
+    iterator: AsyncIterator[bytes | str], on_complete: Callable[[bytes], None]
+) -> AsyncIterator[bytes | str]:
+    limit = get_settings().response_cache_max_entry_bytes
+
+    async def _generator() -> AsyncIterator[bytes | str]:
+        chunks: list[bytes] | None = []
+        size = 0
+        async for chunk in iterator:
+            yield chunk
+            if chunks is None:
+                continue
+            data = chunk.encode() if isinstance(chunk, str) else bytes(chunk)
+            size += len(data)
+            if size > limit:
+                chunks = None
+            else:
+                chunks.append(data)
+        # Only streams that were read to the end by the client reach this point.
+        if chunks is not None:
+            on_complete(b"".join(chunks))
+
+    return _generator()
+
+
+def store_proxy_response(
+    response: Response,
+    lookup: ResponseCacheLookup,
+    candidate: RouteCandidate,
+    redis,  # noqa: ANN001
+) -> Response:
+    """Return ``response`` unchanged for the client while copying it into the cache."""
+    if not lookup.ttl_seconds or response.status_code != 200:
+        return response
+    media_type = response.headers.get("content-type")
+    cache = get_response_cache()
+
+    def _store(body: bytes, is_stream: bool) -> None:
+        if is_stream and not _stream_is_complete(body, lookup.exposure_format):
+            return
+        cached = CachedResponse(
+            body=body,
+            media_type=media_type,
+            is_stream=is_stream,
+            endpoint_id=candidate.endpoint.id,
+            api_key_id=candidate.api_key.id,
+        )
+        safe_create_task(cache.put(redis, lookup.key, cached, lookup.ttl_seconds))
+
+    response.headers[GATEWAY_CACHE_HEADER] = "miss"
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = _tee_stream(
+            response.body_iterator, lambda body: _store(body, True)
+        )
+    else:
+        _store(bytes(response.body), lookup.is_stream)
+    return response
+
+
+def _fan_out_stream(
+    iterator: AsyncIterator[bytes | str], fanout: StreamFanout, exposure_format: str
+) -> AsyncIterator[bytes | str]:
+    async def _generator() -> AsyncIterator[bytes | str]:
+        inspector = SSEStreamInspector()
+        finished = False
+        try:
+            async for chunk in iterator:
+                fanout.publish(chunk)
+                inspector.feed(chunk.encode() if isinstance(chunk, str) else bytes(chunk))
+                yield chunk
+            finished = True
+        finally:
+            if finished:
+                inspector.close()
+            if finished and _inspected_stream_is_complete(inspector, exposure_format):
+                fanout.close()
+            else:
+                fanout.abort()
+
+    return _generator()
+
+
+def share_proxy_response(
+    response: Response,
+    flight: Flight,
+    lookup: ResponseCacheLookup,
+    candidate: RouteCandidate,
+) -> Response:
+    """Hand a leader's successful response to the requests coalesced behind it."""
+    single_flight = get_single_flight()
+    if response.status_code != 200:
+        single_flight.settle(flight, None)
+        return response
+    media_type = response.headers.get("content-type")
+    if isinstance(response, StreamingResponse):
+        fanout = StreamFanout(media_type, candidate.endpoint.id, candidate.api_key.id)
+        response.body_iterator = _fan_out_stream(
+            response.body_iterator, fanout, lookup.exposure_format
+        )
+        single_flight.settle(flight, fanout)
+        return response
+    single_flight.settle(
+        flight,
+        CachedResponse(
+            body=bytes(response.body),
+            media_type=media_type,
+            is_stream=False,
+            endpoint_id=candidate.endpoint.id,
+            api_key_id=candidate.api_key.id,
+        ),
+    )
+    return response
@@ -17,6 +17,7 @@ from app.api.v1.route_proxy_helpers import (
 )
 from app.core.providers import normalize_provider_name
 from app.db.session import SessionLocal
+from app.services.billing import UsageShare
 from app.services.codex_oauth import resolve_codex_credential
 from app.services.router import RouteCandidate
 
@@ -31,6 +32,7 @@ class CandidateRequestContext:
     debug_headers: dict
     agent_name: str | None
     candidate_provider: str
+    usage_shares: tuple[UsageShare, ...] = ()
 
 
 async def prepare_candidate_request_context(
@@ -50,6 +52,7 @@ async def prepare_candidate_request_context(
     model_payload_keys: tuple[str, ...],
     redis,
     client,
+    usage_shares: tuple[UsageShare, ...] = (),
 ) -> CandidateRequestContext:
     candidate_provider = normalize_provider_name(
         getattr(candidate.endpoint, "provider", None)
@@ -119,4 +122,5 @@ async def prepare_candidate_request_context(
         ),
         agent_name=_get_agent_name(candidate.endpoint),
         candidate_provider=candidate_provider,
+        usage_shares=usage_shares,
     )
@@ -13,10 +13,34 @@ from app.api.v1.route_helpers import (
 from app.api.v1.route_modules.proxy_agent_handler import (
     handle_agent_candidate,
 )
+from app.api.v1.route_modules.proxy_attempts import rate_limit_exceeded
+from app.api.v1.route_modules.proxy_batching import (
+    batched_embedding_response,
+    join_embedding_batch,
+    lead_embedding_batch,
+    release_embedding_batch,
+    split_batched_response,
+)
+from app.api.v1.route_modules.proxy_cache import (
+    cached_proxy_response,
+    coalesced_proxy_response,
+    join_single_flight,
+    resolve_response_cache_lookup,
+    resolve_route_options,
+    share_proxy_response,
+    store_proxy_response,
+)
 from app.api.v1.route_modules.proxy_context import prepare_candidate_request_context
+from app.api.v1.route_modules.proxy_deadline import (
+    deadline_exceeded,
+    resolve_request_deadline,
+)
 from app.api.v1.route_modules.proxy_direct_handler import (
+    CandidateProxyResult,
     handle_direct_candidate,
 )
+from app.api.v1.route_modules.proxy_failures import UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+from app.api.v1.route_modules.proxy_hedging import HedgeLane, race_hedged_candidate
 from app.api.v1.route_modules.proxy_payloads import (
     extract_requested_rule_group,
     parse_request_payload,
@@ -28,6 +52,7 @@ from app.api.v1.route_modules.proxy_trace import (
     resolve_trace_id,
 )
 from app.api.v1.route_proxy_helpers import _looks_like_codex_request
+from app.core.config import get_settings
 from app.core.http_client import get_http_client
 from app.core.redis import get_redis
 from app.core.route_exposure import (
@@ -35,9 +60,15 @@ from app.core.route_exposure import (
     EXPOSURE_FORMAT_CODEX,
     normalize_exposure_format,
 )
+from app.services.affinity import prompt_affinity_key
+from app.services.billing import UsageShare
 from app.services.circuit_breaker import CircuitBreaker
+from app.services.hedging import get_hedge_budget
 from app.services.notifications import get_notifier
+from app.services.response_cache import get_response_cache
+from app.services.single_flight import get_single_flight
 from app.services.router import ModelRouter, RouteCandidate
+from app.services.token_budget import estimate_prompt_tokens
 
 
 async def _proxy_openai_request(
@@ -56,6 +87,7 @@ async def _proxy_openai_request(
     model_payload_keys: tuple[str, ...] = ("model",),
     target_path_rewriter: Callable[[str, RouteCandidate], str] | None = None,
 ) -> Response:
+    received_at = time.perf_counter()
     raw_body = await request.body()
     payload = parse_request_payload(raw_body)
     model_alias = resolve_model_alias(
@@ -70,6 +102,7 @@ async def _proxy_openai_request(
     rule_group = await _resolve_rule_group_from_token(
         session, request, requested_rule_group
     )
+    deadline = resolve_request_deadline(request, received_at)
     allowed_rule_groups = [
         str(group).strip().lower()
         for group in getattr(request.state, "route_allowed_rule_groups", [])
@@ -86,40 +119,130 @@ async def _proxy_openai_request(
     redis = await get_redis()
     notifier = get_notifier()
     circuit_breaker = CircuitBreaker(redis, notifier=notifier)
-    router_service = ModelRouter(circuit_breaker)
-
-    candidates, effective_group = await router_service.get_candidates(
+    session_id = resolve_session_id(request, payload)
+    request_id = uuid.uuid4().hex
+    trace_id = resolve_trace_id(request, payload, session_id)
+    route_options, options_group = await resolve_route_options(
         session,
-        model_alias,
-        rule_group,
-        provider_filters=provider_filter,
-        provider_filter_fallback_to_any=provider_filter_fallback_to_any,
-        allow_unmapped_fallback=True,
+        redis,
+        model_alias=model_alias,
+        rule_group=rule_group,
+        exposure_format=requested_exposure_format,
         allow_default_rule_fallback=allow_default_rule_fallback,
+    )
+    cache_lookup = resolve_response_cache_lookup(
+        request,
+        payload,
+        route_options,
+        model_alias=model_alias,
+        effective_group=options_group,
         exposure_format=requested_exposure_format,
     )
+    flight = None
+    if cache_lookup is not None:
+        cached = (
+            await get_response_cache().get(redis, cache_lookup.key)
+            if cache_lookup.ttl_seconds
+            else None
+        )
+        if cached is not None:
+            return cached_proxy_response(
+                cached,
+                cache_lookup,
+                request_id=request_id,
+                trace_id=trace_id,
+                model_alias=model_alias,
+                requested_rule_group=requested_rule_group,
+                request_start=received_at,
+            )
+        flight = join_single_flight(cache_lookup)
+        if flight is not None and not flight.leader:
+            shared = await coalesced_proxy_response(
+                flight,
+                cache_lookup,
+                deadline=deadline,
+                request_id=request_id,
+                trace_id=trace_id,
+                model_alias=model_alias,
+                requested_rule_group=requested_rule_group,
+                request_start=received_at,
+            )
+            if shared is not None:
+                return shared
+            flight = None
 
-    if not candidates:
-        raise HTTPException(status_code=404, detail="No available API keys")
+    batch_ticket = None
+    try:
+        batch_ticket = join_embedding_batch(
+            request,
+            payload,
+            route_options,
+            model_alias=model_alias,
+            effective_group=options_group,
+            exposure_format=requested_exposure_format,
+            request_id=request_id,
+            trace_id=trace_id,
+        )
+        usage_shares: tuple[UsageShare, ...] = ()
+        if batch_ticket is not None and not batch_ticket.leader:
+            batched = await batched_embedding_response(
+                batch_ticket, deadline=deadline, request_id=request_id, trace_id=trace_id
+            )
+            if batched is not None:
+                return batched
+            batch_ticket = None
+        elif batch_ticket is not None:
+            merged = await lead_embedding_batch(batch_ticket, payload)
+            if merged is None:
+                batch_ticket = None
+            else:
+                payload, raw_body = merged.payload, merged.raw_body
+                usage_shares = merged.usage_shares
 
-    dump_rule = await _find_dump_rule(
-        session,
-        model_alias,
-        effective_group,
-        exposure_format=requested_exposure_format,
-    )
+        router_service = ModelRouter(
+            circuit_breaker,
+            prompt_tokens_estimate=estimate_prompt_tokens(payload, len(raw_body)),
+            affinity_key=prompt_affinity_key(
+                session_id, payload, get_settings().affinity_prefix_kb * 1024
+            ),
+        )
 
-    request_id = uuid.uuid4().hex
-    session_id = resolve_session_id(request, payload)
-    trace_id = resolve_trace_id(request, payload, session_id)
-    request_start = time.perf_counter()
-    include_internal_debug = include_debug_headers(request)
-    client = await get_http_client()
-    attempt_order = 0
+        candidates, effective_group = await router_service.get_candidates(
+            session,
+            model_alias,
+            rule_group,
+            provider_filters=provider_filter,
+            provider_filter_fallback_to_any=provider_filter_fallback_to_any,
+            allow_unmapped_fallback=True,
+            allow_default_rule_fallback=allow_default_rule_fallback,
+            exposure_format=requested_exposure_format,
+        )
 
-    for candidate in candidates:
-        try:
-            candidate_context = await prepare_candidate_request_context(
+        if not candidates:
+            if router_service.rate_limit_retry_after is not None:
+                raise rate_limit_exceeded(router_service)
+            raise HTTPException(status_code=404, detail="No available API keys")
+
+        dump_rule = await _find_dump_rule(
+            session,
+            model_alias,
+            effective_group,
+            exposure_format=requested_exposure_format,
+        )
+
+        request_start = time.perf_counter()
+        include_internal_debug = include_debug_headers(request)
+        client = await get_http_client()
+        attempt_order = 0
+
+        hedge_policy = router_service.rule_options.hedge
+        if hedge_policy is not None:
+            get_hedge_budget().deposit()
+        hedged_candidate: RouteCandidate | None = None
+        served_candidate: RouteCandidate | None = None
+
+        async def _prepare_context(candidate: RouteCandidate):  # noqa: ANN202
+            return await prepare_candidate_request_context(
                 request,
                 session,
                 payload,
@@ -135,41 +258,23 @@ async def _proxy_openai_request(
                 model_payload_keys=model_payload_keys,
                 redis=redis,
                 client=client,
+                usage_shares=usage_shares,
             )
-        except Exception as exc:
-            await circuit_breaker.record_failure(candidate.api_key.id)
-            if candidate != candidates[-1]:
-                continue
-            raise HTTPException(status_code=502, detail="OAuth token refresh failed") from exc
-
-        if candidate_context.agent_name:
-            result = await handle_agent_candidate(
-                request=request,
-                candidate=candidate,
-                last_candidate=candidates[-1],
-                candidate_context=candidate_context,
-                router_service=router_service,
-                circuit_breaker=circuit_breaker,
-                redis=redis,
-                client=client,
-                request_id=request_id,
-                trace_id=trace_id,
-                model_alias=model_alias,
-                requested_rule_group=requested_rule_group,
-                effective_group=effective_group,
-                exposure_format=requested_exposure_format,
-                dump_rule=dump_rule,
-                session_id=session_id,
-                request_start=request_start,
-                attempt_order=attempt_order,
-            )
-        else:
+
+        async def _run_direct(
+            candidate: RouteCandidate,
+            candidate_context,
+            candidate_router: ModelRouter,
+            order: int,
+            hedge_lane: HedgeLane | None = None,
+        ) -> CandidateProxyResult:
+            nonlocal served_candidate
             result = await handle_direct_candidate(
                 request=request,
                 candidate=candidate,
                 last_candidate=candidates[-1],
                 candidate_context=candidate_context,
-                router_service=router_service,
+                router_service=candidate_router,
                 circuit_breaker=circuit_breaker,
                 client=client,
                 redis=redis,
@@ -182,11 +287,122 @@ async def _proxy_openai_request(
                 dump_rule=dump_rule,
                 session_id=session_id,
                 request_start=request_start,
-                attempt_order=attempt_order,
+                attempt_order=order,
+                hedge_lane=hedge_lane,
+                deadline=deadline,
             )
+            if result.response is not None:
+                served_candidate = candidate
+            return result
+
+        async def _run_hedge(
+            candidate: RouteCandidate, order: int, hedge_lane: HedgeLane
+        ) -> CandidateProxyResult:
+            hedge_router = router_service.fork()
+            try:
+                try:
+                    candidate_context = await _prepare_context(candidate)
+                except Exception as exc:
+                    await circuit_breaker.record_failure(candidate.api_key.id)
+                    if candidate != candidates[-1]:
+                        return CandidateProxyResult(response=None, attempt_order=order)
+                    raise HTTPException(
+                        status_code=502, detail="OAuth token refresh failed"
+                    ) from exc
+                return await _run_direct(
+                    candidate, candidate_context, hedge_router, order, hedge_lane
+                )
+            finally:
+                await hedge_router.release_attempt()
+
+        try:
+            for index, candidate in enumerate(candidates):
+                if candidate is hedged_candidate:
+                    continue
+                if deadline is not None and deadline.expired():
+                    raise deadline_exceeded()
+                try:
+                    candidate_context = await _prepare_context(candidate)
+                except Exception as exc:
+                    await circuit_breaker.record_failure(candidate.api_key.id)
+                    if candidate != candidates[-1]:
+                        continue
+                    raise HTTPException(
+                        status_code=502, detail="OAuth token refresh failed"
+                    ) from exc
+
+                if candidate_context.agent_name:
+                    result = await handle_agent_candidate(
+                        request=request,
+                        candidate=candidate,
+                        last_candidate=candidates[-1],
+                        candidate_context=candidate_context,
+                        router_service=router_service,
+                        circuit_breaker=circuit_breaker,
+                        redis=redis,
+                        client=client,
+                        request_id=request_id,
+                        trace_id=trace_id,
+                        model_alias=model_alias,
+                        requested_rule_group=requested_rule_group,
+                        effective_group=effective_group,
+                        exposure_format=requested_exposure_format,
+                        dump_rule=dump_rule,
+                        session_id=session_id,
+                        request_start=request_start,
+                        attempt_order=attempt_order,
+                        deadline=deadline,
+                    )
+                elif (
+                    hedge_policy is not None
+                    and hedged_candidate is None
+                    and index + 1 < len(candidates)
+                    and candidates[index + 1].agent_name is None
+                ):
+                    # A request fires at most one hedge, so it costs at most one
+                    # extra upstream call.
+                    secondary = candidates[index + 1]
+                    hedged_candidate = secondary
+                    primary_order = attempt_order
+                    hedge_order = attempt_order + UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+                    outcome = await race_hedged_candidate(
+                        lambda lane: _run_direct(
+                            candidate, candidate_context, router_service, primary_order, lane
+                        ),
+                        lambda lane: _run_hedge(secondary, hedge_order, lane),
+                        delay_seconds=hedge_policy.delay_seconds(
+                            candidate.api_key.id, is_stream=candidate_context.is_stream
+                        ),
+                    )
+                    if not outcome.hedged:
+                        hedged_candidate = None
+                    result = outcome.result
+                else:
+                    result = await _run_direct(
+                        candidate, candidate_context, router_service, attempt_order
+                    )
 
-        attempt_order = result.attempt_order
-        if result.response is not None:
-            return result.response
+                attempt_order = result.attempt_order
+                if result.response is not None:
+                    response = result.response
+                    if batch_ticket is not None:
+                        response = split_batched_response(response, batch_ticket)
+                    if cache_lookup is None:
+                        return response
+                    served = served_candidate or candidate
+                    if result.succeeded:
+                        response = store_proxy_response(response, cache_lookup, served, redis)
+                        if flight is not None:
+                            response = share_proxy_response(
+                                response, flight, cache_lookup, served
+                            )
+                    return response
 
-    raise HTTPException(status_code=502, detail="All upstream requests failed")
+            raise HTTPException(status_code=502, detail="All upstream requests failed")
+        finally:
+            await router_service.release_attempt()
+    finally:
+        if flight is not None:
+            get_single_flight().settle(flight, None)
+        if batch_ticket is not None and batch_ticket.leader:
+            release_embedding_batch(batch_ticket)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import math
+import time
+
+import httpx
+from fastapi import HTTPException, Request
+
+from app.core.config import get_settings
+from app.services.key_latency import get_key_latency_percentile
+
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+DEADLINE_ESTIMATE_PERCENTILE = 50.0
+MIN_ATTEMPT_TIMEOUT_SECONDS = 0.001
+
+
+@dataclass(frozen=True)
+class RequestDeadline:
+    """End-to-end budget for one proxied request, on the perf_counter clock."""
+
+    expires_at: float
+
+    def remaining_seconds(self) -> float:
+        return self.expires_at - time.perf_counter()
+
+    def expired(self) -> bool:
+        return self.remaining_seconds() <= 0
+
+    def cap_seconds(self, limit: float | None = None) -> float:
+        remaining = max(self.remaining_seconds(), MIN_ATTEMPT_TIMEOUT_SECONDS)
+        return remaining if limit is None else min(limit, remaining)
+
+    def cannot_fit(self, api_key_id: int, *, is_stream: bool) -> bool:
+        """Whether the key's median latency (TTFT for streams) exceeds the budget left."""
+        estimate_ms = get_key_latency_percentile(
+            api_key_id, DEADLINE_ESTIMATE_PERCENTILE, first_token=is_stream
+        )
+        return estimate_ms is not None and estimate_ms / 1000 > self.remaining_seconds()
+
+
+def _parse_timeout_seconds(value: object) -> float | None:
+    if isinstance(value, bool):
+        return None
+    try:
+        seconds = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(seconds) or seconds <= 0:
+        return None
+    return seconds
+
+
+def resolve_request_deadline(request: Request, received_at: float) -> RequestDeadline | None:
+    """Client header first, then the Factory key default; None means unbounded."""
+    raw_timeout = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    if raw_timeout is not None:
+        seconds = _parse_timeout_seconds(raw_timeout.strip())
+        if seconds is None:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid {REQUEST_TIMEOUT_HEADER} header"
+            )
+    else:
+        seconds = _parse_timeout_seconds(
+            getattr(request.state, "route_request_timeout_seconds", None)
+        )
+    if seconds is None:
+        return None
+    return RequestDeadline(expires_at=received_at + seconds)
+
+
+def first_event_timeout(
+    first_byte_timeout_ms: int | None, deadline: RequestDeadline | None
+) -> float | None:
+    timeout = first_byte_timeout_ms / 1000 if first_byte_timeout_ms else None
+    if deadline is not None:
+        return deadline.cap_seconds(timeout)
+    return timeout
+
+
+def deadline_exceeded() -> HTTPException:
+    return HTTPException(status_code=504, detail="Request deadline exceeded")
+
+
+def _attempt_timeout(deadline: RequestDeadline, *, stream: bool) -> httpx.Timeout:
+    default_seconds = get_settings().http_timeout_seconds
+    budget = deadline.cap_seconds(default_seconds)
+    if stream:
+        # Reads keep the normal timeout so a committed stream is not cut off;
+        # the wait for the first event is bounded by the caller.
+        return httpx.Timeout(default_seconds, connect=budget, write=budget, pool=budget)
+    return httpx.Timeout(budget)
+
+
+async def send_upstream(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    headers: dict,
+    content: bytes,
+    stream: bool,
+    deadline: RequestDeadline | None,
+) -> httpx.Response:
+    if deadline is None:
+        request_obj = client.build_request(method, url, headers=headers, content=content)
+        return await client.send(request_obj, stream=stream)
+    request_obj = client.build_request(
+        method,
+        url,
+        headers=headers,
+        content=content,
+        timeout=_attempt_timeout(deadline, stream=stream),
+    )
+    return await asyncio.wait_for(
+        client.send(request_obj, stream=stream), timeout=deadline.cap_seconds()
+    )
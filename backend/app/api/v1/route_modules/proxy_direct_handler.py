@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 import time
 
@@ -10,13 +11,22 @@ from app.api.v1.route_modules.proxy_attempts import (
     reserve_candidate_attempt_or_raise as _reserve_candidate_attempt_or_raise,
 )
 from app.api.v1.route_modules.proxy_context import CandidateRequestContext
+from app.api.v1.route_modules.proxy_deadline import (
+    RequestDeadline,
+    deadline_exceeded,
+    first_event_timeout,
+    send_upstream,
+)
+from app.api.v1.route_modules.proxy_hedging import HedgeLane
 from app.api.v1.route_modules.proxy_failures import (
     CANDIDATE_FALLBACK_STATUSES,
     CIRCUIT_BREAKER_STATUSES,
     UPSTREAM_CANDIDATE_MAX_ATTEMPTS,
+    circuit_failure_scope,
     parse_json_object_bytes,
+    peek_first_stream_event,
+    decide_same_candidate_retry,
     semantic_failure_reason as detect_semantic_failure_reason,
-    should_retry_same_candidate,
 )
 from app.api.v1.route_modules.proxy_responses import raw_proxy_response_with_dump
 from app.api.v1.route_proxy_helpers import (
@@ -27,10 +37,16 @@ from app.api.v1.route_proxy_helpers import (
 )
 from app.services.background_tasks import safe_create_task
 from app.services.billing import RequestMetrics, extract_usage, write_request_log
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import (
+    CIRCUIT_SCOPE_ENDPOINT,
+    CIRCUIT_SCOPE_MODEL,
+    CircuitBreaker,
+)
 from app.services.codex_usage import record_codex_usage_from_headers
 from app.services.codex_oauth import apply_codex_auth_headers, resolve_codex_credential
 from app.db.session import SessionLocal
+from app.services.key_latency import observe_request_metrics
+from app.services.provider_quota import provider_cooldown, record_provider_quota
 from app.services.router import ModelRouter, RouteCandidate
 
 
@@ -38,6 +54,7 @@ from app.services.router import ModelRouter, RouteCandidate
 class CandidateProxyResult:
     response: Response | None
     attempt_order: int
+    succeeded: bool = False
 
 
 async def handle_direct_candidate(
@@ -60,6 +77,8 @@ async def handle_direct_candidate(
     session_id: str | None,
     request_start: float,
     attempt_order: int,
+    hedge_lane: HedgeLane | None = None,
+    deadline: RequestDeadline | None = None,
 ) -> CandidateProxyResult:
     upstream_body = candidate_context.upstream_body
     headers = candidate_context.headers
@@ -71,11 +90,63 @@ async def handle_direct_candidate(
     candidate_provider = candidate_context.candidate_provider
 
     def _record_attempt_log(**kwargs) -> None:  # noqa: ANN003
+        if hedge_lane is not None:
+            hedge_lane.attempt_pending = False
         _write_attempt_log(exposure_format=exposure_format, **kwargs)
 
+    def _record_hedge_lost(status_code: int | None = None) -> None:
+        _record_attempt_log(
+            request_id=request_id,
+            trace_id=trace_id,
+            model_alias=model_alias,
+            candidate=candidate,
+            requested_rule_group=requested_rule_group,
+            rule_group=effective_group,
+            attempt_order=attempt_order,
+            status_code=status_code,
+            outcome="cancelled",
+            failure_reason="hedge_lost",
+            latency_ms=_elapsed_ms(attempt_start),
+            agent_node=agent_name,
+            upstream_url=url,
+        )
+
+    def _record_deadline_attempt(failure_reason: str, status_code: int | None = None) -> None:
+        _record_attempt_log(
+            request_id=request_id,
+            trace_id=trace_id,
+            model_alias=model_alias,
+            candidate=candidate,
+            requested_rule_group=requested_rule_group,
+            rule_group=effective_group,
+            attempt_order=attempt_order,
+            status_code=status_code,
+            outcome="fallback"
+            if failure_reason == "deadline_skip" and candidate != last_candidate
+            else "error",
+            failure_reason=failure_reason,
+            latency_ms=_elapsed_ms(attempt_start),
+            agent_node=agent_name,
+            upstream_url=url,
+        )
+
+    if hedge_lane is not None:
+        hedge_lane.record_lost = _record_hedge_lost
+
     for attempt_index in range(UPSTREAM_CANDIDATE_MAX_ATTEMPTS):
         attempt_order += 1
         attempt_start = time.perf_counter()
+        if hedge_lane is not None:
+            hedge_lane.attempt_pending = True
+        if deadline is not None:
+            if deadline.expired():
+                _record_deadline_attempt("deadline_exceeded")
+                raise deadline_exceeded()
+            if deadline.cannot_fit(candidate.api_key.id, is_stream=is_stream):
+                _record_deadline_attempt("deadline_skip")
+                if candidate != last_candidate:
+                    break
+                raise deadline_exceeded()
         if not await _reserve_candidate_attempt_or_raise(
             router_service=router_service,
             candidate=candidate,
@@ -93,14 +164,22 @@ async def handle_direct_candidate(
         ):
             break
         try:
-            request_obj = client.build_request(
+            response = await send_upstream(
+                client,
                 request.method,
                 url,
                 headers=headers,
                 content=upstream_body,
+                stream=is_stream,
+                deadline=deadline,
             )
-            response = await client.send(request_obj, stream=is_stream)
         except Exception as exc:
+            if deadline is not None and deadline.expired():
+                _record_deadline_attempt("deadline_exceeded")
+                raise deadline_exceeded() from exc
+            retry = decide_same_candidate_retry(
+                None, attempt_index, endpoint_id=candidate.endpoint.id, deadline=deadline
+            )
             _record_attempt_log(
                 request_id=request_id,
                 trace_id=trace_id,
@@ -111,15 +190,18 @@ async def handle_direct_candidate(
                 attempt_order=attempt_order,
                 status_code=None,
                 outcome="retry"
-                if attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+                if retry is not None and retry.retry
                 else ("fallback" if candidate != last_candidate else "error"),
                 failure_reason="connection_error",
                 latency_ms=_elapsed_ms(attempt_start),
                 agent_node=agent_name,
                 upstream_url=url,
+                retry_decision=retry.reason if retry is not None else None,
+                retry_delay_ms=retry.delay_ms if retry is not None else None,
             )
-            await circuit_breaker.record_failure(candidate.api_key.id)
-            if attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS:
+            await circuit_breaker.record_candidate_failure(candidate, CIRCUIT_SCOPE_ENDPOINT)
+            if retry is not None and retry.retry:
+                await asyncio.sleep(retry.delay_seconds)
                 continue
             if candidate != last_candidate:
                 break
@@ -140,14 +222,19 @@ async def handle_direct_candidate(
                     endpoint=candidate.endpoint,
                 )
                 headers = apply_codex_auth_headers(headers, credential)
-                request_obj = client.build_request(
+                response = await send_upstream(
+                    client,
                     request.method,
                     url,
                     headers=headers,
                     content=upstream_body,
+                    stream=is_stream,
+                    deadline=deadline,
                 )
-                response = await client.send(request_obj, stream=is_stream)
             except Exception as exc:
+                if deadline is not None and deadline.expired():
+                    _record_deadline_attempt("deadline_exceeded")
+                    raise deadline_exceeded() from exc
                 await circuit_breaker.record_failure(candidate.api_key.id)
                 if candidate != last_candidate:
                     break
@@ -174,16 +261,25 @@ async def handle_direct_candidate(
                     detail="OAuth token refresh failed",
                 ) from exc
             try:
-                request_obj = client.build_request(
+                response = await send_upstream(
+                    client,
                     request.method,
                     url,
                     headers=headers,
                     content=upstream_body,
+                    stream=is_stream,
+                    deadline=deadline,
                 )
-                response = await client.send(request_obj, stream=is_stream)
             except Exception as exc:
-                await circuit_breaker.record_failure(candidate.api_key.id)
-                if attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS:
+                if deadline is not None and deadline.expired():
+                    _record_deadline_attempt("deadline_exceeded")
+                    raise deadline_exceeded() from exc
+                await circuit_breaker.record_candidate_failure(candidate, CIRCUIT_SCOPE_ENDPOINT)
+                retry = decide_same_candidate_retry(
+                    None, attempt_index, endpoint_id=candidate.endpoint.id, deadline=deadline
+                )
+                if retry is not None and retry.retry:
+                    await asyncio.sleep(retry.delay_seconds)
                     continue
                 if candidate != last_candidate:
                     break
@@ -193,11 +289,31 @@ async def handle_direct_candidate(
                 ) from exc
 
         if response.status_code in CANDIDATE_FALLBACK_STATUSES:
-            if response.status_code in CIRCUIT_BREAKER_STATUSES:
-                await circuit_breaker.record_failure(candidate.api_key.id)
             content = await response.aread()
             await response.aclose()
-            should_retry = should_retry_same_candidate(response.status_code, attempt_index)
+            failure_scope = circuit_failure_scope(content)
+            quota = await record_provider_quota(
+                redis,
+                api_key_id=candidate.api_key.id,
+                status_code=response.status_code,
+                headers=response.headers,
+                content=content,
+            )
+            # A provider-reported cooldown already takes the key out of rotation
+            # for exactly as long as needed, so it does not count toward the circuit.
+            if not provider_cooldown(response.status_code, quota) and (
+                response.status_code in CIRCUIT_BREAKER_STATUSES
+                or failure_scope == CIRCUIT_SCOPE_MODEL
+            ):
+                await circuit_breaker.record_candidate_failure(candidate, failure_scope)
+            retry = decide_same_candidate_retry(
+                response.status_code,
+                attempt_index,
+                endpoint_id=candidate.endpoint.id,
+                headers=response.headers,
+                deadline=deadline,
+            )
+            should_retry = retry is not None and retry.retry
             _record_attempt_log(
                 request_id=request_id,
                 trace_id=trace_id,
@@ -214,8 +330,11 @@ async def handle_direct_candidate(
                 latency_ms=_elapsed_ms(attempt_start),
                 agent_node=agent_name,
                 upstream_url=url,
+                retry_decision=retry.reason if retry is not None else None,
+                retry_delay_ms=retry.delay_ms if retry is not None else None,
             )
             if should_retry:
+                await asyncio.sleep(retry.delay_seconds)
                 continue
             if candidate != last_candidate:
                 break
@@ -241,6 +360,14 @@ async def handle_direct_candidate(
             )
 
         if is_stream:
+            safe_create_task(
+                record_provider_quota(
+                    redis,
+                    api_key_id=candidate.api_key.id,
+                    status_code=response.status_code,
+                    headers=response.headers,
+                )
+            )
             if candidate_provider == "codex":
                 safe_create_task(
                     record_codex_usage_from_headers(
@@ -249,6 +376,54 @@ async def handle_direct_candidate(
                         headers=response.headers,
                     )
                 )
+            first_byte_timeout = first_event_timeout(
+                router_service.rule_options.first_byte_timeout_ms, deadline
+            )
+            if hedge_lane is not None or first_byte_timeout is not None:
+                # Peek before committing: racing streams are decided by the
+                # first SSE data event, and a stalled or failing start can
+                # still fall over to the next candidate.
+                response, stream_failure = await peek_first_stream_event(
+                    response, first_byte_timeout
+                )
+                if (
+                    stream_failure == "first_byte_timeout"
+                    and deadline is not None
+                    and deadline.expired()
+                ):
+                    _record_deadline_attempt("deadline_exceeded", response.status_code)
+                    raise deadline_exceeded()
+                if stream_failure and (
+                    candidate != last_candidate or stream_failure != "first_event_error"
+                ):
+                    if stream_failure == "first_event_error":
+                        await response.aclose()
+                    await circuit_breaker.record_candidate_failure(candidate)
+                    _record_attempt_log(
+                        request_id=request_id,
+                        trace_id=trace_id,
+                        model_alias=model_alias,
+                        candidate=candidate,
+                        requested_rule_group=requested_rule_group,
+                        rule_group=effective_group,
+                        attempt_order=attempt_order,
+                        status_code=response.status_code,
+                        outcome="fallback" if candidate != last_candidate else "error",
+                        failure_reason=stream_failure,
+                        latency_ms=_elapsed_ms(attempt_start),
+                        agent_node=agent_name,
+                        upstream_url=url,
+                    )
+                    if candidate != last_candidate:
+                        break
+                    raise HTTPException(
+                        status_code=504 if stream_failure == "first_byte_timeout" else 502,
+                        detail="Upstream stream failed before first byte",
+                    )
+                if hedge_lane is not None and not hedge_lane.claim():
+                    await response.aclose()
+                    _record_hedge_lost(response.status_code)
+                    return CandidateProxyResult(response=None, attempt_order=attempt_order)
 
             def _record_stream_attempt(
                 outcome: str,
@@ -298,6 +473,8 @@ async def handle_direct_candidate(
                 router_service=router_service,
                 route_candidate=candidate,
                 record_attempt=_record_stream_attempt,
+                inflight_lease=router_service.detach_inflight_lease(),
+                token_reservation=router_service.detach_token_reservation(),
             )
             return CandidateProxyResult(
                 response=StreamingResponse(
@@ -307,6 +484,7 @@ async def handle_direct_candidate(
                     headers=stream_headers,
                 ),
                 attempt_order=attempt_order,
+                succeeded=True,
             )
 
         latency_ms = int((time.perf_counter() - request_start) * 1000)
@@ -319,7 +497,9 @@ async def handle_direct_candidate(
             candidate_provider,
         )
         if semantic_failure_reason:
-            await circuit_breaker.record_failure(candidate.api_key.id)
+            await circuit_breaker.record_candidate_failure(
+                candidate, circuit_failure_scope(content)
+            )
             await response.aclose()
             _record_attempt_log(
                 request_id=request_id,
@@ -359,8 +539,20 @@ async def handle_direct_candidate(
                 attempt_order=attempt_order,
             )
 
-        await circuit_breaker.record_success(candidate.api_key.id)
-        await router_service.record_candidate_success(candidate)
+        if hedge_lane is not None and not hedge_lane.claim():
+            await response.aclose()
+            _record_hedge_lost(response.status_code)
+            return CandidateProxyResult(response=None, attempt_order=attempt_order)
+
+        await router_service.record_attempt_success(candidate)
+        safe_create_task(
+            record_provider_quota(
+                redis,
+                api_key_id=candidate.api_key.id,
+                status_code=response.status_code,
+                headers=response.headers,
+            )
+        )
         if candidate_provider == "codex":
             safe_create_task(
                 record_codex_usage_from_headers(
@@ -388,6 +580,7 @@ async def handle_direct_candidate(
         prompt_tokens, completion_tokens, total_tokens, cached_tokens = extract_usage(
             response_payload
         )
+        await router_service.settle_token_reservation(total_tokens)
         metrics = RequestMetrics(
             request_id=request_id,
             trace_id=trace_id,
@@ -397,6 +590,7 @@ async def handle_direct_candidate(
             requested_rule_group=requested_rule_group,
             rule_group=effective_group,
             exposure_format=exposure_format,
+            routing_strategy=router_service.routing_strategy,
             status_code=response.status_code,
             latency_ms=latency_ms,
             ttft_ms=None,
@@ -408,7 +602,9 @@ async def handle_direct_candidate(
             execution_mode=candidate.execution_mode,
             agent_node=agent_name,
             upstream_url=url,
+            usage_shares=candidate_context.usage_shares,
         )
+        observe_request_metrics(metrics)
         safe_create_task(write_request_log(metrics))
 
         return CandidateProxyResult(
@@ -434,6 +630,7 @@ async def handle_direct_candidate(
                 latency_ms=latency_ms,
             ),
             attempt_order=attempt_order,
+            succeeded=True,
         )
 
     return CandidateProxyResult(response=None, attempt_order=attempt_order)
@@ -1,4 +1,12 @@
+import asyncio
+from collections.abc import Mapping
 import json
+import re
+
+from app.api.v1.route_modules.proxy_deadline import RequestDeadline
+from app.api.v1.route_proxy_helpers import _read_until_first_data
+from app.services.circuit_breaker import CIRCUIT_SCOPE_KEY, CIRCUIT_SCOPE_MODEL
+from app.services.retry_policy import RetryDecision, plan_retry
 
 CANDIDATE_FALLBACK_STATUSES = {400, 401, 402, 403, 404, 429, 500, 502, 503, 504}
 CIRCUIT_BREAKER_STATUSES = {401, 402, 403, 429, 500, 502, 503, 504}
@@ -36,6 +44,23 @@ SEMANTIC_FAILURE_MARKERS = (
     "封禁",
     "欠费",
 )
+MODEL_FAILURE_MARKERS = (
+    "model_not_supported",
+    "model_not_found",
+    "model not found",
+    "unsupported model",
+    "unsupported_model",
+    "model is not supported",
+    "not supported model",
+    "no such model",
+    "invalid model",
+    "模型不存在",
+    "不支持该模型",
+    "不支持的模型",
+)
+# "does not exist" 只在同一句里先提到 model 时才算模型错误，
+# 避免 "organization/project/API key does not exist" 被当成模型级失败
+MODEL_NOT_EXIST_PATTERN = re.compile(r'\bmodel\b[^"\n]{0,120}?\bdoes not exist')
 SEMANTIC_SUCCESS_SIGNAL_KEYS = {
     "choices",
     "output",
@@ -158,8 +183,54 @@ def semantic_failure_reason(
     return None
 
 
-def should_retry_same_candidate(status_code: int, attempt_index: int) -> bool:
+def should_retry_same_candidate(status_code: int | None, attempt_index: int) -> bool:
+    """Whether a failure is retryable at all; ``None`` means a connection error."""
     return (
-        status_code in LOCAL_RETRY_STATUSES
-        and attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+        status_code is None or status_code in LOCAL_RETRY_STATUSES
+    ) and attempt_index + 1 < UPSTREAM_CANDIDATE_MAX_ATTEMPTS
+
+
+def decide_same_candidate_retry(
+    status_code: int | None,
+    attempt_index: int,
+    *,
+    endpoint_id: int,
+    headers: Mapping[str, str] | None = None,
+    deadline: RequestDeadline | None = None,
+) -> RetryDecision | None:
+    """Apply backoff, provider reset hints and the retry budget to a retryable failure."""
+    if not should_retry_same_candidate(status_code, attempt_index):
+        return None
+    return plan_retry(
+        endpoint_id,
+        attempt_index,
+        headers=headers,
+        remaining_seconds=deadline.remaining_seconds() if deadline is not None else None,
     )
+
+
+def circuit_failure_scope(content: bytes | None) -> str:
+    """Model-specific failures only open the key+model circuit, not the whole key."""
+    if not content:
+        return CIRCUIT_SCOPE_KEY
+    text = content[:4096].decode("utf-8", errors="ignore").lower()
+    if any(marker in text for marker in MODEL_FAILURE_MARKERS):
+        return CIRCUIT_SCOPE_MODEL
+    if MODEL_NOT_EXIST_PATTERN.search(text):
+        return CIRCUIT_SCOPE_MODEL
+    return CIRCUIT_SCOPE_KEY
+
+
+async def peek_first_stream_event(stream, timeout: float | None):  # noqa: ANN001, ANN201
+    """Wait for the first SSE data event before the stream is committed.
+
+    Returns the buffered stream and a failure reason; on timeout or read
+    errors the stream is already closed.
+    """
+    try:
+        stream = await _read_until_first_data(stream, timeout=timeout)
+    except asyncio.TimeoutError:
+        return stream, "first_byte_timeout"
+    except Exception:
+        return stream, "upstream_stream_error"
+    return stream, "first_event_error" if stream.first_event_failed else None
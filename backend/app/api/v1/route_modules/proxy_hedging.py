@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from app.services.hedging import get_hedge_budget
+
+if TYPE_CHECKING:
+    from app.api.v1.route_modules.proxy_direct_handler import CandidateProxyResult
+
+
+@dataclass
+class HedgeRace:
+    winner: HedgeLane | None = None
+
+
+@dataclass
+class HedgeLane:
+    """One side of a hedge race, shared with the candidate handler."""
+
+    race: HedgeRace
+    attempt_pending: bool = False
+    record_lost: Callable[[], None] | None = field(default=None, repr=False)
+
+    def claim(self) -> bool:
+        if self.race.winner is None:
+            self.race.winner = self
+        return self.race.winner is self
+
+    def record_cancelled(self) -> None:
+        if self.attempt_pending and self.record_lost is not None:
+            self.record_lost()
+
+
+@dataclass(frozen=True)
+class HedgeOutcome:
+    result: CandidateProxyResult | None
+    hedged: bool
+
+
+def _is_winning_result(result: CandidateProxyResult | None) -> bool:
+    return (
+        result is not None
+        and result.response is not None
+        and result.response.status_code < 400
+    )
+
+
+async def _cancel_lanes(tasks: dict[asyncio.Task, HedgeLane]) -> None:
+    for task, lane in tasks.items():
+        if task.done():
+            continue
+        task.cancel()
+        lane.record_cancelled()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def race_hedged_candidate(
+    primary: Callable[[HedgeLane], Awaitable[CandidateProxyResult]],
+    hedge: Callable[[HedgeLane], Awaitable[CandidateProxyResult]],
+    *,
+    delay_seconds: float,
+) -> HedgeOutcome:
+    """Run ``primary`` and fire ``hedge`` if it has not finished after the delay.
+
+    The first lane to produce a successful response claims the race; the
+    other is cancelled. Failures and error responses only decide the outcome
+    once both lanes are finished, in the same order as sequential fallback.
+    """
+    race = HedgeRace()
+    primary_lane = HedgeLane(race)
+    primary_task = asyncio.create_task(primary(primary_lane))
+    lanes: dict[asyncio.Task, HedgeLane] = {primary_task: primary_lane}
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay_seconds)
+        if done or not get_hedge_budget().try_spend():
+            return HedgeOutcome(result=await primary_task, hedged=False)
+
+        hedge_lane = HedgeLane(race)
+        hedge_task = asyncio.create_task(hedge(hedge_lane))
+        lanes[hedge_task] = hedge_lane
+        pending = set(lanes)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    if _is_winning_result(task.result()):
+                        return HedgeOutcome(result=task.result(), hedged=True)
+
+        for task in (primary_task, hedge_task):
+            if task.exception() is not None:
+                raise task.exception()
+        primary_result = primary_task.result()
+        hedge_result = hedge_task.result()
+        if primary_result.response is None and hedge_result.response is None:
+            return HedgeOutcome(
+                result=max(primary_result, hedge_result, key=lambda item: item.attempt_order),
+                hedged=True,
+            )
+        return HedgeOutcome(
+            result=hedge_result if hedge_result.response is not None else primary_result,
+            hedged=True,
+        )
+    finally:
+        await _cancel_lanes(lanes)
@@ -17,7 +17,7 @@ from app.core.redis import get_redis
 from app.db.models import Endpoint, ModelMap, RoutingRule
 from app.services.agent_transport import AgentRequest, AgentUnavailableError, get_agent_manager
 from app.services.circuit_breaker import CircuitBreaker
-from app.services.model_patterns import model_pattern_matches
+from app.services.model_patterns import ModelPatternIndex
 from app.services.notifications import get_notifier
 from app.services.router import ModelRouter, RouteCandidate
 
@@ -298,20 +298,18 @@ async def _matching_rule_groups_by_model_alias(
         )
         .order_by(RoutingRule.priority.desc(), RoutingRule.id)
     )
-    rules = result.scalars().all()
+    rule_index = ModelPatternIndex(
+        (rule.model_pattern, rule.group_name.lower()) for rule in result.scalars().all()
+    )
     for model_alias in model_aliases:
         seen = {group.lower() for group in matched[model_alias]}
+        matching_group_keys = set(rule_index.matches(model_alias))
         for group in non_default_groups:
             group_key = group.lower()
-            if group_key in seen:
+            if group_key in seen or group_key not in matching_group_keys:
                 continue
-            if any(
-                rule.group_name.lower() == group_key
-                and model_pattern_matches(rule.model_pattern, model_alias)
-                for rule in rules
-            ):
-                matched[model_alias].append(group)
-                seen.add(group_key)
+            matched[model_alias].append(group)
+            seen.add(group_key)
     return matched
 
 
@@ -466,21 +464,13 @@ async def list_accessible_model_aliases(
         )
         .order_by(RoutingRule.priority.desc(), RoutingRule.id)
     )
-    rules_by_group: dict[str, list[RoutingRule]] = {}
-    for rule in rule_result.scalars().all():
-        rules_by_group.setdefault(rule.group_name.lower(), []).append(rule)
-
-    allowed_aliases: set[str] = set()
-    for model_alias in model_aliases:
-        for group in non_default_groups:
-            if any(
-                model_pattern_matches(rule.model_pattern, model_alias)
-                for rule in rules_by_group.get(group.lower(), [])
-            ):
-                allowed_aliases.add(model_alias)
-                break
-
-    return sorted(allowed_aliases)
+    allowed_group_keys = {group.lower() for group in non_default_groups}
+    rule_index = ModelPatternIndex(
+        (rule.model_pattern, rule)
+        for rule in rule_result.scalars().all()
+        if rule.group_name.lower() in allowed_group_keys
+    )
+    return [model_alias for model_alias in model_aliases if rule_index.matches(model_alias)]
 
 
 async def list_models(
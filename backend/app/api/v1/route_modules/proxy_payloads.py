@@ -3,6 +3,7 @@ import json
 from fastapi import HTTPException, Request
 
 from app.api.v1.route_proxy_helpers import _apply_request_body_template
+from app.core.json_codec import loads_json, splice_top_level, top_level_members
 from app.services.router import RouteCandidate
 
 
@@ -10,7 +11,7 @@ def parse_request_payload(raw_body: bytes) -> dict[str, object]:
     if not raw_body:
         return {}
     try:
-        parsed = json.loads(raw_body)
+        parsed = loads_json(raw_body)
     except json.JSONDecodeError as exc:
         raise HTTPException(status_code=400, detail="Invalid JSON body") from exc
     if not isinstance(parsed, dict):
@@ -104,16 +105,39 @@ def prepare_upstream_payload_and_body(
     if templated_payload is not None:
         upstream_payload = templated_payload
 
-    if (
-        templated_payload is not None
-        or should_rewrite_body_model
-        or should_include_openai_stream_usage
-        or should_apply_codex_backend_shape
-    ):
+    if templated_payload is not None or should_apply_codex_backend_shape:
         return upstream_payload, json.dumps(upstream_payload).encode("utf-8")
+    changed_keys = []
+    if should_rewrite_body_model:
+        changed_keys.append(rewrite_key)
+    if should_include_openai_stream_usage:
+        changed_keys.append("stream_options")
+    if changed_keys:
+        return upstream_payload, _rewrite_body_members(raw_body, upstream_payload, changed_keys)
     return upstream_payload, raw_body
 
 
+def _rewrite_body_members(
+    raw_body: bytes,
+    upstream_payload: dict[str, object],
+    changed_keys: list[str],
+) -> bytes:
+    """Splice changed top-level fields into the client's bytes instead of re-encoding it all.
+
+    Top-level keys the gateway dropped from the payload (``rule_group``)
+    are dropped from the bytes as well, matching the full re-encode.
+    """
+    members = top_level_members(raw_body)
+    if members is None:
+        return json.dumps(upstream_payload).encode("utf-8")
+    return splice_top_level(
+        raw_body,
+        members,
+        replace={key: upstream_payload[key] for key in changed_keys},
+        remove={member.key for member in members if member.key not in upstream_payload},
+    )
+
+
 def is_stream_request(request: Request, upstream_payload: dict[str, object]) -> bool:
     accept_header = request.headers.get("accept", "").lower()
     return bool(upstream_payload.get("stream")) or "text/event-stream" in accept_header
@@ -2,9 +2,7 @@ import uuid
 
 from fastapi import Request
 
-from app.api.v1.route_helpers import _extract_factory_api_key
-from app.core.config import get_settings
-from app.services.admin_auth import verify_admin_session_token
+from app.api.v1.route_helpers import _extract_factory_api_key, _is_admin_session_request
 
 SESSION_HINT_KEYS = (
     "session_id",
@@ -22,7 +20,7 @@ def include_debug_headers(request: Request) -> bool:
     if debug_value not in {"1", "true", "yes"}:
         return False
     token = _extract_factory_api_key(request.headers)
-    return verify_admin_session_token(token, get_settings())
+    return _is_admin_session_request(request, token)
 
 
 def extract_text(value: object) -> str | None:
@@ -11,6 +11,7 @@ from app.api.v1.route_models import (
     StatsDistributionItemOut,
     StatsLatencyPercentileBucketOut,
     StatsOverviewOut,
+    StatsStrategyCacheOut,
     StatsTimeseriesBucketOut,
     StatsTopKeyOut,
     UsageStatsOut,
@@ -19,6 +20,7 @@ from app.api.v1.route_modules.stats_handlers import (
     admin_dump_search,
     admin_metrics_timeseries,
     admin_overview,
+    admin_stats_cache_by_strategy,
     admin_stats_distribution_groups,
     admin_stats_distribution_models,
     admin_stats_latency_percentiles,
@@ -89,6 +91,13 @@ router.add_api_route(
     response_model=list[StatsDistributionItemOut],
     dependencies=_admin_dependencies,
 )
+router.add_api_route(
+    "/admin/stats/cache/strategies",
+    admin_stats_cache_by_strategy,
+    methods=["GET"],
+    response_model=list[StatsStrategyCacheOut],
+    dependencies=_admin_dependencies,
+)
 router.add_api_route(
     "/admin/stats/top-keys",
     admin_stats_top_keys,
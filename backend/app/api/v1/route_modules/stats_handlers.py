@@ -36,6 +36,7 @@ from app.api.v1.route_models import (
     StatsKpiValue,
     StatsLatencyPercentileBucketOut,
     StatsOverviewOut,
+    StatsStrategyCacheOut,
     StatsTimeseriesBucketOut,
     StatsTopKeyOut,
 )
@@ -45,10 +46,12 @@ from app.core.redis import get_redis
 from app.db.models import APIKey, Agent, DumpIndex, Endpoint, ModelMap, RequestLog, RoutingRule
 from app.db.session import get_session
 from app.services.agent_transport import get_agent_manager
+from app.services.affinity import prompt_affinity_key
 from app.services.agents import build_agent_statuses, list_agents
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import CIRCUIT_SCOPE_KEY, CircuitBreaker
 from app.services.model_patterns import model_pattern_matches
 from app.services.notifications import get_notifier
+from app.services.provider_quota import read_provider_cooldowns
 from app.services.router import ModelRouter, RouteCandidate
 
 
@@ -246,6 +249,7 @@ def _aggregate_rows(
     total_tokens = sum(_log_total_tokens(log) for log, *_ in rows)
     cached_tokens = sum(_row_cached_tokens(log, dump) for log, *_rest, dump in rows)
     cache_hits = sum(1 for log, *_rest, dump in rows if _row_is_cache_hit(log, dump))
+    gateway_cache_hits = sum(1 for log, *_ in rows if log.gateway_cache_hit)
     latency_values = [log.latency_ms for log, *_ in rows if log.latency_ms is not None]
     avg_latency = (
         int(sum(latency_values) / len(latency_values)) if latency_values else None
@@ -258,6 +262,10 @@ def _aggregate_rows(
         "cached_tokens": cached_tokens,
         "cache_hits": cache_hits,
         "cache_hit_rate": (cache_hits / request_count * 100) if request_count else 0.0,
+        "gateway_cache_hits": gateway_cache_hits,
+        "gateway_cache_hit_rate": (
+            gateway_cache_hits / request_count * 100 if request_count else 0.0
+        ),
         "avg_latency_ms": avg_latency,
         "p95_latency_ms": _percentile(latency_values, 0.95),
     }
@@ -289,6 +297,10 @@ async def admin_stats_overview(
             float(current["cache_hit_rate"] or 0.0),
             float(previous["cache_hit_rate"] or 0.0),
         ),
+        gateway_cache_hit_rate=_kpi(
+            float(current["gateway_cache_hit_rate"] or 0.0),
+            float(previous["gateway_cache_hit_rate"] or 0.0),
+        ),
         avg_latency_ms=_kpi(
             float(current["avg_latency_ms"] or 0),
             float(previous["avg_latency_ms"] or 0),
@@ -481,6 +493,43 @@ async def admin_stats_distribution_groups(
     return _distribution_items(totals, token_basis=False, limit=limit)
 
 
+async def admin_stats_cache_by_strategy(
+    hours: int = Query(default=24, ge=1, le=8760),
+    since: str | None = Query(default=None),
+    until: str | None = Query(default=None),
+    session: AsyncSession = Depends(get_session),
+) -> list[StatsStrategyCacheOut]:
+    start_time, end_time = _stats_time_window(hours, since, until)
+    rows = await _stats_rows(session, start_time, end_time)
+    totals: dict[str, dict[str, int]] = defaultdict(
+        lambda: {"request_count": 0, "prompt_tokens": 0, "cached_tokens": 0, "cache_hits": 0}
+    )
+    for log, _api_key, _endpoint, dump in rows:
+        data = totals[log.routing_strategy or "unknown"]
+        data["request_count"] += 1
+        data["prompt_tokens"] += log.prompt_tokens or 0
+        data["cached_tokens"] += _row_cached_tokens(log, dump)
+        if _row_is_cache_hit(log, dump):
+            data["cache_hits"] += 1
+    return [
+        StatsStrategyCacheOut(
+            strategy=strategy,
+            request_count=data["request_count"],
+            prompt_tokens=data["prompt_tokens"],
+            cached_tokens=data["cached_tokens"],
+            cache_hit_rate=data["cache_hits"] / data["request_count"] * 100,
+            cached_token_rate=(
+                data["cached_tokens"] / data["prompt_tokens"] * 100
+                if data["prompt_tokens"]
+                else 0.0
+            ),
+        )
+        for strategy, data in sorted(
+            totals.items(), key=lambda item: item[1]["request_count"], reverse=True
+        )
+    ]
+
+
 async def admin_stats_top_keys(
     hours: int = Query(default=24, ge=1, le=8760),
     limit: int = Query(default=10, ge=1, le=100),
@@ -639,7 +688,9 @@ async def route_test(
     redis = await get_redis()
     notifier = get_notifier()
     circuit_breaker = CircuitBreaker(redis, notifier=notifier)
-    router_service = ModelRouter(circuit_breaker)
+    router_service = ModelRouter(
+        circuit_breaker, affinity_key=prompt_affinity_key(payload.session_id, {})
+    )
     candidates, effective_group = await router_service.get_candidates(
         session,
         payload.model,
@@ -732,7 +783,9 @@ async def route_explain(
     redis = await get_redis()
     notifier = get_notifier()
     circuit_breaker = CircuitBreaker(redis, notifier=notifier)
-    router_service = ModelRouter(circuit_breaker)
+    router_service = ModelRouter(
+        circuit_breaker, affinity_key=prompt_affinity_key(payload.session_id, {})
+    )
     effective_group, fallback_used, matched_rule, target_key_ids, strategy = (
         await _resolve_route_explain_policy(
             session,
@@ -768,6 +821,17 @@ async def route_explain(
     available_candidates: list[RouteCandidate] = []
     excluded: list[RouteExplainExcludedOut] = []
     circuit_status_by_key: dict[int, object] = {}
+    scope_states = await circuit_breaker.scope_states(
+        [
+            scope
+            for candidate in candidate_objects
+            for scope in circuit_breaker.candidate_scopes(candidate)
+            if scope.kind != CIRCUIT_SCOPE_KEY
+        ]
+    )
+    cooldowns = await read_provider_cooldowns(
+        redis, [candidate.api_key.id for candidate in candidate_objects]
+    )
     for candidate in candidate_objects:
         api_key = candidate.api_key
         endpoint = candidate.endpoint
@@ -787,6 +851,11 @@ async def route_explain(
         circuit_status_by_key[api_key.id] = circuit_status
         if circuit_status.state == "open":
             reasons.append("circuit_open")
+        for scope in circuit_breaker.candidate_scopes(candidate):
+            if scope_states.get(scope.state_key) == "open":
+                reasons.append(f"{scope.kind}_circuit_open")
+        if api_key.id in cooldowns:
+            reasons.append("provider_cooldown")
         if candidate.execution_mode == "via_agent":
             agent_name = candidate.agent_name
             agent = agent_rows.get(agent_name or "")
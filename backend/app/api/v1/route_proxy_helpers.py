@@ -2,7 +2,6 @@ from typing import AsyncGenerator, Callable
 import asyncio
 import json
 import logging
-import re
 import time
 from urllib.parse import parse_qsl, urlencode
 
@@ -15,8 +14,17 @@ from app.services.background_tasks import safe_create_task
 from app.services.billing import RequestMetrics, extract_usage, write_request_log
 from app.services.codex_oauth import CodexCredential, apply_codex_auth_headers
 from app.services.endpoint_transport import endpoint_agent_name, send_endpoint_request
+from app.services.inflight import InflightLease
+from app.services.key_latency import observe_request_metrics
 from app.services.router import RouteCandidate
 from app.services.secrets import decrypt_oauth_config, decrypt_secret_value
+from app.services.stream_inspection import SSEStreamInspector
+from app.services.token_budget import TokenReservation
+from app.services.transport_plan import (
+    endpoint_transport_plan,
+    render_body_template,
+    tokenize_body_template,
+)
 
 OAUTH_CACHE_PREFIX = "oauth:endpoint"
 DEFAULT_OAUTH_EXPIRES_IN_SECONDS = 3600
@@ -24,14 +32,9 @@ DEFAULT_OAUTH_REFRESH_LEEWAY_SECONDS = 120
 DEFAULT_OAUTH_LOCK_TTL_SECONDS = 10
 OAUTH_LOCK_WAIT_STEP_SECONDS = 0.1
 OAUTH_LOCK_WAIT_ROUNDS = 20
-STANDARD_PROVIDER_NAMES = {"openai", "anthropic", "gemini", "codex"}
 STREAM_EXPLICIT_COMPLETION_EXPOSURES = {"codex", "response"}
 logger = logging.getLogger(__name__)
 
-# 请求体模板变量替换的正则模式
-# 先匹配被双引号包裹的占位符，避免字符串转义问题
-QUOTED_TEMPLATE_VARIABLE_PATTERN = re.compile(r'"\{\{(\w+)}}"')
-TEMPLATE_VARIABLE_PATTERN = re.compile(r"\{\{(\w+)}}")
 PASSTHROUGH_HEADER_ALLOWLIST = {
     "accept",
     "anthropic-beta",
@@ -68,38 +71,12 @@ CODEX_PASSTHROUGH_HEADER_ALLOWLIST = {
 }
 
 
-def _is_custom_provider(endpoint: object | None) -> bool:
-    if endpoint is None:
-        return False
-    provider = str(getattr(endpoint, "provider", "") or "").strip().lower()
-    return provider not in STANDARD_PROVIDER_NAMES
-
-
-def _json_encode_template_value(value: object) -> str:
-    return json.dumps(value, ensure_ascii=False)
-
-
 def _render_request_body_template(
     template: str,
     variables: dict[str, object],
 ) -> str:
     """渲染请求体模板，替换 {{variable}} 占位符。"""
-
-    def quoted_replacer(match: re.Match[str]) -> str:
-        var_name = match.group(1)
-        if var_name not in variables:
-            return match.group(0)
-        return _json_encode_template_value(variables[var_name])
-
-    rendered = QUOTED_TEMPLATE_VARIABLE_PATTERN.sub(quoted_replacer, template)
-
-    def replacer(match: re.Match[str]) -> str:
-        var_name = match.group(1)
-        if var_name not in variables:
-            return match.group(0)
-        return _json_encode_template_value(variables[var_name])
-
-    return TEMPLATE_VARIABLE_PATTERN.sub(replacer, rendered)
+    return render_body_template(tokenize_body_template(template), variables)
 
 
 def _extract_template_variables(payload: dict[str, object]) -> dict[str, object]:
@@ -150,18 +127,15 @@ def _apply_request_body_template(
         - None: 不使用模板，保持原始 payload
         - dict: 使用模板渲染后的新 payload
     """
-    if not _is_custom_provider(endpoint):
-        return None
-
-    template = getattr(endpoint, "request_body_template", None)
-    if not template or not isinstance(template, str) or not template.strip():
+    template = endpoint_transport_plan(endpoint).body_template
+    if template is None:
         return None
 
     variables = _extract_template_variables(payload)
     variables["model"] = real_model
 
     try:
-        rendered = _render_request_body_template(template, variables)
+        rendered = render_body_template(template, variables)
         parsed = json.loads(rendered)
         if isinstance(parsed, dict):
             return parsed
@@ -209,7 +183,8 @@ def _build_upstream_headers(
     is_stream: bool = False,
 ) -> dict:
     headers = {}
-    provider = str(getattr(endpoint, "provider", "") or "").strip().lower()
+    plan = endpoint_transport_plan(endpoint)
+    provider = plan.provider
     allow_codex_headers = (
         provider in {"openai", "codex"}
         and _is_openai_responses_path(request_path)
@@ -262,33 +237,22 @@ def _build_upstream_headers(
 
     resolved_api_key = decrypt_secret_value(api_key, settings=get_settings())
 
-    header_name = getattr(endpoint, "auth_header_name", "Authorization") or "Authorization"
-    header_prefix = getattr(endpoint, "auth_header_prefix", "Bearer") or ""
-    if header_prefix:
-        headers[header_name] = f"{header_prefix} {resolved_api_key}"
+    if plan.auth_header_prefix:
+        headers[plan.auth_header_name] = f"{plan.auth_header_prefix} {resolved_api_key}"
     else:
-        headers[header_name] = resolved_api_key
-
-    if _is_custom_provider(endpoint):
-        # 处理扩展字段：extra_headers
-        extra_headers_json = getattr(endpoint, "extra_headers", None)
-        if extra_headers_json:
-            try:
-                extra_headers = json.loads(extra_headers_json)
-                if isinstance(extra_headers, dict):
-                    for key, value in extra_headers.items():
-                        headers[key] = str(value)
-            except (json.JSONDecodeError, TypeError):
-                pass
-
-        # 处理扩展字段：extra_cookies
-        extra_cookies = getattr(endpoint, "extra_cookies", None)
-        if extra_cookies:
-            existing_cookie = headers.get("Cookie", "")
-            if existing_cookie:
-                headers["Cookie"] = f"{existing_cookie}; {extra_cookies}"
-            else:
-                headers["Cookie"] = extra_cookies
+        headers[plan.auth_header_name] = resolved_api_key
+
+    # 处理扩展字段：extra_headers
+    headers.update(plan.extra_headers)
+
+    # 处理扩展字段：extra_cookies
+    extra_cookies = plan.extra_cookies
+    if extra_cookies:
+        existing_cookie = headers.get("Cookie", "")
+        if existing_cookie:
+            headers["Cookie"] = f"{existing_cookie}; {extra_cookies}"
+        else:
+            headers["Cookie"] = extra_cookies
 
     return headers
 
@@ -325,8 +289,8 @@ def _build_target_url(
 ) -> str:
     base = base_url.rstrip("/")
     path = path_override if path_override is not None else request.url.path
-    provider = str(getattr(endpoint, "provider", "") or "").strip().lower()
-    if provider == "codex":
+    plan = endpoint_transport_plan(endpoint) if endpoint is not None else None
+    if plan is not None and plan.provider == "codex":
         if str(path).rstrip("/").endswith("/v1/responses/compact"):
             path = "/backend-api/codex/responses/compact"
         else:
@@ -340,13 +304,8 @@ def _build_target_url(
             path = f"/{path}"
 
     # 如果 endpoint 配置了自定义 url_path_suffix，则使用它替代默认路径
-    url_path_suffix = None
-    if _is_custom_provider(endpoint):
-        url_path_suffix = getattr(endpoint, "url_path_suffix", None)
-
-    if url_path_suffix:
-        # 使用自定义后缀路径
-        path = url_path_suffix if url_path_suffix.startswith("/") else f"/{url_path_suffix}"
+    if plan is not None and plan.url_path_suffix:
+        path = plan.url_path_suffix
     else:
         # 默认路径处理逻辑：避免 base_url 已带 /v1 或 /v1beta 时重复拼接版本段。
         path = _strip_duplicate_version_segment(base, path)
@@ -354,24 +313,10 @@ def _build_target_url(
     url = f"{base}{path}"
 
     # 处理扩展字段：extra_query_params
-    if _is_custom_provider(endpoint):
-        extra_query_params_json = getattr(endpoint, "extra_query_params", None)
-        if extra_query_params_json:
-            try:
-                extra_query_params = json.loads(extra_query_params_json)
-                if isinstance(extra_query_params, dict) and extra_query_params:
-                    query_parts = list(
-                        parse_qsl(
-                            _upstream_query_string(request, endpoint),
-                            keep_blank_values=True,
-                        )
-                    )
-                    for key, value in extra_query_params.items():
-                        query_parts.append((str(key), str(value)))
-                    new_query = urlencode(query_parts)
-                    url = f"{url}?{new_query}" if new_query else url
-            except (json.JSONDecodeError, TypeError):
-                pass
+    if plan is not None and plan.extra_query_params:
+        query_parts = parse_qsl(_upstream_query_string(request, endpoint), keep_blank_values=True)
+        query_parts.extend(plan.extra_query_params)
+        url = f"{url}?{urlencode(query_parts)}"
 
     upstream_query = _upstream_query_string(request, endpoint)
     if upstream_query and "?" not in url:
@@ -722,6 +667,54 @@ def _merge_headers(base: dict, extra: dict) -> dict:
     return sanitized
 
 
+class _FirstDataStream:
+    """Upstream or agent stream whose leading chunks were read before committing."""
+
+    def __init__(self, source, chunks: list[bytes], iterator, first_event_failed: bool) -> None:  # noqa: ANN001
+        self._source = source
+        self._chunks = chunks
+        self._iterator = iterator
+        self.first_event_failed = first_event_failed
+
+    def __getattr__(self, name: str):  # noqa: ANN204
+        return getattr(self._source, name)
+
+    async def aiter_bytes(self) -> AsyncGenerator[bytes, None]:
+        for chunk in self._chunks:
+            yield chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    iter_bytes = aiter_bytes
+
+
+async def _read_until_first_data(source, *, timeout: float | None = None) -> _FirstDataStream:  # noqa: ANN001
+    """Buffer chunks until the first SSE data event, closing the source on failure.
+
+    Raises ``asyncio.TimeoutError`` when no data event arrives within ``timeout``.
+    """
+    iterator = source.aiter_bytes() if hasattr(source, "aiter_bytes") else source.iter_bytes()
+    chunks: list[bytes] = []
+
+    async def _read() -> bool:
+        inspector = SSEStreamInspector()
+        async for chunk in iterator:
+            chunks.append(chunk)
+            inspector.feed(chunk)
+            if inspector.failed:
+                return True
+            if inspector.data_seen:
+                return False
+        return False
+
+    try:
+        first_event_failed = await asyncio.wait_for(_read(), timeout=timeout)
+    except BaseException:
+        await source.aclose()
+        raise
+    return _FirstDataStream(source, chunks, iterator, first_event_failed)
+
+
 async def _stream_response(
     response,
     request_id: str,
@@ -747,32 +740,28 @@ async def _stream_response(
     router_service=None,
     route_candidate: RouteCandidate | None = None,
     record_attempt: Callable[[str, str | None], None] | None = None,
+    inflight_lease: InflightLease | None = None,
+    token_reservation: TokenReservation | None = None,
 ) -> AsyncGenerator[bytes, None]:
-    buffer = ""
-    usage_payload = None
+    inspector = SSEStreamInspector()
     first_data_at: float | None = None
     chunks: list[bytes] = []
     stream_complete = False
     stream_failed = False
-    response_completed = False
     failure_reason: str | None = None
     try:
         async for chunk in response.aiter_bytes():
             if chunk:
                 if dump_rule is not None:
                     chunks.append(chunk)
-                (
-                    buffer,
-                    usage_payload,
-                    data_seen,
-                    chunk_failed,
-                    chunk_completed,
-                ) = _inspect_stream_chunk(buffer, usage_payload, chunk)
-                stream_failed = stream_failed or chunk_failed
-                response_completed = response_completed or chunk_completed
-                if data_seen and first_data_at is None:
+                inspector.feed(chunk)
+                stream_failed = inspector.failed
+                if first_data_at is None and inspector.data_seen:
                     first_data_at = time.perf_counter()
             yield chunk
+        inspector.close()
+        stream_failed = inspector.failed
+        response_completed = inspector.completed
         requires_completion = exposure_format in STREAM_EXPLICIT_COMPLETION_EXPOSURES
         stream_complete = not stream_failed and (
             response_completed or not requires_completion
@@ -807,6 +796,8 @@ async def _stream_response(
     finally:
         stream_end = time.perf_counter()
         await response.aclose()
+        if inflight_lease is not None:
+            await inflight_lease.release()
         total_latency_ms = int((stream_end - request_start) * 1000)
         if record_attempt is not None:
             if stream_complete:
@@ -819,17 +810,20 @@ async def _stream_response(
             if stream_failed:
                 await circuit_breaker.record_failure(route_candidate.api_key.id)
             elif stream_complete:
-                await circuit_breaker.record_success(route_candidate.api_key.id)
                 if router_service is not None:
-                    await router_service.record_candidate_success(route_candidate)
+                    await router_service.record_attempt_success(route_candidate)
+                else:
+                    await circuit_breaker.record_candidate_success(route_candidate)
         ttft_ms = (
             int((first_data_at - request_start) * 1000)
             if first_data_at is not None
             else None
         )
         prompt_tokens, completion_tokens, total_tokens, cached_tokens = extract_usage(
-            usage_payload
+            inspector.usage_payload
         )
+        if token_reservation is not None:
+            await token_reservation.settle(total_tokens)
         tps = _calculate_tps(first_data_at, stream_end, completion_tokens)
         resolved_latency_ms = total_latency_ms
         metrics = RequestMetrics(
@@ -841,6 +835,9 @@ async def _stream_response(
             requested_rule_group=requested_rule_group,
             rule_group=rule_group,
             exposure_format=exposure_format,
+            routing_strategy=(
+                router_service.routing_strategy if router_service is not None else None
+            ),
             status_code=status_code,
             latency_ms=resolved_latency_ms,
             ttft_ms=ttft_ms,
@@ -853,6 +850,7 @@ async def _stream_response(
             agent_node=agent_node,
             upstream_url=upstream_url,
         )
+        observe_request_metrics(metrics)
         safe_create_task(write_request_log(metrics))
         if dump_rule is not None and dump_endpoint_name:
             safe_create_task(
@@ -894,54 +892,21 @@ def _calculate_tps(
 
 
 def _inspect_stream_chunk(
-    buffer: str, usage_payload: dict | None, chunk: bytes
-) -> tuple[str, dict | None, bool, bool, bool]:
-    try:
-        text = chunk.decode("utf-8")
-    except UnicodeDecodeError:
-        return buffer, usage_payload, False, False, False
-
-    buffer += text
-    lines = buffer.split("\n")
-    buffer = lines.pop()
-    data_seen = False
-    stream_failed = False
-    response_completed = False
-    for line in lines:
-        line = line.strip()
-        if not line.startswith("data:"):
-            continue
-        data = line[5:].strip()
-        if not data or data == "[DONE]":
-            continue
-        data_seen = True
-        try:
-            payload = json.loads(data)
-        except json.JSONDecodeError:
-            continue
-        payload_type = str(payload.get("type") or "").strip().lower()
-        if payload_type == "response.completed":
-            response_completed = True
-        if payload_type in {"error", "response.failed"} or isinstance(
-            payload.get("error"), dict
-        ):
-            stream_failed = True
-        metadata = payload.get("metadata")
-        if "usage" in payload or "usageMetadata" in payload or "total_usage" in payload:
-            usage_payload = payload
-        elif isinstance(metadata, dict) and (
-            "total_usage" in metadata or "usage" in metadata
-        ):
-            usage_payload = payload
-        elif payload_type == "response.completed":
-            response_payload = payload.get("response")
-            if isinstance(response_payload, dict) and "usage" in response_payload:
-                usage_payload = response_payload
-        else:
-            choices = payload.get("choices")
-            if isinstance(choices, list) and any(
-                isinstance(choice, dict) and isinstance(choice.get("usage"), dict)
-                for choice in choices
-            ):
-                usage_payload = payload
-    return buffer, usage_payload, data_seen, stream_failed, response_completed
+    buffer: str | bytes, usage_payload: dict | None, chunk: bytes
+) -> tuple[bytes, dict | None, bool, bool, bool]:
+    """Stateless form of ``SSEStreamInspector`` kept for callers of the old helper.
+
+    Only the unterminated trailing line is carried in ``buffer``, so a
+    multi-line event split across calls is not joined; hold an inspector
+    for the whole stream instead.
+    """
+    inspector = SSEStreamInspector()
+    inspector.usage_payload = usage_payload
+    inspector.feed((buffer.encode("utf-8") if isinstance(buffer, str) else buffer) + chunk)
+    return (
+        inspector.pending,
+        inspector.usage_payload,
+        inspector.data_seen,
+        inspector.failed,
+        inspector.completed,
+    )
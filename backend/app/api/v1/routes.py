@@ -12,6 +12,8 @@ from app.api.v1.route_modules import (
     proxy_agent_handler,
     proxy_agent_streams,
     proxy_attempts,
+    proxy_batching,
+    proxy_cache,
     proxy_core,
     proxy_direct_handler,
     proxy_entrypoints,
@@ -38,6 +40,8 @@ _COMPAT_MODULES = (
     proxy_agent_handler,
     proxy_agent_streams,
     proxy_attempts,
+    proxy_batching,
+    proxy_cache,
     proxy_core,
     proxy_direct_handler,
     proxy_entrypoints,
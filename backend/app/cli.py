@@ -274,6 +274,7 @@ def upstream_key_add(args: argparse.Namespace, client: FactoryClient) -> Command
         "rule_groups": _csv(args.rule_groups) if args.rule_groups else None,
         "weight": args.weight,
         "rpm_limit": args.rpm_limit,
+        "tpm_limit": args.tpm_limit,
         "daily_limit": args.daily_limit,
     }
     payload = {key: value for key, value in payload.items() if value is not None}
@@ -600,6 +601,7 @@ def build_parser() -> argparse.ArgumentParser:
     key_add_parser.add_argument("--rule-groups")
     key_add_parser.add_argument("--weight", type=int, default=1)
     key_add_parser.add_argument("--rpm-limit", type=int)
+    key_add_parser.add_argument("--tpm-limit", type=int)
     key_add_parser.add_argument("--daily-limit", type=int)
     key_add_parser.set_defaults(func=upstream_key_add)
 
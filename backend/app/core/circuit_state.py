@@ -0,0 +1,532 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+import math
+import time
+from typing import Any
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_WINDOW_SLOTS = 6
+CIRCUIT_HISTORY_MAX_ENTRIES = 50
+CIRCUIT_HISTORY_TTL_SECONDS = 7 * 86400
+
+# State is one compact JSON document per key so that routing can still peek
+# many circuits with a single MGET. Fields: s=state, u=open_until, t=trips,
+# c=consecutive failures, p=half-open permits in use, pa=last permit time,
+# hs=half-open successes, w=[[slot, ok, err], ...] over the sliding window.
+# KEYS = state_1, history_1, state_2, history_2, ... (one pair per scope)
+# ARGV = event, failure_threshold, window_seconds, min_requests, error_rate,
+#        open_seconds, max_open_seconds, half_open_requests, history_max,
+#        history_ttl_seconds
+# The event is applied to every pair; "acquire" is all-or-nothing across them.
+# Returns {previous_state, state, allowed, reason} flattened per pair.
+CIRCUIT_EVENT_SCRIPT = """
+local event = ARGV[1]
+local threshold = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local min_requests = tonumber(ARGV[4])
+local error_rate = tonumber(ARGV[5])
+local open_seconds = tonumber(ARGV[6])
+local max_open = tonumber(ARGV[7])
+local trial_limit = tonumber(ARGV[8])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local slot = math.floor(now / (window / 6))
+
+local function fresh()
+  return {s = 'closed', u = 0, t = 0, c = 0, p = 0, pa = 0, hs = 0, w = {}}
+end
+
+local function step(raw)
+  local st = fresh()
+  if raw == 'open' then
+    -- cjson cannot encode inf, so legacy markers get a finite open period
+    st.s = 'open'
+    st.u = now + open_seconds
+  elseif raw then
+    local ok, decoded = pcall(cjson.decode, raw)
+    if ok and type(decoded) == 'table' then
+      for name, value in pairs(decoded) do
+        st[name] = value
+      end
+    end
+  end
+  local previous = st.s
+  local allowed = 1
+  local reason = ''
+  local dirty = true
+
+  local function record(ok_count, err_count)
+    local kept = {}
+    local current = nil
+    for _, entry in ipairs(st.w) do
+      if entry[1] > slot - 6 then
+        if entry[1] == slot then
+          current = entry
+        end
+        table.insert(kept, entry)
+      end
+    end
+    if not current then
+      current = {slot, 0, 0}
+      table.insert(kept, current)
+    end
+    current[2] = current[2] + ok_count
+    current[3] = current[3] + err_count
+    local requests = 0
+    local errors = 0
+    for _, entry in ipairs(kept) do
+      requests = requests + entry[2] + entry[3]
+      errors = errors + entry[3]
+    end
+    st.w = kept
+    return requests, errors
+  end
+
+  local function trip(why)
+    st.t = st.t + 1
+    st.s = 'open'
+    st.u = now + math.min(open_seconds * 2 ^ (st.t - 1), max_open)
+    st.p = 0
+    st.hs = 0
+    st.w = {}
+    reason = why
+  end
+
+  if event == 'acquire' then
+    if st.s == 'closed' then
+      dirty = false
+    elseif st.s == 'open' then
+      if now < st.u then
+        allowed = 0
+        dirty = false
+      else
+        st.s = 'half_open'
+        st.p = 0
+        st.hs = 0
+        reason = 'open_elapsed'
+      end
+    end
+    if st.s == 'half_open' then
+      if st.p > 0 and now - st.pa > window then
+        st.p = 0
+      end
+      if st.p >= trial_limit then
+        allowed = 0
+      else
+        st.p = st.p + 1
+        st.pa = now
+      end
+    end
+  elseif event == 'success' then
+    if st.s == 'closed' then
+      record(1, 0)
+      st.c = 0
+    else
+      st.hs = st.hs + 1
+      st.p = math.max(st.p - 1, 0)
+      if st.hs >= trial_limit then
+        st = fresh()
+        reason = 'probe_succeeded'
+      elseif st.s == 'open' then
+        st.s = 'half_open'
+        reason = 'probe_succeeded'
+      end
+    end
+  elseif event == 'failure' then
+    if st.s == 'closed' then
+      local requests, errors = record(0, 1)
+      st.c = st.c + 1
+      if st.c >= threshold then
+        trip('consecutive_failures')
+      elseif requests >= min_requests and errors >= error_rate * requests then
+        trip('error_rate')
+      end
+    elseif st.s == 'half_open' or now >= st.u then
+      trip('probe_failed')
+    else
+      dirty = false
+    end
+  end
+  return {previous = previous, st = st, allowed = allowed, reason = reason, dirty = dirty}
+end
+
+local steps = {}
+local denied = false
+for index = 1, #KEYS, 2 do
+  local result = step(redis.call('GET', KEYS[index]))
+  if result.allowed == 0 then
+    denied = true
+  end
+  table.insert(steps, result)
+end
+
+local reply = {}
+for position, result in ipairs(steps) do
+  local state_key = KEYS[position * 2 - 1]
+  local history_key = KEYS[position * 2]
+  local st = result.st
+  if event == 'acquire' and denied then
+    table.insert(reply, result.previous)
+    table.insert(reply, result.previous)
+    table.insert(reply, 0)
+    table.insert(reply, '')
+  else
+    if result.dirty then
+      if st.s == 'closed' and st.c == 0 and #st.w == 0 then
+        redis.call('DEL', state_key)
+      else
+        local ttl = window
+        if st.s == 'open' then
+          ttl = st.u - now + max_open
+        elseif st.s == 'half_open' then
+          ttl = window + max_open
+        end
+        redis.call('SET', state_key, cjson.encode(st), 'PX', math.max(1000, math.ceil(ttl * 1000)))
+      end
+    end
+    if result.previous ~= st.s then
+      redis.call('LPUSH', history_key, cjson.encode({from = result.previous, to = st.s, reason = result.reason, at = now}))
+      redis.call('LTRIM', history_key, 0, tonumber(ARGV[9]) - 1)
+      redis.call('EXPIRE', history_key, tonumber(ARGV[10]))
+    end
+    table.insert(reply, result.previous)
+    table.insert(reply, st.s)
+    table.insert(reply, result.allowed)
+    table.insert(reply, result.reason)
+  end
+end
+return reply
+"""
+
+
+@dataclass(frozen=True)
+class CircuitPolicy:
+    failure_threshold: int
+    window_seconds: float
+    min_requests: int
+    error_rate: float
+    open_seconds: float
+    max_open_seconds: float
+    half_open_requests: int
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> "CircuitPolicy":
+        open_seconds = max(float(settings.circuit_breaker_open_seconds), 1.0)
+        return cls(
+            failure_threshold=max(int(settings.circuit_breaker_failures), 1),
+            window_seconds=max(float(settings.circuit_breaker_window_seconds), 1.0),
+            min_requests=max(int(settings.circuit_breaker_min_requests), 1),
+            error_rate=float(settings.circuit_breaker_error_rate),
+            open_seconds=open_seconds,
+            max_open_seconds=max(float(settings.circuit_breaker_ttl_seconds), open_seconds),
+            half_open_requests=max(int(settings.circuit_breaker_half_open_requests), 1),
+        )
+
+    def script_args(self, event: str) -> list[Any]:
+        return [
+            event,
+            self.failure_threshold,
+            self.window_seconds,
+            self.min_requests,
+            self.error_rate,
+            self.open_seconds,
+            self.max_open_seconds,
+            self.half_open_requests,
+            CIRCUIT_HISTORY_MAX_ENTRIES,
+            CIRCUIT_HISTORY_TTL_SECONDS,
+        ]
+
+
+@dataclass
+class CircuitState:
+    state: str = CIRCUIT_CLOSED
+    open_until: float = 0.0
+    trips: int = 0
+    failures: int = 0
+    permits: int = 0
+    permit_at: float = 0.0
+    probe_successes: int = 0
+    window: list[list[float]] = field(default_factory=list)
+
+    def effective_state(self, now: float) -> str:
+        if self.state == CIRCUIT_OPEN and now >= self.open_until:
+            return CIRCUIT_HALF_OPEN
+        return self.state
+
+    def admits_trial(self, now: float, policy: CircuitPolicy) -> bool:
+        state = self.effective_state(now)
+        if state == CIRCUIT_OPEN:
+            return False
+        if state == CIRCUIT_HALF_OPEN and self.state == CIRCUIT_HALF_OPEN:
+            stale = now - self.permit_at > policy.window_seconds
+            return stale or self.permits < policy.half_open_requests
+        return True
+
+    def window_totals(self, now: float, policy: CircuitPolicy) -> tuple[int, int]:
+        slot = math.floor(now / (policy.window_seconds / CIRCUIT_WINDOW_SLOTS))
+        requests = errors = 0
+        for entry in self.window:
+            if entry[0] > slot - CIRCUIT_WINDOW_SLOTS:
+                requests += int(entry[1] + entry[2])
+                errors += int(entry[2])
+        return requests, errors
+
+    @property
+    def is_idle(self) -> bool:
+        return self.state == CIRCUIT_CLOSED and not self.failures and not self.window
+
+
+@dataclass(frozen=True)
+class CircuitTransition:
+    previous: str
+    state: str
+    allowed: bool = True
+    reason: str | None = None
+
+    @property
+    def changed(self) -> bool:
+        return self.previous != self.state
+
+
+def decode_circuit_state(raw: str | bytes | None) -> CircuitState:
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    if not raw:
+        return CircuitState()
+    if raw == CIRCUIT_OPEN:
+        # Plain "open" markers predate the JSON state and stay open until they expire.
+        return CircuitState(state=CIRCUIT_OPEN, open_until=math.inf)
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return CircuitState()
+    if not isinstance(data, dict):
+        return CircuitState()
+    window = data.get("w")
+    return CircuitState(
+        state=str(data.get("s") or CIRCUIT_CLOSED),
+        open_until=float(data.get("u") or 0),
+        trips=int(data.get("t") or 0),
+        failures=int(data.get("c") or 0),
+        permits=int(data.get("p") or 0),
+        permit_at=float(data.get("pa") or 0),
+        probe_successes=int(data.get("hs") or 0),
+        window=[list(entry) for entry in window] if isinstance(window, list) else [],
+    )
+
+
+def encode_circuit_state(state: CircuitState) -> str:
+    return json.dumps(
+        {
+            "s": state.state,
+            "u": state.open_until,
+            "t": state.trips,
+            "c": state.failures,
+            "p": state.permits,
+            "pa": state.permit_at,
+            "hs": state.probe_successes,
+            "w": state.window,
+        },
+        separators=(",", ":"),
+    )
+
+
+def circuit_state_ttl_ms(state: CircuitState, now: float, policy: CircuitPolicy) -> int:
+    ttl = policy.window_seconds
+    if state.state == CIRCUIT_OPEN:
+        ttl = state.open_until - now + policy.max_open_seconds
+    elif state.state == CIRCUIT_HALF_OPEN:
+        ttl = policy.window_seconds + policy.max_open_seconds
+    return max(1000, math.ceil(ttl * 1000))
+
+
+def apply_circuit_event(
+    raw: str | bytes | None,
+    event: str,
+    *,
+    now: float,
+    policy: CircuitPolicy,
+) -> tuple[CircuitState | None, CircuitTransition]:
+    """Python mirror of CIRCUIT_EVENT_SCRIPT.
+
+    Returns the state to store (``None`` when nothing changed) and the transition.
+    """
+    state = decode_circuit_state(raw)
+    if math.isinf(state.open_until):
+        state.open_until = now + policy.open_seconds
+    previous = state.state
+    allowed = True
+    reason: str | None = None
+    dirty = True
+    slot = math.floor(now / (policy.window_seconds / CIRCUIT_WINDOW_SLOTS))
+
+    def record(ok_count: int, err_count: int) -> tuple[int, int]:
+        kept = [entry for entry in state.window if entry[0] > slot - CIRCUIT_WINDOW_SLOTS]
+        current = next((entry for entry in kept if entry[0] == slot), None)
+        if current is None:
+            current = [slot, 0, 0]
+            kept.append(current)
+        current[1] += ok_count
+        current[2] += err_count
+        state.window = kept
+        return state.window_totals(now, policy)
+
+    def trip(why: str) -> None:
+        nonlocal reason
+        state.trips += 1
+        state.state = CIRCUIT_OPEN
+        state.open_until = now + min(
+            policy.open_seconds * 2 ** (state.trips - 1), policy.max_open_seconds
+        )
+        state.permits = 0
+        state.probe_successes = 0
+        state.window = []
+        reason = why
+
+    if event == "acquire":
+        if state.state == CIRCUIT_CLOSED:
+            dirty = False
+        elif state.state == CIRCUIT_OPEN:
+            if now < state.open_until:
+                allowed = False
+                dirty = False
+            else:
+                state.state = CIRCUIT_HALF_OPEN
+                state.permits = 0
+                state.probe_successes = 0
+                reason = "open_elapsed"
+        if state.state == CIRCUIT_HALF_OPEN:
+            if state.permits > 0 and now - state.permit_at > policy.window_seconds:
+                state.permits = 0
+            if state.permits >= policy.half_open_requests:
+                allowed = False
+            else:
+                state.permits += 1
+                state.permit_at = now
+    elif event == "success":
+        if state.state == CIRCUIT_CLOSED:
+            record(1, 0)
+            state.failures = 0
+        else:
+            state.probe_successes += 1
+            state.permits = max(state.permits - 1, 0)
+            if state.probe_successes >= policy.half_open_requests:
+                state = CircuitState()
+                reason = "probe_succeeded"
+            elif state.state == CIRCUIT_OPEN:
+                state.state = CIRCUIT_HALF_OPEN
+                reason = "probe_succeeded"
+    elif event == "failure":
+        if state.state == CIRCUIT_CLOSED:
+            requests, errors = record(0, 1)
+            state.failures += 1
+            if state.failures >= policy.failure_threshold:
+                trip("consecutive_failures")
+            elif requests >= policy.min_requests and errors >= policy.error_rate * requests:
+                trip("error_rate")
+        elif state.state == CIRCUIT_HALF_OPEN or now >= state.open_until:
+            trip("probe_failed")
+        else:
+            dirty = False
+
+    transition = CircuitTransition(
+        previous=previous, state=state.state, allowed=allowed, reason=reason
+    )
+    return (state if dirty else None), transition
+
+
+def circuit_history_entry(transition: CircuitTransition, now: float) -> str:
+    return json.dumps(
+        {
+            "from": transition.previous,
+            "to": transition.state,
+            "reason": transition.reason or "",
+            "at": now,
+        },
+        separators=(",", ":"),
+    )
+
+
+def apply_circuit_events(
+    raws: list[str | bytes | None],
+    event: str,
+    *,
+    now: float,
+    policy: CircuitPolicy,
+) -> list[tuple[CircuitState | None, CircuitTransition]]:
+    """Apply ``event`` to several scopes; acquiring is all-or-nothing."""
+    results = [apply_circuit_event(raw, event, now=now, policy=policy) for raw in raws]
+    if event == "acquire" and not all(transition.allowed for _, transition in results):
+        return [
+            (None, CircuitTransition(previous=t.previous, state=t.previous, allowed=False))
+            for _, t in results
+        ]
+    return results
+
+
+def parse_circuit_result(result: Any) -> list[CircuitTransition]:
+    items = [item.decode("utf-8") if isinstance(item, bytes) else item for item in result]
+    return [
+        CircuitTransition(
+            previous=str(previous),
+            state=str(state),
+            allowed=int(allowed) == 1,
+            reason=str(reason) or None,
+        )
+        for previous, state, allowed, reason in zip(*[iter(items)] * 4, strict=True)
+    ]
+
+
+def circuit_event_command(
+    redis: Any, keys: list[str], event: str, policy: CircuitPolicy
+) -> tuple[str, tuple[Any, ...], dict[str, Any]] | None:
+    """Return the single atomic command for ``event``, or ``None`` if unsupported.
+
+    ``keys`` alternates state and history keys. The command can be issued
+    directly or queued on a pipeline of ``redis``.
+    """
+    if hasattr(redis, "circuit_event"):
+        return ("circuit_event", tuple(keys), {"event": event, "policy": policy})
+    if hasattr(redis, "eval"):
+        return (
+            "eval",
+            (CIRCUIT_EVENT_SCRIPT, len(keys), *keys, *policy.script_args(event)),
+            {},
+        )
+    return None
+
+
+async def run_circuit_event(
+    redis: Any, keys: list[str], event: str, policy: CircuitPolicy
+) -> list[CircuitTransition]:
+    command = circuit_event_command(redis, keys, event, policy)
+    if command is not None:
+        name, args, kwargs = command
+        return parse_circuit_result(await getattr(redis, name)(*args, **kwargs))
+    now = time.time()
+    state_keys = keys[0::2]
+    history_keys = keys[1::2]
+    raws = [await redis.get(state_key) for state_key in state_keys]
+    results = apply_circuit_events(raws, event, now=now, policy=policy)
+    for state_key, history_key, (state, transition) in zip(
+        state_keys, history_keys, results, strict=True
+    ):
+        if state is not None:
+            if state.is_idle:
+                await redis.delete(state_key)
+            else:
+                ttl_ms = circuit_state_ttl_ms(state, now, policy)
+                await redis.set(
+                    state_key,
+                    encode_circuit_state(state),
+                    ex=max(1, math.ceil(ttl_ms / 1000)),
+                )
+        if transition.changed:
+            await redis.lpush(history_key, circuit_history_entry(transition, now))
+            await redis.ltrim(history_key, 0, CIRCUIT_HISTORY_MAX_ENTRIES - 1)
+            await redis.expire(history_key, CIRCUIT_HISTORY_TTL_SECONDS)
+    return [transition for _, transition in results]
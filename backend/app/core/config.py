@@ -18,7 +18,11 @@ class Settings(BaseSettings):
     master_auth_token: str | None = None
     admin_session_ttl_seconds: int = 86400
     admin_legacy_master_bearer_enabled: bool = False
+    factory_key_cache_ttl_seconds: float = 60.0
+    factory_key_negative_cache_ttl_seconds: float = 5.0
+    factory_key_cache_max_entries: int = 10000
     data_encryption_key: str | None = None
+    secret_cache_max_entries: int = 4096
     agent_auth_token: str | None = None
     agent_allowed_targets: str = "*"
     agent_heartbeat_timeout_seconds: int = 120
@@ -42,7 +46,35 @@ class Settings(BaseSettings):
     http_timeout_seconds: float = 60.0
     circuit_breaker_failures: int = 3
     circuit_breaker_ttl_seconds: int = 3600
+    circuit_breaker_open_seconds: int = 30
+    circuit_breaker_window_seconds: int = 60
+    circuit_breaker_min_requests: int = 10
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_half_open_requests: int = 1
     memory_redis_max_keys: int = 4096
+    routing_snapshot_max_age_seconds: float = 30.0
+    routing_snapshot_version_check_seconds: float = 1.0
+    inflight_redis_enabled: bool = False
+    wrr_shared_state_enabled: bool = True
+    rpm_burst_seconds: float = 60.0
+    hedge_budget_percent: float = 5.0
+    hedge_default_delay_ms: int = 2000
+    retry_backoff_base_ms: int = 200
+    retry_backoff_max_ms: int = 5000
+    retry_budget_percent: float = 20.0
+    provider_cooldown_max_seconds: int = 3600
+    adaptive_concurrency_enabled: bool = True
+    adaptive_concurrency_initial_limit: int = 20
+    adaptive_concurrency_min_limit: int = 1
+    adaptive_concurrency_max_limit: int = 200
+    adaptive_concurrency_queue_ms: int = 200
+    adaptive_concurrency_redis_enabled: bool = False
+    affinity_prefix_kb: int = 4
+    affinity_load_factor: float = 1.25
+    response_cache_memory_bytes: int = 64 * 1024 * 1024
+    response_cache_max_entry_bytes: int = 1024 * 1024
+    request_coalescing_enabled: bool = False
+    request_coalescing_stream_enabled: bool = False
     health_probe_enabled: bool = True
     health_probe_interval_seconds: int = 60
     health_probe_timeout_seconds: float = 10.0
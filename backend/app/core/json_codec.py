@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖，未安装时使用标准库
+    orjson = None
+
+_STRUCTURAL = re.compile(rb'[",:\[\]{}]')
+_WHITESPACE = b" \t\r\n"
+
+
+def loads_json(raw: bytes | str) -> object:
+    """Parse JSON with orjson when it is installed.
+
+    orjson rejects a few inputs the standard library accepts (NaN, integers
+    beyond 64 bits), so those fall back to ``json.loads``.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+@dataclass(frozen=True)
+class JsonMember:
+    key: str
+    key_start: int
+    value_start: int
+    value_end: int
+
+
+def _string_end(raw: bytes, start: int) -> int:
+    """Index just past the string literal whose opening quote is at ``start``."""
+    position = start + 1
+    while True:
+        quote = raw.find(b'"', position)
+        if quote < 0:
+            raise ValueError("Unterminated JSON string")
+        backslashes = 0
+        cursor = quote - 1
+        while raw[cursor] == 0x5C:
+            backslashes += 1
+            cursor -= 1
+        if backslashes % 2 == 0:
+            return quote + 1
+        position = quote + 1
+
+
+def _strip_span(raw: bytes, start: int, end: int) -> tuple[int, int]:
+    while start < end and raw[start] in _WHITESPACE:
+        start += 1
+    while end > start and raw[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def top_level_members(raw: bytes) -> list[JsonMember] | None:
+    """Locate the members of a top-level JSON object without decoding their values.
+
+    ``raw`` must already be known to be valid JSON. Only quotes and
+    structural characters are visited, and string bodies are skipped with
+    ``bytes.find``, so multi-megabyte string values cost almost nothing.
+    Returns None for anything but an object with unique keys.
+    """
+    start, end = _strip_span(raw, 0, len(raw))
+    if start >= end or raw[start] != 0x7B or raw[end - 1] != 0x7D:
+        return None
+    members: list[JsonMember] = []
+    seen: set[str] = set()
+    depth = 0
+    key: str | None = None
+    key_start = value_start = -1
+    position = start
+    try:
+        while True:
+            match = _STRUCTURAL.search(raw, position, end)
+            if match is None:
+                return None
+            index = match.start()
+            char = raw[index]
+            if char == 0x22:
+                string_end = _string_end(raw, index)
+                if depth == 1 and key is None:
+                    key = json.loads(raw[index:string_end])
+                    key_start = index
+                position = string_end
+                continue
+            position = index + 1
+            if char in b"{[":
+                depth += 1
+            elif depth > 1:
+                if char in b"}]":
+                    depth -= 1
+            elif char == 0x3A:
+                value_start = position
+            elif char in b",}":
+                if key is not None:
+                    if key in seen:
+                        return None
+                    seen.add(key)
+                    value_span = _strip_span(raw, value_start, index)
+                    members.append(JsonMember(key, key_start, *value_span))
+                    key = None
+                if char == 0x7D:
+                    return members
+    except (ValueError, IndexError):
+        return None
+
+
+def splice_top_level(
+    raw: bytes,
+    members: list[JsonMember],
+    *,
+    replace: Mapping[str, object],
+    remove: frozenset[str] | set[str] = frozenset(),
+) -> bytes:
+    """Rebuild a top-level object from ``raw``, re-encoding only the touched members.
+
+    Keys in ``replace`` that are not in ``raw`` are appended, the way
+    assigning a new key to a dict and re-serializing it would order them.
+    """
+    view = memoryview(raw)
+    parts: list[bytes | memoryview] = []
+    present: set[str] = set()
+    for member in members:
+        present.add(member.key)
+        if member.key in remove:
+            continue
+        if member.key in replace:
+            encoded = json.dumps(replace[member.key]).encode("utf-8")
+            parts.append(bytes(view[member.key_start : member.value_start]) + encoded)
+        else:
+            parts.append(view[member.key_start : member.value_end])
+    for key, value in replace.items():
+        if key not in present:
+            parts.append(json.dumps({key: value})[1:-1].encode("utf-8"))
+    return b"{" + b",".join(parts) + b"}"
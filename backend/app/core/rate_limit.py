@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+import time
+from typing import Any
+
+# State is stored as a plain "tokens:updated_at" string so that callers can
+# still peek many buckets with a single MGET.
+# KEYS[1] = bucket key, ARGV = capacity, refill_per_second, cost, ttl_ms, force
+# With force=1 the cost is always applied (negative costs refund), which lets
+# callers reconcile an earlier estimate; the balance may then go negative.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[5]) == 1
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = capacity
+local raw = redis.call('GET', KEYS[1])
+if raw then
+  local sep = string.find(raw, ':', 1, true)
+  if sep then
+    local stored = tonumber(string.sub(raw, 1, sep - 1))
+    local updated = tonumber(string.sub(raw, sep + 1))
+    if stored and updated then
+      tokens = math.min(capacity, stored + math.max(0, now - updated) * refill)
+    end
+  end
+end
+local allowed = 0
+if force or tokens >= cost then
+  tokens = math.min(capacity, tokens - cost)
+  allowed = 1
+end
+local retry_after = math.max(0, (cost - tokens) / refill)
+redis.call('SET', KEYS[1], string.format('%.6f:%.6f', tokens, now), 'PX', tonumber(ARGV[4]))
+return {allowed, string.format('%.6f', tokens), string.format('%.6f', retry_after)}
+"""
+
+
+@dataclass(frozen=True)
+class TokenBucketResult:
+    allowed: bool
+    remaining: float
+    retry_after_seconds: float | None
+
+
+def format_retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def token_bucket_ttl_ms(capacity: float, refill_per_second: float) -> int:
+    # A bucket that has been idle long enough to refill completely carries no state.
+    return int(math.ceil(capacity / refill_per_second * 1000)) + 1000
+
+
+def bucket_tokens(
+    raw: str | None,
+    *,
+    capacity: float,
+    refill_per_second: float,
+    now: float,
+) -> float:
+    if not raw:
+        return capacity
+    stored_raw, _, updated_raw = str(raw).partition(":")
+    try:
+        stored = float(stored_raw)
+        updated = float(updated_raw)
+    except ValueError:
+        return capacity
+    return min(capacity, stored + max(0.0, now - updated) * refill_per_second)
+
+
+def apply_token_bucket(
+    raw: str | None,
+    *,
+    capacity: float,
+    refill_per_second: float,
+    cost: float,
+    now: float,
+    force: bool = False,
+) -> tuple[str, TokenBucketResult]:
+    tokens = bucket_tokens(
+        raw, capacity=capacity, refill_per_second=refill_per_second, now=now
+    )
+    allowed = force or tokens >= cost
+    if allowed:
+        tokens = min(capacity, tokens - cost)
+    retry_after = max(0.0, (cost - tokens) / refill_per_second)
+    return f"{tokens:.6f}:{now:.6f}", TokenBucketResult(
+        allowed=allowed,
+        remaining=tokens,
+        retry_after_seconds=retry_after,
+    )
+
+
+async def take_tokens(
+    redis: Any,
+    key: str,
+    *,
+    capacity: float,
+    refill_per_second: float,
+    cost: float = 1.0,
+    force: bool = False,
+) -> TokenBucketResult:
+    """Atomically take ``cost`` tokens from the bucket at ``key``."""
+    if capacity <= 0 or refill_per_second <= 0:
+        return TokenBucketResult(allowed=False, remaining=0.0, retry_after_seconds=None)
+    ttl_ms = token_bucket_ttl_ms(capacity, refill_per_second)
+    if hasattr(redis, "token_bucket"):
+        return await redis.token_bucket(
+            key,
+            capacity=capacity,
+            refill_per_second=refill_per_second,
+            cost=cost,
+            ttl_ms=ttl_ms,
+            force=force,
+        )
+    if hasattr(redis, "eval"):
+        allowed, remaining, retry_after = await redis.eval(
+            TOKEN_BUCKET_SCRIPT, 1, key, capacity, refill_per_second, cost, ttl_ms, int(force)
+        )
+        return TokenBucketResult(
+            allowed=int(allowed) == 1,
+            remaining=float(remaining),
+            retry_after_seconds=float(retry_after),
+        )
+    raw, result = apply_token_bucket(
+        await redis.get(key),
+        capacity=capacity,
+        refill_per_second=refill_per_second,
+        cost=cost,
+        now=time.time(),
+        force=force,
+    )
+    await redis.set(key, raw, ex=max(1, math.ceil(ttl_ms / 1000)))
+    return result
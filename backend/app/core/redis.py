@@ -7,7 +7,17 @@ from typing import Any
 
 from redis.asyncio import Redis
 
+from app.core.circuit_state import (
+    CIRCUIT_HISTORY_MAX_ENTRIES,
+    CIRCUIT_HISTORY_TTL_SECONDS,
+    CircuitPolicy,
+    apply_circuit_events,
+    circuit_history_entry,
+    circuit_state_ttl_ms,
+    encode_circuit_state,
+)
 from app.core.config import get_settings
+from app.core.rate_limit import TokenBucketResult, apply_token_bucket
 
 logger = logging.getLogger(__name__)
 
@@ -117,6 +127,76 @@ class MemoryRedis:
         self._remember(key, str(next_value), expires_at)
         return next_value
 
+    async def decr(self, key: str) -> int:
+        self._purge(key)
+        item = self._store.get(key)
+        current = int(item[0]) if item else 0
+        next_value = current - 1
+        expires_at = item[1] if item else None
+        self._remember(key, str(next_value), expires_at)
+        return next_value
+
+    async def token_bucket(
+        self,
+        key: str,
+        *,
+        capacity: float,
+        refill_per_second: float,
+        cost: float,
+        ttl_ms: int,
+        force: bool = False,
+    ) -> TokenBucketResult:
+        # Mirrors TOKEN_BUCKET_SCRIPT; no await between read and write keeps it atomic.
+        self._purge(key)
+        item = self._store.get(key)
+        now = time.time()
+        raw, result = apply_token_bucket(
+            item[0] if item and isinstance(item[0], str) else None,
+            capacity=capacity,
+            refill_per_second=refill_per_second,
+            cost=cost,
+            now=now,
+            force=force,
+        )
+        self._remember(key, raw, now + ttl_ms / 1000)
+        return result
+
+    async def circuit_event(
+        self, *keys: str, event: str, policy: CircuitPolicy
+    ) -> list[Any]:
+        # Mirrors CIRCUIT_EVENT_SCRIPT, including its return shape.
+        state_keys = keys[0::2]
+        now = time.time()
+        raws: list[str | None] = []
+        for state_key in state_keys:
+            self._purge(state_key)
+            item = self._store.get(state_key)
+            raws.append(item[0] if item and isinstance(item[0], str) else None)
+        results = apply_circuit_events(raws, event, now=now, policy=policy)
+        reply: list[Any] = []
+        for state_key, history_key, (state, transition) in zip(
+            state_keys, keys[1::2], results, strict=True
+        ):
+            if state is not None:
+                if state.is_idle:
+                    self._store.pop(state_key, None)
+                else:
+                    expires_at = now + circuit_state_ttl_ms(state, now, policy) / 1000
+                    self._remember(state_key, encode_circuit_state(state), expires_at)
+            if transition.changed:
+                await self.lpush(history_key, circuit_history_entry(transition, now))
+                await self.ltrim(history_key, 0, CIRCUIT_HISTORY_MAX_ENTRIES - 1)
+                await self.expire(history_key, CIRCUIT_HISTORY_TTL_SECONDS)
+            reply.extend(
+                [
+                    transition.previous,
+                    transition.state,
+                    1 if transition.allowed else 0,
+                    transition.reason or "",
+                ]
+            )
+        return reply
+
     async def expire(self, key: str, ttl_seconds: int) -> bool:
         self._purge(key)
         if key not in self._store:
@@ -147,6 +227,9 @@ class MemoryRedis:
                 deleted += 1
         return deleted
 
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
     async def ping(self) -> bool:
         return True
 
@@ -154,6 +237,37 @@ class MemoryRedis:
         self._store.clear()
 
 
+class MemoryPipeline:
+    """Queues commands like a redis-py pipeline and replays them on ``execute``."""
+
+    def __init__(self, redis: Any) -> None:
+        self._redis = redis
+        self._commands: list[tuple[Any, tuple[Any, ...], dict[str, Any]]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._redis, name)
+
+        def queue(*args: Any, **kwargs: Any) -> MemoryPipeline:
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def execute(self) -> list[Any]:
+        commands, self._commands = self._commands, []
+        return [await method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+def redis_pipeline(redis: Any) -> Any:
+    """Return a non-transactional pipeline, replaying sequentially if unsupported."""
+    if hasattr(redis, "pipeline"):
+        return redis.pipeline(transaction=False)
+    return MemoryPipeline(redis)
+
+
 _redis_client: Redis | MemoryRedis | None = None
 
 
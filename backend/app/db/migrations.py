@@ -243,6 +243,49 @@ SCHEMA_MIGRATIONS: tuple[SchemaMigration, ...] = (
             "ALTER TABLE request_logs ADD COLUMN is_cache_hit BOOLEAN DEFAULT FALSE",
         ),
     ),
+    SchemaMigration(
+        migration_id="20260707_api_key_tpm_limit",
+        statements=(
+            "ALTER TABLE api_keys ADD COLUMN tpm_limit INTEGER",
+        ),
+    ),
+    SchemaMigration(
+        migration_id="20260708_factory_key_request_timeout",
+        statements=(
+            "ALTER TABLE factory_access_keys ADD COLUMN request_timeout_seconds FLOAT",
+        ),
+    ),
+    SchemaMigration(
+        migration_id="20260709_request_attempt_retry_decision",
+        statements=(
+            "ALTER TABLE request_attempt_logs ADD COLUMN retry_decision VARCHAR(32)",
+            "ALTER TABLE request_attempt_logs ADD COLUMN retry_delay_ms INTEGER",
+        ),
+    ),
+    SchemaMigration(
+        migration_id="20260710_request_log_routing_strategy",
+        statements=(
+            "ALTER TABLE request_logs ADD COLUMN routing_strategy VARCHAR(32)",
+        ),
+    ),
+    SchemaMigration(
+        migration_id="20260711_request_log_gateway_cache_hit",
+        sqlite_only=(
+            "ALTER TABLE request_logs ADD COLUMN gateway_cache_hit BOOLEAN DEFAULT 0",
+        ),
+        pg_only=(
+            "ALTER TABLE request_logs ADD COLUMN gateway_cache_hit BOOLEAN DEFAULT FALSE",
+        ),
+    ),
+    SchemaMigration(
+        migration_id="20260712_request_log_coalesced",
+        sqlite_only=(
+            "ALTER TABLE request_logs ADD COLUMN coalesced BOOLEAN DEFAULT 0",
+        ),
+        pg_only=(
+            "ALTER TABLE request_logs ADD COLUMN coalesced BOOLEAN DEFAULT FALSE",
+        ),
+    ),
 )
 
 
@@ -55,6 +55,7 @@ class APIKey(Base):
     rule_groups_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     weight: Mapped[int] = mapped_column(Integer, default=1)
     rpm_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    tpm_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
     daily_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
     used_today: Mapped[int] = mapped_column(Integer, default=0)
     used_today_date: Mapped[date | None] = mapped_column(Date, nullable=True)
@@ -159,6 +160,7 @@ class FactoryAccessKey(Base):
     key: Mapped[str] = mapped_column(String(128), unique=True, index=True)
     key_preview: Mapped[str | None] = mapped_column(String(64), nullable=True)
     rule_groups_json: Mapped[str] = mapped_column(Text, default="[]")
+    request_timeout_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
@@ -271,11 +273,14 @@ class RequestLog(Base):
     exposure_format: Mapped[str | None] = mapped_column(
         String(32), index=True, nullable=True
     )
+    routing_strategy: Mapped[str | None] = mapped_column(String(32), nullable=True)
     prompt_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     completion_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     total_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     cached_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     is_cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    gateway_cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    coalesced: Mapped[bool] = mapped_column(Boolean, default=False)
     latency_ms: Mapped[int] = mapped_column(Integer)
     ttft_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     tps: Mapped[float | None] = mapped_column(Float, nullable=True)
@@ -318,6 +323,8 @@ class RequestAttemptLog(Base):
     execution_mode: Mapped[str | None] = mapped_column(String(32), nullable=True)
     agent_node: Mapped[str | None] = mapped_column(String(128), nullable=True)
     upstream_url: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    retry_decision: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    retry_delay_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -16,6 +16,7 @@ from app.core.redis import close_redis
 from app.db.base import Base
 from app.db.migrations import apply_schema_updates
 from app.db.session import engine
+from app.services.access_key_cache import run_access_key_invalidation_listener
 from app.services.background_tasks import safe_create_task
 from app.services.health_monitor import HealthMonitor
 
@@ -58,6 +59,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
         monitor = HealthMonitor()
         app.state.health_monitor = monitor
         app.state.health_task = safe_create_task(monitor.run())
+    app.state.access_key_listener_task = safe_create_task(run_access_key_invalidation_listener())
 
     try:
         yield
@@ -70,6 +72,10 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
             task.cancel()
             with suppress(asyncio.CancelledError):
                 await task
+        listener_task = app.state.access_key_listener_task
+        listener_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener_task
 
         await close_http_client()
         await close_redis()
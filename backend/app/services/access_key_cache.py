@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import logging
+import time
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.services.access_keys import hash_access_key, is_hashed_access_key
+
+logger = logging.getLogger(__name__)
+
+ACCESS_KEY_INVALIDATION_CHANNEL = "factory_access_keys:invalidate"
+# 订阅断开后重连前的等待时间
+_LISTENER_RETRY_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class ResolvedAccessKey:
+    rule_groups: tuple[str, ...]
+    request_timeout_seconds: int | None
+    access_key_id: int | None = None
+
+
+class AccessKeyCache:
+    """Bounded TTL cache from Factory key hash to its resolved rule groups.
+
+    Invalid tokens live in a separate, shorter-lived store so a flood of
+    guessed keys cannot evict the valid ones.
+    """
+
+    def __init__(self) -> None:
+        self.valid: OrderedDict[str, tuple[float, ResolvedAccessKey]] = OrderedDict()
+        self.invalid: OrderedDict[str, float] = OrderedDict()
+        self.generation = 0
+
+    def get(self, token_hash: str) -> tuple[bool, ResolvedAccessKey | None]:
+        """Return ``(hit, entry)``; a hit with no entry means the token is known invalid."""
+        now = time.monotonic()
+        entry = self.valid.get(token_hash)
+        if entry is not None:
+            if entry[0] > now:
+                self.valid.move_to_end(token_hash)
+                return True, entry[1]
+            del self.valid[token_hash]
+        expires_at = self.invalid.get(token_hash)
+        if expires_at is not None:
+            if expires_at > now:
+                return True, None
+            del self.invalid[token_hash]
+        return False, None
+
+    def put(
+        self, token_hash: str, resolved: ResolvedAccessKey | None, *, generation: int
+    ) -> None:
+        """Remember a lookup unless an invalidation happened while it was running."""
+        if generation != self.generation:
+            return
+        settings = get_settings()
+        max_entries = max(int(settings.factory_key_cache_max_entries), 0)
+        if resolved is None:
+            ttl_seconds = settings.factory_key_negative_cache_ttl_seconds
+            store: OrderedDict = self.invalid
+            value: object = time.monotonic() + ttl_seconds
+        else:
+            ttl_seconds = settings.factory_key_cache_ttl_seconds
+            store = self.valid
+            value = (time.monotonic() + ttl_seconds, resolved)
+        if ttl_seconds <= 0 or max_entries == 0:
+            return
+        store.pop(token_hash, None)
+        store[token_hash] = value
+        while len(store) > max_entries:
+            store.popitem(last=False)
+
+    def discard(self, token_hash: str | None = None) -> None:
+        """Drop one key hash, or everything when no hash is given."""
+        self.generation += 1
+        if token_hash is None:
+            self.valid.clear()
+            self.invalid.clear()
+            return
+        self.valid.pop(token_hash, None)
+        self.invalid.pop(token_hash, None)
+
+
+_access_key_cache = AccessKeyCache()
+
+
+def get_access_key_cache() -> AccessKeyCache:
+    return _access_key_cache
+
+
+def reset_access_key_cache() -> None:
+    _access_key_cache.valid.clear()
+    _access_key_cache.invalid.clear()
+    _access_key_cache.generation = 0
+
+
+def stored_key_hash(stored_key: str) -> str:
+    """Cache key for a ``FactoryAccessKey.key`` column, which may still hold a legacy raw key."""
+    return stored_key if is_hashed_access_key(stored_key) else hash_access_key(stored_key)
+
+
+async def invalidate_access_key(redis, stored_key: str) -> None:  # noqa: ANN001
+    """Drop a Factory key locally and tell the other workers to do the same."""
+    token_hash = stored_key_hash(stored_key)
+    _access_key_cache.discard(token_hash)
+    if not hasattr(redis, "publish"):
+        return
+    try:
+        await redis.publish(ACCESS_KEY_INVALIDATION_CHANNEL, token_hash)
+    except Exception as exc:
+        logger.warning("Failed to publish factory key invalidation: %s", exc)
+
+
+async def run_access_key_invalidation_listener() -> None:
+    """Apply invalidations published by other workers until cancelled.
+
+    The in-memory Redis fallback is single-process, so there is nothing to
+    subscribe to. After a dropped subscription the whole cache is cleared,
+    since messages sent in the gap are lost.
+    """
+    redis = await get_redis()
+    if not hasattr(redis, "pubsub"):
+        return
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(ACCESS_KEY_INVALIDATION_CHANNEL)
+            _access_key_cache.discard()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message.get("data")
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                _access_key_cache.discard(str(data) if data else None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Factory key invalidation subscription dropped: %s", exc)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+        await asyncio.sleep(_LISTENER_RETRY_SECONDS)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import bisect
+from collections.abc import Mapping
+from functools import lru_cache
+import hashlib
+import json
+import math
+
+AFFINITY_VIRTUAL_NODES = 64
+# 权重只放大虚拟节点数到这个倍数，避免大权重 Key 生成过大的环
+AFFINITY_MAX_WEIGHT_SCALE = 16
+AFFINITY_RING_CACHE_SIZE = 256
+
+_SYSTEM_FIELDS = ("system", "instructions", "systemInstruction", "system_instruction")
+_MESSAGE_FIELDS = ("messages", "input", "contents")
+_SYSTEM_ROLES = frozenset({"system", "developer"})
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def _early_messages(messages: object) -> object:
+    """System messages plus the first conversational turn, which stay fixed as a chat grows."""
+    if not isinstance(messages, list):
+        return messages
+    early: list[object] = []
+    for message in messages:
+        early.append(message)
+        role = message.get("role") if isinstance(message, dict) else None
+        if role not in _SYSTEM_ROLES:
+            break
+    return early
+
+
+def prompt_affinity_key(
+    session_id: str | None, payload: Mapping[str, object], prefix_bytes: int = 4096
+) -> str | None:
+    """Stable routing key: the session when the client sent one, else a prompt-prefix hash."""
+    if session_id:
+        return f"session:{session_id}"
+    prefix = {
+        field: payload[field] for field in _SYSTEM_FIELDS if payload.get(field) is not None
+    }
+    for field in _MESSAGE_FIELDS:
+        if payload.get(field) is not None:
+            prefix[field] = _early_messages(payload[field])
+    if not prefix or prefix_bytes <= 0:
+        return None
+    serialized = json.dumps(
+        prefix, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str
+    ).encode()
+    return "prefix:" + hashlib.blake2b(serialized[:prefix_bytes], digest_size=16).hexdigest()
+
+
+@lru_cache(maxsize=AFFINITY_RING_CACHE_SIZE)
+def _ring(members: tuple[tuple[int, int], ...]) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    points = sorted(
+        (_point(f"{key_id}#{replica}"), key_id)
+        for key_id, weight in members
+        for replica in range(AFFINITY_VIRTUAL_NODES * min(weight, AFFINITY_MAX_WEIGHT_SCALE))
+    )
+    return tuple(point for point, _ in points), tuple(key_id for _, key_id in points)
+
+
+def affinity_order(
+    key_weights: Mapping[int, int],
+    affinity_key: str,
+    loads: Mapping[int, int],
+    load_factor: float,
+) -> list[int]:
+    """Consistent hashing with bounded loads.
+
+    Keys are visited clockwise from the affinity key's point on the ring. A key
+    whose in-flight count already exceeds ``load_factor`` times its weighted
+    share is moved behind the keys that still have room.
+    """
+    if not key_weights:
+        return []
+    members = tuple(sorted((key_id, max(weight, 1)) for key_id, weight in key_weights.items()))
+    points, owners = _ring(members)
+    start = bisect.bisect(points, _point(affinity_key))
+    walk: list[int] = []
+    seen: set[int] = set()
+    for offset in range(len(owners)):
+        key_id = owners[(start + offset) % len(owners)]
+        if key_id in seen:
+            continue
+        seen.add(key_id)
+        walk.append(key_id)
+        if len(walk) == len(members):
+            break
+
+    total_weight = sum(weight for _, weight in members)
+    total_load = sum(loads.get(key_id, 0) for key_id, _ in members)
+    factor = max(load_factor, 1.0)
+
+    weights = dict(members)
+    with_room: list[int] = []
+    overloaded: list[int] = []
+    for key_id in walk:
+        capacity = math.ceil(factor * (total_load + 1) * weights[key_id] / total_weight)
+        if loads.get(key_id, 0) < capacity:
+            with_room.append(key_id)
+        else:
+            overloaded.append(key_id)
+    return with_room + overloaded
@@ -17,6 +17,7 @@ class AgentRequest:
     headers: dict[str, str]
     body: bytes
     stream: bool
+    timeout_seconds: float | None = None
 
 
 @dataclass(frozen=True)
@@ -39,6 +40,7 @@ class AgentStream:
     request_id: str
     idle_timeout_seconds: float | None = None
     on_idle_timeout: Callable[[], None] | None = None
+    on_close: Callable[[], None] | None = None
     status_code: int | None = None
     headers: dict[str, str] = field(default_factory=dict)
     _queue: asyncio.Queue[bytes | AgentStreamError | None] = field(
@@ -72,6 +74,12 @@ class AgentStream:
                 raise chunk
             yield chunk
 
+    async def aclose(self) -> None:
+        """Stop listening for this stream; later agent messages are dropped."""
+        if self.on_close:
+            self.on_close()
+        self._queue.put_nowait(None)
+
     async def read_all(self) -> bytes:
         chunks = []
         async for chunk in self.iter_bytes():
@@ -173,17 +181,23 @@ class AgentManager:
             "body": base64.b64encode(request.body).decode("utf-8"),
             "stream": request.stream,
         }
+        request_timeout = self._request_timeout()
+        if request.timeout_seconds is not None:
+            # Agents abort their upstream call once the caller's deadline passes.
+            payload["timeout_ms"] = max(1, int(request.timeout_seconds * 1000))
+            request_timeout = min(request_timeout, max(0.001, request.timeout_seconds))
 
         if request.stream:
             stream = AgentStream(
                 request_id=request_id,
                 idle_timeout_seconds=self._stream_idle_timeout(),
                 on_idle_timeout=lambda: connection.pending.pop(request_id, None),
+                on_close=lambda: connection.pending.pop(request_id, None),
             )
             connection.pending[request_id] = stream
             try:
                 await connection.send(payload)
-                await asyncio.wait_for(stream.wait_started(), timeout=self._request_timeout())
+                await asyncio.wait_for(stream.wait_started(), timeout=request_timeout)
                 return stream
             except asyncio.TimeoutError as exc:
                 connection.pending.pop(request_id, None)
@@ -199,7 +213,7 @@ class AgentManager:
         connection.pending[request_id] = future
         try:
             await connection.send(payload)
-            return await asyncio.wait_for(future, timeout=self._request_timeout())
+            return await asyncio.wait_for(future, timeout=request_timeout)
         except asyncio.TimeoutError as exc:
             connection.pending.pop(request_id, None)
             if not future.done():
@@ -207,6 +207,15 @@ async def _send_error(
     )
 
 
+def _request_deadline_seconds(payload: dict[str, Any]) -> float | None:
+    timeout_ms = payload.get("timeout_ms")
+    if isinstance(timeout_ms, bool) or not isinstance(timeout_ms, (int, float)):
+        return None
+    if timeout_ms <= 0:
+        return None
+    return timeout_ms / 1000
+
+
 async def handle_proxy_request(
     payload: dict[str, Any],
     client: AsyncClient,
@@ -232,52 +241,57 @@ async def handle_proxy_request(
         headers = {}
     body = _decode_body(payload.get("body"))
     stream = bool(payload.get("stream"))
+    deadline_seconds = _request_deadline_seconds(payload)
     response: Response | None = None
     response_started = False
 
     try:
-        if stream:
-            stream_timeout = Timeout(
-                settings.http_timeout_seconds,
-                read=settings.agent_upstream_read_timeout_seconds,
-            )
-            request_obj = client.build_request(
+        async with asyncio.timeout(deadline_seconds) as deadline:
+            if stream:
+                stream_timeout = Timeout(
+                    settings.http_timeout_seconds,
+                    read=settings.agent_upstream_read_timeout_seconds,
+                )
+                request_obj = client.build_request(
+                    method,
+                    url,
+                    headers=headers,
+                    content=body,
+                    timeout=stream_timeout,
+                )
+                response = await client.send(request_obj, stream=True)
+                await send(
+                    {
+                        "type": "proxy_response",
+                        "request_id": request_id,
+                        "status_code": response.status_code,
+                        "headers": dict(response.headers),
+                    }
+                )
+                response_started = True
+                async for chunk in response.aiter_bytes():
+                    if chunk:
+                        await send(
+                            {
+                                "type": "proxy_stream",
+                                "request_id": request_id,
+                                "data": _encode_body(chunk),
+                            }
+                        )
+                        # The gateway commits a stream once data arrives, so
+                        # the deadline only bounds the wait for the first chunk.
+                        deadline.reschedule(None)
+                await send({"type": "proxy_stream_end", "request_id": request_id})
+                return
+
+            response = await client.request(
                 method,
                 url,
                 headers=headers,
                 content=body,
-                timeout=stream_timeout,
+                timeout=settings.http_timeout_seconds,
             )
-            response = await client.send(request_obj, stream=True)
-            await send(
-                {
-                    "type": "proxy_response",
-                    "request_id": request_id,
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                }
-            )
-            response_started = True
-            async for chunk in response.aiter_bytes():
-                if chunk:
-                    await send(
-                        {
-                            "type": "proxy_stream",
-                            "request_id": request_id,
-                            "data": _encode_body(chunk),
-                        }
-                    )
-            await send({"type": "proxy_stream_end", "request_id": request_id})
-            return
-
-        response = await client.request(
-            method,
-            url,
-            headers=headers,
-            content=body,
-            timeout=settings.http_timeout_seconds,
-        )
-        content = await response.aread()
+            content = await response.aread()
         await send(
             {
                 "type": "proxy_response",
@@ -287,8 +301,9 @@ async def handle_proxy_request(
                 "body": _encode_body(content),
             }
         )
-    except HTTPError as exc:
-        error_type = type(exc).__name__
+    except (HTTPError, TimeoutError) as exc:
+        deadline_exceeded = isinstance(exc, TimeoutError)
+        error_type = "deadline_exceeded" if deadline_exceeded else type(exc).__name__
         logger.warning(
             "Agent upstream request failed request_id=%s error_type=%s stream=%s",
             request_id,
@@ -300,9 +315,11 @@ async def handle_proxy_request(
                 {
                     "type": "proxy_response",
                     "request_id": request_id,
-                    "status_code": 502,
+                    "status_code": 504 if deadline_exceeded else 502,
                     "headers": {},
-                    "body": _encode_body(b"upstream_error"),
+                    "body": _encode_body(
+                        b"deadline_exceeded" if deadline_exceeded else b"upstream_error"
+                    ),
                 }
             )
         if stream:
@@ -11,6 +11,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Agent
+from app.services.routing_snapshot import invalidate_local_routing_snapshot
 
 
 @dataclass(frozen=True)
@@ -144,6 +145,7 @@ async def upsert_agent(
         session.add(agent)
         await session.commit()
         await session.refresh(agent)
+        invalidate_local_routing_snapshot()
         return agent
 
     if region is not None:
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
@@ -23,6 +24,15 @@ def _usage_int(value: Any) -> int | None:
     return None
 
 
+@dataclass(frozen=True)
+class UsageShare:
+    """One caller's part of an upstream call that served several callers."""
+
+    request_id: str
+    trace_id: str
+    weight: int
+
+
 @dataclass(frozen=True)
 class RequestMetrics:
     request_id: str
@@ -44,6 +54,10 @@ class RequestMetrics:
     agent_node: str | None = None
     upstream_url: str | None = None
     exposure_format: str = "any"
+    routing_strategy: str | None = None
+    gateway_cache_hit: bool = False
+    coalesced: bool = False
+    usage_shares: tuple[UsageShare, ...] = ()
 
 
 @dataclass(frozen=True)
@@ -64,6 +78,8 @@ class RequestAttemptMetrics:
     agent_node: str | None = None
     upstream_url: str | None = None
     exposure_format: str = "any"
+    retry_decision: str | None = None
+    retry_delay_ms: int | None = None
 
 
 def extract_usage(
@@ -153,31 +169,46 @@ def _extract_cached_tokens(payload: dict[str, Any], usage: dict[str, Any]) -> in
     return _usage_int(cached_tokens)
 
 
+def apportion_tokens(total: int | None, weights: Sequence[int]) -> list[int | None]:
+    """Split ``total`` by ``weights``; the rounding remainder goes to the last share."""
+    if total is None:
+        return [None] * len(weights)
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+    shares: list[int | None] = [total * weight // weight_sum for weight in weights]
+    shares[-1] = total - sum(shares[:-1])  # type: ignore[arg-type]
+    return shares
+
+
 async def write_request_log(metrics: RequestMetrics) -> None:
+    shares = metrics.usage_shares or (
+        UsageShare(request_id=metrics.request_id, trace_id=metrics.trace_id, weight=1),
+    )
+    weights = [share.weight for share in shares]
     async with SessionLocal() as session:
-        log = RequestLog(
-            request_id=metrics.request_id,
-            trace_id=metrics.trace_id,
-            model_alias=metrics.model_alias,
-            endpoint_id=metrics.endpoint_id,
-            api_key_id=metrics.api_key_id,
-            requested_rule_group=metrics.requested_rule_group,
-            rule_group=metrics.rule_group,
-            exposure_format=metrics.exposure_format,
-            prompt_tokens=metrics.prompt_tokens,
-            completion_tokens=metrics.completion_tokens,
-            total_tokens=metrics.total_tokens,
-            cached_tokens=metrics.cached_tokens,
-            is_cache_hit=bool((metrics.cached_tokens or 0) > 0),
-            latency_ms=metrics.latency_ms,
-            ttft_ms=metrics.ttft_ms,
-            tps=metrics.tps,
-            status_code=metrics.status_code,
-            execution_mode=metrics.execution_mode,
-            agent_node=metrics.agent_node,
-            upstream_url=metrics.upstream_url,
-        )
-        session.add(log)
+        for share, prompt_tokens, completion_tokens, total_tokens, cached_tokens in zip(
+            shares,
+            apportion_tokens(metrics.prompt_tokens, weights),
+            apportion_tokens(metrics.completion_tokens, weights),
+            apportion_tokens(metrics.total_tokens, weights),
+            apportion_tokens(metrics.cached_tokens, weights),
+            strict=True,
+        ):
+            session.add(
+                _request_log(
+                    metrics,
+                    share,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    total_tokens=total_tokens,
+                    cached_tokens=cached_tokens,
+                )
+            )
+        if metrics.gateway_cache_hit or metrics.coalesced:
+            await session.commit()
+            return
 
         tokens = metrics.total_tokens
         if tokens is None:
@@ -202,6 +233,42 @@ async def write_request_log(metrics: RequestMetrics) -> None:
         await session.commit()
 
 
+def _request_log(
+    metrics: RequestMetrics,
+    share: UsageShare,
+    *,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    total_tokens: int | None,
+    cached_tokens: int | None,
+) -> RequestLog:
+    return RequestLog(
+        request_id=share.request_id,
+        trace_id=share.trace_id,
+        model_alias=metrics.model_alias,
+        endpoint_id=metrics.endpoint_id,
+        api_key_id=metrics.api_key_id,
+        requested_rule_group=metrics.requested_rule_group,
+        rule_group=metrics.rule_group,
+        exposure_format=metrics.exposure_format,
+        routing_strategy=metrics.routing_strategy,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        cached_tokens=cached_tokens,
+        is_cache_hit=bool((cached_tokens or 0) > 0),
+        gateway_cache_hit=metrics.gateway_cache_hit,
+        coalesced=metrics.coalesced,
+        latency_ms=metrics.latency_ms,
+        ttft_ms=metrics.ttft_ms,
+        tps=metrics.tps,
+        status_code=metrics.status_code,
+        execution_mode=metrics.execution_mode,
+        agent_node=metrics.agent_node,
+        upstream_url=metrics.upstream_url,
+    )
+
+
 async def write_request_attempt_log(metrics: RequestAttemptMetrics) -> None:
     async with SessionLocal() as session:
         log = RequestAttemptLog(
@@ -221,6 +288,8 @@ async def write_request_attempt_log(metrics: RequestAttemptMetrics) -> None:
             execution_mode=metrics.execution_mode,
             agent_node=metrics.agent_node,
             upstream_url=metrics.upstream_url,
+            retry_decision=metrics.retry_decision,
+            retry_delay_ms=metrics.retry_delay_ms,
         )
         session.add(log)
         await session.commit()
@@ -1,7 +1,22 @@
 from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import math
+import time
 
 from redis.asyncio import Redis
 
+from app.core.circuit_state import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HISTORY_MAX_ENTRIES,
+    CIRCUIT_OPEN,
+    CircuitPolicy,
+    CircuitTransition,
+    circuit_event_command,
+    decode_circuit_state,
+    parse_circuit_result,
+    run_circuit_event,
+)
 from app.core.config import Settings, get_settings
 from app.services.notifications import AlertPolicyStore
 from app.services.telegram import TelegramNotifier
@@ -12,9 +27,40 @@ class CircuitStatus:
     state: str
     failures: int
     ttl_seconds: int | None
+    trips: int = 0
+    window_requests: int = 0
+    window_error_rate: float | None = None
+
+
+@dataclass(frozen=True)
+class CircuitHistoryEntry:
+    from_state: str
+    to_state: str
+    reason: str | None
+    at: datetime
+
+
+CIRCUIT_SCOPE_ENDPOINT = "endpoint"
+CIRCUIT_SCOPE_KEY = "key"
+CIRCUIT_SCOPE_MODEL = "model"
+
+
+@dataclass(frozen=True)
+class CircuitScope:
+    kind: str
+    state_key: str
+    history_key: str
+    label: str
 
 
 class CircuitBreaker:
+    """Per-scope circuit breaker.
+
+    Candidates are guarded at three scopes: the upstream endpoint, the API key
+    and the (API key, real model) pair. Failures are recorded at the narrowest
+    scope that explains them, successes close every scope of the candidate.
+    """
+
     def __init__(
         self,
         redis: Redis,
@@ -25,75 +71,233 @@ class CircuitBreaker:
         resolved_settings = settings or get_settings()
         self.redis = redis
         self.notifier = notifier
-        self.failures_threshold = resolved_settings.circuit_breaker_failures
-        self.ttl_seconds = resolved_settings.circuit_breaker_ttl_seconds
+        self.policy = CircuitPolicy.from_settings(resolved_settings)
         self._alert_store = alert_store
 
     def _state_key(self, api_key_id: int) -> str:
         return f"circuit:{api_key_id}:state"
 
-    def _fail_key(self, api_key_id: int) -> str:
-        return f"circuit:{api_key_id}:failures"
+    def _history_key(self, api_key_id: int) -> str:
+        return f"circuit:{api_key_id}:history"
 
-    def _decode(self, value: str | bytes | None) -> str | None:
-        if value is None:
-            return None
-        if isinstance(value, bytes):
-            return value.decode("utf-8")
-        return value
+    def key_scope(self, api_key_id: int) -> CircuitScope:
+        return CircuitScope(
+            kind=CIRCUIT_SCOPE_KEY,
+            state_key=self._state_key(api_key_id),
+            history_key=self._history_key(api_key_id),
+            label=f"api_key_id={api_key_id}",
+        )
+
+    def scopes_for(
+        self,
+        api_key_id: int,
+        *,
+        endpoint_id: int | None = None,
+        real_model: str | None = None,
+    ) -> list[CircuitScope]:
+        scopes: list[CircuitScope] = []
+        if endpoint_id is not None:
+            prefix = f"circuit:endpoint:{endpoint_id}"
+            scopes.append(
+                CircuitScope(
+                    kind=CIRCUIT_SCOPE_ENDPOINT,
+                    state_key=f"{prefix}:state",
+                    history_key=f"{prefix}:history",
+                    label=f"endpoint_id={endpoint_id}",
+                )
+            )
+        scopes.append(self.key_scope(api_key_id))
+        if real_model:
+            prefix = f"circuit:{api_key_id}:model:{real_model}"
+            scopes.append(
+                CircuitScope(
+                    kind=CIRCUIT_SCOPE_MODEL,
+                    state_key=f"{prefix}:state",
+                    history_key=f"{prefix}:history",
+                    label=f"api_key_id={api_key_id} model={real_model}",
+                )
+            )
+        return scopes
+
+    def candidate_scopes(self, candidate) -> list[CircuitScope]:  # noqa: ANN001
+        """Scopes guarding anything with ``api_key``, ``endpoint`` and ``real_model``."""
+        endpoint = getattr(candidate, "endpoint", None)
+        return self.scopes_for(
+            candidate.api_key.id,
+            endpoint_id=getattr(endpoint, "id", None),
+            real_model=getattr(candidate, "real_model", None),
+        )
 
     async def is_available(self, api_key_id: int) -> bool:
-        state = self._decode(await self.redis.get(self._state_key(api_key_id)))
-        return state != "open"
+        state = decode_circuit_state(await self.redis.get(self._state_key(api_key_id)))
+        return state.admits_trial(time.time(), self.policy)
+
+    def state_keys(self, api_key_ids: list[int]) -> list[str]:
+        return [self._state_key(api_key_id) for api_key_id in api_key_ids]
+
+    def route_states(
+        self, state_keys: list[str], states: list[str | bytes | None]
+    ) -> dict[str, str]:
+        """Map raw circuit documents to closed/half_open/open for routing.
+
+        A half-open circuit whose trial permits are all taken reports ``open``.
+        """
+        now = time.time()
+        route_states: dict[str, str] = {}
+        for state_key, raw in zip(state_keys, states, strict=False):
+            state = decode_circuit_state(raw)
+            if not state.admits_trial(now, self.policy):
+                route_states[state_key] = CIRCUIT_OPEN
+            else:
+                route_states[state_key] = state.effective_state(now)
+        return route_states
+
+    async def scope_states(self, scopes: list[CircuitScope]) -> dict[str, str]:
+        state_keys = list(dict.fromkeys(scope.state_key for scope in scopes))
+        if not state_keys:
+            return {}
+        return self.route_states(state_keys, await self.redis.mget(state_keys))
 
     async def are_available(self, api_key_ids: list[int]) -> dict[int, bool]:
         unique_ids = list(dict.fromkeys(api_key_ids))
         if not unique_ids:
             return {}
-        keys = [self._state_key(api_key_id) for api_key_id in unique_ids]
-        states = await self.redis.mget(keys)
+        state_keys = self.state_keys(unique_ids)
+        states = self.route_states(state_keys, await self.redis.mget(state_keys))
         return {
-            api_key_id: self._decode(state) != "open"
-            for api_key_id, state in zip(unique_ids, states, strict=False)
+            api_key_id: states[state_key] != CIRCUIT_OPEN
+            for api_key_id, state_key in zip(unique_ids, state_keys, strict=True)
         }
 
     async def get_state(self, api_key_id: int) -> str | None:
-        return self._decode(await self.redis.get(self._state_key(api_key_id)))
+        raw = await self.redis.get(self._state_key(api_key_id))
+        if raw is None:
+            return None
+        return decode_circuit_state(raw).effective_state(time.time())
+
+    def _status_from_raw(self, raw: str | bytes | None) -> CircuitStatus:
+        now = time.time()
+        state = decode_circuit_state(raw)
+        effective = state.effective_state(now)
+        ttl_seconds = None
+        if effective == CIRCUIT_OPEN and math.isfinite(state.open_until):
+            ttl_seconds = max(math.ceil(state.open_until - now), 0)
+        requests, errors = state.window_totals(now, self.policy)
+        return CircuitStatus(
+            state=effective,
+            failures=state.failures,
+            ttl_seconds=ttl_seconds,
+            trips=state.trips,
+            window_requests=requests,
+            window_error_rate=errors / requests if requests else None,
+        )
 
     async def get_status(self, api_key_id: int) -> CircuitStatus:
-        state = self._decode(await self.redis.get(self._state_key(api_key_id)))
-        failures_raw = self._decode(await self.redis.get(self._fail_key(api_key_id)))
-        failures = int(failures_raw or 0)
-        state_value = "open" if state == "open" else "closed"
+        return self._status_from_raw(await self.redis.get(self._state_key(api_key_id)))
 
-        ttl_key = self._state_key(api_key_id) if state == "open" else self._fail_key(api_key_id)
-        ttl_value = await self.redis.ttl(ttl_key)
-        ttl_seconds = ttl_value if ttl_value >= 0 else None
+    async def get_statuses(self, api_key_ids: list[int]) -> dict[int, CircuitStatus]:
+        unique_ids = list(dict.fromkeys(api_key_ids))
+        if not unique_ids:
+            return {}
+        states = await self.redis.mget(self.state_keys(unique_ids))
+        return {
+            api_key_id: self._status_from_raw(raw)
+            for api_key_id, raw in zip(unique_ids, states, strict=False)
+        }
+
+    async def get_history(
+        self, api_key_id: int, limit: int = CIRCUIT_HISTORY_MAX_ENTRIES
+    ) -> list[CircuitHistoryEntry]:
+        entries: list[CircuitHistoryEntry] = []
+        for raw in await self.redis.lrange(self._history_key(api_key_id), 0, limit - 1):
+            try:
+                item = json.loads(raw)
+                entries.append(
+                    CircuitHistoryEntry(
+                        from_state=str(item["from"]),
+                        to_state=str(item["to"]),
+                        reason=str(item.get("reason") or "") or None,
+                        at=datetime.fromtimestamp(float(item["at"]), tz=timezone.utc),
+                    )
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+        return entries
+
+    @staticmethod
+    def _scope_keys(scopes: list[CircuitScope]) -> list[str]:
+        return [key for scope in scopes for key in (scope.state_key, scope.history_key)]
+
+    async def _run(self, scopes: list[CircuitScope], event: str) -> list[CircuitTransition]:
+        return await run_circuit_event(self.redis, self._scope_keys(scopes), event, self.policy)
 
-        return CircuitStatus(state=state_value, failures=failures, ttl_seconds=ttl_seconds)
+    async def acquire_trial(self, scopes: list[CircuitScope]) -> bool:
+        """Take a half-open trial permit in every scope, or in none of them."""
+        if not scopes:
+            return True
+        transitions = await self._run(scopes, "acquire")
+        return all(transition.allowed for transition in transitions)
 
     async def record_failure(self, api_key_id: int) -> None:
-        fail_key = self._fail_key(api_key_id)
-        count = await self.redis.incr(fail_key)
-        await self.redis.expire(fail_key, self.ttl_seconds)
-        if count >= self.failures_threshold:
-            opened = await self.redis.set(
-                self._state_key(api_key_id), "open", ex=self.ttl_seconds, nx=True
-            )
-            if opened and self.notifier and await self._should_notify("circuit_open"):
-                await self.notifier.send_message(
-                    f"Circuit open for api_key_id={api_key_id} after {count} failures"
-                )
+        await self._record_scope_failure(self.key_scope(api_key_id))
 
-    async def record_success(self, api_key_id: int) -> None:
-        state = self._decode(await self.redis.get(self._state_key(api_key_id)))
-        await self.redis.delete(self._fail_key(api_key_id))
-        await self.redis.delete(self._state_key(api_key_id))
-        if state == "open" and self.notifier and await self._should_notify("circuit_recovered"):
+    async def record_candidate_failure(
+        self, candidate, scope: str = CIRCUIT_SCOPE_KEY  # noqa: ANN001
+    ) -> None:
+        scopes = {item.kind: item for item in self.candidate_scopes(candidate)}
+        await self._record_scope_failure(scopes.get(scope) or scopes[CIRCUIT_SCOPE_KEY])
+
+    async def _record_scope_failure(self, scope: CircuitScope) -> None:
+        (transition,) = await self._run([scope], "failure")
+        if (
+            transition.changed
+            and transition.previous == CIRCUIT_CLOSED
+            and self.notifier
+            and await self._should_notify("circuit_open")
+        ):
             await self.notifier.send_message(
-                f"Circuit recovered for api_key_id={api_key_id}"
+                f"Circuit open for {scope.label} ({transition.reason})"
             )
 
+    def queue_success(self, pipe, scopes: list[CircuitScope]) -> bool:  # noqa: ANN001
+        """Queue the atomic success event for ``scopes`` on ``pipe``.
+
+        Returns ``False`` when the client cannot queue it; call
+        ``record_scope_success`` instead. The queued result goes to ``finish_success``.
+        """
+        command = circuit_event_command(
+            self.redis, self._scope_keys(scopes), "success", self.policy
+        )
+        if command is None:
+            return False
+        name, args, kwargs = command
+        getattr(pipe, name)(*args, **kwargs)
+        return True
+
+    async def record_success(self, api_key_id: int) -> None:
+        await self.record_scope_success([self.key_scope(api_key_id)])
+
+    async def record_candidate_success(self, candidate) -> None:  # noqa: ANN001
+        await self.record_scope_success(self.candidate_scopes(candidate))
+
+    async def record_scope_success(self, scopes: list[CircuitScope]) -> None:
+        await self._notify_success(scopes, await self._run(scopes, "success"))
+
+    async def finish_success(self, scopes: list[CircuitScope], result: object) -> None:
+        await self._notify_success(scopes, parse_circuit_result(result))
+
+    async def _notify_success(
+        self, scopes: list[CircuitScope], transitions: list[CircuitTransition]
+    ) -> None:
+        for scope, transition in zip(scopes, transitions, strict=False):
+            if (
+                transition.changed
+                and transition.state == CIRCUIT_CLOSED
+                and self.notifier
+                and await self._should_notify("circuit_recovered")
+            ):
+                await self.notifier.send_message(f"Circuit recovered for {scope.label}")
+
     async def _should_notify(self, event: str) -> bool:
         if not self.notifier:
             return False
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+import json
+import logging
+import os
+import socket
+import time
+from typing import TYPE_CHECKING
+
+from app.core.config import get_settings
+from app.core.redis import redis_pipeline
+from app.services.billing import RequestAttemptMetrics
+from app.services.inflight import get_local_inflight, wait_for_release
+
+if TYPE_CHECKING:
+    from app.services.router import RouteCandidate
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY_STATE_PREFIX = "route:concurrency"
+CONCURRENCY_WORKERS_KEY = f"{CONCURRENCY_STATE_PREFIX}:workers"
+CONCURRENCY_WORKERS_MAX = 64
+CONCURRENCY_PUBLISH_SECONDS = 5.0
+CONCURRENCY_SHARED_TTL_SECONDS = 60
+# 上游过载时成倍收缩，延迟漂移时小幅回退
+CONCURRENCY_OVERLOAD_RATIO = 0.5
+CONCURRENCY_LATENCY_BACKOFF_RATIO = 0.9
+CONCURRENCY_LATENCY_TOLERANCE = 2.0
+CONCURRENCY_BASELINE_ALPHA = 0.05
+_OVERLOAD_STATUSES = frozenset({429, 503})
+_OVERLOAD_REASONS = frozenset({"first_byte_timeout"})
+
+
+@dataclass
+class AdaptiveLimit:
+    limit: float
+    baseline_ms: float | None = None
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_key(worker_id: str) -> str:
+    return f"{CONCURRENCY_STATE_PREFIX}:{worker_id}"
+
+
+class ConcurrencyLimiter:
+    """AIMD concurrency limit per key, learned from this worker's own traffic."""
+
+    def __init__(self) -> None:
+        self.limits: dict[int, AdaptiveLimit] = {}
+        self._published_at = 0.0
+
+    def _bounds(self) -> tuple[float, float]:
+        settings = get_settings()
+        floor = max(float(settings.adaptive_concurrency_min_limit), 1.0)
+        return floor, max(float(settings.adaptive_concurrency_max_limit), floor)
+
+    def _state(self, api_key_id: int) -> AdaptiveLimit:
+        state = self.limits.get(api_key_id)
+        if state is None:
+            floor, ceiling = self._bounds()
+            initial = float(get_settings().adaptive_concurrency_initial_limit)
+            state = AdaptiveLimit(limit=min(max(initial, floor), ceiling))
+            self.limits[api_key_id] = state
+        return state
+
+    def limit(self, api_key_id: int) -> int | None:
+        if not get_settings().adaptive_concurrency_enabled:
+            return None
+        return int(self._state(api_key_id).limit)
+
+    def is_saturated(self, api_key_id: int) -> bool:
+        limit = self.limit(api_key_id)
+        if limit is None:
+            return False
+        return get_local_inflight([api_key_id])[api_key_id] >= limit
+
+    def prefer_unsaturated(self, candidates: Sequence[RouteCandidate]) -> list[RouteCandidate]:
+        """Keep the strategy order but move keys at their limit to the back."""
+        if not get_settings().adaptive_concurrency_enabled:
+            return list(candidates)
+        open_slots: list[RouteCandidate] = []
+        saturated: list[RouteCandidate] = []
+        for candidate in candidates:
+            if self.is_saturated(candidate.api_key.id):
+                saturated.append(candidate)
+            else:
+                open_slots.append(candidate)
+        return open_slots + saturated
+
+    async def acquire_slot(self, api_key_id: int, wait_seconds: float = 0.0) -> bool:
+        """Whether the key has room now or frees a slot within ``wait_seconds``."""
+        deadline = time.monotonic() + max(wait_seconds, 0.0)
+        while self.is_saturated(api_key_id):
+            if not await wait_for_release(api_key_id, deadline - time.monotonic()):
+                return False
+        return True
+
+    def observe(self, metrics: RequestAttemptMetrics) -> None:
+        if not get_settings().adaptive_concurrency_enabled:
+            return
+        if metrics.outcome == "success":
+            self._on_latency(metrics.api_key_id, float(metrics.latency_ms))
+        elif (
+            metrics.status_code in _OVERLOAD_STATUSES
+            or metrics.failure_reason in _OVERLOAD_REASONS
+        ):
+            state = self._state(metrics.api_key_id)
+            floor, _ = self._bounds()
+            state.limit = max(floor, state.limit * CONCURRENCY_OVERLOAD_RATIO)
+
+    def _on_latency(self, api_key_id: int, latency_ms: float) -> None:
+        state = self._state(api_key_id)
+        floor, ceiling = self._bounds()
+        baseline = state.baseline_ms
+        if baseline is not None and latency_ms > baseline * CONCURRENCY_LATENCY_TOLERANCE:
+            state.limit = max(floor, state.limit * CONCURRENCY_LATENCY_BACKOFF_RATIO)
+        elif get_local_inflight([api_key_id])[api_key_id] * 2 >= state.limit:
+            # Only grow while the limit is actually being used.
+            state.limit = min(ceiling, state.limit + 1.0)
+        state.baseline_ms = (
+            latency_ms
+            if baseline is None
+            else baseline + CONCURRENCY_BASELINE_ALPHA * (latency_ms - baseline)
+        )
+
+    def snapshot(self) -> dict[int, int]:
+        return {api_key_id: int(state.limit) for api_key_id, state in self.limits.items()}
+
+    async def publish_if_due(self, redis) -> None:  # noqa: ANN001
+        settings = get_settings()
+        if (
+            redis is None
+            or not settings.adaptive_concurrency_enabled
+            or not settings.adaptive_concurrency_redis_enabled
+            or not self.limits
+        ):
+            return
+        now = time.monotonic()
+        if now - self._published_at < CONCURRENCY_PUBLISH_SECONDS:
+            return
+        self._published_at = now
+        worker_id = _worker_id()
+        try:
+            pipe = redis_pipeline(redis)
+            pipe.set(
+                _worker_key(worker_id),
+                json.dumps(self.snapshot(), separators=(",", ":")),
+                ex=CONCURRENCY_SHARED_TTL_SECONDS,
+            )
+            pipe.lpush(CONCURRENCY_WORKERS_KEY, worker_id)
+            pipe.ltrim(CONCURRENCY_WORKERS_KEY, 0, CONCURRENCY_WORKERS_MAX - 1)
+            await pipe.execute()
+        except Exception as exc:
+            logger.warning("Failed to publish concurrency limits: %s", exc)
+
+
+async def read_shared_concurrency_limits(  # noqa: ANN001
+    redis, api_key_ids: list[int]
+) -> dict[int, int] | None:
+    """Sum of every live worker's limit per key, or None without Redis aggregation."""
+    settings = get_settings()
+    if (
+        redis is None
+        or not settings.adaptive_concurrency_enabled
+        or not settings.adaptive_concurrency_redis_enabled
+        or not api_key_ids
+    ):
+        return None
+    try:
+        worker_ids = list(dict.fromkeys(await redis.lrange(CONCURRENCY_WORKERS_KEY, 0, -1)))
+        values = await redis.mget([_worker_key(worker_id) for worker_id in worker_ids])
+    except Exception as exc:
+        logger.warning("Failed to read shared concurrency limits: %s", exc)
+        return None
+    totals = {api_key_id: 0 for api_key_id in api_key_ids}
+    for raw in values:
+        try:
+            limits = json.loads(raw) if raw else {}
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(limits, dict):
+            continue
+        for api_key_id in api_key_ids:
+            value = limits.get(str(api_key_id))
+            if isinstance(value, int):
+                totals[api_key_id] += value
+    return totals
+
+
+def concurrency_queue_seconds() -> float:
+    return max(get_settings().adaptive_concurrency_queue_ms, 0) / 1000
+
+
+_concurrency_limiter = ConcurrencyLimiter()
+
+
+def get_concurrency_limiter() -> ConcurrencyLimiter:
+    return _concurrency_limiter
+
+
+def reset_concurrency_limiter() -> None:
+    _concurrency_limiter.limits.clear()
+    _concurrency_limiter._published_at = 0.0
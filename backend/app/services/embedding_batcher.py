@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+import hashlib
+import json
+
+from app.services.billing import UsageShare, apportion_tokens
+
+_USAGE_FIELDS = ("prompt_tokens", "total_tokens")
+
+
+def batch_inputs(value: object) -> tuple[str, list[object]] | None:
+    """The inputs of one embeddings call and their kind, or None when they cannot be merged."""
+    if isinstance(value, str):
+        return "text", [value]
+    if not isinstance(value, list) or not value:
+        return None
+    if all(isinstance(item, str) for item in value):
+        return "text", list(value)
+    if all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        return "tokens", [value]
+    if all(
+        isinstance(item, list)
+        and all(isinstance(token, int) and not isinstance(token, bool) for token in item)
+        for item in value
+    ):
+        return "tokens", list(value)
+    return None
+
+
+def embedding_batch_key(
+    *,
+    path: str,
+    model_alias: str,
+    rule_group: str,
+    exposure_format: str,
+    input_kind: str,
+    payload: Mapping[str, object],
+) -> str:
+    """Requests only share a batch when everything except ``input`` matches."""
+    params = {key: value for key, value in payload.items() if key != "input"}
+    canonical = json.dumps(
+        [path, model_alias, rule_group, exposure_format, input_kind, params],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class BatchMember:
+    request_id: str
+    trace_id: str
+    inputs: list[object]
+    result: asyncio.Future[dict | None]
+
+
+@dataclass
+class EmbeddingBatch:
+    key: str
+    max_inputs: int
+    members: list[BatchMember] = field(default_factory=list)
+    input_count: int = 0
+    full: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def usage_shares(self) -> tuple[UsageShare, ...]:
+        return tuple(
+            UsageShare(
+                request_id=member.request_id,
+                trace_id=member.trace_id,
+                weight=len(member.inputs),
+            )
+            for member in self.members
+        )
+
+    def merged_inputs(self) -> list[object]:
+        return [item for member in self.members for item in member.inputs]
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embeddings calls into one upstream call per batch key."""
+
+    def __init__(self) -> None:
+        self.batches: dict[str, EmbeddingBatch] = {}
+
+    def join(
+        self, key: str, member: BatchMember, max_inputs: int
+    ) -> tuple[EmbeddingBatch, bool]:
+        """Add ``member`` to the open batch; the bool tells whether it leads a new one."""
+        batch = self.batches.get(key)
+        if batch is not None and batch.input_count + len(member.inputs) <= batch.max_inputs:
+            leader = False
+        else:
+            if batch is not None:
+                batch.full.set()
+            batch = EmbeddingBatch(key=key, max_inputs=max_inputs)
+            self.batches[key] = batch
+            leader = True
+        batch.members.append(member)
+        batch.input_count += len(member.inputs)
+        if batch.input_count >= batch.max_inputs:
+            batch.full.set()
+            self._close(batch)
+        return batch, leader
+
+    async def collect(self, batch: EmbeddingBatch, wait_seconds: float) -> None:
+        """Wait until the batch is full or the wait is over, then stop accepting members."""
+        try:
+            await asyncio.wait_for(batch.full.wait(), max(wait_seconds, 0.0))
+        except asyncio.TimeoutError:
+            pass
+        self._close(batch)
+
+    def _close(self, batch: EmbeddingBatch) -> None:
+        if self.batches.get(batch.key) is batch:
+            del self.batches[batch.key]
+
+
+def split_embedding_response(body: dict, counts: list[int]) -> list[dict] | None:
+    """Per-caller responses with rebased indices and proportional usage."""
+    data = body.get("data")
+    if not isinstance(data, list) or len(data) != sum(counts):
+        return None
+    ordered = sorted(
+        data,
+        key=lambda item: item.get("index", 0) if isinstance(item, dict) else 0,
+    )
+    usage = body.get("usage")
+    usage_parts: dict[str, list[int | None]] = {}
+    if isinstance(usage, dict):
+        for name in _USAGE_FIELDS:
+            value = usage.get(name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                usage_parts[name] = apportion_tokens(value, counts)
+
+    responses: list[dict] = []
+    offset = 0
+    for position, count in enumerate(counts):
+        items = []
+        for index, item in enumerate(ordered[offset : offset + count]):
+            items.append({**item, "index": index} if isinstance(item, dict) else item)
+        offset += count
+        response = {**body, "data": items}
+        if isinstance(usage, dict):
+            response["usage"] = {
+                **usage,
+                **{name: parts[position] for name, parts in usage_parts.items()},
+            }
+        responses.append(response)
+    return responses
+
+
+_embedding_batcher = EmbeddingBatcher()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    return _embedding_batcher
+
+
+def reset_embedding_batcher() -> None:
+    _embedding_batcher.batches.clear()
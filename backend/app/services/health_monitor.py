@@ -18,7 +18,7 @@ from app.core.http_client import get_http_client
 from app.core.redis import get_redis
 from app.db.models import APIKey, Endpoint, ModelMap
 from app.db.session import SessionLocal
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.circuit_breaker import CIRCUIT_SCOPE_ENDPOINT, CircuitBreaker
 from app.services.notifications import AlertPolicyStore, get_notifier
 from app.services.codex_oauth import (
     build_codex_headers,
@@ -379,11 +379,13 @@ class HealthMonitor:
             else:
                 status = "success"
                 if provider != "codex":
-                    await circuit_breaker.record_success(target.api_key.id)
+                    await circuit_breaker.record_candidate_success(target)
         except Exception:
             latency_ms = int((time.perf_counter() - start) * 1000)
             if provider != "codex":
-                await circuit_breaker.record_failure(target.api_key.id)
+                await circuit_breaker.record_candidate_failure(
+                    target, CIRCUIT_SCOPE_ENDPOINT
+                )
 
         result = HealthProbeResult(
             api_key_id=target.api_key.id,
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from app.core.config import get_settings
+from app.services.key_latency import get_key_latency_percentile
+
+HEDGE_DELAY_PERCENTILE = 95.0
+# 对冲预算按请求累积，上限限制了空闲后的突发对冲次数
+HEDGE_BUDGET_MAX_TOKENS = 10.0
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    delay_ms: int | None = None
+
+    def delay_seconds(self, api_key_id: int, *, is_stream: bool) -> float:
+        """Fixed rule delay, else the key's p95 latency (TTFT for streams)."""
+        if self.delay_ms is not None:
+            return max(self.delay_ms, 0) / 1000
+        learned = get_key_latency_percentile(
+            api_key_id, HEDGE_DELAY_PERCENTILE, first_token=is_stream
+        )
+        if learned is not None:
+            return learned / 1000
+        return max(get_settings().hedge_default_delay_ms, 0) / 1000
+
+
+def parse_hedge_policy(data: object) -> HedgePolicy | None:
+    if not isinstance(data, dict) or not data.get("hedge_enabled"):
+        return None
+    delay_ms = data.get("hedge_delay_ms")
+    if isinstance(delay_ms, bool) or not isinstance(delay_ms, (int, float)):
+        return HedgePolicy()
+    return HedgePolicy(delay_ms=max(int(delay_ms), 0))
+
+
+class HedgeBudget:
+    """Caps hedges to a percentage of hedge-eligible requests in this worker."""
+
+    def __init__(self) -> None:
+        self.tokens = 0.0
+
+    def deposit(self) -> None:
+        ratio = max(get_settings().hedge_budget_percent, 0.0) / 100
+        self.tokens = min(self.tokens + ratio, HEDGE_BUDGET_MAX_TOKENS)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+_hedge_budget = HedgeBudget()
+
+
+def get_hedge_budget() -> HedgeBudget:
+    return _hedge_budget
+
+
+def reset_hedge_budget() -> None:
+    _hedge_budget.tokens = 0.0
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import itertools
+import logging
+import time
+
+from app.core.config import get_settings
+from app.core.redis import redis_pipeline
+
+logger = logging.getLogger(__name__)
+
+INFLIGHT_STATE_PREFIX = "route:inflight"
+# Leases that are never released (e.g. a stream generator that was never
+# started) stop counting after this long; the shared Redis gauge expires too.
+INFLIGHT_LEASE_MAX_SECONDS = 900
+
+_lease_ids = itertools.count(1)
+_local_leases: dict[int, dict[int, float]] = {}
+_release_events: dict[int, asyncio.Event] = {}
+
+
+def _inflight_state_key(api_key_id: int) -> str:
+    return f"{INFLIGHT_STATE_PREFIX}:{api_key_id}"
+
+
+def _shared_redis(redis):  # noqa: ANN001, ANN202
+    if redis is None or not get_settings().inflight_redis_enabled:
+        return None
+    return redis
+
+
+@dataclass
+class InflightLease:
+    api_key_id: int
+    lease_id: int
+    redis: object | None = None
+    released: bool = field(default=False)
+
+    async def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        leases = _local_leases.get(self.api_key_id)
+        if leases is not None:
+            leases.pop(self.lease_id, None)
+            if not leases:
+                _local_leases.pop(self.api_key_id, None)
+        event = _release_events.pop(self.api_key_id, None)
+        if event is not None:
+            event.set()
+        if self.redis is None:
+            return
+        try:
+            await self.redis.decr(_inflight_state_key(self.api_key_id))
+        except Exception as exc:
+            logger.warning("Failed to release shared in-flight gauge: %s", exc)
+
+
+async def acquire_inflight(api_key_id: int, redis=None) -> InflightLease:  # noqa: ANN001
+    lease = InflightLease(api_key_id=api_key_id, lease_id=next(_lease_ids))
+    _local_leases.setdefault(api_key_id, {})[lease.lease_id] = time.monotonic()
+    shared = _shared_redis(redis)
+    if shared is not None:
+        key = _inflight_state_key(api_key_id)
+        try:
+            pipe = redis_pipeline(shared)
+            pipe.incr(key)
+            pipe.expire(key, INFLIGHT_LEASE_MAX_SECONDS)
+            await pipe.execute()
+        except Exception as exc:
+            logger.warning("Failed to acquire shared in-flight gauge: %s", exc)
+        else:
+            lease.redis = shared
+    return lease
+
+
+async def wait_for_release(api_key_id: int, timeout: float) -> bool:
+    """Wait until any local lease on the key is released, at most ``timeout`` seconds."""
+    if timeout <= 0:
+        return False
+    event = _release_events.setdefault(api_key_id, asyncio.Event())
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except TimeoutError:
+        return False
+    return True
+
+
+def get_local_inflight(api_key_ids: list[int]) -> dict[int, int]:
+    cutoff = time.monotonic() - INFLIGHT_LEASE_MAX_SECONDS
+    counts: dict[int, int] = {}
+    for api_key_id in api_key_ids:
+        leases = _local_leases.get(api_key_id)
+        if not leases:
+            counts[api_key_id] = 0
+            continue
+        expired = [lease_id for lease_id, started in leases.items() if started < cutoff]
+        for lease_id in expired:
+            del leases[lease_id]
+        counts[api_key_id] = len(leases)
+    return counts
+
+
+async def get_shared_inflight(api_key_ids: list[int], redis=None) -> dict[int, int] | None:  # noqa: ANN001
+    shared = _shared_redis(redis)
+    if shared is None or not api_key_ids:
+        return None
+    try:
+        values = await shared.mget([_inflight_state_key(api_key_id) for api_key_id in api_key_ids])
+    except Exception as exc:
+        logger.warning("Failed to read shared in-flight gauges: %s", exc)
+        return None
+    counts: dict[int, int] = {}
+    for api_key_id, value in zip(api_key_ids, values, strict=True):
+        try:
+            counts[api_key_id] = max(int(value or 0), 0)
+        except (TypeError, ValueError):
+            counts[api_key_id] = 0
+    return counts
+
+
+async def get_inflight_counts(api_key_ids: list[int], redis=None) -> dict[int, int]:  # noqa: ANN001
+    shared = await get_shared_inflight(api_key_ids, redis)
+    if shared is not None:
+        return shared
+    return get_local_inflight(api_key_ids)
+
+
+def reset_inflight() -> None:
+    _local_leases.clear()
+    _release_events.clear()
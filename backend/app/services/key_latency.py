@@ -0,0 +1,139 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import math
+import time
+
+from app.services.billing import RequestAttemptMetrics, RequestMetrics
+
+LATENCY_EWMA_ALPHA = 0.3
+LATENCY_ERROR_PENALTY = 4.0
+LATENCY_STATS_MAX_KEYS = 4096
+LATENCY_STATS_STALE_SECONDS = 300.0
+LATENCY_SAMPLE_WINDOW = 64
+LATENCY_PERCENTILE_MIN_SAMPLES = 8
+# 本地限流、并发已满、半开试探名额已满、对冲落败和请求截止时间耗尽都不代表上游健康状况
+_IGNORED_FAILURE_REASONS = frozenset(
+    {
+        "rpm_limit",
+        "tpm_limit",
+        "concurrency_limit",
+        "circuit_half_open",
+        "hedge_lost",
+        "deadline_skip",
+        "deadline_exceeded",
+    }
+)
+
+
+@dataclass
+class KeyLatencyStats:
+    ttft_ms: float | None = None
+    latency_ms: float | None = None
+    error_rate: float = 0.0
+    updated_at: float = 0.0
+    latency_samples: deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLE_WINDOW)
+    )
+    ttft_samples: deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLE_WINDOW)
+    )
+
+    def base_ms(self) -> float | None:
+        base = self.ttft_ms if self.ttft_ms is not None else self.latency_ms
+        return None if base is None else max(base, 1.0)
+
+
+_key_stats: OrderedDict[int, KeyLatencyStats] = OrderedDict()
+
+
+def _ewma(previous: float | None, sample: float) -> float:
+    if previous is None:
+        return sample
+    return previous + LATENCY_EWMA_ALPHA * (sample - previous)
+
+
+def _is_stale(stats: KeyLatencyStats, now: float) -> bool:
+    return now - stats.updated_at > LATENCY_STATS_STALE_SECONDS
+
+
+def _touch_stats(api_key_id: int) -> KeyLatencyStats:
+    now = time.monotonic()
+    stats = _key_stats.get(api_key_id)
+    if stats is None or _is_stale(stats, now):
+        stats = KeyLatencyStats()
+        _key_stats[api_key_id] = stats
+        while len(_key_stats) > LATENCY_STATS_MAX_KEYS:
+            _key_stats.popitem(last=False)
+    else:
+        _key_stats.move_to_end(api_key_id)
+    stats.updated_at = now
+    return stats
+
+
+def observe_attempt_metrics(metrics: RequestAttemptMetrics) -> None:
+    if metrics.outcome == "success":
+        stats = _touch_stats(metrics.api_key_id)
+        stats.error_rate = _ewma(stats.error_rate, 0.0)
+        stats.latency_ms = _ewma(stats.latency_ms, float(metrics.latency_ms))
+        stats.latency_samples.append(float(metrics.latency_ms))
+        return
+    if metrics.failure_reason in _IGNORED_FAILURE_REASONS:
+        return
+    stats = _touch_stats(metrics.api_key_id)
+    stats.error_rate = _ewma(stats.error_rate, 1.0)
+
+
+def observe_request_metrics(metrics: RequestMetrics) -> None:
+    if metrics.ttft_ms is None or metrics.status_code >= 400:
+        return
+    stats = _touch_stats(metrics.api_key_id)
+    stats.ttft_ms = _ewma(stats.ttft_ms, float(metrics.ttft_ms))
+    stats.ttft_samples.append(float(metrics.ttft_ms))
+
+
+def get_key_latency_costs(api_key_ids: list[int]) -> dict[int, float]:
+    """Return the expected cost per key in ms, lower is better.
+
+    Keys without recent latency samples borrow the best known base so they are
+    still probed; the EWMA error rate then inflates each key's cost.
+    """
+    now = time.monotonic()
+    recent: dict[int, KeyLatencyStats] = {}
+    for api_key_id in api_key_ids:
+        stats = _key_stats.get(api_key_id)
+        if stats is not None and not _is_stale(stats, now):
+            recent[api_key_id] = stats
+    known_bases = [
+        base for base in (stats.base_ms() for stats in recent.values()) if base is not None
+    ]
+    default_base = min(known_bases) if known_bases else 1.0
+    costs: dict[int, float] = {}
+    for api_key_id in api_key_ids:
+        stats = recent.get(api_key_id)
+        if stats is None:
+            costs[api_key_id] = default_base
+            continue
+        base = stats.base_ms()
+        costs[api_key_id] = (default_base if base is None else base) * (
+            1.0 + LATENCY_ERROR_PENALTY * stats.error_rate
+        )
+    return costs
+
+
+def get_key_latency_percentile(
+    api_key_id: int, percentile: float, *, first_token: bool = False
+) -> float | None:
+    """Nearest-rank percentile of recent latency (or TTFT) samples in ms."""
+    stats = _key_stats.get(api_key_id)
+    if stats is None or _is_stale(stats, time.monotonic()):
+        return None
+    samples = stats.ttft_samples if first_token else stats.latency_samples
+    if len(samples) < LATENCY_PERCENTILE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    rank = math.ceil(percentile / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def reset_key_latency_stats() -> None:
+    _key_stats.clear()
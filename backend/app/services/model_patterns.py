@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from functools import lru_cache
 import re
+from typing import Generic, TypeVar
 
 import regex
 
@@ -72,3 +74,168 @@ def model_pattern_matches(pattern: str, model_alias: str) -> bool:
         )
     except TimeoutError:
         return False
+
+
+_T = TypeVar("_T")
+
+_PLAIN_LITERAL_CHARS = frozenset(".^$*+?{}[]()|\\")
+_COMBINABLE_GROUP_PREFIXES = ("(?:", "(?=", "(?!", "(?<=", "(?<!")
+_EXACT_KIND = "exact"
+_PREFIX_KIND = "prefix"
+_REGEX_KIND = "regex"
+
+
+def _literal_text(body: str) -> str | None:
+    chars: list[str] = []
+    index = 0
+    while index < len(body):
+        char = body[index]
+        if char == "\\":
+            if index + 1 >= len(body) or body[index + 1].isalnum():
+                return None
+            chars.append(body[index + 1])
+            index += 2
+            continue
+        if char in _PLAIN_LITERAL_CHARS:
+            return None
+        chars.append(char)
+        index += 1
+    return "".join(chars)
+
+
+def _classify_model_pattern(pattern: str) -> tuple[str, str]:
+    """Split a pattern into an exact literal, a literal prefix, or a real regex.
+
+    Patterns run through ``regex.match`` (start-anchored, not end-anchored), so
+    ``gpt-4o``, ``^gpt-4o`` and ``^gpt-4o.*`` are all plain prefix tests.
+    """
+    body = pattern[1:] if pattern.startswith("^") else pattern
+    if body.endswith("$") and not body.endswith("\\$"):
+        literal = _literal_text(body[:-1])
+        if literal is not None:
+            return _EXACT_KIND, literal
+        return _REGEX_KIND, pattern
+    if body.endswith(".*") and not body.endswith("\\.*"):
+        body = body[:-2]
+    literal = _literal_text(body)
+    if literal is not None:
+        return _PREFIX_KIND, literal
+    return _REGEX_KIND, pattern
+
+
+def _is_combinable_pattern(pattern: str) -> bool:
+    # Named groups would collide and inline flags would leak into the other
+    # alternatives, so those patterns keep matching one by one.
+    start = pattern.find("(?")
+    while start != -1:
+        if not pattern.startswith(_COMBINABLE_GROUP_PREFIXES, start):
+            return False
+        start = pattern.find("(?", start + 2)
+    return True
+
+
+@lru_cache(maxsize=256)
+def _compile_combined_patterns(patterns: tuple[str, ...]) -> regex.Pattern[str]:
+    return regex.compile(
+        "".join(
+            f"(?:(?=(?P<p{index}>{pattern})))?" for index, pattern in enumerate(patterns)
+        )
+    )
+
+
+class _PrefixNode:
+    __slots__ = ("children", "positions")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _PrefixNode] = {}
+        self.positions: list[int] = []
+
+
+class ModelPatternIndex(Generic[_T]):
+    """Match one model alias against many patterns in a single pass.
+
+    Entries are ``(pattern, item)`` pairs in priority order; ``matches`` returns
+    the items whose pattern matches, in that same order. Unsafe patterns are
+    dropped, the same as ``model_pattern_matches`` treating them as no match.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, _T]]) -> None:
+        self._items: list[_T] = []
+        self._exact: dict[str, list[int]] = {}
+        self._prefix_root = _PrefixNode()
+        self._combined_positions: list[int] = []
+        self._combined_patterns: list[str] = []
+        self._single_patterns: list[tuple[int, str]] = []
+        for pattern, item in entries:
+            try:
+                validate_model_pattern(pattern)
+            except UnsafeModelPatternError:
+                continue
+            position = len(self._items)
+            self._items.append(item)
+            kind, value = _classify_model_pattern(pattern)
+            if kind == _EXACT_KIND:
+                self._exact.setdefault(value, []).append(position)
+            elif kind == _PREFIX_KIND:
+                node = self._prefix_root
+                for char in value:
+                    node = node.children.setdefault(char, _PrefixNode())
+                node.positions.append(position)
+            elif _is_combinable_pattern(pattern):
+                self._combined_positions.append(position)
+                self._combined_patterns.append(pattern)
+            else:
+                self._single_patterns.append((position, pattern))
+        self._combined = (
+            _compile_combined_patterns(tuple(self._combined_patterns))
+            if self._combined_patterns
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def matches(self, model_alias: str) -> list[_T]:
+        positions = list(self._exact.get(model_alias, ()))
+        if model_alias.endswith("\n"):
+            # ``$`` also matches right before a trailing newline.
+            positions.extend(self._exact.get(model_alias[:-1], ()))
+        node = self._prefix_root
+        positions.extend(node.positions)
+        for char in model_alias:
+            node = node.children.get(char)
+            if node is None:
+                break
+            positions.extend(node.positions)
+        positions.extend(self._match_combined(model_alias))
+        positions.extend(
+            position
+            for position, pattern in self._single_patterns
+            if model_pattern_matches(pattern, model_alias)
+        )
+        return [self._items[position] for position in sorted(positions)]
+
+    def _match_combined(self, model_alias: str) -> list[int]:
+        if self._combined is None:
+            return []
+        try:
+            match = self._combined.match(
+                model_alias,
+                timeout=MODEL_PATTERN_MATCH_TIMEOUT_SECONDS,
+            )
+        except TimeoutError:
+            # Fall back to per-pattern budgets so one slow rule cannot hide the rest.
+            return [
+                position
+                for position, pattern in zip(
+                    self._combined_positions, self._combined_patterns, strict=True
+                )
+                if model_pattern_matches(pattern, model_alias)
+            ]
+        if match is None:
+            return []
+        return [
+            position
+            for index, position in enumerate(self._combined_positions)
+            if match.start(f"p{index}") != -1
+        ]
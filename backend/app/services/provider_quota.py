@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Mapping
+
+from app.core.config import get_settings
+from app.services.retry_policy import parse_duration_seconds, rate_limit_reset_seconds
+
+PROVIDER_QUOTA_REDIS_PREFIX = "provider_quota"
+PROVIDER_COOLDOWN_REDIS_PREFIX = "provider_cooldown"
+PROVIDER_QUOTA_TTL_SECONDS = 24 * 3600
+
+_QUOTA_HEADER_PREFIXES = ("x-ratelimit-", "anthropic-ratelimit-", "retry-after")
+# Gemini reports the wait for a 429 in the google.rpc.RetryInfo error detail.
+_GEMINI_RETRY_DELAY = re.compile(rb'"retryDelay"\s*:\s*"([0-9.]+s)"')
+
+
+@dataclass(frozen=True)
+class ProviderQuotaWindow:
+    limit: int | None = None
+    remaining: int | None = None
+    reset_after_seconds: float | None = None
+
+
+@dataclass(frozen=True)
+class ProviderQuotaSnapshot:
+    requests: ProviderQuotaWindow
+    tokens: ProviderQuotaWindow
+    cooldown_until: float | None
+    updated_at: int
+
+
+def quota_key(api_key_id: int) -> str:
+    return f"{PROVIDER_QUOTA_REDIS_PREFIX}:{api_key_id}"
+
+
+def cooldown_key(api_key_id: int) -> str:
+    return f"{PROVIDER_COOLDOWN_REDIS_PREFIX}:{api_key_id}"
+
+
+def _parse_int(value: str | None) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _parse_reset(value: str | None) -> float | None:
+    if value is None:
+        return None
+    seconds = parse_duration_seconds(value)
+    return max(seconds, 0.0) if seconds is not None else None
+
+
+def _window(
+    headers: Mapping[str, str], limit: str, remaining: str, reset: str
+) -> ProviderQuotaWindow:
+    return ProviderQuotaWindow(
+        limit=_parse_int(headers.get(limit)),
+        remaining=_parse_int(headers.get(remaining)),
+        reset_after_seconds=_parse_reset(headers.get(reset)),
+    )
+
+
+def _openai_window(headers: Mapping[str, str], unit: str) -> ProviderQuotaWindow:
+    return _window(
+        headers,
+        f"x-ratelimit-limit-{unit}",
+        f"x-ratelimit-remaining-{unit}",
+        f"x-ratelimit-reset-{unit}",
+    )
+
+
+def _anthropic_window(headers: Mapping[str, str], unit: str) -> ProviderQuotaWindow:
+    prefix = f"anthropic-ratelimit-{unit}"
+    return _window(headers, f"{prefix}-limit", f"{prefix}-remaining", f"{prefix}-reset")
+
+
+def _tightest(*windows: ProviderQuotaWindow) -> ProviderQuotaWindow:
+    reported = [window for window in windows if window.remaining is not None]
+    if not reported:
+        return next(
+            (window for window in windows if window != ProviderQuotaWindow()),
+            ProviderQuotaWindow(),
+        )
+    return min(reported, key=lambda window: window.remaining)  # type: ignore[arg-type, return-value]
+
+
+def _exhausted_wait(window: ProviderQuotaWindow) -> float | None:
+    if window.remaining is None or window.remaining > 0:
+        return None
+    return window.reset_after_seconds
+
+
+def parse_provider_quota(
+    status_code: int,
+    headers: Mapping[str, object],
+    content: bytes | None = None,
+) -> ProviderQuotaSnapshot | None:
+    """Read OpenAI, Anthropic and Gemini rate-limit signals from one upstream response."""
+    lowered = {str(key).lower(): str(value) for key, value in headers.items()}
+    has_headers = any(key.startswith(_QUOTA_HEADER_PREFIXES) for key in lowered)
+    gemini_delay = None
+    if status_code == 429 and content:
+        match = _GEMINI_RETRY_DELAY.search(content[:8192])
+        if match:
+            gemini_delay = parse_duration_seconds(match.group(1).decode())
+    if not has_headers and gemini_delay is None:
+        return None
+
+    requests = _tightest(
+        _openai_window(lowered, "requests"), _anthropic_window(lowered, "requests")
+    )
+    tokens = _tightest(
+        _openai_window(lowered, "tokens"),
+        _anthropic_window(lowered, "tokens"),
+        _anthropic_window(lowered, "input-tokens"),
+        _anthropic_window(lowered, "output-tokens"),
+    )
+    exhausted = [
+        wait
+        for wait in (_exhausted_wait(requests), _exhausted_wait(tokens))
+        if wait is not None
+    ]
+    wait = max(exhausted) if exhausted else None
+    if status_code == 429:
+        # An explicit Retry-After wins; the reset of every window is a last resort
+        # because only one of them is usually the exhausted one.
+        for hint in (
+            _parse_reset(lowered.get("retry-after")),
+            gemini_delay,
+            wait,
+            rate_limit_reset_seconds(lowered),
+        ):
+            if hint is not None and hint > 0:
+                wait = hint
+                break
+    now = time.time()
+    cooldown_until = None
+    if wait is not None and wait > 0:
+        max_seconds = max(get_settings().provider_cooldown_max_seconds, 0)
+        cooldown_until = now + min(wait, max_seconds)
+    return ProviderQuotaSnapshot(
+        requests=requests,
+        tokens=tokens,
+        cooldown_until=cooldown_until,
+        updated_at=int(now),
+    )
+
+
+async def record_provider_quota(
+    redis,
+    *,
+    api_key_id: int,
+    status_code: int,
+    headers: Mapping[str, object],
+    content: bytes | None = None,
+) -> ProviderQuotaSnapshot | None:
+    """Store the latest quota view and put the key into cooldown when it is exhausted."""
+    snapshot = parse_provider_quota(status_code, headers, content)
+    if snapshot is None:
+        return None
+    await redis.set(
+        quota_key(api_key_id),
+        json.dumps(asdict(snapshot), separators=(",", ":")),
+        ex=PROVIDER_QUOTA_TTL_SECONDS,
+    )
+    if snapshot.cooldown_until is not None:
+        ttl = math.ceil(snapshot.cooldown_until - time.time())
+        if ttl > 0:
+            await redis.set(cooldown_key(api_key_id), repr(snapshot.cooldown_until), ex=ttl)
+    return snapshot
+
+
+def provider_cooldown(status_code: int, snapshot: ProviderQuotaSnapshot | None) -> bool:
+    """Whether a 429 came with enough information to cool the key down precisely."""
+    return status_code == 429 and snapshot is not None and snapshot.cooldown_until is not None
+
+
+def parse_cooldown_until(raw: object, now: float) -> float | None:
+    if raw is None:
+        return None
+    try:
+        until = float(raw)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    return until if until > now else None
+
+
+async def read_provider_cooldowns(redis, api_key_ids: list[int]) -> dict[int, float]:
+    if not api_key_ids:
+        return {}
+    values = await redis.mget([cooldown_key(api_key_id) for api_key_id in api_key_ids])
+    now = time.time()
+    result: dict[int, float] = {}
+    for api_key_id, raw in zip(api_key_ids, values, strict=False):
+        until = parse_cooldown_until(raw, now)
+        if until is not None:
+            result[api_key_id] = until
+    return result
+
+
+async def read_provider_quota_many(
+    redis, api_key_ids: list[int]
+) -> dict[int, dict[str, object]]:
+    if not api_key_ids:
+        return {}
+    values = await redis.mget([quota_key(api_key_id) for api_key_id in api_key_ids])
+    now = time.time()
+    result: dict[int, dict[str, object]] = {}
+    for api_key_id, raw in zip(api_key_ids, values, strict=False):
+        if not raw:
+            continue
+        try:
+            parsed = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(parsed, dict):
+            continue
+        if parse_cooldown_until(parsed.get("cooldown_until"), now) is None:
+            parsed["cooldown_until"] = None
+        result[api_key_id] = parsed
+    return result
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import base64
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+import time
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_PREFIX = "response_cache"
+# 这些字段只影响投递方式或追踪，不影响上游生成的内容
+_VOLATILE_FIELDS = frozenset(
+    {
+        "stream",
+        "stream_options",
+        "user",
+        "metadata",
+        "session_id",
+        "conversation_id",
+        "thread_id",
+        "chat_id",
+        "dialog_id",
+        "trace_id",
+        "request_id",
+    }
+)
+_EMBEDDING_PATH_MARKERS = ("embeddings", "embedContent")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    media_type: str | None
+    is_stream: bool
+    endpoint_id: int
+    api_key_id: int
+
+
+def _encode_entry(response: CachedResponse, expires_at: float) -> str:
+    return json.dumps(
+        {
+            "body": base64.b64encode(response.body).decode("ascii"),
+            "media_type": response.media_type,
+            "is_stream": response.is_stream,
+            "endpoint_id": response.endpoint_id,
+            "api_key_id": response.api_key_id,
+            "expires_at": expires_at,
+        },
+        separators=(",", ":"),
+    )
+
+
+def _decode_entry(raw: object) -> tuple[CachedResponse, float] | None:
+    try:
+        data = json.loads(raw)  # type: ignore[arg-type]
+        response = CachedResponse(
+            body=base64.b64decode(data["body"]),
+            media_type=data.get("media_type"),
+            is_stream=bool(data.get("is_stream")),
+            endpoint_id=int(data["endpoint_id"]),
+            api_key_id=int(data["api_key_id"]),
+        )
+        return response, float(data["expires_at"])
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+def _is_deterministic(payload: Mapping[str, object]) -> bool:
+    generation = payload.get("generationConfig") or payload.get("generation_config")
+    options = generation if isinstance(generation, Mapping) else payload
+    temperature = options.get("temperature")
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+        return False
+    choices = options.get("candidateCount", payload.get("n"))
+    return temperature == 0 and choices in (None, 1)
+
+
+def response_cache_key(
+    *,
+    path: str,
+    model_alias: str,
+    rule_group: str,
+    exposure_format: str,
+    is_stream: bool,
+    payload: Mapping[str, object],
+    access_key_id: int | None = None,
+) -> str | None:
+    """Canonical hash of a deterministic request, or None when it must not be cached.
+
+    ``access_key_id`` is the caller's Factory access key, so callers sharing a
+    rule group never receive each other's responses.
+    """
+    if not any(marker in path for marker in _EMBEDDING_PATH_MARKERS) and not _is_deterministic(
+        payload
+    ):
+        return None
+    normalized = {key: value for key, value in payload.items() if key not in _VOLATILE_FIELDS}
+    canonical = json.dumps(
+        [access_key_id, path, model_alias, rule_group, exposure_format, is_stream, normalized],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _redis_key(key: str) -> str:
+    return f"{RESPONSE_CACHE_PREFIX}:{key}"
+
+
+class ResponseCache:
+    """Byte-bounded in-process LRU in front of a Redis tier."""
+
+    def __init__(self) -> None:
+        self.entries: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self.size_bytes = 0
+
+    def _evict(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1].body)
+
+    def _remember(self, key: str, response: CachedResponse, expires_at: float) -> None:
+        capacity = max(get_settings().response_cache_memory_bytes, 0)
+        if len(response.body) > capacity:
+            return
+        self._evict(key)
+        self.entries[key] = (expires_at, response)
+        self.size_bytes += len(response.body)
+        while self.size_bytes > capacity and self.entries:
+            self._evict(next(iter(self.entries)))
+
+    async def get(self, redis, key: str) -> CachedResponse | None:  # noqa: ANN001
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                return response
+            self._evict(key)
+        if redis is None:
+            return None
+        try:
+            raw = await redis.get(_redis_key(key))
+        except Exception as exc:
+            logger.warning("Failed to read response cache: %s", exc)
+            return None
+        decoded = _decode_entry(raw) if raw else None
+        if decoded is None:
+            return None
+        response, expires_at = decoded
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        self._remember(key, response, time.monotonic() + remaining)
+        return response
+
+    async def put(
+        self, redis, key: str, response: CachedResponse, ttl_seconds: int  # noqa: ANN001
+    ) -> None:
+        if ttl_seconds <= 0 or len(response.body) > get_settings().response_cache_max_entry_bytes:
+            return
+        self._remember(key, response, time.monotonic() + ttl_seconds)
+        if redis is None:
+            return
+        try:
+            await redis.set(
+                _redis_key(key),
+                _encode_entry(response, time.time() + ttl_seconds),
+                ex=ttl_seconds,
+            )
+        except Exception as exc:
+            logger.warning("Failed to write response cache: %s", exc)
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
+
+
+def reset_response_cache() -> None:
+    _response_cache.entries.clear()
+    _response_cache.size_bytes = 0
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import re
+import time
+
+from app.core.config import get_settings
+
+# 每个 endpoint 空闲时最多积攒的重试次数，也是新 endpoint 的初始额度
+RETRY_BUDGET_MAX_TOKENS = 10.0
+RATE_LIMIT_RESET_HEADERS = (
+    "retry-after",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+    "x-ratelimit-reset",
+)
+RETRY_DECISION_BACKOFF = "backoff"
+RETRY_DECISION_RETRY_AFTER = "retry_after"
+RETRY_DECISION_BUDGET_EXHAUSTED = "budget_exhausted"
+RETRY_DECISION_DELAY_TOO_LONG = "delay_too_long"
+RETRY_DECISION_DEADLINE = "deadline"
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+# Values this large are Unix timestamps rather than relative seconds.
+_EPOCH_THRESHOLD_SECONDS = 1_000_000_000
+
+
+@dataclass(frozen=True)
+class RetryDecision:
+    retry: bool
+    reason: str
+    delay_seconds: float = 0.0
+
+    @property
+    def delay_ms(self) -> int | None:
+        return int(self.delay_seconds * 1000) if self.retry else None
+
+
+def parse_duration_seconds(value: str) -> float | None:
+    text = value.strip().lower()
+    if not text:
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is not None:
+        if number >= _EPOCH_THRESHOLD_SECONDS:
+            return number - time.time()
+        return number
+    parts = _DURATION_PART.findall(text)
+    if parts and "".join(amount + unit for amount, unit in parts) == text:
+        scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+        return sum(float(amount) * scale[unit] for amount, unit in parts)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            moment = datetime.fromisoformat(text.replace("z", "+00:00"))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - datetime.now(timezone.utc)).total_seconds()
+
+
+def rate_limit_reset_seconds(headers: Mapping[str, str] | None) -> float | None:
+    """Longest wait the provider asked for via Retry-After or x-ratelimit-reset-*."""
+    if not headers:
+        return None
+    lowered = {str(key).lower(): str(value) for key, value in headers.items()}
+    waits = [
+        seconds
+        for name in RATE_LIMIT_RESET_HEADERS
+        if name in lowered
+        and (seconds := parse_duration_seconds(lowered[name])) is not None
+    ]
+    if not waits:
+        return None
+    return max(max(waits), 0.0)
+
+
+def backoff_seconds(attempt_index: int) -> float:
+    """Exponential backoff with full jitter."""
+    settings = get_settings()
+    cap = max(settings.retry_backoff_max_ms, 0) / 1000
+    base = max(settings.retry_backoff_base_ms, 0) / 1000
+    return random.uniform(0.0, min(cap, base * (2**attempt_index)))
+
+
+class RetryBudget:
+    """Caps same-candidate retries to a percentage of successes per endpoint."""
+
+    def __init__(self) -> None:
+        self.tokens: dict[int, float] = {}
+
+    def deposit(self, endpoint_id: int) -> None:
+        ratio = max(get_settings().retry_budget_percent, 0.0) / 100
+        current = self.tokens.get(endpoint_id, RETRY_BUDGET_MAX_TOKENS)
+        self.tokens[endpoint_id] = min(current + ratio, RETRY_BUDGET_MAX_TOKENS)
+
+    def try_spend(self, endpoint_id: int) -> bool:
+        current = self.tokens.get(endpoint_id, RETRY_BUDGET_MAX_TOKENS)
+        if current < 1.0:
+            return False
+        self.tokens[endpoint_id] = current - 1.0
+        return True
+
+
+_retry_budget = RetryBudget()
+
+
+def get_retry_budget() -> RetryBudget:
+    return _retry_budget
+
+
+def reset_retry_budget() -> None:
+    _retry_budget.tokens.clear()
+
+
+def plan_retry(
+    endpoint_id: int,
+    attempt_index: int,
+    *,
+    headers: Mapping[str, str] | None = None,
+    remaining_seconds: float | None = None,
+) -> RetryDecision:
+    """Decide how long to wait before retrying the same candidate, if at all."""
+    hinted = rate_limit_reset_seconds(headers)
+    if hinted is not None:
+        delay, reason = hinted, RETRY_DECISION_RETRY_AFTER
+        if delay > max(get_settings().retry_backoff_max_ms, 0) / 1000:
+            return RetryDecision(retry=False, reason=RETRY_DECISION_DELAY_TOO_LONG)
+    else:
+        delay, reason = backoff_seconds(attempt_index), RETRY_DECISION_BACKOFF
+    if remaining_seconds is not None and delay >= remaining_seconds:
+        return RetryDecision(retry=False, reason=RETRY_DECISION_DEADLINE)
+    if not _retry_budget.try_spend(endpoint_id):
+        return RetryDecision(retry=False, reason=RETRY_DECISION_BUDGET_EXHAUSTED)
+    return RetryDecision(retry=True, reason=reason, delay_seconds=delay)
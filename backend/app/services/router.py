@@ -1,31 +1,46 @@
 from collections import OrderedDict
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from datetime import date
 import hashlib
 import json
-from typing import Sequence
+import logging
+import random
+import time
+from typing import Mapping, Sequence
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.circuit_state import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+from app.core.config import get_settings
 from app.core.providers import normalize_provider_filters, normalize_provider_name
+from app.core.rate_limit import bucket_tokens, take_tokens
 from app.core.route_exposure import (
     DEFAULT_EXPOSURE_FORMAT,
     exposure_format_match_priority,
-    normalize_exposure_formats,
 )
-from app.db.models import APIKey, Agent, Endpoint, ModelMap, RoutingRule
+from app.core.redis import MemoryRedis, redis_pipeline
+from app.db.models import APIKey, Agent, Endpoint
 from app.core.timezone import app_today
 from app.services.agent_transport import get_agent_manager
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.affinity import affinity_order
+from app.services.circuit_breaker import CircuitBreaker, CircuitScope
+from app.services.concurrency_limit import get_concurrency_limiter
 from app.services.endpoint_transport import endpoint_agent_name
-from app.services.model_patterns import model_pattern_matches
-
-
-@dataclass(frozen=True)
-class AgentRouteState:
-    is_active: bool
-    is_draining: bool
+from app.services.inflight import InflightLease, acquire_inflight, get_inflight_counts
+from app.services.key_latency import get_key_latency_costs
+from app.services.provider_quota import cooldown_key, parse_cooldown_until
+from app.services.retry_policy import get_retry_budget
+from app.services.routing_snapshot import (
+    DEFAULT_RULE_STRATEGY,
+    AgentRouteState,
+    RoutingSnapshot,
+    get_routing_snapshot,
+    parse_key_ids,
+    parse_rule_config_detail,
+)
+from app.services.rule_options import RuleOptions
+from app.services.token_budget import TokenReservation, tpm_state_key
 
 
 @dataclass(frozen=True)
@@ -56,20 +71,113 @@ class RuleTargetSelection:
     strategy: str
     matched_rule: bool
     exposure_supported: bool
+    options: RuleOptions = RuleOptions()
+
+
+@dataclass(frozen=True)
+class RateBucket:
+    state_key: str
+    capacity: float
+    refill_per_second: float
+    cost: float
+    reason: str
+
+    @classmethod
+    def for_limit(
+        cls,
+        state_key: str,
+        per_minute: int,
+        burst_seconds: float,
+        *,
+        cost: float,
+        reason: str,
+    ) -> "RateBucket":
+        capacity = max(per_minute * burst_seconds / 60, 1.0) if per_minute else 0.0
+        cost = max(cost, 1.0)
+        # A single request larger than the whole bucket still goes through once
+        # the bucket is full instead of being rejected forever.
+        return cls(
+            state_key=state_key,
+            capacity=capacity,
+            refill_per_second=per_minute / 60,
+            cost=min(cost, capacity) if capacity else cost,
+            reason=reason,
+        )
 
 
-DEFAULT_RULE_STRATEGY = "weighted_round_robin"
+@dataclass
+class RoutingState:
+    circuit_states: dict[str, str] = field(default_factory=dict)
+    bucket_tokens: dict[str, float] = field(default_factory=dict)
+    cooldown_until: dict[int, float] = field(default_factory=dict)
+
+
+def _parse_key_id(raw: object) -> int | None:
+    if raw is None:
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+LEAST_LATENCY_STRATEGY = "least_latency"
+LEAST_INFLIGHT_STRATEGY = "least_inflight"
+AFFINITY_STRATEGY = "affinity"
 SEQUENTIAL_STATE_TTL_SECONDS = 86400
 WRR_STATE_MAX_POOLS = 1024
-RPM_STATE_TTL_SECONDS = 120
+WRR_SHARED_STATE_TTL_SECONDS = 3600
+RPM_BUCKET_PREFIX = "rate:bucket"
+
+logger = logging.getLogger(__name__)
 
 _wrr_state: OrderedDict[str, dict[int, int]] = OrderedDict()
 
+# Smooth WRR step over a Redis hash of current weights.
+# KEYS[1] = state hash, ARGV = ttl_seconds, key_id_1, weight_1, key_id_2, weight_2, ...
+WRR_SELECT_SCRIPT = """
+local pool_size = (#ARGV - 1) / 2
+if redis.call('HLEN', KEYS[1]) ~= pool_size then
+  redis.call('DEL', KEYS[1])
+end
+local total_weight = 0
+local selected_id = nil
+local selected_current = nil
+for index = 2, #ARGV, 2 do
+  local weight = tonumber(ARGV[index + 1])
+  total_weight = total_weight + weight
+  local current = redis.call('HINCRBY', KEYS[1], ARGV[index], weight)
+  if selected_current == nil or current > selected_current then
+    selected_id = ARGV[index]
+    selected_current = current
+  end
+end
+redis.call('HINCRBY', KEYS[1], selected_id, -total_weight)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+return selected_id
+"""
+
 
 class ModelRouter:
-    def __init__(self, circuit_breaker: CircuitBreaker) -> None:
+    def __init__(
+        self,
+        circuit_breaker: CircuitBreaker,
+        *,
+        prompt_tokens_estimate: int = 0,
+        affinity_key: str | None = None,
+    ) -> None:
         self.circuit_breaker = circuit_breaker
+        self.prompt_tokens_estimate = prompt_tokens_estimate
+        self.affinity_key = affinity_key
+        self.routing_strategy: str | None = None
         self._last_sequential_state_key: str | None = None
+        self._inflight_lease: InflightLease | None = None
+        self._token_reservation: TokenReservation | None = None
+        self._sequential_prefetch: dict[str, int | None] = {}
+        self._half_open_scopes: dict[tuple[int, str], list[CircuitScope]] = {}
+        self.rate_limit_retry_after: float | None = None
+        self.reserve_failure_reason: str | None = None
+        self.rule_options = RuleOptions()
 
     async def get_candidates(
         self,
@@ -83,56 +191,45 @@ class ModelRouter:
         allow_default_rule_fallback: bool = True,
         exposure_format: str = DEFAULT_EXPOSURE_FORMAT,
     ) -> tuple[list[RouteCandidate], str]:
-        selection = await self._select_rule_targets(
-            session, model_alias, rule_group, exposure_format=exposure_format
+        snapshot = await get_routing_snapshot(session, self.circuit_breaker.redis)
+        selection, effective_group = self.resolve_rule_selection(
+            snapshot,
+            model_alias,
+            rule_group,
+            exposure_format=exposure_format,
+            allow_default_rule_fallback=allow_default_rule_fallback,
         )
-        effective_group = rule_group
-        if not selection.exposure_supported:
+        if selection is None:
             return [], effective_group
-        if not selection.matched_rule:
-            if rule_group.lower() == "default" or not allow_default_rule_fallback:
-                return [], effective_group
-            fallback_selection = await self._select_rule_targets(
-                session,
-                model_alias,
-                "default",
-                exposure_format=exposure_format,
-            )
-            if (
-                not fallback_selection.exposure_supported
-                or not fallback_selection.matched_rule
-            ):
-                return [], effective_group
-            selection = fallback_selection
-            effective_group = "default"
         target_key_ids = selection.target_key_ids
         strategy = selection.strategy
+        self.rule_options = selection.options
+        self.routing_strategy = strategy or DEFAULT_RULE_STRATEGY
         if effective_group.lower() != "default" and not target_key_ids:
             return [], effective_group
-        stmt = (
-            select(APIKey, Endpoint, ModelMap)
-            .join(Endpoint, APIKey.endpoint_id == Endpoint.id)
-            .join(ModelMap, ModelMap.endpoint_id == Endpoint.id)
-            .where(
-                ModelMap.model_alias == model_alias,
-                APIKey.is_active.is_(True),
-                Endpoint.is_active.is_(True),
+        sequential_state_key = None
+        if (strategy or DEFAULT_RULE_STRATEGY) == "sequential":
+            sequential_state_key = self._sequential_state_key(
+                model_alias=model_alias,
+                effective_group=effective_group,
+                provider_filters=provider_filters,
+                target_key_ids=target_key_ids,
             )
-            .order_by(APIKey.id)
-        )
-        if target_key_ids:
-            stmt = stmt.where(APIKey.id.in_(target_key_ids))
-
-        result = await session.execute(stmt)
-        rows = result.all()
+        target_key_set = set(target_key_ids)
         all_candidates = [
             RouteCandidate(
-                api_key=api_key, endpoint=endpoint, real_model=model_map.real_model
+                api_key=route.api_key, endpoint=route.endpoint, real_model=route.real_model
             )
-            for api_key, endpoint, model_map in rows
+            for route in snapshot.routes_for_alias(model_alias)
+            if not target_key_set or route.api_key.id in target_key_set
         ]
         candidates = await self._filter_available_candidates(
-            session, all_candidates, effective_group, target_key_ids=target_key_ids
+            session,
+            all_candidates,
+            effective_group,
+            target_key_ids=target_key_ids,
+            agent_state=snapshot.agent_states,
+            sequential_state_key=sequential_state_key,
         )
         candidates = self._filter_provider_candidates(
             candidates,
@@ -143,6 +240,7 @@ class ModelRouter:
         if not candidates and allow_unmapped_fallback:
             fallback_candidates = await self._load_unmapped_candidates(
                 session,
+                snapshot,
                 model_alias,
                 effective_group,
                 target_key_ids=target_key_ids,
@@ -161,7 +259,7 @@ class ModelRouter:
             provider_filters=provider_filters,
             target_key_ids=target_key_ids,
         )
-        return ordered, effective_group
+        return get_concurrency_limiter().prefer_unsaturated(ordered), effective_group
 
     async def order_candidates(
         self,
@@ -175,8 +273,32 @@ class ModelRouter:
     ) -> list[RouteCandidate]:
         context_key = f"{model_alias}:{effective_group}:{strategy}"
         normalized = strategy or DEFAULT_RULE_STRATEGY
+        if normalized == AFFINITY_STRATEGY and self.affinity_key and candidates:
+            self._last_sequential_state_key = None
+            inflight_counts = await get_inflight_counts(
+                [candidate.api_key.id for candidate in candidates],
+                self.circuit_breaker.redis,
+            )
+            return self._order_affinity(candidates, self.affinity_key, inflight_counts)
+        if normalized == LEAST_INFLIGHT_STRATEGY:
+            self._last_sequential_state_key = None
+            inflight_counts = await get_inflight_counts(
+                [candidate.api_key.id for candidate in candidates],
+                self.circuit_breaker.redis,
+            )
+            return self._order_candidates(
+                candidates,
+                normalized,
+                context_key,
+                target_key_ids,
+                inflight_counts=inflight_counts,
+            )
         if normalized != "sequential":
             self._last_sequential_state_key = None
+            if normalized not in {LEAST_LATENCY_STRATEGY, LEAST_INFLIGHT_STRATEGY}:
+                selected = await self._select_shared_wrr_candidate(candidates, context_key)
+                if selected is not None:
+                    return self._order_around_selected(candidates, selected)
             return self._order_candidates(
                 candidates, normalized, context_key, target_key_ids
             )
@@ -188,7 +310,10 @@ class ModelRouter:
             target_key_ids=target_key_ids,
         )
         self._last_sequential_state_key = state_key
-        active_key_id = await self._get_sequential_active_key_id(state_key)
+        if state_key in self._sequential_prefetch:
+            active_key_id = self._sequential_prefetch[state_key]
+        else:
+            active_key_id = await self._get_sequential_active_key_id(state_key)
         return self._order_candidates(
             candidates,
             normalized,
@@ -206,6 +331,24 @@ class ModelRouter:
             ex=SEQUENTIAL_STATE_TTL_SECONDS,
         )
 
+    async def record_attempt_success(self, candidate: RouteCandidate) -> None:
+        """Close the key's circuit and pin the sequential primary in one round trip."""
+        get_retry_budget().deposit(candidate.endpoint.id)
+        scopes = self.circuit_breaker.candidate_scopes(candidate)
+        pipe = redis_pipeline(self.circuit_breaker.redis)
+        queued = self.circuit_breaker.queue_success(pipe, scopes)
+        if self._last_sequential_state_key:
+            pipe.set(
+                self._last_sequential_state_key,
+                str(candidate.api_key.id),
+                ex=SEQUENTIAL_STATE_TTL_SECONDS,
+            )
+        results = await pipe.execute() if len(pipe) else []
+        if queued:
+            await self.circuit_breaker.finish_success(scopes, results[0])
+        else:
+            await self.circuit_breaker.record_scope_success(scopes)
+
     async def get_sequential_active_key_id(
         self,
         *,
@@ -225,45 +368,43 @@ class ModelRouter:
     async def _load_unmapped_candidates(
         self,
         session: AsyncSession,
+        snapshot: RoutingSnapshot,
         model_alias: str,
         effective_group: str,
         *,
         target_key_ids: list[int],
     ) -> list[RouteCandidate]:
-        fallback_stmt = (
-            select(APIKey, Endpoint)
-            .join(Endpoint, APIKey.endpoint_id == Endpoint.id)
-            .where(
-                APIKey.is_active.is_(True),
-                Endpoint.is_active.is_(True),
-            )
-            .order_by(APIKey.id)
-        )
-        if target_key_ids:
-            fallback_stmt = fallback_stmt.where(APIKey.id.in_(target_key_ids))
-        result = await session.execute(fallback_stmt)
+        target_key_set = set(target_key_ids)
         candidates = [
             RouteCandidate(api_key=api_key, endpoint=endpoint, real_model=model_alias)
-            for api_key, endpoint in result.all()
+            for api_key, endpoint in snapshot.active_routes
+            if not target_key_set or api_key.id in target_key_set
         ]
         return await self._filter_available_candidates(
             session,
             candidates,
             effective_group,
             target_key_ids=target_key_ids,
+            agent_state=snapshot.agent_states,
         )
 
     async def _filter_available_candidates(
         self,
-        session: AsyncSession,
+        session: AsyncSession | None,
         candidates: Sequence[RouteCandidate],
         effective_group: str,
         *,
         target_key_ids: list[int],
+        agent_state: Mapping[str, AgentRouteState] | None = None,
+        sequential_state_key: str | None = None,
     ) -> list[RouteCandidate]:
-        via_agent_names = {candidate.agent_name for candidate in candidates if candidate.agent_name}
-        agent_state = await self._load_agent_route_state(session, via_agent_names)
+        if agent_state is None:
+            via_agent_names = {
+                candidate.agent_name for candidate in candidates if candidate.agent_name
+            }
+            agent_state = await self._load_agent_route_state(session, via_agent_names)
         agent_manager = get_agent_manager()
+        daily_usage = await self._load_daily_usage(session, candidates)
 
         eligible: list[RouteCandidate] = []
         for candidate in candidates:
@@ -274,34 +415,33 @@ class ModelRouter:
                         continue
                 elif getattr(api_key, "rule_group", "default") != effective_group:
                     continue
-            if not self._passes_key_limits(api_key):
+            if not self._passes_key_limits(api_key, daily_usage):
                 continue
             eligible.append(candidate)
 
-        circuit_availability = await self.circuit_breaker.are_available(
-            [candidate.api_key.id for candidate in eligible]
+        state = await self._load_routing_state(
+            eligible, sequential_state_key=sequential_state_key
         )
 
-        circuit_available: list[RouteCandidate] = []
+        available: list[RouteCandidate] = []
         for candidate in eligible:
             api_key = candidate.api_key
-            if not circuit_availability.get(api_key.id, True):
+            if not self._passes_circuits(candidate, state.circuit_states):
                 continue
-            circuit_available.append(candidate)
-
-        rpm_counts = await self._load_rpm_counts(circuit_available)
-
-        available: list[RouteCandidate] = []
-        for candidate in circuit_available:
-            api_key = candidate.api_key
-            if not self._passes_rpm_limit(api_key, rpm_counts.get(api_key.id, 0)):
+            if not self._passes_rate_limits(api_key, state.bucket_tokens):
+                continue
+            if not self._passes_provider_cooldown(api_key, state.cooldown_until):
                 continue
             if candidate.execution_mode == "via_agent":
                 agent_name = candidate.agent_name
                 if not agent_name:
                     continue
-                state = agent_state.get(agent_name)
-                if state is None or not state.is_active or state.is_draining:
+                agent_route_state = agent_state.get(agent_name)
+                if (
+                    agent_route_state is None
+                    or not agent_route_state.is_active
+                    or agent_route_state.is_draining
+                ):
                     continue
                 if agent_manager.get(agent_name) is None:
                     continue
@@ -309,17 +449,56 @@ class ModelRouter:
         return available
 
     @staticmethod
-    def _passes_key_limits(api_key: APIKey) -> bool:
+    async def _load_daily_usage(
+        session: AsyncSession | None, candidates: Sequence[RouteCandidate]
+    ) -> dict[int, tuple[int | None, date | None]]:
+        """Read live ``used_today`` counters of daily-limited candidate keys.
+
+        Billing updates these on every request without bumping the routing
+        snapshot version, so they are never served from the snapshot.
+        """
+        key_ids = list(
+            dict.fromkeys(
+                candidate.api_key.id
+                for candidate in candidates
+                if getattr(candidate.api_key, "daily_limit", None) is not None
+            )
+        )
+        if session is None or not key_ids:
+            return {}
+        try:
+            result = await session.execute(
+                select(APIKey.id, APIKey.used_today, APIKey.used_today_date).where(
+                    APIKey.id.in_(key_ids)
+                )
+            )
+        except (AttributeError, AssertionError):
+            return {}
+        return {
+            api_key_id: (used_today, used_today_date)
+            for api_key_id, used_today, used_today_date in result.all()
+        }
+
+    @staticmethod
+    def _passes_key_limits(
+        api_key: APIKey,
+        daily_usage: Mapping[int, tuple[int | None, date | None]] | None = None,
+    ) -> bool:
         today = app_today()
-        used_today = getattr(api_key, "used_today", 0) or 0
-        if getattr(api_key, "used_today_date", None) != today:
+        if daily_usage and api_key.id in daily_usage:
+            used_today, used_today_date = daily_usage[api_key.id]
+        else:
+            used_today = getattr(api_key, "used_today", 0)
+            used_today_date = getattr(api_key, "used_today_date", None)
+        used_today = used_today or 0
+        if used_today_date != today:
             used_today = 0
         daily_limit = getattr(api_key, "daily_limit", None)
         return daily_limit is None or used_today < daily_limit
 
     @staticmethod
-    def _rpm_limit(api_key: APIKey) -> int | None:
-        raw_limit = getattr(api_key, "rpm_limit", None)
+    def _key_limit(api_key: APIKey, field_name: str) -> int | None:
+        raw_limit = getattr(api_key, field_name, None)
         if raw_limit is None:
             return None
         try:
@@ -328,44 +507,244 @@ class ModelRouter:
             return None
 
     @staticmethod
-    def _rpm_state_key(api_key_id: int, now: datetime | None = None) -> str:
-        timestamp = now or datetime.now(timezone.utc)
-        window = timestamp.astimezone(timezone.utc).strftime("%Y%m%d%H%M")
-        return f"rate:rpm:{api_key_id}:{window}"
+    def _rpm_state_key(api_key_id: int) -> str:
+        return f"{RPM_BUCKET_PREFIX}:{api_key_id}"
 
-    @classmethod
-    def _passes_rpm_limit(cls, api_key: APIKey, current_count: int) -> bool:
-        rpm_limit = cls._rpm_limit(api_key)
-        return rpm_limit is None or current_count < rpm_limit
-
-    async def _load_rpm_counts(
-        self, candidates: Sequence[RouteCandidate]
-    ) -> dict[int, int]:
-        ids_and_keys = [
-            (candidate.api_key.id, self._rpm_state_key(candidate.api_key.id))
+    def _rate_buckets(self, api_key: APIKey) -> list[RateBucket]:
+        burst_seconds = max(get_settings().rpm_burst_seconds, 1.0)
+        buckets: list[RateBucket] = []
+        rpm_limit = self._key_limit(api_key, "rpm_limit")
+        if rpm_limit is not None:
+            buckets.append(
+                RateBucket.for_limit(
+                    self._rpm_state_key(api_key.id),
+                    rpm_limit,
+                    burst_seconds,
+                    cost=1.0,
+                    reason="rpm_limit",
+                )
+            )
+        tpm_limit = self._key_limit(api_key, "tpm_limit")
+        if tpm_limit is not None:
+            buckets.append(
+                RateBucket.for_limit(
+                    tpm_state_key(api_key.id),
+                    tpm_limit,
+                    burst_seconds,
+                    cost=self.prompt_tokens_estimate,
+                    reason="tpm_limit",
+                )
+            )
+        return buckets
+
+    def _note_rate_limit_wait(self, seconds: float | None) -> None:
+        if seconds is None:
+            return
+        if self.rate_limit_retry_after is None or seconds < self.rate_limit_retry_after:
+            self.rate_limit_retry_after = seconds
+
+    def _passes_rate_limits(self, api_key: APIKey, tokens: Mapping[str, float]) -> bool:
+        for bucket in self._rate_buckets(api_key):
+            if bucket.capacity <= 0:
+                return False
+            available = tokens.get(bucket.state_key)
+            if available is None or available >= bucket.cost:
+                continue
+            self._note_rate_limit_wait((bucket.cost - available) / bucket.refill_per_second)
+            return False
+        return True
+
+    def _passes_provider_cooldown(
+        self, api_key: APIKey, cooldown_until: Mapping[int, float]
+    ) -> bool:
+        until = cooldown_until.get(api_key.id)
+        if until is None:
+            return True
+        self._note_rate_limit_wait(until - time.time())
+        return False
+
+    def _passes_circuits(self, candidate: RouteCandidate, states: Mapping[str, str]) -> bool:
+        """Every scope must admit the candidate; half-open scopes need a trial permit."""
+        half_open: list[CircuitScope] = []
+        for scope in self.circuit_breaker.candidate_scopes(candidate):
+            circuit_state = states.get(scope.state_key, CIRCUIT_CLOSED)
+            if circuit_state == CIRCUIT_OPEN:
+                return False
+            if circuit_state == CIRCUIT_HALF_OPEN:
+                half_open.append(scope)
+        if half_open:
+            self._half_open_scopes[(candidate.api_key.id, candidate.real_model)] = half_open
+        return True
+
+    async def _load_routing_state(
+        self,
+        candidates: Sequence[RouteCandidate],
+        *,
+        sequential_state_key: str | None = None,
+    ) -> RoutingState:
+        """Read circuits, rate limits, cooldowns and sequential state in one round trip.
+
+        The endpoint, key and key+model circuits and the provider cooldown of every
+        candidate are read with a single MGET.
+        """
+        circuit_keys = list(
+            dict.fromkeys(
+                scope.state_key
+                for candidate in candidates
+                for scope in self.circuit_breaker.candidate_scopes(candidate)
+            )
+        )
+        buckets = [
+            bucket
             for candidate in candidates
-            if self._rpm_limit(candidate.api_key) is not None
+            for bucket in self._rate_buckets(candidate.api_key)
+            if bucket.capacity > 0
         ]
-        if not ids_and_keys:
-            return {}
-        values = await self.circuit_breaker.redis.mget([key for _, key in ids_and_keys])
-        counts: dict[int, int] = {}
-        for (api_key_id, _), value in zip(ids_and_keys, values, strict=False):
-            try:
-                counts[api_key_id] = int(value or 0)
-            except (TypeError, ValueError):
-                counts[api_key_id] = 0
-        return counts
-
-    async def reserve_candidate_attempt(self, candidate: RouteCandidate) -> bool:
-        rpm_limit = self._rpm_limit(candidate.api_key)
-        if rpm_limit is None:
-            return True
-        key = self._rpm_state_key(candidate.api_key.id)
-        count = await self.circuit_breaker.redis.incr(key)
-        if count == 1:
-            await self.circuit_breaker.redis.expire(key, RPM_STATE_TTL_SECONDS)
-        return count <= rpm_limit
+        cooldown_key_ids = list(dict.fromkeys(candidate.api_key.id for candidate in candidates))
+        state = RoutingState()
+        if not circuit_keys and not buckets and sequential_state_key is None:
+            return state
+        pipe = redis_pipeline(self.circuit_breaker.redis)
+        if circuit_keys:
+            pipe.mget(
+                circuit_keys + [cooldown_key(api_key_id) for api_key_id in cooldown_key_ids]
+            )
+        if buckets:
+            pipe.mget([bucket.state_key for bucket in buckets])
+        if sequential_state_key is not None:
+            pipe.get(sequential_state_key)
+        results = iter(await pipe.execute())
+
+        if circuit_keys:
+            values = next(results)
+            state.circuit_states = self.circuit_breaker.route_states(
+                circuit_keys, values[: len(circuit_keys)]
+            )
+            now = time.time()
+            for api_key_id, raw in zip(
+                cooldown_key_ids, values[len(circuit_keys) :], strict=False
+            ):
+                until = parse_cooldown_until(raw, now)
+                if until is not None:
+                    state.cooldown_until[api_key_id] = until
+        if buckets:
+            now = time.time()
+            state.bucket_tokens = {
+                bucket.state_key: bucket_tokens(
+                    value,
+                    capacity=bucket.capacity,
+                    refill_per_second=bucket.refill_per_second,
+                    now=now,
+                )
+                for bucket, value in zip(buckets, next(results), strict=False)
+            }
+        if sequential_state_key is not None:
+            active_key_id = _parse_key_id(next(results))
+            self._sequential_prefetch[sequential_state_key] = active_key_id
+        return state
+
+    async def _refund_buckets(self, buckets: Sequence[RateBucket]) -> None:
+        for bucket in buckets:
+            await take_tokens(
+                self.circuit_breaker.redis,
+                bucket.state_key,
+                capacity=bucket.capacity,
+                refill_per_second=bucket.refill_per_second,
+                cost=-bucket.cost,
+                force=True,
+            )
+
+    async def reserve_candidate_attempt(
+        self, candidate: RouteCandidate, *, queue_seconds: float = 0.0
+    ) -> bool:
+        # Attempts within one request run one after another, so starting a new
+        # attempt always ends the previous one.
+        await self.release_attempt()
+        redis = self.circuit_breaker.redis
+        limiter = get_concurrency_limiter()
+        await limiter.publish_if_due(redis)
+        if not await limiter.acquire_slot(candidate.api_key.id, queue_seconds):
+            self.reserve_failure_reason = "concurrency_limit"
+            return False
+        taken: list[RateBucket] = []
+        for bucket in self._rate_buckets(candidate.api_key):
+            result = await take_tokens(
+                redis,
+                bucket.state_key,
+                capacity=bucket.capacity,
+                refill_per_second=bucket.refill_per_second,
+                cost=bucket.cost,
+            )
+            if not result.allowed:
+                self.reserve_failure_reason = bucket.reason
+                self._note_rate_limit_wait(result.retry_after_seconds)
+                await self._refund_buckets(taken)
+                return False
+            taken.append(bucket)
+        # Half-open keys only take a limited number of trial requests; the
+        # permit is taken last so a rate-limit denial never wastes it.
+        half_open_scopes = self._half_open_scopes.get(
+            (candidate.api_key.id, candidate.real_model)
+        )
+        if half_open_scopes:
+            if not await self.circuit_breaker.acquire_trial(half_open_scopes):
+                self.reserve_failure_reason = "circuit_half_open"
+                await self._refund_buckets(taken)
+                return False
+        for bucket in taken:
+            if bucket.reason == "tpm_limit":
+                self._token_reservation = TokenReservation(
+                    api_key_id=candidate.api_key.id,
+                    redis=redis,
+                    capacity=bucket.capacity,
+                    refill_per_second=bucket.refill_per_second,
+                    reserved=bucket.cost,
+                )
+        self._inflight_lease = await acquire_inflight(candidate.api_key.id, redis)
+        return True
+
+    def fork(self) -> "ModelRouter":
+        """Router for a concurrent hedge attempt.
+
+        It shares the request's routing state but keeps its own in-flight lease
+        and TPM reservation, so either attempt can be released independently.
+        """
+        forked = ModelRouter(
+            self.circuit_breaker,
+            prompt_tokens_estimate=self.prompt_tokens_estimate,
+            affinity_key=self.affinity_key,
+        )
+        forked.routing_strategy = self.routing_strategy
+        forked._last_sequential_state_key = self._last_sequential_state_key
+        forked._half_open_scopes = self._half_open_scopes
+        forked.rule_options = self.rule_options
+        return forked
+
+    def detach_inflight_lease(self) -> InflightLease | None:
+        """Hand the current attempt's lease to a stream that outlives the handler."""
+        lease = self._inflight_lease
+        self._inflight_lease = None
+        return lease
+
+    def detach_token_reservation(self) -> TokenReservation | None:
+        """Hand the current attempt's TPM reservation to a stream for reconciliation."""
+        reservation = self._token_reservation
+        self._token_reservation = None
+        return reservation
+
+    async def settle_token_reservation(self, actual_tokens: int | None) -> None:
+        reservation = self.detach_token_reservation()
+        if reservation is not None:
+            await reservation.settle(actual_tokens)
+
+    async def release_attempt(self) -> None:
+        """End the current attempt; an unsettled TPM reservation is refunded."""
+        lease = self.detach_inflight_lease()
+        if lease is not None:
+            await lease.release()
+        reservation = self.detach_token_reservation()
+        if reservation is not None:
+            await reservation.refund()
 
     @staticmethod
     def _filter_provider_candidates(
@@ -414,20 +793,41 @@ class ModelRouter:
     def _candidate_weight(candidate: RouteCandidate) -> int:
         return max(getattr(candidate.api_key, "weight", 1), 1)
 
-    async def _select_rule_targets(
-        self,
-        session: AsyncSession,
+    @staticmethod
+    def resolve_rule_selection(
+        snapshot: RoutingSnapshot,
         model_alias: str,
         rule_group: str,
         *,
         exposure_format: str = DEFAULT_EXPOSURE_FORMAT,
-    ) -> RuleTargetSelection:
-        result = await session.execute(
-            select(RoutingRule)
-            .where(RoutingRule.group_name == rule_group, RoutingRule.is_active.is_(True))
-            .order_by(RoutingRule.priority.desc(), RoutingRule.id)
+        allow_default_rule_fallback: bool = True,
+    ) -> tuple[RuleTargetSelection | None, str]:
+        """Matching rule and the group it came from; None when nothing may serve the alias."""
+        selection = ModelRouter._select_rule_targets(
+            snapshot, model_alias, rule_group, exposure_format=exposure_format
         )
-        rules = result.scalars().all()
+        if not selection.exposure_supported:
+            return None, rule_group
+        if selection.matched_rule:
+            return selection, rule_group
+        if rule_group.lower() == "default" or not allow_default_rule_fallback:
+            return None, rule_group
+        fallback_selection = ModelRouter._select_rule_targets(
+            snapshot, model_alias, "default", exposure_format=exposure_format
+        )
+        if not fallback_selection.exposure_supported or not fallback_selection.matched_rule:
+            return None, rule_group
+        return fallback_selection, "default"
+
+    @staticmethod
+    def _select_rule_targets(
+        snapshot: RoutingSnapshot,
+        model_alias: str,
+        rule_group: str,
+        *,
+        exposure_format: str = DEFAULT_EXPOSURE_FORMAT,
+    ) -> RuleTargetSelection:
+        rules = snapshot.rules_for_group(rule_group)
         if not rules and rule_group.lower() == "default":
             return RuleTargetSelection(
                 target_key_ids=[],
@@ -436,37 +836,30 @@ class ModelRouter:
                 exposure_supported=True,
             )
         fallback: RuleTargetSelection | None = None
-        exposure_supported = False
-        for rule in rules:
-            _, _, rule_exposure_formats = self._parse_rule_config_detail(
-                rule.target_key_ids_json
-            )
+        exposure_supported = any(
+            exposure_format_match_priority(list(entry.exposure_formats), exposure_format)
+            is not None
+            for entry in rules
+        )
+        for entry in snapshot.matching_rules(rule_group, model_alias):
             match_priority = exposure_format_match_priority(
-                rule_exposure_formats, exposure_format
+                list(entry.exposure_formats), exposure_format
             )
-            if match_priority is not None:
-                exposure_supported = True
-            if not model_pattern_matches(rule.model_pattern, model_alias):
-                continue
             if match_priority == 2:
-                target_key_ids, strategy = self._parse_rule_config(
-                    rule.target_key_ids_json
-                )
                 return RuleTargetSelection(
-                    target_key_ids=target_key_ids,
-                    strategy=strategy,
+                    target_key_ids=list(entry.target_key_ids),
+                    strategy=entry.strategy,
                     matched_rule=True,
                     exposure_supported=True,
+                    options=entry.options,
                 )
             if match_priority == 1 and fallback is None:
-                target_key_ids, strategy = self._parse_rule_config(
-                    rule.target_key_ids_json
-                )
                 fallback = RuleTargetSelection(
-                    target_key_ids=target_key_ids,
-                    strategy=strategy,
+                    target_key_ids=list(entry.target_key_ids),
+                    strategy=entry.strategy,
                     matched_rule=True,
                     exposure_supported=True,
+                    options=entry.options,
                 )
         return fallback or RuleTargetSelection(
             target_key_ids=[],
@@ -477,25 +870,7 @@ class ModelRouter:
 
     @staticmethod
     def _parse_rule_config_detail(raw: str) -> tuple[list[int], str, list[str]]:
-        if not raw:
-            return [], DEFAULT_RULE_STRATEGY, []
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
-            return [], DEFAULT_RULE_STRATEGY, []
-        if isinstance(data, dict):
-            target_key_ids = ModelRouter._parse_key_ids(
-                data.get("target_key_ids", [])
-            )
-            strategy = data.get("strategy") or DEFAULT_RULE_STRATEGY
-            if not isinstance(strategy, str):
-                strategy = str(strategy)
-            return (
-                target_key_ids,
-                strategy,
-                normalize_exposure_formats(data.get("exposure_formats", [])),
-            )
-        return [], DEFAULT_RULE_STRATEGY, []
+        return parse_rule_config_detail(raw)
 
     @staticmethod
     def _parse_rule_config(raw: str) -> tuple[list[int], str]:
@@ -504,15 +879,7 @@ class ModelRouter:
 
     @staticmethod
     def _parse_key_ids(data: object) -> list[int]:
-        if not isinstance(data, list):
-            return []
-        parsed: list[int] = []
-        for item in data:
-            if isinstance(item, int):
-                parsed.append(item)
-            elif isinstance(item, str) and item.isdigit():
-                parsed.append(int(item))
-        return parsed
+        return parse_key_ids(data)
 
     @staticmethod
     def _pool_key(candidates: Sequence[RouteCandidate], context: str) -> str:
@@ -543,13 +910,38 @@ class ModelRouter:
         return f"route:sequential:active:{digest}"
 
     async def _get_sequential_active_key_id(self, state_key: str) -> int | None:
-        raw = await self.circuit_breaker.redis.get(state_key)
-        if raw is None:
+        return _parse_key_id(await self.circuit_breaker.redis.get(state_key))
+
+    def _shared_wrr_redis(self):  # noqa: ANN202
+        redis = getattr(self.circuit_breaker, "redis", None)
+        if redis is None or not get_settings().wrr_shared_state_enabled:
+            return None
+        if isinstance(redis, MemoryRedis) or not hasattr(redis, "eval"):
             return None
+        return redis
+
+    async def _select_shared_wrr_candidate(
+        self, candidates: Sequence[RouteCandidate], context: str
+    ) -> RouteCandidate | None:
+        redis = self._shared_wrr_redis()
+        if redis is None or not candidates:
+            return None
+        ordered = sorted(candidates, key=lambda item: item.api_key.id)
+        pool_key = ModelRouter._pool_key(ordered, context)
+        digest = hashlib.sha256(pool_key.encode("utf-8")).hexdigest()
+        args: list[int] = [WRR_SHARED_STATE_TTL_SECONDS]
+        for candidate in ordered:
+            args.extend((candidate.api_key.id, ModelRouter._candidate_weight(candidate)))
         try:
-            return int(raw)
-        except (TypeError, ValueError):
+            raw = await redis.eval(WRR_SELECT_SCRIPT, 1, f"route:wrr:{digest}", *args)
+            selected_id = int(raw)
+        except Exception as exc:
+            logger.warning("Shared WRR state unavailable, using local state: %s", exc)
             return None
+        return next(
+            (candidate for candidate in ordered if candidate.api_key.id == selected_id),
+            None,
+        )
 
     @staticmethod
     def _select_wrr_candidate(
@@ -583,6 +975,82 @@ class ModelRouter:
         state[selected.api_key.id] -= total_weight
         return selected
 
+    @staticmethod
+    def _order_least_latency(candidates: Sequence[RouteCandidate]) -> list[RouteCandidate]:
+        costs = get_key_latency_costs([candidate.api_key.id for candidate in candidates])
+        ordered = sorted(
+            candidates,
+            key=lambda candidate: (
+                costs[candidate.api_key.id],
+                -ModelRouter._candidate_weight(candidate),
+                candidate.api_key.id,
+            ),
+        )
+        draw_weights = [
+            ModelRouter._candidate_weight(candidate) / costs[candidate.api_key.id] ** 2
+            for candidate in ordered
+        ]
+        threshold = random.random() * sum(draw_weights)
+        selected_index = len(ordered) - 1
+        for index, draw_weight in enumerate(draw_weights):
+            threshold -= draw_weight
+            if threshold < 0:
+                selected_index = index
+                break
+        return [ordered[selected_index], *ordered[:selected_index], *ordered[selected_index + 1 :]]
+
+    @staticmethod
+    def _order_least_inflight(
+        candidates: Sequence[RouteCandidate],
+        inflight_counts: Mapping[int, int],
+    ) -> list[RouteCandidate]:
+        def load(candidate: RouteCandidate) -> float:
+            return inflight_counts.get(candidate.api_key.id, 0) / ModelRouter._candidate_weight(
+                candidate
+            )
+
+        ordered = sorted(candidates, key=lambda candidate: (load(candidate), candidate.api_key.id))
+        if len(ordered) < 2:
+            return ordered
+        # Power of two choices: draw two distinct keys by weight, keep the less loaded one.
+        pool = list(candidates)
+        choices: list[RouteCandidate] = []
+        for _ in range(2):
+            weights = [ModelRouter._candidate_weight(candidate) for candidate in pool]
+            threshold = random.random() * sum(weights)
+            picked_index = len(pool) - 1
+            for index, weight in enumerate(weights):
+                threshold -= weight
+                if threshold < 0:
+                    picked_index = index
+                    break
+            choices.append(pool.pop(picked_index))
+        selected = min(choices, key=load)
+        return [selected, *[candidate for candidate in ordered if candidate is not selected]]
+
+    @staticmethod
+    def _order_affinity(
+        candidates: Sequence[RouteCandidate],
+        affinity_key: str,
+        inflight_counts: Mapping[int, int],
+    ) -> list[RouteCandidate]:
+        key_weights = {
+            candidate.api_key.id: ModelRouter._candidate_weight(candidate)
+            for candidate in candidates
+        }
+        rank = {
+            key_id: index
+            for index, key_id in enumerate(
+                affinity_order(
+                    key_weights,
+                    affinity_key,
+                    inflight_counts,
+                    get_settings().affinity_load_factor,
+                )
+            )
+        }
+        return sorted(candidates, key=lambda candidate: rank[candidate.api_key.id])
+
     @staticmethod
     def _order_candidates(
         candidates: Sequence[RouteCandidate],
@@ -590,6 +1058,7 @@ class ModelRouter:
         context: str = "",
         target_key_ids: list[int] | None = None,
         active_key_id: int | None = None,
+        inflight_counts: Mapping[int, int] | None = None,
     ) -> list[RouteCandidate]:
         if not candidates:
             return []
@@ -616,7 +1085,17 @@ class ModelRouter:
             if active_index is None:
                 return ordered
             return [*ordered[active_index:], *ordered[:active_index]]
+        if normalized == LEAST_LATENCY_STRATEGY:
+            return ModelRouter._order_least_latency(candidates)
+        if normalized == LEAST_INFLIGHT_STRATEGY:
+            return ModelRouter._order_least_inflight(candidates, inflight_counts or {})
         selected = ModelRouter._select_wrr_candidate(candidates, context)
+        return ModelRouter._order_around_selected(candidates, selected)
+
+    @staticmethod
+    def _order_around_selected(
+        candidates: Sequence[RouteCandidate], selected: RouteCandidate
+    ) -> list[RouteCandidate]:
         remaining = [
             candidate
             for candidate in candidates
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+import logging
+import time
+from types import MappingProxyType
+from typing import Any, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.route_exposure import normalize_exposure_formats
+from app.db.models import APIKey, Agent, Endpoint, ModelMap, RoutingRule
+from app.services.rule_options import RuleOptions, parse_rule_options
+from app.services.model_patterns import ModelPatternIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULE_STRATEGY = "weighted_round_robin"
+ROUTING_SNAPSHOT_VERSION_KEY = "routing:snapshot:version"
+# 用量计数每次请求都会变，不进入快照；每日额度由选路时实时查询
+SNAPSHOT_EXCLUDED_KEY_COLUMNS = frozenset({"used_today", "used_today_date", "total_usage"})
+
+_ModelT = TypeVar("_ModelT")
+
+
+@dataclass(frozen=True)
+class AgentRouteState:
+    is_active: bool
+    is_draining: bool
+
+
+@dataclass(frozen=True)
+class SnapshotRule:
+    rule: RoutingRule
+    target_key_ids: tuple[int, ...]
+    strategy: str
+    exposure_formats: tuple[str, ...]
+    options: RuleOptions = RuleOptions()
+
+
+@dataclass(frozen=True)
+class MappedRoute:
+    api_key: APIKey
+    endpoint: Endpoint
+    real_model: str
+
+
+@dataclass(frozen=True)
+class RoutingSnapshot:
+    """Immutable view of the routing tables, shared by every request in a worker."""
+
+    version: str
+    built_at: float
+    rules_by_group: Mapping[str, tuple[SnapshotRule, ...]]
+    mapped_routes: Mapping[str, tuple[MappedRoute, ...]]
+    active_routes: tuple[tuple[APIKey, Endpoint], ...]
+    agent_states: Mapping[str, AgentRouteState]
+    rule_index_by_group: Mapping[str, ModelPatternIndex[SnapshotRule]]
+
+    def rules_for_group(self, group_name: str) -> tuple[SnapshotRule, ...]:
+        return self.rules_by_group.get(group_name, ())
+
+    def matching_rules(self, group_name: str, model_alias: str) -> list[SnapshotRule]:
+        index = self.rule_index_by_group.get(group_name)
+        if index is None:
+            return []
+        return index.matches(model_alias)
+
+    def routes_for_alias(self, model_alias: str) -> tuple[MappedRoute, ...]:
+        return self.mapped_routes.get(model_alias, ())
+
+
+def parse_rule_config_detail(raw: str | None) -> tuple[list[int], str, list[str]]:
+    if not raw:
+        return [], DEFAULT_RULE_STRATEGY, []
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return [], DEFAULT_RULE_STRATEGY, []
+    if isinstance(data, dict):
+        target_key_ids = parse_key_ids(data.get("target_key_ids", []))
+        strategy = data.get("strategy") or DEFAULT_RULE_STRATEGY
+        if not isinstance(strategy, str):
+            strategy = str(strategy)
+        return (
+            target_key_ids,
+            strategy,
+            normalize_exposure_formats(data.get("exposure_formats", [])),
+        )
+    return [], DEFAULT_RULE_STRATEGY, []
+
+
+def parse_key_ids(data: object) -> list[int]:
+    if not isinstance(data, list):
+        return []
+    parsed: list[int] = []
+    for item in data:
+        if isinstance(item, int):
+            parsed.append(item)
+        elif isinstance(item, str) and item.isdigit():
+            parsed.append(int(item))
+    return parsed
+
+
+def _model_from_row(model: type[_ModelT], row: Any) -> _ModelT:
+    # Rows are read from the tables, not the ORM identity map, so snapshot
+    # objects are transient and never shared with (or refreshed by) a session.
+    return model(**dict(row._mapping))
+
+
+async def build_routing_snapshot(session: AsyncSession, *, version: str) -> RoutingSnapshot:
+    rule_table = RoutingRule.__table__
+    rule_result = await session.execute(
+        select(rule_table)
+        .where(rule_table.c.is_active.is_(True))
+        .order_by(rule_table.c.priority.desc(), rule_table.c.id)
+    )
+    rules_by_group: dict[str, list[SnapshotRule]] = {}
+    for row in rule_result.all():
+        rule = _model_from_row(RoutingRule, row)
+        target_key_ids, strategy, exposure_formats = parse_rule_config_detail(
+            rule.target_key_ids_json
+        )
+        rules_by_group.setdefault(rule.group_name, []).append(
+            SnapshotRule(
+                rule=rule,
+                target_key_ids=tuple(target_key_ids),
+                strategy=strategy,
+                exposure_formats=tuple(exposure_formats),
+                options=parse_rule_options(rule.target_key_ids_json),
+            )
+        )
+
+    endpoint_table = Endpoint.__table__
+    endpoint_result = await session.execute(
+        select(endpoint_table).where(endpoint_table.c.is_active.is_(True))
+    )
+    endpoints = {
+        row.id: _model_from_row(Endpoint, row) for row in endpoint_result.all()
+    }
+
+    key_table = APIKey.__table__
+    key_result = await session.execute(
+        select(
+            *(
+                column
+                for column in key_table.columns
+                if column.name not in SNAPSHOT_EXCLUDED_KEY_COLUMNS
+            )
+        )
+        .where(
+            key_table.c.is_active.is_(True),
+            key_table.c.endpoint_id.in_(list(endpoints)),
+        )
+        .order_by(key_table.c.id)
+    )
+    active_routes: list[tuple[APIKey, Endpoint]] = []
+    keys_by_endpoint: dict[int, list[APIKey]] = {}
+    for row in key_result.all():
+        api_key = _model_from_row(APIKey, row)
+        active_routes.append((api_key, endpoints[api_key.endpoint_id]))
+        keys_by_endpoint.setdefault(api_key.endpoint_id, []).append(api_key)
+
+    map_table = ModelMap.__table__
+    map_result = await session.execute(
+        select(map_table.c.endpoint_id, map_table.c.model_alias, map_table.c.real_model)
+        .where(map_table.c.endpoint_id.in_(list(endpoints)))
+        .order_by(map_table.c.id)
+    )
+    mapped_routes: dict[str, list[MappedRoute]] = {}
+    for endpoint_id, model_alias, real_model in map_result.all():
+        endpoint = endpoints[endpoint_id]
+        mapped_routes.setdefault(model_alias, []).extend(
+            MappedRoute(api_key=api_key, endpoint=endpoint, real_model=real_model)
+            for api_key in keys_by_endpoint.get(endpoint_id, [])
+        )
+
+    agent_table = Agent.__table__
+    agent_result = await session.execute(
+        select(agent_table.c.name, agent_table.c.is_active, agent_table.c.is_draining)
+    )
+    agent_states = {
+        name: AgentRouteState(is_active=bool(is_active), is_draining=bool(is_draining))
+        for name, is_active, is_draining in agent_result.all()
+    }
+
+    return RoutingSnapshot(
+        version=version,
+        built_at=time.monotonic(),
+        rules_by_group=MappingProxyType(
+            {group: tuple(rules) for group, rules in rules_by_group.items()}
+        ),
+        rule_index_by_group=MappingProxyType(
+            {
+                group: ModelPatternIndex((entry.rule.model_pattern, entry) for entry in rules)
+                for group, rules in rules_by_group.items()
+            }
+        ),
+        mapped_routes=MappingProxyType(
+            {
+                alias: tuple(sorted(routes, key=lambda route: route.api_key.id))
+                for alias, routes in mapped_routes.items()
+            }
+        ),
+        active_routes=tuple(active_routes),
+        agent_states=MappingProxyType(agent_states),
+    )
+
+
+_snapshot: RoutingSnapshot | None = None
+_version_checked_at = 0.0
+_build_lock: asyncio.Lock | None = None
+
+
+def _decode_version(value: str | bytes | None) -> str:
+    if value is None:
+        return "0"
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return str(value)
+
+
+async def _read_version(redis) -> str:  # noqa: ANN001
+    return _decode_version(await redis.get(ROUTING_SNAPSHOT_VERSION_KEY))
+
+
+def _get_build_lock() -> asyncio.Lock:
+    global _build_lock
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    return _build_lock
+
+
+def _snapshot_is_fresh(snapshot: RoutingSnapshot | None, now: float) -> bool:
+    if snapshot is None:
+        return False
+    max_age = get_settings().routing_snapshot_max_age_seconds
+    return max_age <= 0 or now - snapshot.built_at < max_age
+
+
+async def get_routing_snapshot(
+    session: AsyncSession,
+    redis=None,  # noqa: ANN001
+) -> RoutingSnapshot:
+    """Return the current snapshot, rebuilding it from ``session`` when stale.
+
+    The Redis version counter is consulted at most once per
+    ``routing_snapshot_version_check_seconds``; without ``redis`` the local
+    snapshot is trusted until it ages out.
+    """
+    global _snapshot, _version_checked_at
+    now = time.monotonic()
+    current = _snapshot
+    if _snapshot_is_fresh(current, now):
+        check_interval = get_settings().routing_snapshot_version_check_seconds
+        if redis is None or now - _version_checked_at < check_interval:
+            return current
+        version = await _read_version(redis)
+        _version_checked_at = now
+        if version == current.version:
+            return current
+    elif redis is not None:
+        version = await _read_version(redis)
+        _version_checked_at = now
+    else:
+        version = current.version if current is not None else "0"
+
+    async with _get_build_lock():
+        latest = _snapshot
+        if latest is not current and latest is not None and latest.version == version:
+            return latest
+        snapshot = await build_routing_snapshot(session, version=version)
+        _snapshot = snapshot
+        return snapshot
+
+
+async def refresh_routing_snapshot(
+    session: AsyncSession,
+    redis=None,  # noqa: ANN001
+) -> None:
+    """Publish a new snapshot version after a committed routing config write."""
+    global _snapshot, _version_checked_at
+    try:
+        if redis is not None:
+            version = _decode_version(await redis.incr(ROUTING_SNAPSHOT_VERSION_KEY))
+        else:
+            current = _snapshot
+            version = str(int(current.version) + 1 if current else 1)
+        snapshot = await build_routing_snapshot(session, version=version)
+    except Exception as exc:
+        logger.warning("Routing snapshot rebuild failed, falling back to lazy reload: %s", exc)
+        _snapshot = None
+        return
+    _snapshot = snapshot
+    _version_checked_at = time.monotonic()
+
+
+def current_routing_snapshot_version() -> str | None:
+    """Version of the snapshot this worker is serving, without touching Redis."""
+    return _snapshot.version if _snapshot is not None else None
+
+
+def invalidate_local_routing_snapshot() -> None:
+    global _snapshot
+    _snapshot = None
+
+
+def reset_routing_snapshot() -> None:
+    global _snapshot, _version_checked_at, _build_lock
+    _snapshot = None
+    _version_checked_at = 0.0
+    _build_lock = None
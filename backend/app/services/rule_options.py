@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+
+from app.services.hedging import HedgePolicy, parse_hedge_policy
+
+RULE_OPTION_FIELDS = (
+    "hedge_enabled",
+    "hedge_delay_ms",
+    "first_byte_timeout_ms",
+    "response_cache_ttl_seconds",
+    "embedding_batch_size",
+    "embedding_batch_wait_ms",
+)
+
+
+def _parse_non_negative_int(value: object) -> int | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return max(int(value), 0)
+
+
+@dataclass(frozen=True)
+class RuleOptions:
+    """Per-rule proxy behaviour stored next to the targets in the rule config."""
+
+    hedge: HedgePolicy | None = None
+    first_byte_timeout_ms: int | None = None
+    response_cache_ttl_seconds: int | None = None
+    embedding_batch_size: int | None = None
+    embedding_batch_wait_ms: int | None = None
+
+    def config_fields(self) -> dict[str, object]:
+        fields: dict[str, object] = {}
+        if self.hedge is not None:
+            fields["hedge_enabled"] = True
+            fields["hedge_delay_ms"] = self.hedge.delay_ms
+        if self.first_byte_timeout_ms:
+            fields["first_byte_timeout_ms"] = self.first_byte_timeout_ms
+        if self.response_cache_ttl_seconds:
+            fields["response_cache_ttl_seconds"] = self.response_cache_ttl_seconds
+        if self.embedding_batch_size:
+            fields["embedding_batch_size"] = self.embedding_batch_size
+        if self.embedding_batch_wait_ms:
+            fields["embedding_batch_wait_ms"] = self.embedding_batch_wait_ms
+        return fields
+
+    def out_fields(self) -> dict[str, object]:
+        return {
+            "hedge_enabled": self.hedge is not None,
+            "hedge_delay_ms": self.hedge.delay_ms if self.hedge is not None else None,
+            "first_byte_timeout_ms": self.first_byte_timeout_ms,
+            "response_cache_ttl_seconds": self.response_cache_ttl_seconds,
+            "embedding_batch_size": self.embedding_batch_size,
+            "embedding_batch_wait_ms": self.embedding_batch_wait_ms,
+        }
+
+    def updated(self, changes: Mapping[str, object]) -> RuleOptions:
+        """Apply admin payload fields; omitted fields keep their current value."""
+        hedge = self.hedge
+        if "hedge_enabled" in changes or "hedge_delay_ms" in changes:
+            enabled = changes.get("hedge_enabled")
+            if enabled is None:
+                enabled = hedge is not None
+            delay_ms = (
+                _parse_non_negative_int(changes.get("hedge_delay_ms"))
+                if "hedge_delay_ms" in changes
+                else (hedge.delay_ms if hedge is not None else None)
+            )
+            hedge = HedgePolicy(delay_ms=delay_ms) if enabled else None
+        first_byte_timeout_ms = self.first_byte_timeout_ms
+        if "first_byte_timeout_ms" in changes:
+            first_byte_timeout_ms = _parse_non_negative_int(changes["first_byte_timeout_ms"]) or None
+        response_cache_ttl_seconds = self.response_cache_ttl_seconds
+        if "response_cache_ttl_seconds" in changes:
+            response_cache_ttl_seconds = (
+                _parse_non_negative_int(changes["response_cache_ttl_seconds"]) or None
+            )
+        embedding_batch_size = self.embedding_batch_size
+        if "embedding_batch_size" in changes:
+            embedding_batch_size = _parse_non_negative_int(changes["embedding_batch_size"]) or None
+        embedding_batch_wait_ms = self.embedding_batch_wait_ms
+        if "embedding_batch_wait_ms" in changes:
+            embedding_batch_wait_ms = (
+                _parse_non_negative_int(changes["embedding_batch_wait_ms"]) or None
+            )
+        return RuleOptions(
+            hedge=hedge,
+            first_byte_timeout_ms=first_byte_timeout_ms,
+            response_cache_ttl_seconds=response_cache_ttl_seconds,
+            embedding_batch_size=embedding_batch_size,
+            embedding_batch_wait_ms=embedding_batch_wait_ms,
+        )
+
+
+def parse_rule_options(raw: str | None) -> RuleOptions:
+    if not raw:
+        return RuleOptions()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return RuleOptions()
+    if not isinstance(data, dict):
+        return RuleOptions()
+    return RuleOptions(
+        hedge=parse_hedge_policy(data),
+        first_byte_timeout_ms=_parse_non_negative_int(data.get("first_byte_timeout_ms")) or None,
+        response_cache_ttl_seconds=(
+            _parse_non_negative_int(data.get("response_cache_ttl_seconds")) or None
+        ),
+        embedding_batch_size=_parse_non_negative_int(data.get("embedding_batch_size")) or None,
+        embedding_batch_wait_ms=(
+            _parse_non_negative_int(data.get("embedding_batch_wait_ms")) or None
+        ),
+    )
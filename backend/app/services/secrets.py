@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import base64
+from collections import OrderedDict
 import hashlib
 import json
 import logging
@@ -46,6 +47,67 @@ def _build_fernet(source_secret: str) -> Fernet:
         return Fernet(base64.urlsafe_b64encode(digest))
 
 
+class _DecryptedSecretCache:
+    """Bounded LRU of decrypted secrets keyed by ciphertext.
+
+    Entries only live in process memory: the cache refuses to be pickled or
+    copied and its repr never shows values. It is emptied when the
+    encryption key changes.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._fernet: Fernet | None = None
+
+    def __repr__(self) -> str:
+        return f"<DecryptedSecretCache entries={len(self._entries)}>"
+
+    def __reduce__(self) -> object:
+        raise TypeError("Decrypted secret cache cannot be serialized")
+
+    def __copy__(self) -> object:
+        raise TypeError("Decrypted secret cache cannot be copied")
+
+    def __deepcopy__(self, memo: dict) -> object:
+        raise TypeError("Decrypted secret cache cannot be copied")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, fernet: Fernet, token: str) -> str | None:
+        if fernet is not self._fernet:
+            self._entries.clear()
+            self._fernet = fernet
+            return None
+        plaintext = self._entries.get(token)
+        if plaintext is not None:
+            self._entries.move_to_end(token)
+        return plaintext
+
+    def put(self, fernet: Fernet, token: str, plaintext: str, max_entries: int) -> None:
+        if max_entries <= 0:
+            return
+        if fernet is not self._fernet:
+            self._entries.clear()
+            self._fernet = fernet
+        self._entries[token] = plaintext
+        self._entries.move_to_end(token)
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._fernet = None
+
+
+_decrypted_secrets = _DecryptedSecretCache()
+
+
+def clear_decrypted_secret_cache() -> None:
+    """Forget every decrypted secret, e.g. after upstream keys are changed."""
+    _decrypted_secrets.clear()
+
+
 def encryption_available(settings: Settings | None = None) -> bool:
     return _source_secret(settings or get_settings()) is not None
 
@@ -91,11 +153,18 @@ def decrypt_secret_value(value: str | None, settings: Settings | None = None) ->
     text = str(value)
     if not is_encrypted_secret(text):
         return text
+    resolved = settings or get_settings()
     token = text[len(ENCRYPTED_SECRET_PREFIX) :]
     try:
-        return _fernet(settings).decrypt(token.encode("ascii")).decode("utf-8")
+        fernet = _fernet(resolved)
+        cached = _decrypted_secrets.get(fernet, token)
+        if cached is not None:
+            return cached
+        plaintext = fernet.decrypt(token.encode("ascii")).decode("utf-8")
     except (InvalidToken, UnicodeDecodeError, SecretEncryptionUnavailable) as exc:
         raise SecretDecryptionError("Unable to decrypt stored secret") from exc
+    _decrypted_secrets.put(fernet, token, plaintext, resolved.secret_cache_max_entries)
+    return plaintext
 
 
 def _is_secret_field(name: object) -> bool:
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from app.services.response_cache import CachedResponse
+
+
+class StreamFanoutAborted(RuntimeError):
+    """The leader stopped before its upstream stream finished successfully."""
+
+
+class StreamFanout:
+    """One upstream SSE stream shared with coalesced subscribers."""
+
+    def __init__(self, media_type: str | None, endpoint_id: int, api_key_id: int) -> None:
+        self.media_type = media_type
+        self.endpoint_id = endpoint_id
+        self.api_key_id = api_key_id
+        self.chunks: list[bytes | str] = []
+        self.closed = False
+        self.aborted = False
+        self._changed = asyncio.Event()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: bytes | str) -> None:
+        self.chunks.append(chunk)
+        self._wake()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def abort(self) -> None:
+        """Leader disconnected or the stream failed; subscribers must not see a clean end."""
+        self.aborted = True
+        self._wake()
+
+    async def wait_for_start(self) -> bool:
+        """Wait for the first chunk or the end of the stream; False if it was aborted."""
+        while not self.chunks and not self.closed and not self.aborted:
+            await self._changed.wait()
+        return not self.aborted
+
+    async def subscribe(self, idle_timeout: float) -> AsyncIterator[bytes | str]:
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+                continue
+            if self.aborted:
+                raise StreamFanoutAborted("Coalesced upstream stream was aborted")
+            if self.closed:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), idle_timeout)
+            except asyncio.TimeoutError as exc:
+                raise StreamFanoutAborted("Coalesced upstream stream stalled") from exc
+
+
+FlightResult = CachedResponse | StreamFanout | None
+
+
+@dataclass(frozen=True)
+class Flight:
+    key: str
+    leader: bool
+    result: asyncio.Future[FlightResult]
+
+
+class SingleFlight:
+    """Identical concurrent requests wait on the first one instead of going upstream."""
+
+    def __init__(self) -> None:
+        self.flights: dict[str, asyncio.Future[FlightResult]] = {}
+
+    def join(self, key: str) -> Flight:
+        future = self.flights.get(key)
+        if future is not None and not future.done():
+            return Flight(key=key, leader=False, result=future)
+        future = asyncio.get_running_loop().create_future()
+        self.flights[key] = future
+        return Flight(key=key, leader=True, result=future)
+
+    def settle(self, flight: Flight, result: FlightResult) -> None:
+        """Hand the leader's outcome to its followers; None sends them upstream on their own."""
+        if not flight.result.done():
+            flight.result.set_result(result)
+        if self.flights.get(flight.key) is flight.result:
+            del self.flights[flight.key]
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
+
+
+def reset_single_flight() -> None:
+    _single_flight.flights.clear()
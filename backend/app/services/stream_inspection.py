@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from app.core.json_codec import loads_json
+
+# 只有包含这些片段或非 null usage 的 data 行才会做 JSON 解析，其余 token 事件只做字节扫描
+STREAM_SIGNAL_MARKERS = (b"response.completed", b"response.failed", b"error")
+# include_usage 打开后 OpenAI 每个分片都带 "usage":null，这种 usage 不算信号
+NULL_USAGE_FIELDS = (b'"usage":null', b'"usage": null')
+# 不发空行分隔事件的上游也不会让单个事件无限累积
+SSE_EVENT_MAX_LINES = 256
+
+
+def _has_signal(data: bytes) -> bool:
+    # bytes.find 比 `in` 快：`in` 会先尝试把参数当作整数处理
+    for marker in STREAM_SIGNAL_MARKERS:
+        if data.find(marker) >= 0:
+            return True
+    usage_count = data.count(b"usage")
+    return usage_count > 0 and usage_count > data.count(NULL_USAGE_FIELDS[0]) + data.count(
+        NULL_USAGE_FIELDS[1]
+    )
+
+
+class SSEStreamInspector:
+    """Incremental SSE scanner that tracks usage, failure and completion of a proxied stream.
+
+    Chunks are split into lines as bytes and never decoded as a whole; a
+    ``data:`` line is JSON-decoded only when it contains one of
+    ``STREAM_SIGNAL_MARKERS`` or a ``usage`` field that is not null. Lines
+    may end in ``\\n`` or ``\\r\\n``. Each data line is tried on its own
+    first, so flags are raised as soon as the line arrives; data lines that
+    only parse together are joined and decoded when their event ends, as
+    multi-line SSE events are defined.
+    """
+
+    __slots__ = (
+        "usage_payload",
+        "data_seen",
+        "failed",
+        "completed",
+        "_pending",
+        "_event_lines",
+        "_event_undecoded",
+    )
+
+    def __init__(self) -> None:
+        self.usage_payload: dict | None = None
+        self.data_seen = False
+        self.failed = False
+        self.completed = False
+        self._pending = bytearray()
+        self._event_lines: list[bytes] = []
+        self._event_undecoded = False
+
+    def feed(self, chunk: bytes) -> None:
+        if (
+            self.data_seen
+            and not self._pending
+            and not self._event_lines
+            and chunk.endswith((b"\n\n", b"\n\r\n"))
+            and not _has_signal(chunk)
+        ):
+            # 只含完整普通 token 事件的分片不会改变任何状态
+            return
+        if b"\n" not in chunk:
+            self._pending += chunk
+            return
+        if self._pending:
+            self._pending += chunk
+            lines = bytes(self._pending).split(b"\n")
+            self._pending.clear()
+        else:
+            lines = chunk.split(b"\n")
+        self._pending += lines.pop()
+        for line in lines:
+            self._feed_line(line)
+
+    @property
+    def pending(self) -> bytes:
+        """Bytes of the trailing line that has not been terminated yet."""
+        return bytes(self._pending)
+
+    def close(self) -> None:
+        """Treat buffered bytes as a final line and finish the open event."""
+        if self._pending:
+            self._feed_line(bytes(self._pending))
+            self._pending.clear()
+        self._end_event()
+
+    def _feed_line(self, line: bytes) -> None:
+        line = line.strip()
+        if not line:
+            if self._event_lines:
+                self._end_event()
+            return
+        if line[:5] != b"data:":
+            return
+        data = line[5:].lstrip()
+        if not data or data == b"[DONE]":
+            return
+        self.data_seen = True
+        if len(self._event_lines) < SSE_EVENT_MAX_LINES:
+            self._event_lines.append(data)
+        if _has_signal(data):
+            try:
+                payload = loads_json(data)
+            except ValueError:
+                self._event_undecoded = True
+            else:
+                self._inspect_payload(payload)
+
+    def _end_event(self) -> None:
+        lines = self._event_lines
+        if self._event_undecoded and len(lines) > 1:
+            try:
+                payload = loads_json(b"\n".join(lines))
+            except ValueError:
+                pass
+            else:
+                self._inspect_payload(payload)
+        self._event_lines = []
+        self._event_undecoded = False
+
+    def _inspect_payload(self, payload: object) -> None:
+        if not isinstance(payload, dict):
+            return
+        payload_type = str(payload.get("type") or "").strip().lower()
+        if payload_type == "response.completed":
+            self.completed = True
+        if payload_type in {"error", "response.failed"} or isinstance(
+            payload.get("error"), dict
+        ):
+            self.failed = True
+        metadata = payload.get("metadata")
+        if "usage" in payload or "usageMetadata" in payload or "total_usage" in payload:
+            self.usage_payload = payload
+        elif isinstance(metadata, dict) and (
+            "total_usage" in metadata or "usage" in metadata
+        ):
+            self.usage_payload = payload
+        elif payload_type == "response.completed":
+            response_payload = payload.get("response")
+            if isinstance(response_payload, dict) and "usage" in response_payload:
+                self.usage_payload = response_payload
+        else:
+            choices = payload.get("choices")
+            if isinstance(choices, list) and any(
+                isinstance(choice, dict) and isinstance(choice.get("usage"), dict)
+                for choice in choices
+            ):
+                self.usage_payload = payload
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+import logging
+
+from app.core.rate_limit import take_tokens
+
+logger = logging.getLogger(__name__)
+
+TPM_BUCKET_PREFIX = "rate:tpm"
+ESTIMATE_BYTES_PER_TOKEN = 4
+ESTIMATE_MESSAGE_OVERHEAD_TOKENS = 4
+ESTIMATE_REQUEST_OVERHEAD_TOKENS = 3
+# 图片/音频/文件按固定额度估算，不按 base64 字节数当文本计
+ESTIMATE_MEDIA_PART_TOKENS = 1024
+ESTIMATE_MEDIA_SCAN_DEPTH = 8
+MEDIA_PART_TYPES = frozenset(
+    {"image", "image_url", "input_image", "input_audio", "input_file", "file", "document"}
+)
+MEDIA_PART_KEYS = frozenset({"inline_data", "inlineData", "file_data", "fileData"})
+
+
+def _string_bytes(node: object) -> int:
+    if isinstance(node, str):
+        return len(node)
+    if isinstance(node, dict):
+        return sum(_string_bytes(value) for value in node.values())
+    if isinstance(node, list):
+        return sum(_string_bytes(item) for item in node)
+    return 0
+
+
+def _media_parts(node: object, depth: int = 0) -> tuple[int, int]:
+    """Return the string bytes and the number of media content parts under ``node``."""
+    if isinstance(node, dict):
+        if node.get("type") in MEDIA_PART_TYPES or not MEDIA_PART_KEYS.isdisjoint(node):
+            return _string_bytes(node), 1
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return 0, 0
+    media_bytes = media_count = 0
+    if depth < ESTIMATE_MEDIA_SCAN_DEPTH:
+        for child in children:
+            # 文本字符串占绝大多数，跳过递归调用
+            if isinstance(child, (dict, list)):
+                child_bytes, child_count = _media_parts(child, depth + 1)
+                media_bytes += child_bytes
+                media_count += child_count
+    return media_bytes, media_count
+
+
+def tpm_state_key(api_key_id: int) -> str:
+    return f"{TPM_BUCKET_PREFIX}:{api_key_id}"
+
+
+def estimate_prompt_tokens(payload: Mapping[str, object], body_size: int) -> int:
+    """Cheap upper-bound guess of prompt tokens, corrected later by real usage.
+
+    Image, audio and file parts count as a fixed allowance each instead of
+    their inline (usually base64) size.
+    """
+    messages = payload.get("messages")
+    if not isinstance(messages, list):
+        messages = payload.get("input")
+    message_count = len(messages) if isinstance(messages, list) else 1
+    media_bytes, media_count = _media_parts(payload)
+    return (
+        max(body_size - media_bytes, 0) // ESTIMATE_BYTES_PER_TOKEN
+        + media_count * ESTIMATE_MEDIA_PART_TOKENS
+        + message_count * ESTIMATE_MESSAGE_OVERHEAD_TOKENS
+        + ESTIMATE_REQUEST_OVERHEAD_TOKENS
+    )
+
+
+@dataclass
+class TokenReservation:
+    api_key_id: int
+    redis: object
+    capacity: float
+    refill_per_second: float
+    reserved: float
+    settled: bool = field(default=False)
+
+    async def _adjust(self, delta: float) -> None:
+        if not delta:
+            return
+        try:
+            await take_tokens(
+                self.redis,
+                tpm_state_key(self.api_key_id),
+                capacity=self.capacity,
+                refill_per_second=self.refill_per_second,
+                cost=delta,
+                force=True,
+            )
+        except Exception as exc:
+            logger.warning("Failed to reconcile TPM reservation: %s", exc)
+
+    async def settle(self, actual_tokens: int | None) -> None:
+        """Replace the estimate with the upstream-reported token usage.
+
+        Without reported usage the estimate is kept as the best guess.
+        """
+        if self.settled:
+            return
+        self.settled = True
+        if actual_tokens is None:
+            return
+        await self._adjust(max(int(actual_tokens), 0) - self.reserved)
+
+    async def refund(self) -> None:
+        if self.settled:
+            return
+        self.settled = True
+        await self._adjust(-self.reserved)
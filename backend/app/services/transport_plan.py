@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+import re
+
+from app.services.routing_snapshot import current_routing_snapshot_version
+
+STANDARD_PROVIDER_NAMES = {"openai", "anthropic", "gemini", "codex"}
+# 请求体模板变量替换的正则模式
+# 先匹配被双引号包裹的占位符，避免字符串转义问题
+QUOTED_TEMPLATE_VARIABLE_PATTERN = re.compile(r'"\{\{(\w+)}}"')
+TEMPLATE_VARIABLE_PATTERN = re.compile(r"\{\{(\w+)}}")
+TRANSPORT_PLAN_MAX_ENTRIES = 1024
+
+_PLAN_FIELDS = (
+    "provider",
+    "auth_header_name",
+    "auth_header_prefix",
+    "extra_headers",
+    "extra_cookies",
+    "extra_query_params",
+    "url_path_suffix",
+    "request_body_template",
+)
+_UNSET = object()
+
+
+@dataclass(frozen=True)
+class TemplateToken:
+    """A literal template chunk, or a ``{{name}}`` placeholder when ``name`` is set."""
+
+    text: str
+    name: str | None = None
+
+
+def tokenize_body_template(template: str) -> tuple[TemplateToken, ...]:
+    """Split a request body template into literals and placeholders.
+
+    Quoted placeholders (``"{{name}}"``) are found first and take their
+    quotes with them, like the two-pass regex renderer this replaces; bare
+    placeholders are only looked for in the literal text between them.
+    """
+    tokens: list[TemplateToken] = []
+
+    def add_literal_text(text: str) -> None:
+        position = 0
+        for match in TEMPLATE_VARIABLE_PATTERN.finditer(text):
+            if match.start() > position:
+                tokens.append(TemplateToken(text[position : match.start()]))
+            tokens.append(TemplateToken(match.group(0), match.group(1)))
+            position = match.end()
+        if position < len(text):
+            tokens.append(TemplateToken(text[position:]))
+
+    position = 0
+    for match in QUOTED_TEMPLATE_VARIABLE_PATTERN.finditer(template):
+        add_literal_text(template[position : match.start()])
+        tokens.append(TemplateToken(match.group(0), match.group(1)))
+        position = match.end()
+    add_literal_text(template[position:])
+    return tuple(tokens)
+
+
+def render_body_template(
+    tokens: tuple[TemplateToken, ...], variables: Mapping[str, object]
+) -> str:
+    """Join the template, JSON-encoding known variables and keeping unknown placeholders."""
+    parts: list[str] = []
+    for token in tokens:
+        if token.name is not None and token.name in variables:
+            parts.append(json.dumps(variables[token.name], ensure_ascii=False))
+        else:
+            parts.append(token.text)
+    return "".join(parts)
+
+
+def _parse_string_pairs(raw: object) -> tuple[tuple[str, str], ...]:
+    if not raw:
+        return ()
+    try:
+        parsed = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return ()
+    if not isinstance(parsed, dict):
+        return ()
+    return tuple((str(key), str(value)) for key, value in parsed.items())
+
+
+@dataclass(frozen=True)
+class EndpointTransportPlan:
+    """Everything about an endpoint that upstream requests need, parsed once."""
+
+    provider: str
+    is_custom: bool
+    auth_header_name: str
+    auth_header_prefix: str
+    extra_headers: tuple[tuple[str, str], ...]
+    extra_cookies: str | None
+    extra_query_params: tuple[tuple[str, str], ...]
+    url_path_suffix: str | None
+    body_template: tuple[TemplateToken, ...] | None
+
+
+def compile_transport_plan(endpoint: object) -> EndpointTransportPlan:
+    provider = str(getattr(endpoint, "provider", "") or "").strip().lower()
+    is_custom = provider not in STANDARD_PROVIDER_NAMES
+    url_path_suffix = getattr(endpoint, "url_path_suffix", None) if is_custom else None
+    if url_path_suffix and not url_path_suffix.startswith("/"):
+        url_path_suffix = f"/{url_path_suffix}"
+    template = getattr(endpoint, "request_body_template", None) if is_custom else None
+    body_template = (
+        tokenize_body_template(template)
+        if isinstance(template, str) and template.strip()
+        else None
+    )
+    return EndpointTransportPlan(
+        provider=provider,
+        is_custom=is_custom,
+        auth_header_name=getattr(endpoint, "auth_header_name", "Authorization")
+        or "Authorization",
+        auth_header_prefix=getattr(endpoint, "auth_header_prefix", "Bearer") or "",
+        extra_headers=(
+            _parse_string_pairs(getattr(endpoint, "extra_headers", None)) if is_custom else ()
+        ),
+        extra_cookies=(getattr(endpoint, "extra_cookies", None) or None) if is_custom else None,
+        extra_query_params=(
+            _parse_string_pairs(getattr(endpoint, "extra_query_params", None))
+            if is_custom
+            else ()
+        ),
+        url_path_suffix=url_path_suffix or None,
+        body_template=body_template,
+    )
+
+
+class TransportPlanCache:
+    """Compiled plans keyed by the endpoint fields they were built from.
+
+    Keying by field values keeps ORM rows, snapshot copies and test stubs of
+    the same endpoint on one plan and never serves a plan for stale fields.
+    The cache is emptied whenever the routing snapshot version changes, so
+    plans for edited or deleted endpoints do not pile up.
+    """
+
+    def __init__(self) -> None:
+        self.plans: dict[tuple[object, ...], EndpointTransportPlan] = {}
+        self.version: str | None = None
+
+    def plan_for(self, endpoint: object) -> EndpointTransportPlan:
+        version = current_routing_snapshot_version()
+        if version != self.version:
+            self.plans.clear()
+            self.version = version
+        fingerprint = tuple(getattr(endpoint, name, _UNSET) for name in _PLAN_FIELDS)
+        try:
+            plan = self.plans.get(fingerprint)
+        except TypeError:
+            return compile_transport_plan(endpoint)
+        if plan is None:
+            if len(self.plans) >= TRANSPORT_PLAN_MAX_ENTRIES:
+                self.plans.clear()
+            plan = compile_transport_plan(endpoint)
+            self.plans[fingerprint] = plan
+        return plan
+
+
+_transport_plans = TransportPlanCache()
+
+
+def endpoint_transport_plan(endpoint: object) -> EndpointTransportPlan:
+    return _transport_plans.plan_for(endpoint)
+
+
+def reset_transport_plans() -> None:
+    _transport_plans.plans.clear()
+    _transport_plans.version = None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Upstream body preparation cost for a large request: full re-encode vs byte splice.
+
+Run from the backend directory:
+
+    python scripts/bench_model_rewrite.py --image-kb 4096 --iterations 50
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+from pathlib import Path
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api.v1.route_modules.proxy_payloads import (  # noqa: E402
+    parse_request_payload,
+    prepare_upstream_payload_and_body,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--image-kb", type=int, default=4096)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    image = base64.b64encode(os.urandom(args.image_kb * 1024 * 3 // 4)).decode()
+    raw_body = json.dumps(
+        {
+            "model": "alias",
+            "stream": True,
+            "rule_group": "default",
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "describe this image"},
+                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image}"}},
+                    ],
+                }
+            ],
+        }
+    ).encode()
+    candidate = SimpleNamespace(endpoint=SimpleNamespace(provider="openai"), real_model="gpt-4o")
+    payload = parse_request_payload(raw_body)
+    payload.pop("rule_group")
+
+    def full_reencode() -> None:
+        upstream_payload = dict(payload, model=candidate.real_model)
+        upstream_payload["stream_options"] = {"include_usage": True}
+        json.dumps(upstream_payload).encode("utf-8")
+
+    def splice() -> None:
+        prepare_upstream_payload_and_body(
+            payload, raw_body, candidate, rewrite_model=True, is_stream=True
+        )
+
+    print(f"body size: {len(raw_body) / 1024 / 1024:.2f} MiB")
+    for label, func in (("full re-encode", full_reencode), ("byte splice", splice)):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{label:>15}: {seconds / args.iterations * 1e3:8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
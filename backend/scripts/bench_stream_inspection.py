@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Per-chunk SSE inspection cost: line-by-line json.loads vs the byte-level inspector.
+
+Run from the backend directory:
+
+    python scripts/bench_stream_inspection.py --tokens 2000
+    python scripts/bench_stream_inspection.py --chunk-size 512  # events split across chunks
+    python scripts/bench_stream_inspection.py --include-usage  # "usage": null on every chunk
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.stream_inspection import SSEStreamInspector  # noqa: E402
+
+
+def build_chunks(tokens: int, include_usage: bool = False) -> list[bytes]:
+    chunks = []
+    for index in range(tokens):
+        event = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": {"content": f"token{index} "}}],
+        }
+        if include_usage:
+            # stream_options.include_usage 打开后 OpenAI 每个分片都带 null usage
+            event["usage"] = None
+        chunks.append(f"data: {json.dumps(event)}\n\n".encode())
+    usage = {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": tokens}}
+    chunks.append(f"data: {json.dumps(usage)}\n\n".encode())
+    chunks.append(b"data: [DONE]\n\n")
+    return chunks
+
+
+def decode_every_line(chunks: list[bytes]) -> None:
+    """The previous approach: decode to str, buffer, and json.loads every data line."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8")
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if not data or data == "[DONE]":
+                continue
+            payload = json.loads(data)
+            payload.get("type")
+            payload.get("usage")
+
+
+def byte_inspector(chunks: list[bytes]) -> None:
+    inspector = SSEStreamInspector()
+    for chunk in chunks:
+        inspector.feed(chunk)
+    inspector.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--chunk-size", type=int, default=0, help="re-slice the stream into fixed-size chunks"
+    )
+    parser.add_argument(
+        "--include-usage",
+        action="store_true",
+        help='add "usage": null to every token chunk, as OpenAI does with include_usage',
+    )
+    args = parser.parse_args()
+
+    chunks = build_chunks(args.tokens, args.include_usage)
+    if args.chunk_size > 0:
+        stream = b"".join(chunks)
+        chunks = [
+            stream[offset : offset + args.chunk_size]
+            for offset in range(0, len(stream), args.chunk_size)
+        ]
+    for label, func in (
+        ("json.loads every line", decode_every_line),
+        ("byte inspector", byte_inspector),
+    ):
+        seconds = min(
+            timeit.repeat(lambda: func(chunks), number=args.iterations, repeat=3)
+        )
+        print(f"{label:>22}: {seconds / args.iterations / len(chunks) * 1e6:8.3f} us/chunk")
+
+
+if __name__ == "__main__":
+    main()
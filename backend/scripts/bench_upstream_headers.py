@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Per-attempt upstream header build cost with and without the decrypted-secret cache.
+
+Run from the backend directory:
+
+    python scripts/bench_upstream_headers.py --iterations 20000
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api.v1 import route_proxy_helpers  # noqa: E402
+from app.core.config import Settings  # noqa: E402
+from app.services.secrets import clear_decrypted_secret_cache, encrypt_secret_value  # noqa: E402
+
+INCOMING_HEADERS = {
+    "host": "gateway.local",
+    "content-type": "application/json",
+    "accept": "application/json",
+    "authorization": "Bearer fk-client",
+    "user-agent": "bench/1.0",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    settings = Settings(data_encryption_key="bench-encryption-key")
+    route_proxy_helpers.get_settings = lambda: settings
+    endpoint = SimpleNamespace(
+        provider="openai", auth_header_name="Authorization", auth_header_prefix="Bearer"
+    )
+    ciphertext = encrypt_secret_value("sk-" + "x" * 48, settings=settings)
+
+    def build() -> None:
+        route_proxy_helpers._build_upstream_headers(
+            INCOMING_HEADERS, endpoint, ciphertext, request_path="/v1/chat/completions"
+        )
+
+    def build_cold() -> None:
+        clear_decrypted_secret_cache()
+        build()
+
+    for label, func in (("decrypt every attempt", build_cold), ("cached secret", build)):
+        build()
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{label:>22}: {seconds / args.iterations * 1e6:8.2f} us/attempt")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,25 @@ import os
 from collections.abc import AsyncIterator
 from typing import Any
 
+import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from app.db.base import Base
 from app.db.migrations import apply_schema_updates
 from app.db.session import create_database_engine
+from app.services.access_key_cache import reset_access_key_cache
+from app.services.concurrency_limit import reset_concurrency_limiter
+from app.services.embedding_batcher import reset_embedding_batcher
+from app.services.hedging import reset_hedge_budget
+from app.services.inflight import reset_inflight
+from app.services.key_latency import reset_key_latency_stats
+from app.services.response_cache import reset_response_cache
+from app.services.retry_policy import reset_retry_budget
+from app.services.routing_snapshot import reset_routing_snapshot
+from app.services.secrets import clear_decrypted_secret_cache
+from app.services.single_flight import reset_single_flight
+from app.services.transport_plan import reset_transport_plans
 
 
 class TestMemoryRedis:
@@ -75,6 +88,23 @@ class TestMemoryRedis:
         return items[start : end + 1]
 
 
+@pytest.fixture(autouse=True)
+def _reset_process_singletons() -> None:
+    """Drop per-worker caches and singletons through each module's reset hook."""
+    reset_routing_snapshot()
+    reset_key_latency_stats()
+    reset_inflight()
+    reset_hedge_budget()
+    reset_retry_budget()
+    reset_concurrency_limiter()
+    reset_response_cache()
+    reset_single_flight()
+    reset_embedding_batcher()
+    reset_access_key_cache()
+    clear_decrypted_secret_cache()
+    reset_transport_plans()
+
+
 @pytest_asyncio.fixture
 async def db_engine() -> AsyncIterator[AsyncEngine]:
     database_url = os.getenv("TEST_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 
 import httpx
@@ -5,11 +6,19 @@ import pytest
 from fastapi import FastAPI
 
 from app.api.v1 import routes as routes_module
+from app.api.v1.route_modules import proxy_cache
+from app.core.circuit_state import decode_circuit_state
 from app.core.config import Settings
 from app.db.session import get_session
-from app.services.router import RouteCandidate
+from app.services.billing import RequestAttemptMetrics
+from app.services.router import ModelRouter, RouteCandidate, RuleTargetSelection
+from app.services.rule_options import RuleOptions
 from conftest import TestMemoryRedis as MemoryRedis
 
+CHAT_PATH = "/openai/v1/chat/completions"
+CHAT_BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+STREAM_BODY = {**CHAT_BODY, "stream": True}
+
 
 @dataclass
 class EndpointStub:
@@ -75,7 +84,8 @@ def build_proxy_app(
         available_candidates = [
             candidate
             for candidate in candidates
-            if redis.store.get(f"circuit:{candidate.api_key.id}:state") != "open"
+            if decode_circuit_state(redis.store.get(f"circuit:{candidate.api_key.id}:state")).state
+            != "open"
         ]
         provider_filters = kwargs.get("provider_filters")
         fallback_to_any = bool(kwargs.get("provider_filter_fallback_to_any"))
@@ -126,3 +136,148 @@ def build_proxy_app(
     app.include_router(routes_module.router)
     app.dependency_overrides[get_session] = override_session
     return app
+
+
+def proxy_candidate(
+    api_key_id: int,
+    key: str,
+    *,
+    endpoint_id: int,
+    endpoint_name: str = "Upstream",
+    real_model: str = "gpt-4o",
+    **endpoint_fields: object,
+) -> RouteCandidate:
+    return RouteCandidate(
+        api_key=APIKeyStub(id=api_key_id, key=key),
+        endpoint=EndpointStub(
+            id=endpoint_id,
+            name=endpoint_name,
+            base_url="https://api.example.com",
+            **endpoint_fields,
+        ),
+        real_model=real_model,
+    )
+
+
+def primary_and_fallback(
+    base_id: int,
+    *,
+    primary_key: str = "sk-primary",
+    fallback_key: str = "sk-fallback",
+    shared_endpoint: bool = False,
+    **primary_endpoint_fields: object,
+) -> list[RouteCandidate]:
+    """Two candidates tried in order.
+
+    On a shared endpoint ``base_id`` the keys are ``base_id + 1`` and
+    ``base_id + 2``; otherwise endpoints ``base_id`` and ``base_id + 2`` carry
+    keys ``base_id + 1`` and ``base_id + 3``.
+    """
+    if shared_endpoint:
+        endpoint = EndpointStub(
+            id=base_id, name="Pool", base_url="https://api.example.com", **primary_endpoint_fields
+        )
+        return [
+            RouteCandidate(
+                api_key=APIKeyStub(id=base_id + offset, key=key),
+                endpoint=endpoint,
+                real_model="gpt-4o",
+            )
+            for offset, key in ((1, primary_key), (2, fallback_key))
+        ]
+    return [
+        proxy_candidate(
+            base_id + 1,
+            primary_key,
+            endpoint_id=base_id,
+            endpoint_name="Primary",
+            **primary_endpoint_fields,
+        ),
+        proxy_candidate(
+            base_id + 3, fallback_key, endpoint_id=base_id + 2, endpoint_name="Fallback"
+        ),
+    ]
+
+
+def use_rule_options(monkeypatch: pytest.MonkeyPatch, options: RuleOptions) -> None:
+    """Serve ``options`` as the matched rule's options; call after ``build_proxy_app``.
+
+    Both the pre-routing lookup (response cache, coalescing, batching) and
+    ``ModelRouter.rule_options`` (hedging, first-byte and retry policies) see them.
+    """
+    get_candidates = ModelRouter.get_candidates
+
+    async def fake_get_routing_snapshot(session, redis=None):  # noqa: ANN001
+        return object()
+
+    def fake_resolve_rule_selection(snapshot, model_alias, rule_group, **kwargs):  # noqa: ANN001
+        selection = RuleTargetSelection(
+            target_key_ids=[],
+            strategy="weighted_round_robin",
+            matched_rule=True,
+            exposure_supported=True,
+            options=options,
+        )
+        return selection, rule_group
+
+    async def get_candidates_with_options(self, *args, **kwargs):  # noqa: ANN001, ANN002, ANN003
+        self.rule_options = options
+        return await get_candidates(self, *args, **kwargs)
+
+    monkeypatch.setattr(proxy_cache, "get_routing_snapshot", fake_get_routing_snapshot)
+    monkeypatch.setattr(
+        ModelRouter, "resolve_rule_selection", staticmethod(fake_resolve_rule_selection)
+    )
+    monkeypatch.setattr(ModelRouter, "get_candidates", get_candidates_with_options)
+
+
+async def post_proxy(
+    app: FastAPI,
+    body: dict | None = None,
+    *,
+    path: str = CHAT_PATH,
+    headers: dict[str, str] | None = None,
+) -> httpx.Response:
+    """POST one request with the master token and let background tasks run."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            path,
+            headers={"Authorization": "Bearer token", **(headers or {})},
+            json=CHAT_BODY if body is None else body,
+        )
+    for _ in range(3):
+        await asyncio.sleep(0)
+    return response
+
+
+def attempt_metrics(
+    api_key_id: int,
+    outcome: str = "success",
+    *,
+    endpoint_id: int = 1,
+    latency_ms: int = 100,
+    status_code: int | None = 200,
+    failure_reason: str | None = None,
+) -> RequestAttemptMetrics:
+    return RequestAttemptMetrics(
+        request_id="req",
+        trace_id="trace",
+        model_alias="gpt-4o",
+        endpoint_id=endpoint_id,
+        api_key_id=api_key_id,
+        requested_rule_group=None,
+        rule_group="default",
+        attempt_order=1,
+        status_code=status_code,
+        outcome=outcome,
+        failure_reason=failure_reason,
+        latency_ms=latency_ms,
+    )
+
+
+def attempt_outcomes(recorded: dict) -> dict[int, tuple[str, str | None]]:
+    return {
+        attempt.api_key_id: (attempt.outcome, attempt.failure_reason)
+        for attempt in recorded["attempts"]
+    }
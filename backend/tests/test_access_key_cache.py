@@ -0,0 +1,149 @@
+import pytest
+from fastapi import HTTPException, Request
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.v1 import route_helpers
+from app.api.v1.route_helpers import (
+    _resolve_allowed_rule_groups_from_token,
+    _resolve_rule_group_from_token,
+)
+from app.api.v1.route_modules.proxy_trace import include_debug_headers
+from app.core.config import Settings
+from app.db.base import Base
+from app.db.models import FactoryAccessKey
+from app.services import access_key_cache as access_key_cache_module
+from app.services.access_key_cache import (
+    AccessKeyCache,
+    ResolvedAccessKey,
+    get_access_key_cache,
+    invalidate_access_key,
+)
+from app.services.access_keys import access_key_preview, hash_access_key
+
+
+def _request(token: str, *, debug: bool = False) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    if debug:
+        headers.append((b"x-debug", b"1"))
+    return Request(
+        {"type": "http", "method": "POST", "path": "/", "query_string": b"", "headers": headers}
+    )
+
+
+@pytest.mark.asyncio
+async def test_factory_key_resolution_is_cached_until_invalidated() -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_maker() as session:
+        factory_key = FactoryAccessKey(
+            name="cached",
+            key=hash_access_key("fk-cached"),
+            key_preview=access_key_preview("fk-cached"),
+            request_timeout_seconds=30,
+            is_active=True,
+        )
+        factory_key.rule_groups = ["Default", "codex", "CODEX"]
+        session.add(factory_key)
+        await session.commit()
+
+        request = _request("fk-cached")
+        assert await _resolve_allowed_rule_groups_from_token(session, request) == [
+            "default",
+            "codex",
+        ]
+        assert request.state.route_request_timeout_seconds == 30
+
+        await session.execute(delete(FactoryAccessKey))
+        await session.commit()
+        cached_request = _request("fk-cached")
+        assert await _resolve_allowed_rule_groups_from_token(session, cached_request) == [
+            "default",
+            "codex",
+        ]
+        assert cached_request.state.route_request_timeout_seconds == 30
+
+        await invalidate_access_key(None, hash_access_key("fk-cached"))
+        with pytest.raises(HTTPException) as exc_info:
+            await _resolve_allowed_rule_groups_from_token(session, _request("fk-cached"))
+        assert exc_info.value.status_code == 401
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_invalid_factory_key_is_negatively_cached() -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_maker() as session:
+        with pytest.raises(HTTPException):
+            await _resolve_allowed_rule_groups_from_token(session, _request("fk-late"))
+
+        factory_key = FactoryAccessKey(
+            name="late", key=hash_access_key("fk-late"), key_preview="fk-...late", is_active=True
+        )
+        factory_key.rule_groups = ["default"]
+        session.add(factory_key)
+        await session.commit()
+
+        with pytest.raises(HTTPException):
+            await _resolve_allowed_rule_groups_from_token(session, _request("fk-late"))
+        get_access_key_cache().discard()
+        assert await _resolve_allowed_rule_groups_from_token(session, _request("fk-late")) == [
+            "default"
+        ]
+
+    await engine.dispose()
+
+
+def test_invalid_entries_do_not_evict_valid_ones(monkeypatch: pytest.MonkeyPatch) -> None:
+    settings = Settings(factory_key_cache_max_entries=2)
+    monkeypatch.setattr(access_key_cache_module, "get_settings", lambda: settings)
+    cache = AccessKeyCache()
+    resolved = ResolvedAccessKey(rule_groups=("default",), request_timeout_seconds=None)
+
+    cache.put("valid", resolved, generation=cache.generation)
+    for index in range(5):
+        cache.put(f"guess-{index}", None, generation=cache.generation)
+
+    assert cache.get("valid") == (True, resolved)
+    assert cache.get("guess-4") == (True, None)
+    assert cache.get("guess-0") == (False, None)
+
+
+def test_lookup_racing_an_invalidation_is_not_cached() -> None:
+    cache = AccessKeyCache()
+    generation = cache.generation
+    cache.discard("stale")
+    cache.put(
+        "stale",
+        ResolvedAccessKey(rule_groups=("default",), request_timeout_seconds=None),
+        generation=generation,
+    )
+
+    assert cache.get("stale") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_admin_session_is_verified_once_per_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str | None] = []
+
+    def fake_verify(token, settings=None):  # noqa: ANN001
+        calls.append(token)
+        return token == "admin-session"
+
+    monkeypatch.setattr(route_helpers, "verify_admin_session_token", fake_verify)
+    request = _request("admin-session", debug=True)
+
+    assert await _resolve_rule_group_from_token(None, request, "codex") == "codex"
+    assert await _resolve_allowed_rule_groups_from_token(None, request) == ["default"]
+    assert include_debug_headers(request) is True
+    assert calls == ["admin-session"]
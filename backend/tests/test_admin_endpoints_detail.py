@@ -17,6 +17,7 @@ from app.services import endpoint_transport
 from app.services.agent_transport import AgentResponse
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.health_monitor import HealthProbeResult, HealthProbeStore
+from app.services.provider_quota import record_provider_quota
 from app.services.secrets import ENCRYPTED_SECRET_PREFIX, decrypt_secret_value
 
 
@@ -94,6 +95,17 @@ async def test_admin_endpoints_detail_includes_keys(monkeypatch: pytest.MonkeyPa
         )
     )
 
+    await record_provider_quota(
+        redis,
+        api_key_id=api_key.id,
+        status_code=200,
+        headers={
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-reset-requests": "120ms",
+        },
+    )
+
     async def override_redis():
         return redis
 
@@ -118,6 +130,10 @@ async def test_admin_endpoints_detail_includes_keys(monkeypatch: pytest.MonkeyPa
     assert payload[0]["is_active"] is True
     assert payload[0]["latency"] == 120
     assert payload[0]["uptime"] == 50.0
+    quota = payload[0]["keys"][0]["provider_quota"]
+    assert quota["requests"]["remaining"] == 499
+    assert quota["requests"]["limit"] == 500
+    assert quota["cooldown_until"] is None
 
     await session.close()
     await engine.dispose()
@@ -10,6 +10,7 @@ from app.core.config import Settings
 from app.db.session import get_session
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.health_monitor import HealthProbeResult, HealthProbeStore
+from app.services.inflight import acquire_inflight
 from conftest import TestMemoryRedis as MemoryRedis
 
 
@@ -46,6 +47,9 @@ class FakeSession:
     async def execute(self, stmt) -> FakeResult:  # noqa: ANN001
         return FakeResult(self._rows)
 
+    async def get(self, _model, ident: int) -> APIKeyStub | None:  # noqa: ANN001
+        return next((api_key for api_key, _ in self._rows if api_key.id == ident), None)
+
 
 @pytest.mark.asyncio
 async def test_health_status_endpoint_returns_probe_and_circuit(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -107,3 +111,105 @@ async def test_health_status_endpoint_returns_probe_and_circuit(monkeypatch: pyt
     open_payload = next(item for item in payload if item["api_key_id"] == 11)
     assert open_payload["probe_status"] == "unknown"
     assert open_payload["circuit_state"] == "open"
+    assert open_payload["circuit_trips"] == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_detail_endpoint_returns_transition_history(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    endpoint = EndpointStub(id=1, name="OpenAI", base_url="https://api.example.com")
+    api_key = APIKeyStub(id=12, endpoint_id=1, rule_group="default")
+    session = FakeSession([(api_key, endpoint)])
+    redis = MemoryRedis()
+    settings = Settings(
+        master_auth_token="token", admin_legacy_master_bearer_enabled=True,
+        circuit_breaker_failures=1,
+    )
+    breaker = CircuitBreaker(redis, settings=settings)
+    await breaker.record_failure(api_key.id)
+
+    async def override_session():
+        yield session
+
+    async def fake_get_redis():
+        return redis
+
+    monkeypatch.setattr(routes_module, "get_settings", lambda: settings)
+    monkeypatch.setattr(routes_module, "get_redis", fake_get_redis)
+
+    app = FastAPI()
+    app.include_router(routes_module.router)
+    app.dependency_overrides[get_session] = override_session
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/admin/health-status/12/circuit", headers={"Authorization": "Bearer token"}
+        )
+        missing = await client.get(
+            "/admin/health-status/99/circuit", headers={"Authorization": "Bearer token"}
+        )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["state"] == "open"
+    assert payload["trips"] == 1
+    assert [
+        (item["from_state"], item["to_state"], item["reason"])
+        for item in payload["transitions"]
+    ] == [("closed", "open", "consecutive_failures")]
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_inflight_endpoint_reports_local_gauges(monkeypatch: pytest.MonkeyPatch) -> None:
+    class InflightSession:
+        async def execute(self, stmt) -> FakeResult:  # noqa: ANN001
+            return FakeResult([(10, 1, "OpenAI"), (11, 1, "OpenAI")])
+
+    redis = MemoryRedis()
+    settings = Settings(master_auth_token="token", admin_legacy_master_bearer_enabled=True)
+    busy = await acquire_inflight(10)
+    await acquire_inflight(10)
+    await busy.release()
+    await busy.release()
+
+    async def override_session():
+        yield InflightSession()
+
+    async def fake_get_redis():
+        return redis
+
+    monkeypatch.setattr(routes_module, "get_settings", lambda: settings)
+    monkeypatch.setattr(routes_module, "get_redis", fake_get_redis)
+
+    app = FastAPI()
+    app.include_router(routes_module.router)
+    app.dependency_overrides[get_session] = override_session
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/admin/inflight", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "api_key_id": 10,
+            "endpoint_id": 1,
+            "endpoint_name": "OpenAI",
+            "local_inflight": 1,
+            "shared_inflight": None,
+            "concurrency_limit": 20,
+            "shared_concurrency_limit": None,
+        },
+        {
+            "api_key_id": 11,
+            "endpoint_id": 1,
+            "endpoint_name": "OpenAI",
+            "local_inflight": 0,
+            "shared_inflight": None,
+            "concurrency_limit": 20,
+            "shared_concurrency_limit": None,
+        },
+    ]
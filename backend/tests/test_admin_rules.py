@@ -11,7 +11,14 @@ from app.api.v1 import routes as routes_module
 from app.api.v1.route_modules import admin_handlers
 from app.core.config import Settings
 from app.db.base import Base
-from app.db.models import APIKey, Endpoint, FactoryAccessKey, ModelMap, RequestLog
+from app.db.models import (
+    APIKey,
+    Endpoint,
+    FactoryAccessKey,
+    ModelMap,
+    RequestLog,
+    RoutingRule,
+)
 from app.db.session import get_session
 from app.services import endpoint_transport
 from app.services.access_keys import is_hashed_access_key
@@ -491,11 +498,12 @@ async def test_factory_access_key_lists_do_not_expose_full_key(
         create_response = await client.post(
             "/admin/factory-keys",
             headers={"Authorization": "Bearer token"},
-            json={"name": "client", "rule_groups": ["codex"]},
+            json={"name": "client", "rule_groups": ["codex"], "request_timeout_seconds": 45},
         )
         assert create_response.status_code == 200
         create_payload = create_response.json()
         assert create_payload["key"].startswith("fk-")
+        assert create_payload["request_timeout_seconds"] == 45
         stored_key = await session.get(FactoryAccessKey, create_payload["id"])
         assert stored_key is not None
         assert stored_key.key != create_payload["key"]
@@ -520,6 +528,7 @@ async def test_factory_access_key_lists_do_not_expose_full_key(
         update_payload = update_response.json()
         assert update_payload["key"] is None
         assert update_payload["key_preview"] == list_payload[0]["key_preview"]
+        assert update_payload["request_timeout_seconds"] == 45
 
         rotate_response = await client.post(
             f"/admin/factory-keys/{create_payload['id']}/rotate",
@@ -606,12 +615,14 @@ async def test_create_endpoint_key_syncs_multi_rule_group_targets(
                 "rule_groups": ["default", "canary"],
                 "daily_limit": 100,
                 "rpm_limit": 20,
+                "tpm_limit": 40000,
                 "is_active": True,
             },
         )
         assert create_key_response.status_code == 200
         create_payload = create_key_response.json()
         key_id = create_payload["id"]
+        assert create_payload["tpm_limit"] == 40000
         assert create_payload["rule_group"] == "canary"
         assert create_payload["rule_groups"] == ["default", "canary"]
 
@@ -832,6 +843,76 @@ async def test_update_rule_target_keys_syncs_api_key_rule_groups(
     await engine.dispose()
 
 
+@pytest.mark.asyncio
+async def test_rule_hedge_settings_survive_unrelated_updates(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    session = session_maker()
+
+    async def override_session():
+        yield session
+
+    settings = Settings(master_auth_token="token", admin_legacy_master_bearer_enabled=True, proxy_dump_root="/tmp")
+    monkeypatch.setattr(routes_module, "get_settings", lambda: settings)
+
+    app = FastAPI()
+    app.include_router(routes_module.router)
+    app.dependency_overrides[get_session] = override_session
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        create_response = await client.post(
+            "/admin/rules",
+            headers={"Authorization": "Bearer token"},
+            json={
+                "model_pattern": "gpt-4.*",
+                "group_name": "hedged",
+                "target_key_ids": [],
+                "hedge_enabled": True,
+                "hedge_delay_ms": 300,
+                "first_byte_timeout_ms": 1500,
+            },
+        )
+        assert create_response.status_code == 200
+        rule_id = create_response.json()["id"]
+        assert create_response.json()["hedge_enabled"] is True
+        assert create_response.json()["hedge_delay_ms"] == 300
+
+        strategy_response = await client.patch(
+            f"/admin/rules/{rule_id}",
+            headers={"Authorization": "Bearer token"},
+            json={"strategy": "least_latency"},
+        )
+        learned_response = await client.patch(
+            f"/admin/rules/{rule_id}",
+            headers={"Authorization": "Bearer token"},
+            json={"hedge_delay_ms": None},
+        )
+        disable_response = await client.patch(
+            f"/admin/rules/{rule_id}",
+            headers={"Authorization": "Bearer token"},
+            json={"hedge_enabled": False},
+        )
+
+    assert strategy_response.json()["hedge_enabled"] is True
+    assert strategy_response.json()["hedge_delay_ms"] == 300
+    assert learned_response.json()["hedge_enabled"] is True
+    assert learned_response.json()["hedge_delay_ms"] is None
+    assert disable_response.json()["hedge_enabled"] is False
+    assert disable_response.json()["first_byte_timeout_ms"] == 1500
+    assert "hedge_enabled" not in json.loads(
+        (await session.get(RoutingRule, rule_id)).target_key_ids_json
+    )
+
+    await session.close()
+    await engine.dispose()
+
+
 @pytest.mark.asyncio
 async def test_rule_group_eligibility_auto_probes_when_model_maps_missing(
     monkeypatch: pytest.MonkeyPatch,
@@ -215,6 +215,32 @@ async def test_agent_manager_send_request_times_out_and_cleans_pending() -> None
     assert connection.pending == {}
 
 
+@pytest.mark.asyncio
+async def test_agent_manager_caps_wait_and_forwards_request_deadline() -> None:
+    manager = AgentManager(request_timeout_seconds=30)
+    channel = FakeChannel()
+    connection = manager.register("edge-hk", channel)
+
+    with pytest.raises(AgentUnavailableError):
+        await asyncio.wait_for(
+            manager.send_request(
+                "edge-hk",
+                AgentRequest(
+                    method="POST",
+                    url="https://api.example.com/v1/chat/completions",
+                    headers={},
+                    body=b"{}",
+                    stream=False,
+                    timeout_seconds=0.05,
+                ),
+            ),
+            timeout=1,
+        )
+
+    assert channel.sent[0]["timeout_ms"] == 50
+    assert connection.pending == {}
+
+
 @pytest.mark.asyncio
 async def test_agent_manager_stream_request_times_out_and_cleans_pending() -> None:
     manager = AgentManager(request_timeout_seconds=0.001)
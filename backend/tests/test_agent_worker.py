@@ -1,3 +1,4 @@
+import asyncio
 import base64
 from ipaddress import ip_address
 
@@ -188,6 +189,54 @@ async def test_handle_proxy_request_reports_error_after_stream_started(
     assert sender.messages[-1]["error_type"] == "ReadTimeout"
 
 
+@pytest.mark.asyncio
+async def test_handle_proxy_request_aborts_upstream_at_deadline(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sender = FakeSender()
+    upstream_cancelled = asyncio.Event()
+    payload = {
+        "type": "proxy_request",
+        "request_id": "req-deadline",
+        "method": "POST",
+        "url": "https://api.example.com/v1/chat/completions",
+        "headers": {},
+        "body": base64.b64encode(b"{}").decode("utf-8"),
+        "stream": False,
+        "timeout_ms": 50,
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            upstream_cancelled.set()
+            raise
+        return httpx.Response(200, content=b"late")
+
+    from app.services import agent_worker
+
+    monkeypatch.setattr(
+        agent_worker,
+        "get_settings",
+        lambda: Settings(agent_allowed_targets="api.example.com"),
+    )
+    monkeypatch.setattr(agent_worker, "_resolve_host_ips", resolve_public_host)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await asyncio.wait_for(handle_proxy_request(payload, client, sender.send), timeout=1)
+
+    assert upstream_cancelled.is_set()
+    assert sender.messages == [
+        {
+            "type": "proxy_response",
+            "request_id": "req-deadline",
+            "status_code": 504,
+            "headers": {},
+            "body": base64.b64encode(b"deadline_exceeded").decode("utf-8"),
+        }
+    ]
+
+
 @pytest.mark.asyncio
 @respx.mock
 async def test_handle_proxy_request_rejects_disallowed_target(
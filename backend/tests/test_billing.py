@@ -8,6 +8,7 @@ from app.services import billing
 from app.services.billing import (
     RequestAttemptMetrics,
     RequestMetrics,
+    UsageShare,
     extract_usage,
     write_request_attempt_log,
     write_request_log,
@@ -181,6 +182,70 @@ async def test_write_request_log_records_usage_atomically(
     await engine.dispose()
 
 
+@pytest.mark.asyncio
+async def test_write_request_log_splits_batched_usage_per_caller(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(billing, "SessionLocal", session_maker)
+
+    async with session_maker() as session:
+        endpoint = Endpoint(name="Batch", base_url="https://api.example.com")
+        session.add(endpoint)
+        await session.commit()
+        await session.refresh(endpoint)
+        api_key = APIKey(endpoint_id=endpoint.id, key="sk-batch", total_usage=0)
+        session.add(api_key)
+        await session.commit()
+        await session.refresh(api_key)
+        endpoint_id = endpoint.id
+        api_key_id = api_key.id
+
+    await write_request_log(
+        RequestMetrics(
+            request_id="req-leader",
+            trace_id="trace-leader",
+            model_alias="embed",
+            endpoint_id=endpoint_id,
+            api_key_id=api_key_id,
+            requested_rule_group="default",
+            rule_group="default",
+            status_code=200,
+            latency_ms=20,
+            ttft_ms=None,
+            tps=None,
+            prompt_tokens=10,
+            completion_tokens=None,
+            total_tokens=10,
+            usage_shares=(
+                UsageShare(request_id="req-leader", trace_id="trace-leader", weight=1),
+                UsageShare(request_id="req-follower", trace_id="trace-follower", weight=2),
+            ),
+        )
+    )
+
+    async with session_maker() as session:
+        logs = (
+            await session.execute(select(RequestLog).order_by(RequestLog.request_id))
+        ).scalars().all()
+        api_key = await session.get(APIKey, api_key_id)
+
+    assert [(log.request_id, log.trace_id) for log in logs] == [
+        ("req-follower", "trace-follower"),
+        ("req-leader", "trace-leader"),
+    ]
+    assert [log.total_tokens for log in logs] == [7, 3]
+    assert all(log.completion_tokens is None for log in logs)
+    assert api_key is not None
+    assert api_key.total_usage == 10
+
+    await engine.dispose()
+
+
 @pytest.mark.asyncio
 async def test_write_request_attempt_log_records_fallback_context(
     monkeypatch: pytest.MonkeyPatch,
@@ -1,5 +1,13 @@
 import pytest
 
+from app.core.circuit_state import (
+    CIRCUIT_EVENT_SCRIPT,
+    CircuitPolicy,
+    apply_circuit_event,
+    apply_circuit_events,
+    circuit_state_ttl_ms,
+    encode_circuit_state,
+)
 from app.core.config import Settings
 from app.services.circuit_breaker import CircuitBreaker
 from conftest import TestMemoryRedis as MemoryRedis
@@ -8,7 +16,11 @@ from conftest import TestMemoryRedis as MemoryRedis
 @pytest.mark.asyncio
 async def test_get_status_reflects_failures_and_state() -> None:
     redis = MemoryRedis()
-    settings = Settings(circuit_breaker_failures=2, circuit_breaker_ttl_seconds=60)
+    settings = Settings(
+        circuit_breaker_failures=2,
+        circuit_breaker_open_seconds=60,
+        circuit_breaker_ttl_seconds=600,
+    )
     breaker = CircuitBreaker(redis, settings=settings)
 
     status = await breaker.get_status(42)
@@ -40,3 +52,128 @@ async def test_are_available_batches_circuit_state_lookup() -> None:
     await redis.set("circuit:7:state", "open")
 
     assert await breaker.are_available([6, 7, 6]) == {6: True, 7: False}
+
+
+def _policy(**overrides: object) -> CircuitPolicy:
+    values = {
+        "failure_threshold": 100,
+        "window_seconds": 60.0,
+        "min_requests": 4,
+        "error_rate": 0.5,
+        "open_seconds": 30.0,
+        "max_open_seconds": 100.0,
+        "half_open_requests": 1,
+    }
+    values.update(overrides)
+    return CircuitPolicy(**values)
+
+
+def _run(raw: str | None, event: str, now: float, policy: CircuitPolicy):  # noqa: ANN202
+    state, transition = apply_circuit_event(raw, event, now=now, policy=policy)
+    if state is not None:
+        raw = None if state.is_idle else encode_circuit_state(state)
+    return raw, transition
+
+
+def test_circuit_trips_on_window_error_rate_after_min_requests() -> None:
+    policy = _policy()
+    raw = None
+    for now, event in [(1.0, "success"), (2.0, "failure"), (3.0, "success")]:
+        raw, transition = _run(raw, event, now, policy)
+        assert transition.state == "closed"
+
+    raw, transition = _run(raw, "failure", 4.0, policy)
+
+    assert transition.state == "open"
+    assert transition.reason == "error_rate"
+
+
+def test_circuit_window_forgets_old_failures() -> None:
+    policy = _policy()
+    raw = None
+    for now in [1.0, 2.0, 3.0]:
+        raw, _ = _run(raw, "failure", now, policy)
+
+    raw, transition = _run(raw, "success", 120.0, policy)
+    raw, transition = _run(raw, "failure", 121.0, policy)
+
+    assert transition.state == "closed"
+
+
+def test_half_open_admits_limited_trials_and_backs_off() -> None:
+    policy = _policy(failure_threshold=1)
+    raw, transition = _run(None, "failure", 0.0, policy)
+    assert transition.state == "open"
+
+    raw, transition = _run(raw, "acquire", 10.0, policy)
+    assert transition.allowed is False
+
+    raw, transition = _run(raw, "acquire", 31.0, policy)
+    assert (transition.state, transition.allowed) == ("half_open", True)
+    raw, transition = _run(raw, "acquire", 32.0, policy)
+    assert transition.allowed is False
+
+    raw, transition = _run(raw, "failure", 33.0, policy)
+    assert (transition.state, transition.reason) == ("open", "probe_failed")
+    raw, transition = _run(raw, "acquire", 80.0, policy)
+    assert transition.allowed is False
+    raw, transition = _run(raw, "acquire", 94.0, policy)
+    assert transition.allowed is True
+
+    raw, transition = _run(raw, "success", 95.0, policy)
+    assert transition.state == "closed"
+    assert raw is None
+
+
+def test_legacy_open_marker_is_rewritten_with_a_finite_open_period() -> None:
+    policy = _policy(half_open_requests=2)
+
+    raw, transition = _run("open", "acquire", 10.0, policy)
+    assert (raw, transition.allowed) == ("open", False)
+
+    state, transition = apply_circuit_event("open", "success", now=10.0, policy=policy)
+
+    assert (transition.previous, transition.state) == ("open", "half_open")
+    assert state.open_until == 40.0
+    assert "Infinity" not in encode_circuit_state(state)
+    assert circuit_state_ttl_ms(state, 10.0, policy) == 160_000
+    assert "math.huge" not in CIRCUIT_EVENT_SCRIPT
+
+
+def test_open_period_is_capped_by_max_open_seconds() -> None:
+    policy = _policy(failure_threshold=1, open_seconds=30.0, max_open_seconds=50.0)
+    raw, _ = _run(None, "failure", 0.0, policy)
+    raw, _ = _run(raw, "acquire", 30.0, policy)
+    raw, _ = _run(raw, "failure", 30.0, policy)
+
+    raw, transition = _run(raw, "acquire", 79.0, policy)
+    assert transition.allowed is False
+    raw, transition = _run(raw, "acquire", 80.0, policy)
+    assert transition.allowed is True
+
+
+def test_acquire_across_scopes_is_all_or_nothing() -> None:
+    policy = _policy(failure_threshold=1)
+    elapsed, _ = _run(None, "failure", 0.0, policy)
+    still_open, _ = _run(None, "failure", 20.0, policy)
+
+    results = apply_circuit_events([elapsed, still_open], "acquire", now=31.0, policy=policy)
+
+    assert [state for state, _ in results] == [None, None]
+    assert [transition.allowed for _, transition in results] == [False, False]
+
+
+@pytest.mark.asyncio
+async def test_circuit_history_records_transitions() -> None:
+    redis = MemoryRedis()
+    breaker = CircuitBreaker(redis, settings=Settings(circuit_breaker_failures=1))
+
+    await breaker.record_failure(9)
+    await breaker.record_success(9)
+
+    history = await breaker.get_history(9)
+    assert [(entry.from_state, entry.to_state) for entry in history] == [
+        ("open", "closed"),
+        ("closed", "open"),
+    ]
+    assert history[1].reason == "consecutive_failures"
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.core.config import Settings
+from app.core.redis import MemoryRedis
+from app.services.concurrency_limit import (
+    get_concurrency_limiter,
+    read_shared_concurrency_limits,
+)
+from app.services.inflight import acquire_inflight
+from app.services.router import RouteCandidate
+from proxy_test_utils import attempt_metrics, proxy_candidate
+
+
+def _candidate(api_key_id: int) -> RouteCandidate:
+    return proxy_candidate(api_key_id, f"sk-{api_key_id}", endpoint_id=1)
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_under_load_and_shrinks_on_overload() -> None:
+    limiter = get_concurrency_limiter()
+    assert limiter.limit(1) == 20
+    leases = [await acquire_inflight(1) for _ in range(11)]
+
+    limiter.observe(attempt_metrics(1, "success"))
+    limiter.observe(attempt_metrics(1, "success"))
+    assert limiter.limit(1) == 22
+
+    limiter.observe(attempt_metrics(1, "fallback", status_code=429))
+    assert limiter.limit(1) == 11
+    limiter.observe(attempt_metrics(1, "success", latency_ms=1000))
+    assert limiter.limit(1) == 9
+    limiter.observe(attempt_metrics(1, "fallback", status_code=400))
+    assert limiter.limit(1) == 9
+
+    for lease in leases:
+        await lease.release()
+    limiter.observe(attempt_metrics(1, "success"))
+    assert limiter.limit(1) == 9
+
+
+@pytest.mark.asyncio
+async def test_saturated_keys_move_to_the_back_and_queue_for_a_release(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        "app.services.concurrency_limit.get_settings",
+        lambda: Settings(adaptive_concurrency_initial_limit=1),
+    )
+    limiter = get_concurrency_limiter()
+    lease = await acquire_inflight(1)
+
+    ordered = limiter.prefer_unsaturated([_candidate(1), _candidate(2), _candidate(3)])
+    assert [candidate.api_key.id for candidate in ordered] == [2, 3, 1]
+    assert await limiter.acquire_slot(1) is False
+
+    asyncio.get_running_loop().call_later(0.01, lambda: asyncio.ensure_future(lease.release()))
+    assert await limiter.acquire_slot(1, wait_seconds=1.0) is True
+
+
+@pytest.mark.asyncio
+async def test_shared_limits_sum_published_workers(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        "app.services.concurrency_limit.get_settings",
+        lambda: Settings(adaptive_concurrency_redis_enabled=True),
+    )
+    redis = MemoryRedis()
+    limiter = get_concurrency_limiter()
+    limiter.limit(1)
+    await limiter.publish_if_due(redis)
+    await redis.set("route:concurrency:other:1", '{"1":5,"2":3}')
+    await redis.lpush("route:concurrency:workers", "other:1")
+
+    assert await read_shared_concurrency_limits(redis, [1, 2]) == {1: 25, 2: 3}
+
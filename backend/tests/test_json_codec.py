@@ -0,0 +1,103 @@
+import json
+
+from app.api.v1.route_modules.proxy_payloads import prepare_upstream_payload_and_body
+from app.core.json_codec import loads_json, splice_top_level, top_level_members
+from app.services.router import RouteCandidate
+from proxy_test_utils import APIKeyStub, EndpointStub
+
+TRICKY_BODY = (
+    b' {"model" : "alias", "messages": [{"role": "user", "content": "say \\"}\\", ok\\\\"}],'
+    b' "rule_group":"team", "n": 1, "meta": {"nested": [1, {"model": "x"}]}, "tag": "\xe4\xbd\xa0"} '
+)
+
+
+def _candidate() -> RouteCandidate:
+    return RouteCandidate(
+        api_key=APIKeyStub(id=1, key="sk"),
+        endpoint=EndpointStub(id=1, name="E", base_url="https://api.example.com"),
+        real_model="real-model",
+    )
+
+
+def test_top_level_members_skip_nested_and_escaped_structure() -> None:
+    members = top_level_members(TRICKY_BODY)
+
+    assert members is not None
+    assert [member.key for member in members] == [
+        "model",
+        "messages",
+        "rule_group",
+        "n",
+        "meta",
+        "tag",
+    ]
+    decoded = json.loads(TRICKY_BODY)
+    for member in members:
+        assert json.loads(TRICKY_BODY[member.value_start : member.value_end]) == decoded[member.key]
+
+
+def test_top_level_members_reject_non_objects_and_duplicate_keys() -> None:
+    assert top_level_members(b"[1, 2]") is None
+    assert top_level_members(b'{"model": "a", "model": "b"}') is None
+    assert top_level_members(b"{}") == []
+
+
+def test_splice_matches_full_rewrite() -> None:
+    members = top_level_members(TRICKY_BODY)
+    expected = json.loads(TRICKY_BODY)
+    expected.pop("rule_group")
+    expected["model"] = "real-model"
+    expected["stream_options"] = {"include_usage": True}
+
+    spliced = splice_top_level(
+        TRICKY_BODY,
+        members,
+        replace={"model": "real-model", "stream_options": {"include_usage": True}},
+        remove={"rule_group"},
+    )
+
+    assert json.loads(spliced) == expected
+    assert list(json.loads(spliced)) == list(expected)
+
+
+def test_model_rewrite_keeps_large_values_byte_identical() -> None:
+    image = "A" * 200_000
+    raw_body = json.dumps(
+        {
+            "model": "alias",
+            "stream": True,
+            "stream_options": {"include_obfuscation": False},
+            "messages": [{"role": "user", "content": [{"type": "image_url", "image_url": image}]}],
+        },
+        separators=(",", ":"),
+    ).encode()
+    payload = json.loads(raw_body)
+
+    upstream_payload, body = prepare_upstream_payload_and_body(
+        payload, raw_body, _candidate(), rewrite_model=True, is_stream=True
+    )
+
+    assert json.loads(body) == upstream_payload
+    assert upstream_payload["model"] == "real-model"
+    assert upstream_payload["stream_options"] == {
+        "include_obfuscation": False,
+        "include_usage": True,
+    }
+    assert raw_body[raw_body.index(b'"messages"') :] in body
+
+
+def test_codex_shape_still_uses_full_rewrite() -> None:
+    raw_body = b'{"model": "alias", "input": "hi", "temperature": 0.2}'
+
+    upstream_payload, body = prepare_upstream_payload_and_body(
+        json.loads(raw_body), raw_body, _candidate(), rewrite_model=True, provider="codex"
+    )
+
+    assert body == json.dumps(upstream_payload).encode()
+    assert "temperature" not in upstream_payload
+
+
+def test_loads_json_accepts_what_the_standard_library_accepts() -> None:
+    assert loads_json(b'{"big": 123456789012345678901234567890, "x": NaN}')["big"] == (
+        123456789012345678901234567890
+    )
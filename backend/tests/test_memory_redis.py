@@ -39,6 +39,42 @@ async def test_memory_redis_expires_keys(monkeypatch: pytest.MonkeyPatch) -> Non
     assert await redis.ttl("token") == -2
 
 
+@pytest.mark.asyncio
+async def test_memory_redis_pipeline_queues_and_returns_results_in_order() -> None:
+    redis = MemoryRedis()
+    await redis.set("a", "1")
+
+    pipe = redis.pipeline(transaction=False)
+    assert pipe.incr("counter") is pipe
+    pipe.mget(["a", "missing"]).set("b", "2", ex=5).get("b")
+
+    assert await redis.get("counter") is None
+    assert await pipe.execute() == [1, ["1", None], True, "2"]
+    assert 0 < await redis.ttl("b") <= 5
+    assert await pipe.execute() == []
+
+
+@pytest.mark.asyncio
+async def test_redis_pipeline_replays_on_clients_without_pipeline_support() -> None:
+    class PlainRedis:
+        def __init__(self) -> None:
+            self.store: dict[str, str] = {}
+
+        async def set(self, key: str, value: str) -> bool:
+            self.store[key] = value
+            return True
+
+        async def get(self, key: str) -> str | None:
+            return self.store.get(key)
+
+    plain = PlainRedis()
+    pipe = redis_module.redis_pipeline(plain)
+    pipe.set("a", "1")
+    pipe.get("a")
+
+    assert await pipe.execute() == [True, "1"]
+
+
 @pytest.mark.asyncio
 async def test_get_redis_warns_and_uses_bounded_memory_fallback(
     monkeypatch: pytest.MonkeyPatch,
@@ -92,6 +92,25 @@ def test_historical_sqlite_migrations_do_not_run_on_postgresql() -> None:
             "ALTER TABLE request_logs ADD COLUMN cached_tokens INTEGER",
             "ALTER TABLE request_logs ADD COLUMN is_cache_hit BOOLEAN DEFAULT FALSE",
         ),
+        "20260707_api_key_tpm_limit": (
+            "ALTER TABLE api_keys ADD COLUMN tpm_limit INTEGER",
+        ),
+        "20260708_factory_key_request_timeout": (
+            "ALTER TABLE factory_access_keys ADD COLUMN request_timeout_seconds FLOAT",
+        ),
+        "20260709_request_attempt_retry_decision": (
+            "ALTER TABLE request_attempt_logs ADD COLUMN retry_decision VARCHAR(32)",
+            "ALTER TABLE request_attempt_logs ADD COLUMN retry_delay_ms INTEGER",
+        ),
+        "20260710_request_log_routing_strategy": (
+            "ALTER TABLE request_logs ADD COLUMN routing_strategy VARCHAR(32)",
+        ),
+        "20260711_request_log_gateway_cache_hit": (
+            "ALTER TABLE request_logs ADD COLUMN gateway_cache_hit BOOLEAN DEFAULT FALSE",
+        ),
+        "20260712_request_log_coalesced": (
+            "ALTER TABLE request_logs ADD COLUMN coalesced BOOLEAN DEFAULT FALSE",
+        ),
     }
 
 
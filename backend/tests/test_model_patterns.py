@@ -3,6 +3,7 @@ import pytest
 from app.services import model_patterns
 from app.services.model_patterns import (
     MAX_MODEL_PATTERN_LENGTH,
+    ModelPatternIndex,
     UnsafeModelPatternError,
     compile_model_pattern,
     model_pattern_matches,
@@ -53,3 +54,37 @@ def test_model_pattern_matches_treats_timeout_as_no_match(
     )
 
     assert model_patterns.model_pattern_matches(".*", "gpt-5") is False
+
+
+def test_model_pattern_index_matches_like_individual_patterns() -> None:
+    patterns = [
+        "^gpt-4o$",
+        "gpt-4o",
+        "^gpt-.*",
+        r"^claude-3\.5-sonnet$",
+        "^(gpt|o)[0-9]+.*$",
+        "(?i)^GPT-4O-MINI$",
+        ".*mini$",
+        "^(a+)+$",
+        "^o1",
+    ]
+    index = ModelPatternIndex((pattern, pattern) for pattern in patterns)
+    aliases = ["gpt-4o", "gpt-4o-mini", "claude-3.5-sonnet", "claude-3x5-sonnet", "o1-mini", ""]
+
+    for alias in aliases:
+        expected = [pattern for pattern in patterns if model_pattern_matches(pattern, alias)]
+        assert index.matches(alias) == expected
+    assert len(index) == len(patterns) - 1
+
+
+def test_model_pattern_index_falls_back_to_single_patterns_on_timeout(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    class TimeoutMatcher:
+        def match(self, *_args: object, **_kwargs: object) -> object:
+            raise TimeoutError
+
+    index = ModelPatternIndex([("^gpt-[0-9]+$", "first"), ("^(gpt|o)-5$", "second")])
+    monkeypatch.setattr(index, "_combined", TimeoutMatcher())
+
+    assert index.matches("gpt-5") == ["first", "second"]
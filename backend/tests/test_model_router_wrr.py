@@ -1,23 +1,40 @@
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 import json
+import time
 
 import pytest
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from app.core.circuit_state import CircuitState, encode_circuit_state
 from app.core.config import Settings
-from app.core.redis import MemoryRedis
+from app.core.redis import MemoryPipeline, MemoryRedis
 from app.core.timezone import app_today
 from app.db.base import Base
 from app.db.models import APIKey, Endpoint, ModelMap, RoutingRule
-from app.services.circuit_breaker import CircuitBreaker
+from app.services.affinity import prompt_affinity_key
+from app.services.billing import RequestAttemptMetrics, RequestMetrics, write_request_log
+from app.services.circuit_breaker import (
+    CIRCUIT_SCOPE_ENDPOINT,
+    CIRCUIT_SCOPE_MODEL,
+    CircuitBreaker,
+)
+from app.services.inflight import get_local_inflight
+from app.services.key_latency import observe_attempt_metrics, observe_request_metrics
+from app.services.provider_quota import record_provider_quota
+from app.services import billing
 from app.services import router as router_module
 from app.services.router import (
     ModelRouter,
-    RPM_STATE_TTL_SECONDS,
     RouteCandidate,
     SEQUENTIAL_STATE_TTL_SECONDS,
 )
+from app.services.routing_snapshot import AgentRouteState
+from app.services.token_budget import (
+    ESTIMATE_MEDIA_PART_TOKENS,
+    estimate_prompt_tokens,
+    tpm_state_key,
+)
 
 
 class CircuitBreakerStub:
@@ -30,12 +47,29 @@ class CircuitBreakerStub:
     async def are_available(self, api_key_ids: list[int]) -> dict[int, bool]:
         return {api_key_id: True for api_key_id in api_key_ids}
 
+    def candidate_scopes(self, _candidate) -> list[object]:  # noqa: ANN001
+        return []
+
+    def route_states(self, state_keys: list[str], _states: list[str | None]) -> dict[str, str]:
+        return {state_key: "closed" for state_key in state_keys}
+
 
 class CountingRedis(MemoryRedis):
     def __init__(self) -> None:
         super().__init__()
         self.get_count = 0
         self.mget_count = 0
+        self.pipeline_count = 0
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        redis = self
+
+        class CountingPipeline(MemoryPipeline):
+            async def execute(self) -> list[object]:
+                redis.pipeline_count += 1
+                return await super().execute()
+
+        return CountingPipeline(self)
 
     async def get(self, key: str) -> str | None:
         self.get_count += 1
@@ -51,6 +85,7 @@ class APIKeyStub:
     id: int
     weight: int
     rpm_limit: int | None = None
+    tpm_limit: int | None = None
     daily_limit: int | None = None
     used_today: int = 0
     used_today_date: date | None = None
@@ -184,10 +219,210 @@ async def test_filter_available_candidates_batches_circuit_lookup() -> None:
     )
 
     assert [candidate.api_key.id for candidate in available] == [1, 3]
+    assert redis.pipeline_count == 1
     assert redis.mget_count == 1
     assert redis.get_count == 0
 
 
+@pytest.mark.asyncio
+async def test_filter_available_candidates_skips_provider_cooldown() -> None:
+    redis = CountingRedis()
+    await record_provider_quota(
+        redis, api_key_id=2, status_code=429, headers={"retry-after": "30"}
+    )
+    router = ModelRouter(CircuitBreaker(redis, settings=Settings()))
+    candidates = build_candidates([1, 1, 1])
+
+    available = await router._filter_available_candidates(
+        session=None,
+        candidates=candidates,
+        effective_group="default",
+        target_key_ids=[1, 2, 3],
+    )
+
+    assert [candidate.api_key.id for candidate in available] == [1, 3]
+    assert redis.mget_count == 1
+    assert router.rate_limit_retry_after == pytest.approx(30, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_filter_available_candidates_mixes_agent_and_direct_candidates(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    class AgentManagerStub:
+        def get(self, name: str) -> object | None:
+            return object() if name == "edge" else None
+
+    monkeypatch.setattr(router_module, "get_agent_manager", lambda: AgentManagerStub())
+    router = ModelRouter(CircuitBreaker(CountingRedis(), settings=Settings()))
+    candidates = [
+        RouteCandidate(
+            api_key=APIKeyStub(id=1, weight=1),
+            endpoint=EndpointStub(id=1, agent_node="edge", access_mode="via_agent"),
+            real_model="model",
+        ),
+        RouteCandidate(
+            api_key=APIKeyStub(id=2, weight=1),
+            endpoint=EndpointStub(id=2),
+            real_model="model",
+        ),
+        RouteCandidate(
+            api_key=APIKeyStub(id=3, weight=1),
+            endpoint=EndpointStub(id=3, agent_node="drained", access_mode="via_agent"),
+            real_model="model",
+        ),
+    ]
+
+    available = await router._filter_available_candidates(
+        session=None,
+        candidates=candidates,
+        effective_group="default",
+        target_key_ids=[1, 2, 3],
+        agent_state={
+            "edge": AgentRouteState(is_active=True, is_draining=False),
+            "drained": AgentRouteState(is_active=True, is_draining=True),
+        },
+    )
+
+    assert [candidate.api_key.id for candidate in available] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_routing_state_loads_circuit_rate_and_sequential_state_in_one_round_trip() -> None:
+    redis = CountingRedis()
+    router = ModelRouter(CircuitBreaker(redis, settings=Settings()))
+    candidates = build_candidates([1, 1, 1])
+    candidates[0].api_key.rpm_limit = 10
+    state_key = router._sequential_state_key(
+        model_alias="gpt-5",
+        effective_group="default",
+        provider_filters=None,
+        target_key_ids=[1, 2, 3],
+    )
+    await redis.set(state_key, "3")
+    await redis.set("circuit:2:state", "open")
+
+    available = await router._filter_available_candidates(
+        session=None,
+        candidates=candidates,
+        effective_group="default",
+        target_key_ids=[1, 2, 3],
+        sequential_state_key=state_key,
+    )
+    ordered = await router.order_candidates(
+        available,
+        strategy="sequential",
+        model_alias="gpt-5",
+        effective_group="default",
+        target_key_ids=[1, 2, 3],
+    )
+
+    assert [candidate.api_key.id for candidate in ordered] == [3, 1]
+    assert redis.pipeline_count == 1
+    assert redis.mget_count == 2
+    assert redis.get_count == 1
+
+
+@pytest.mark.asyncio
+async def test_half_open_key_admits_one_trial_request() -> None:
+    redis = MemoryRedis()
+    await redis.set(
+        "circuit:2:state",
+        encode_circuit_state(CircuitState(state="open", open_until=time.time() - 1, trips=1)),
+    )
+    candidates = build_candidates([1, 1])
+    first = ModelRouter(CircuitBreaker(redis, settings=Settings()))
+    second = ModelRouter(CircuitBreaker(redis, settings=Settings()))
+
+    first_available = await first._filter_available_candidates(
+        session=None, candidates=candidates, effective_group="default", target_key_ids=[1, 2]
+    )
+    second_available = await second._filter_available_candidates(
+        session=None, candidates=candidates, effective_group="default", target_key_ids=[1, 2]
+    )
+
+    assert [candidate.api_key.id for candidate in first_available] == [1, 2]
+    assert [candidate.api_key.id for candidate in second_available] == [1, 2]
+    assert await first.reserve_candidate_attempt(candidates[1]) is True
+    assert await second.reserve_candidate_attempt(candidates[1]) is False
+    assert second.reserve_failure_reason == "circuit_half_open"
+    assert await second.reserve_candidate_attempt(candidates[0]) is True
+
+    await first.record_attempt_success(candidates[1])
+    assert await redis.get("circuit:2:state") is None
+
+
+@pytest.mark.asyncio
+async def test_endpoint_circuit_skips_every_key_on_the_endpoint() -> None:
+    redis = CountingRedis()
+    breaker = CircuitBreaker(redis, settings=Settings(circuit_breaker_failures=1))
+    shared = EndpointStub(id=1)
+    candidates = [
+        RouteCandidate(api_key=APIKeyStub(id=1, weight=1), endpoint=shared, real_model="model"),
+        RouteCandidate(api_key=APIKeyStub(id=2, weight=1), endpoint=shared, real_model="model"),
+        RouteCandidate(
+            api_key=APIKeyStub(id=3, weight=1), endpoint=EndpointStub(id=2), real_model="model"
+        ),
+    ]
+    await breaker.record_candidate_failure(candidates[0], CIRCUIT_SCOPE_ENDPOINT)
+    router = ModelRouter(breaker)
+
+    available = await router._filter_available_candidates(
+        session=None, candidates=candidates, effective_group="default", target_key_ids=[1, 2, 3]
+    )
+
+    assert [candidate.api_key.id for candidate in available] == [3]
+    assert await breaker.is_available(1) is True
+    assert redis.mget_count == 1
+
+
+@pytest.mark.asyncio
+async def test_model_circuit_only_removes_that_model() -> None:
+    redis = MemoryRedis()
+    breaker = CircuitBreaker(redis, settings=Settings(circuit_breaker_failures=1))
+    api_key = APIKeyStub(id=1, weight=1)
+    endpoint = EndpointStub(id=1)
+    broken = RouteCandidate(api_key=api_key, endpoint=endpoint, real_model="model-a")
+    healthy = RouteCandidate(api_key=api_key, endpoint=endpoint, real_model="model-b")
+    await breaker.record_candidate_failure(broken, CIRCUIT_SCOPE_MODEL)
+    router = ModelRouter(breaker)
+
+    available = await router._filter_available_candidates(
+        session=None, candidates=[broken, healthy], effective_group="default", target_key_ids=[1]
+    )
+
+    assert [candidate.real_model for candidate in available] == ["model-b"]
+
+    await router.record_attempt_success(broken)
+    assert await redis.get("circuit:1:model:model-a:state") is None
+
+
+@pytest.mark.asyncio
+async def test_record_attempt_success_batches_circuit_and_sequential_writes() -> None:
+    redis = CountingRedis()
+    breaker = CircuitBreaker(redis, settings=Settings())
+    router = ModelRouter(breaker)
+    candidates = build_candidates([1, 1])
+    await redis.set("circuit:2:state", "open")
+    await router.order_candidates(
+        candidates,
+        strategy="sequential",
+        model_alias="gpt-5",
+        effective_group="default",
+        target_key_ids=[1, 2],
+    )
+    redis.pipeline_count = 0
+
+    await router.record_attempt_success(candidates[1])
+
+    assert redis.pipeline_count == 1
+    assert await breaker.is_available(2) is True
+    assert await redis.get("circuit:2:state") is None
+    assert await router.get_sequential_active_key_id(
+        model_alias="gpt-5", effective_group="default", target_key_ids=[1, 2]
+    ) == 2
+
+
 @pytest.mark.asyncio
 async def test_get_candidates_filters_rules_by_exposure_format() -> None:
     engine = create_async_engine("sqlite+aiosqlite:///:memory:")
@@ -412,7 +647,9 @@ async def test_filter_available_candidates_applies_daily_and_rpm_limits() -> Non
     candidates[1].api_key.used_today = 10
     candidates[1].api_key.used_today_date = date(2024, 1, 1)
     candidates[2].api_key.rpm_limit = 1
-    await redis.set(ModelRouter._rpm_state_key(candidates[2].api_key.id), "1")
+    await redis.set(
+        ModelRouter._rpm_state_key(candidates[2].api_key.id), f"0.000000:{time.time():.6f}"
+    )
 
     available = await router._filter_available_candidates(
         session=None,
@@ -423,10 +660,69 @@ async def test_filter_available_candidates_applies_daily_and_rpm_limits() -> Non
 
     assert [candidate.api_key.id for candidate in available] == [2]
     assert redis.mget_count == 2
+    assert router.rate_limit_retry_after == pytest.approx(60, abs=1)
 
 
 @pytest.mark.asyncio
-async def test_reserve_candidate_attempt_counts_rpm_window() -> None:
+async def test_daily_limit_uses_live_usage_instead_of_the_routing_snapshot(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(billing, "SessionLocal", session_maker)
+    async with session_maker() as session:
+        endpoint = Endpoint(name="Quota", base_url="https://quota.example.com", is_active=True)
+        session.add(endpoint)
+        await session.flush()
+        limited_key = APIKey(
+            endpoint_id=endpoint.id, key="sk-limited", is_active=True, daily_limit=10
+        )
+        spare_key = APIKey(endpoint_id=endpoint.id, key="sk-spare", is_active=True)
+        session.add_all([limited_key, spare_key])
+        session.add(ModelMap(endpoint_id=endpoint.id, model_alias="gpt-quota", real_model="gpt"))
+        await session.commit()
+
+        router = ModelRouter(CircuitBreakerStub())
+        before, _group = await router.get_candidates(session, "gpt-quota", "default")
+
+    await write_request_log(
+        RequestMetrics(
+            request_id="req-quota",
+            trace_id="trace-quota",
+            model_alias="gpt-quota",
+            endpoint_id=endpoint.id,
+            api_key_id=limited_key.id,
+            requested_rule_group="default",
+            rule_group="default",
+            status_code=200,
+            latency_ms=10,
+            ttft_ms=None,
+            tps=None,
+            prompt_tokens=None,
+            completion_tokens=None,
+            total_tokens=12,
+        )
+    )
+
+    async with session_maker() as session:
+        after, _group = await ModelRouter(CircuitBreakerStub()).get_candidates(
+            session, "gpt-quota", "default"
+        )
+
+    await engine.dispose()
+
+    assert sorted(candidate.api_key.id for candidate in before) == [
+        limited_key.id,
+        spare_key.id,
+    ]
+    assert [candidate.api_key.id for candidate in after] == [spare_key.id]
+
+
+@pytest.mark.asyncio
+async def test_reserve_candidate_attempt_takes_from_rpm_bucket() -> None:
     redis = CountingRedis()
     router = ModelRouter(CircuitBreaker(redis, settings=Settings()))
     candidate = build_candidates([1])[0]
@@ -434,9 +730,146 @@ async def test_reserve_candidate_attempt_counts_rpm_window() -> None:
 
     assert await router.reserve_candidate_attempt(candidate) is True
     rpm_ttl = await redis.ttl(ModelRouter._rpm_state_key(candidate.api_key.id))
-    assert 0 < rpm_ttl <= RPM_STATE_TTL_SECONDS
+    assert 0 < rpm_ttl <= 61
+    assert await router.reserve_candidate_attempt(candidate) is True
+    assert router.rate_limit_retry_after is None
+    assert await router.reserve_candidate_attempt(candidate) is False
+    assert router.rate_limit_retry_after == pytest.approx(30, abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_rpm_bucket_refills_instead_of_resetting_at_minute_boundary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    redis = MemoryRedis()
+    router = ModelRouter(CircuitBreaker(redis, settings=Settings()))
+    candidate = build_candidates([1])[0]
+    candidate.api_key.rpm_limit = 60
+    clock = [1_000.0]
+    monkeypatch.setattr("app.core.redis.time.time", lambda: clock[0])
+
+    for _ in range(60):
+        assert await router.reserve_candidate_attempt(candidate) is True
+    assert await router.reserve_candidate_attempt(candidate) is False
+
+    clock[0] += 0.5
+    assert await router.reserve_candidate_attempt(candidate) is False
+    clock[0] += 0.5
+    assert await router.reserve_candidate_attempt(candidate) is True
+    assert await router.reserve_candidate_attempt(candidate) is False
+
+
+@pytest.mark.asyncio
+async def test_reserve_candidate_attempt_reserves_and_reconciles_tpm() -> None:
+    redis = MemoryRedis()
+    router = ModelRouter(
+        CircuitBreaker(redis, settings=Settings()), prompt_tokens_estimate=400
+    )
+    candidate = build_candidates([1])[0]
+    candidate.api_key.tpm_limit = 1000
+    state_key = tpm_state_key(candidate.api_key.id)
+
+    assert await router.reserve_candidate_attempt(candidate) is True
+    assert float((await redis.get(state_key)).split(":")[0]) == pytest.approx(600, abs=1)
+
+    await router.settle_token_reservation(900)
+    assert float((await redis.get(state_key)).split(":")[0]) == pytest.approx(100, abs=1)
+
+    assert await router.reserve_candidate_attempt(candidate) is False
+    assert router.reserve_failure_reason == "tpm_limit"
+    assert router.rate_limit_retry_after == pytest.approx(300 / (1000 / 60), abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_refunds_tpm_and_rpm_reservations() -> None:
+    redis = MemoryRedis()
+    router = ModelRouter(
+        CircuitBreaker(redis, settings=Settings()), prompt_tokens_estimate=800
+    )
+    candidate = build_candidates([1])[0]
+    candidate.api_key.rpm_limit = 10
+    candidate.api_key.tpm_limit = 1000
+
     assert await router.reserve_candidate_attempt(candidate) is True
+    await router.release_attempt()
+    assert await router.reserve_candidate_attempt(candidate) is True
+    # The second reservation only fits because the first one was refunded.
+    assert await router.reserve_candidate_attempt(candidate) is True
+    assert await router.reserve_candidate_attempt(candidate) is True
+
+    router.prompt_tokens_estimate = 5000
+    await router.release_attempt()
+    await redis.set(
+        tpm_state_key(candidate.api_key.id), f"100.000000:{time.time():.6f}"
+    )
+    rpm_before = await redis.get(ModelRouter._rpm_state_key(candidate.api_key.id))
     assert await router.reserve_candidate_attempt(candidate) is False
+    rpm_after = await redis.get(ModelRouter._rpm_state_key(candidate.api_key.id))
+    assert float(rpm_after.split(":")[0]) == pytest.approx(
+        float(rpm_before.split(":")[0]), abs=0.01
+    )
+
+
+@pytest.mark.asyncio
+async def test_filter_available_candidates_skips_keys_without_tpm_headroom() -> None:
+    redis = CountingRedis()
+    router = ModelRouter(
+        CircuitBreaker(redis, settings=Settings()), prompt_tokens_estimate=500
+    )
+    candidates = build_candidates([1, 1])
+    for candidate in candidates:
+        candidate.api_key.rpm_limit = 100
+        candidate.api_key.tpm_limit = 1000
+    await redis.set(
+        tpm_state_key(candidates[0].api_key.id), f"200.000000:{time.time():.6f}"
+    )
+
+    available = await router._filter_available_candidates(
+        session=None,
+        candidates=candidates,
+        effective_group="default",
+        target_key_ids=[1, 2],
+    )
+
+    assert [candidate.api_key.id for candidate in available] == [2]
+    assert redis.mget_count == 2
+
+
+def test_estimate_prompt_tokens_scales_with_body_and_messages() -> None:
+    small = estimate_prompt_tokens({"messages": [{"role": "user", "content": "hi"}]}, 40)
+    large = estimate_prompt_tokens(
+        {"messages": [{"role": "user", "content": "x"}] * 4}, 4000
+    )
+
+    assert small == 40 // 4 + 4 + 3
+    assert large == 4000 // 4 + 16 + 3
+
+
+@pytest.mark.parametrize(
+    "image_part",
+    [
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64," + "A" * 400_000}},
+        {"type": "input_image", "image_url": "data:image/png;base64," + "A" * 400_000},
+        {"type": "image", "source": {"type": "base64", "data": "A" * 400_000}},
+        {"inline_data": {"mime_type": "image/png", "data": "A" * 400_000}},
+    ],
+)
+def test_estimate_prompt_tokens_counts_inline_images_as_a_fixed_allowance(
+    image_part: dict,
+) -> None:
+    payload = {
+        "messages": [
+            {"role": "user", "content": [{"type": "text", "text": "describe"}, image_part]}
+        ]
+    }
+    raw_body = json.dumps(payload, separators=(",", ":")).encode()
+    text_only = {"messages": [{"role": "user", "content": [{"type": "text", "text": "describe"}]}]}
+    text_size = len(json.dumps(text_only, separators=(",", ":")).encode())
+
+    estimate = estimate_prompt_tokens(payload, len(raw_body))
+
+    assert estimate < 400_000 // 4
+    assert estimate <= text_size // 4 + ESTIMATE_MEDIA_PART_TOKENS + 4 + 3 + 16
 
 
 def test_route_candidate_reports_direct_execution_by_default() -> None:
@@ -475,3 +908,272 @@ def test_route_candidate_keeps_legacy_agent_node_compatibility() -> None:
 
     assert candidate.execution_mode == "via_agent"
     assert candidate.agent_name == "edge-sg"
+
+
+def _observe_key(
+    api_key_id: int,
+    *,
+    ttft_ms: int | None,
+    latency_ms: int,
+    outcome: str = "success",
+) -> None:
+    observe_attempt_metrics(
+        RequestAttemptMetrics(
+            request_id="req",
+            trace_id="trace",
+            model_alias="model",
+            endpoint_id=api_key_id,
+            api_key_id=api_key_id,
+            requested_rule_group=None,
+            rule_group="default",
+            attempt_order=1,
+            status_code=200 if outcome == "success" else 502,
+            outcome=outcome,
+            failure_reason=None if outcome == "success" else "http_502",
+            latency_ms=latency_ms,
+        )
+    )
+    if outcome == "success":
+        observe_request_metrics(
+            RequestMetrics(
+                request_id="req",
+                trace_id="trace",
+                model_alias="model",
+                endpoint_id=api_key_id,
+                api_key_id=api_key_id,
+                requested_rule_group=None,
+                rule_group="default",
+                status_code=200,
+                latency_ms=latency_ms,
+                ttft_ms=ttft_ms,
+                tps=None,
+                prompt_tokens=None,
+                completion_tokens=None,
+                total_tokens=None,
+            )
+        )
+
+
+def test_least_latency_prefers_fast_and_healthy_keys(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    candidates = build_candidates([1, 1, 1])
+    for _ in range(5):
+        _observe_key(1, ttft_ms=900, latency_ms=2000)
+        _observe_key(2, ttft_ms=100, latency_ms=400)
+        _observe_key(3, ttft_ms=100, latency_ms=400, outcome="error")
+    draws = iter([0.0, 0.99])
+    monkeypatch.setattr(router_module.random, "random", lambda: next(draws))
+
+    first = ModelRouter._order_candidates(candidates, "least_latency")
+    second = ModelRouter._order_candidates(candidates, "least_latency")
+
+    assert [candidate.api_key.id for candidate in first] == [2, 3, 1]
+    assert second[0].api_key.id == 1
+
+
+def test_least_latency_probes_keys_without_samples(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    candidates = build_candidates([1, 1])
+    _observe_key(1, ttft_ms=200, latency_ms=500)
+    monkeypatch.setattr(router_module.random, "random", lambda: 0.75)
+
+    ordered = ModelRouter._order_candidates(candidates, "least_latency")
+
+    assert ordered[0].api_key.id == 2
+
+
+@pytest.mark.asyncio
+async def test_least_inflight_picks_less_loaded_of_two_draws(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    router = ModelRouter(CircuitBreakerStub())
+    candidates = build_candidates([1, 1, 1])
+    await router.reserve_candidate_attempt(candidates[0])
+    router.detach_inflight_lease()
+    await router.reserve_candidate_attempt(candidates[0])
+    router.detach_inflight_lease()
+    await router.reserve_candidate_attempt(candidates[1])
+    router.detach_inflight_lease()
+    draws = iter([0.0, 0.0])
+    monkeypatch.setattr(router_module.random, "random", lambda: next(draws))
+
+    ordered = await router.order_candidates(
+        candidates,
+        "least_inflight",
+        model_alias="model",
+        effective_group="default",
+    )
+
+    assert [candidate.api_key.id for candidate in ordered] == [2, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_affinity_pins_a_session_and_spills_over_when_its_key_is_overloaded() -> None:
+    candidates = build_candidates([1, 1, 1, 1])
+
+    async def order(affinity_key: str) -> list[int]:
+        router = ModelRouter(CircuitBreakerStub(), affinity_key=affinity_key)
+        ordered = await router.order_candidates(
+            candidates, "affinity", model_alias="model", effective_group="default"
+        )
+        return [candidate.api_key.id for candidate in ordered]
+
+    pinned = await order("session:alpha")
+    assert await order("session:alpha") == pinned
+    assert len({(await order(f"session:{index}"))[0] for index in range(40)}) == 4
+
+    busy = ModelRouter(CircuitBreakerStub())
+    for _ in range(4):
+        await busy.reserve_candidate_attempt(candidates[pinned[0] - 1])
+        busy.detach_inflight_lease()
+
+    assert await order("session:alpha") == [*pinned[1:], pinned[0]]
+
+
+def test_prompt_affinity_key_ignores_later_turns() -> None:
+    first_turn = {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "You are terse."},
+            {"role": "user", "content": "Summarize the report."},
+        ],
+    }
+    later_turn = {
+        **first_turn,
+        "messages": [
+            *first_turn["messages"],
+            {"role": "assistant", "content": "Done."},
+            {"role": "user", "content": "Shorter."},
+        ],
+    }
+
+    key = prompt_affinity_key(None, first_turn)
+    assert key is not None and key.startswith("prefix:")
+    assert prompt_affinity_key(None, later_turn) == key
+    assert prompt_affinity_key("abc", later_turn) == "session:abc"
+    assert prompt_affinity_key(None, {"model": "gpt-4o"}) is None
+
+
+@pytest.mark.asyncio
+async def test_reserve_candidate_attempt_tracks_one_lease_per_request() -> None:
+    router = ModelRouter(CircuitBreakerStub())
+    first, second = build_candidates([1, 1])
+
+    await router.reserve_candidate_attempt(first)
+    assert get_local_inflight([1, 2]) == {1: 1, 2: 0}
+
+    await router.reserve_candidate_attempt(second)
+    assert get_local_inflight([1, 2]) == {1: 0, 2: 1}
+
+    stream_lease = router.detach_inflight_lease()
+    await router.release_attempt()
+    assert get_local_inflight([2]) == {2: 1}
+
+    await stream_lease.release()
+    assert get_local_inflight([2]) == {2: 0}
+
+
+class SharedWrrRedis:
+    """Applies WRR_SELECT_SCRIPT's KEYS/ARGV contract to an in-process hash store."""
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[str, int]] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args: object) -> str:
+        assert script == router_module.WRR_SELECT_SCRIPT
+        assert numkeys == 1
+        key = str(keys_and_args[0])
+        args = [str(item) for item in keys_and_args[1:]]
+        pool = list(zip(args[1::2], (int(weight) for weight in args[2::2])))
+        state = self.hashes.setdefault(key, {})
+        if len(state) != len(pool):
+            state.clear()
+        selected_id: str | None = None
+        for key_id, weight in pool:
+            state[key_id] = state.get(key_id, 0) + weight
+            if selected_id is None or state[key_id] > state[selected_id]:
+                selected_id = key_id
+        state[selected_id] -= sum(weight for _, weight in pool)
+        self.ttls[key] = int(args[0])
+        return selected_id
+
+
+async def _route_across_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    redis: object,
+    *,
+    workers: int,
+    requests: int,
+) -> list[int]:
+    candidates = build_candidates([5, 3, 2])
+    worker_states = [router_module.OrderedDict() for _ in range(workers)]
+    selections: list[int] = []
+    for index in range(requests):
+        # Each worker process has its own module-level WRR state.
+        monkeypatch.setattr(router_module, "_wrr_state", worker_states[index % workers])
+        breaker = CircuitBreakerStub()
+        breaker.redis = redis
+        ordered = await ModelRouter(breaker).order_candidates(
+            candidates,
+            "weighted_round_robin",
+            model_alias="model",
+            effective_group="default",
+        )
+        selections.append(ordered[0].api_key.id)
+    return selections
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [4, 8, 16])
+async def test_shared_wrr_state_honours_weights_across_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    workers: int,
+) -> None:
+    redis = SharedWrrRedis()
+
+    selections = await _route_across_workers(
+        monkeypatch, redis, workers=workers, requests=10 * workers
+    )
+
+    assert {key_id: selections.count(key_id) for key_id in (1, 2, 3)} == {
+        1: 5 * workers,
+        2: 3 * workers,
+        3: 2 * workers,
+    }
+    assert list(redis.ttls.values()) == [router_module.WRR_SHARED_STATE_TTL_SECONDS]
+
+
+@pytest.mark.asyncio
+async def test_wrr_uses_local_state_with_memory_redis(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    selections = await _route_across_workers(
+        monkeypatch, MemoryRedis(), workers=4, requests=4
+    )
+
+    # Without shared state every freshly started worker begins on the same key.
+    assert selections == [1, 1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_reserve_candidate_attempt_skips_key_at_concurrency_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        "app.services.concurrency_limit.get_settings",
+        lambda: Settings(adaptive_concurrency_initial_limit=1),
+    )
+    candidate = build_candidates([1])[0]
+    busy = ModelRouter(CircuitBreaker(MemoryRedis(), settings=Settings()))
+    router = ModelRouter(CircuitBreaker(MemoryRedis(), settings=Settings()))
+
+    assert await busy.reserve_candidate_attempt(candidate) is True
+    assert await router.reserve_candidate_attempt(candidate) is False
+    assert router.reserve_failure_reason == "concurrency_limit"
+
+    await busy.release_attempt()
+    assert await router.reserve_candidate_attempt(candidate) is True
+    assert get_local_inflight([1]) == {1: 1}
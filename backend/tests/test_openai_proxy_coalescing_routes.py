@@ -0,0 +1,292 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.v1 import routes as routes_module
+from app.api.v1.route_modules import proxy_cache
+from app.core.config import Settings
+from app.services.router import RouteCandidate
+from app.services.rule_options import RuleOptions
+from app.services.single_flight import StreamFanout, StreamFanoutAborted, get_single_flight
+from proxy_test_utils import build_proxy_app, post_proxy, proxy_candidate, use_rule_options
+
+EMBEDDING_BODY = {"model": "text-embedding-3-small", "input": ["alpha", "beta"]}
+
+
+def _candidate() -> RouteCandidate:
+    return proxy_candidate(
+        91, "sk-coalesce", endpoint_id=90, real_model="text-embedding-3-small"
+    )
+
+
+def _use_default_rule(monkeypatch: pytest.MonkeyPatch, **settings_overrides: object) -> None:
+    use_rule_options(monkeypatch, RuleOptions())
+    settings_overrides.setdefault("request_coalescing_enabled", True)
+    settings = Settings(
+        master_auth_token="token",
+        admin_legacy_master_bearer_enabled=True,
+        **settings_overrides,
+    )
+    monkeypatch.setattr(routes_module, "get_settings", lambda: settings)
+
+
+async def _post_concurrently(
+    app, path: str, body: dict, release: asyncio.Event, count: int = 3  # noqa: ANN001
+) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        requests = [
+            asyncio.create_task(
+                client.post(path, headers={"Authorization": "Bearer token"}, json=body)
+            )
+            for _ in range(count)
+        ]
+        while not get_single_flight().flights:
+            await asyncio.sleep(0)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        release.set()
+        responses = await asyncio.gather(*requests)
+    for _ in range(3):
+        await asyncio.sleep(0)
+    return list(responses)
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_upstream_call(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        await release.wait()
+        return httpx.Response(200, json={"object": "list", "data": []})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _use_default_rule(monkeypatch)
+
+    responses = await _post_concurrently(app, "/openai/v1/embeddings", EMBEDDING_BODY, release)
+    await upstream_client.aclose()
+
+    assert len(calls) == 1
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == {"object": "list", "data": []} for response in responses)
+    assert sorted(response.headers.get("x-gateway-cache", "") for response in responses) == [
+        "",
+        "coalesced",
+        "coalesced",
+    ]
+    assert len(recorded["attempts"]) == 1
+    assert not get_single_flight().flights
+
+
+@pytest.mark.asyncio
+async def test_followers_go_upstream_when_the_leader_fails(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        await release.wait()
+        if len(calls) == 1:
+            return httpx.Response(400, json={"error": "bad"})
+        return httpx.Response(200, json={"object": "list", "data": []})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _use_default_rule(monkeypatch)
+
+    responses = await _post_concurrently(
+        app, "/openai/v1/embeddings", EMBEDDING_BODY, release, count=2
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert sorted(response.status_code for response in responses) == [200, 400]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_is_off_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[bytes] = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        await release.wait()
+        return httpx.Response(200, json={"object": "list", "data": []})
+
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, {})
+    _use_default_rule(monkeypatch, request_coalescing_enabled=False)
+
+    requests = [
+        asyncio.create_task(post_proxy(app, EMBEDDING_BODY, path="/openai/v1/embeddings"))
+        for _ in range(2)
+    ]
+    while len(calls) < 2:
+        await asyncio.sleep(0)
+    release.set()
+    responses = await asyncio.gather(*requests)
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert all("x-gateway-cache" not in response.headers for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_followers_go_upstream_when_the_leader_fails_semantically(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        await release.wait()
+        if len(calls) == 1:
+            return httpx.Response(200, json={"error": {"message": "overloaded"}})
+        return httpx.Response(200, json={"object": "list", "data": []})
+
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, {})
+    _use_default_rule(monkeypatch)
+
+    responses = await _post_concurrently(
+        app, "/openai/v1/embeddings", EMBEDDING_BODY, release, count=2
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert sorted(str(response.json()) for response in responses) == [
+        str({"error": {"message": "overloaded"}}),
+        str({"object": "list", "data": []}),
+    ]
+    assert all("x-gateway-cache" not in response.headers for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_stream_fan_out_replays_the_leader_stream(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+    release = asyncio.Event()
+    sse = (
+        b'data: {"id":"c1","choices":[{"delta":{"content":"hi"}}]}\n\n'
+        b"data: [DONE]\n\n"
+    )
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        await release.wait()
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse)
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _use_default_rule(monkeypatch, request_coalescing_stream_enabled=True)
+
+    responses = await _post_concurrently(
+        app,
+        "/openai/v1/chat/completions",
+        {
+            "model": "gpt-4o-mini",
+            "stream": True,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": "hi"}],
+        },
+        release,
+        count=2,
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 1
+    assert [response.content for response in responses] == [sse, sse]
+    assert any(response.headers.get("x-gateway-cache") == "coalesced" for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_stream_fanout_subscriber_sees_chunks_published_before_it_joined() -> None:
+    fanout = StreamFanout("text/event-stream", 1, 1)
+    fanout.publish(b"a")
+
+    async def _consume() -> list[bytes | str]:
+        return [chunk async for chunk in fanout.subscribe(1.0)]
+
+    consumer = asyncio.create_task(_consume())
+    await asyncio.sleep(0)
+    fanout.publish(b"b")
+    fanout.close()
+
+    assert await consumer == [b"a", b"b"]
+
+
+async def _chunks(*chunks: bytes):  # noqa: ANN202
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_stream_fanout_aborts_when_the_leader_stream_fails() -> None:
+    fanout = StreamFanout("text/event-stream", 1, 1)
+    leader = proxy_cache._fan_out_stream(
+        _chunks(b'data: {"choices":[]}\n\n', b'data: {"error":{"message":"boom"}}\n\n'),
+        fanout,
+        "openai",
+    )
+
+    assert [chunk async for chunk in leader] == fanout.chunks
+    assert fanout.aborted is True
+    with pytest.raises(StreamFanoutAborted):
+        async for _ in fanout.subscribe(1.0):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stream_fanout_aborts_when_the_leader_disconnects() -> None:
+    fanout = StreamFanout("text/event-stream", 1, 1)
+    leader = proxy_cache._fan_out_stream(
+        _chunks(b'data: {"choices":[]}\n\n', b"data: [DONE]\n\n"), fanout, "openai"
+    )
+
+    await leader.__anext__()
+    await leader.aclose()
+
+    assert fanout.aborted is True
+    assert fanout.closed is False
+
+
+@pytest.mark.asyncio
+async def test_follower_falls_back_when_the_stream_aborts_before_its_first_chunk() -> None:
+    fanout = StreamFanout("text/event-stream", 1, 1)
+    flight = get_single_flight().join("stream-key")
+    follower = get_single_flight().join("stream-key")
+    get_single_flight().settle(flight, fanout)
+    fanout.abort()
+    lookup = proxy_cache.ResponseCacheLookup(
+        key="stream-key",
+        ttl_seconds=None,
+        effective_group="default",
+        exposure_format="openai",
+        is_stream=True,
+    )
+
+    response = await proxy_cache.coalesced_proxy_response(
+        follower,
+        lookup,
+        deadline=None,
+        request_id="req",
+        trace_id="trace",
+        model_alias="gpt-4o-mini",
+        requested_rule_group=None,
+        request_start=0.0,
+    )
+
+    assert response is None
@@ -0,0 +1,120 @@
+import httpx
+import pytest
+
+from app.services.provider_quota import (
+    cooldown_key,
+    parse_provider_quota,
+    read_provider_quota_many,
+)
+from app.services.router import RouteCandidate
+from proxy_test_utils import build_proxy_app, post_proxy, primary_and_fallback
+
+
+def _candidates() -> list[RouteCandidate]:
+    return primary_and_fallback(60)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_key_cools_down_without_opening_circuit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        if request.headers["Authorization"] == "Bearer sk-primary":
+            return httpx.Response(429, headers={"retry-after": "30"}, json={"error": "slow"})
+        return httpx.Response(200, json={"id": "ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert calls == ["Bearer sk-primary", "Bearer sk-fallback"]
+    redis = recorded["redis"]
+    assert "circuit:61:state" not in redis.store
+    assert 0 < await redis.ttl(cooldown_key(61)) <= 30
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_without_reset_hint_still_counts_toward_circuit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers["Authorization"] == "Bearer sk-primary":
+            return httpx.Response(429, json={"error": "slow"})
+        return httpx.Response(200, json={"id": "ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    redis = recorded["redis"]
+    assert "circuit:61:state" in redis.store
+    assert cooldown_key(61) not in redis.store
+
+
+@pytest.mark.asyncio
+async def test_successful_response_with_exhausted_quota_starts_cooldown(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={
+                "x-ratelimit-limit-requests": "100",
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-reset-requests": "20s",
+            },
+            json={"id": "ok"},
+        )
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    redis = recorded["redis"]
+    assert 0 < await redis.ttl(cooldown_key(61)) <= 20
+    quota = await read_provider_quota_many(redis, [61])
+    assert quota[61]["requests"] == {"limit": 100, "remaining": 0, "reset_after_seconds": 20.0}
+
+
+def test_provider_quota_parses_anthropic_and_gemini_signals() -> None:
+    anthropic = parse_provider_quota(
+        200,
+        {
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-remaining": "49",
+            "anthropic-ratelimit-input-tokens-remaining": "0",
+            "anthropic-ratelimit-input-tokens-reset": "10s",
+            "anthropic-ratelimit-output-tokens-remaining": "8000",
+        },
+    )
+    assert anthropic is not None
+    assert anthropic.requests.remaining == 49
+    assert anthropic.tokens.remaining == 0
+    assert anthropic.cooldown_until is not None
+
+    gemini = parse_provider_quota(
+        429,
+        {},
+        b'{"error":{"details":[{"@type":"type.googleapis.com/google.rpc.RetryInfo",'
+        b'"retryDelay":"37s"}]}}',
+    )
+    assert gemini is not None and gemini.cooldown_until is not None
+
+    assert parse_provider_quota(200, {"content-type": "application/json"}) is None
+    healthy = parse_provider_quota(200, {"x-ratelimit-remaining-tokens": "1200"})
+    assert healthy is not None and healthy.cooldown_until is None
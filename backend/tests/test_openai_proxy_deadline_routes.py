@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api.v1.route_modules.proxy_deadline import resolve_request_deadline
+from app.services.key_latency import observe_attempt_metrics
+from app.services.router import RouteCandidate
+from proxy_test_utils import (
+    attempt_metrics,
+    attempt_outcomes,
+    build_proxy_app,
+    post_proxy,
+    primary_and_fallback,
+)
+
+
+def _candidates() -> list[RouteCandidate]:
+    return primary_and_fallback(
+        40, primary_key="sk-slow", fallback_key="sk-fast", shared_endpoint=True
+    )
+
+
+def _route_request(headers: list[tuple[bytes, bytes]]) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers})
+
+
+@pytest.mark.asyncio
+async def test_request_deadline_returns_504_instead_of_retrying(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"id": "late"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    started = time.perf_counter()
+    response = await post_proxy(app, headers={"X-Request-Timeout": "0.1"})
+    await upstream_client.aclose()
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Request deadline exceeded"
+    assert time.perf_counter() - started < 2
+    assert calls == ["Bearer sk-slow"]
+    assert attempt_outcomes(recorded) == {41: ("error", "deadline_exceeded")}
+
+
+@pytest.mark.asyncio
+async def test_request_deadline_skips_candidate_that_cannot_finish_in_time(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    for _ in range(10):
+        observe_attempt_metrics(attempt_metrics(41, endpoint_id=40, latency_ms=8000))
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        return httpx.Response(200, json={"id": "fast"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app, headers={"X-Request-Timeout": "2"})
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert calls == ["Bearer sk-fast"]
+    assert attempt_outcomes(recorded) == {
+        41: ("fallback", "deadline_skip"),
+        42: ("success", None),
+    }
+
+
+@pytest.mark.asyncio
+async def test_invalid_request_timeout_header_is_rejected(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("upstream should not be called")
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app, headers={"X-Request-Timeout": "soon"})
+    await upstream_client.aclose()
+
+    assert response.status_code == 400
+
+
+def test_request_deadline_prefers_header_over_factory_key_default() -> None:
+    keyed = _route_request([])
+    keyed.state.route_request_timeout_seconds = 30.0
+    deadline = resolve_request_deadline(keyed, 100.0)
+    assert deadline is not None and deadline.expires_at == 130.0
+
+    overridden = _route_request([(b"x-request-timeout", b"2.5")])
+    overridden.state.route_request_timeout_seconds = 30.0
+    deadline = resolve_request_deadline(overridden, 100.0)
+    assert deadline is not None and deadline.expires_at == 102.5
+
+    assert resolve_request_deadline(_route_request([]), 100.0) is None
+    with pytest.raises(HTTPException):
+        resolve_request_deadline(_route_request([(b"x-request-timeout", b"0")]), 100.0)
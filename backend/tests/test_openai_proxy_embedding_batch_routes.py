@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.billing import apportion_tokens
+from app.services.embedding_batcher import batch_inputs, split_embedding_response
+from app.services.router import RouteCandidate
+from app.services.rule_options import RuleOptions
+from proxy_test_utils import build_proxy_app, post_proxy, proxy_candidate, use_rule_options
+
+
+def _candidate() -> RouteCandidate:
+    return proxy_candidate(101, "sk-batch", endpoint_id=100, real_model="text-embedding-3-small")
+
+
+def _enable_batching(monkeypatch: pytest.MonkeyPatch, batch_size: int, wait_ms: int) -> None:
+    use_rule_options(
+        monkeypatch,
+        RuleOptions(embedding_batch_size=batch_size, embedding_batch_wait_ms=wait_ms),
+    )
+
+
+def _embedding_handler(calls: list[list[str]]):  # noqa: ANN202
+    def handler(request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["input"]
+        calls.append(inputs)
+        return httpx.Response(
+            200,
+            json={
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": index, "embedding": [float(len(text))]}
+                    for index, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 3 * len(inputs), "total_tokens": 3 * len(inputs)},
+            },
+        )
+
+    return handler
+
+
+async def _post_all(app, inputs: list[object]) -> list[httpx.Response]:  # noqa: ANN001
+    responses = await asyncio.gather(
+        *(
+            post_proxy(
+                app,
+                {"model": "text-embedding-3-small", "input": value},
+                path="/openai/v1/embeddings",
+            )
+            for value in inputs
+        )
+    )
+    return list(responses)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_embeddings_share_one_upstream_batch(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[list[str]] = []
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(_embedding_handler(calls)))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _enable_batching(monkeypatch, batch_size=8, wait_ms=1000)
+
+    responses = await _post_all(app, ["a", "bb", "ccc"])
+    await upstream_client.aclose()
+
+    assert len(calls) == 1
+    assert sorted(calls[0]) == ["a", "bb", "ccc"]
+    for response, text in zip(responses, ["a", "bb", "ccc"], strict=True):
+        assert response.status_code == 200
+        body = response.json()
+        assert body["data"] == [
+            {"object": "embedding", "index": 0, "embedding": [float(len(text))]}
+        ]
+        assert body["usage"] == {"prompt_tokens": 3, "total_tokens": 3}
+    shares = recorded["metrics"].usage_shares
+    assert sorted(share.weight for share in shares) == [1, 1, 1]
+    assert len({share.request_id for share in shares}) == 3
+
+
+@pytest.mark.asyncio
+async def test_full_batch_goes_upstream_without_waiting(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[list[str]] = []
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(_embedding_handler(calls)))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _enable_batching(monkeypatch, batch_size=2, wait_ms=60_000)
+
+    responses = await asyncio.wait_for(_post_all(app, ["a", "bb", ["c", "d"]]), 5)
+    await upstream_client.aclose()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert sorted(len(inputs) for inputs in calls) == [2, 2]
+    assert [len(response.json()["data"]) for response in responses] == [1, 1, 2]
+
+
+def test_split_embedding_response_rebases_indices_and_apportions_usage() -> None:
+    body = {
+        "object": "list",
+        "data": [
+            {"index": 2, "embedding": [2.0]},
+            {"index": 0, "embedding": [0.0]},
+            {"index": 1, "embedding": [1.0]},
+        ],
+        "usage": {"prompt_tokens": 10, "total_tokens": 10},
+    }
+
+    first, second = split_embedding_response(body, [1, 2])
+
+    assert first["data"] == [{"index": 0, "embedding": [0.0]}]
+    assert second["data"] == [{"index": 0, "embedding": [1.0]}, {"index": 1, "embedding": [2.0]}]
+    assert first["usage"] == {"prompt_tokens": 3, "total_tokens": 3}
+    assert second["usage"] == {"prompt_tokens": 7, "total_tokens": 7}
+    assert split_embedding_response(body, [1, 1]) is None
+    assert apportion_tokens(None, [1, 2]) == [None, None]
+
+
+def test_batch_inputs_keeps_text_and_token_inputs_apart() -> None:
+    assert batch_inputs("x") == ("text", ["x"])
+    assert batch_inputs([1, 2]) == ("tokens", [[1, 2]])
+    assert batch_inputs([[1], [2]]) == ("tokens", [[1], [2]])
+    assert batch_inputs(["x", 1]) is None
+    assert batch_inputs([]) is None
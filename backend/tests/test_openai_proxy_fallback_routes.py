@@ -4,6 +4,9 @@ import json
 import httpx
 import pytest
 
+from app.api.v1.route_modules.proxy_failures import circuit_failure_scope
+from app.core.circuit_state import decode_circuit_state
+from app.services.circuit_breaker import CIRCUIT_SCOPE_KEY, CIRCUIT_SCOPE_MODEL
 from app.services.router import RouteCandidate
 from proxy_test_utils import APIKeyStub, EndpointStub, build_proxy_app
 
@@ -75,7 +78,7 @@ async def test_proxy_retries_primary_then_skips_open_circuit_on_next_request(
     assert response.headers["x-api-key-id"] == str(fallback_key.id)
     assert second_response.headers["x-api-key-id"] == str(fallback_key.id)
     redis = recorded["redis"]
-    assert redis.store[f"circuit:{primary_key.id}:state"] == "open"
+    assert decode_circuit_state(redis.store[f"circuit:{primary_key.id}:state"]).state == "open"
 
 
 @pytest.mark.asyncio
@@ -244,7 +247,7 @@ async def test_proxy_falls_back_on_semantic_error_response(
     assert requests[0].headers.get("Authorization") == "Bearer sk-primary"
     assert requests[1].headers.get("Authorization") == "Bearer sk-fallback"
     redis = recorded["redis"]
-    assert redis.store[f"circuit:{primary_key.id}:failures"] == "1"
+    assert decode_circuit_state(redis.store[f"circuit:{primary_key.id}:state"]).failures == 1
     attempts = recorded.get("attempts")
     assert attempts is not None
     assert [attempt.outcome for attempt in attempts] == ["fallback", "success"]
@@ -290,3 +293,83 @@ async def test_proxy_does_not_fallback_on_nullable_response_error_field(
     assert response.status_code == 200
     assert response.json() == upstream_payload
     assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_proxy_model_failure_only_opens_model_circuit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    primary_endpoint = EndpointStub(id=36, name="Primary", base_url="https://api.example.com")
+    fallback_endpoint = EndpointStub(id=37, name="Fallback", base_url="https://api.example.com")
+    primary_key = APIKeyStub(id=38, key="sk-primary")
+    fallback_key = APIKeyStub(id=39, key="sk-fallback")
+    primary_candidate = RouteCandidate(
+        api_key=primary_key,
+        endpoint=primary_endpoint,
+        real_model="gpt-4o",
+    )
+    fallback_candidate = RouteCandidate(
+        api_key=fallback_key,
+        endpoint=fallback_endpoint,
+        real_model="gpt-4o",
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("Authorization") == "Bearer sk-primary":
+            return httpx.Response(
+                400,
+                json={"error": {"code": "model_not_supported", "message": "no"}},
+            )
+        return httpx.Response(200, json={"id": "cmpl-model-fallback-ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(
+        monkeypatch,
+        [primary_candidate, fallback_candidate],
+        upstream_client,
+        recorded,
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/openai/v1/completions",
+            headers={"Authorization": "Bearer token"},
+            json={"model": "gpt-4o-mini", "prompt": "hi"},
+        )
+
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    redis = recorded["redis"]
+    model_state = redis.store[f"circuit:{primary_key.id}:model:gpt-4o:state"]
+    assert decode_circuit_state(model_state).failures == 1
+    assert f"circuit:{primary_key.id}:state" not in redis.store
+
+
+@pytest.mark.parametrize(
+    ("body", "scope"),
+    [
+        (
+            {
+                "error": {
+                    "message": "The model `gpt-4.1-nano` does not exist "
+                    "or you do not have access to it."
+                }
+            },
+            CIRCUIT_SCOPE_MODEL,
+        ),
+        ({"error": {"code": "model_not_found", "message": "no"}}, CIRCUIT_SCOPE_MODEL),
+        ({"error": {"message": "The organization org-123 does not exist."}}, CIRCUIT_SCOPE_KEY),
+        ({"error": {"message": "Project proj_abc does not exist"}}, CIRCUIT_SCOPE_KEY),
+        (
+            {"error": {"message": "API key does not exist", "param": "model"}},
+            CIRCUIT_SCOPE_KEY,
+        ),
+    ],
+)
+def test_circuit_failure_scope_only_treats_model_wording_as_model_failures(
+    body: dict, scope: str
+) -> None:
+    assert circuit_failure_scope(json.dumps(body).encode()) == scope
@@ -0,0 +1,157 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.agent_transport import AgentStream
+from app.services.router import RouteCandidate
+from app.services.rule_options import RuleOptions, parse_rule_options
+from proxy_test_utils import (
+    STREAM_BODY,
+    attempt_outcomes,
+    build_proxy_app,
+    post_proxy,
+    primary_and_fallback,
+    use_rule_options,
+)
+
+
+def _candidates(primary_agent: str | None = None) -> list[RouteCandidate]:
+    return primary_and_fallback(
+        30, primary_key="sk-stalled", fallback_key="sk-healthy", agent_node=primary_agent
+    )
+
+
+def _set_first_byte_timeout(monkeypatch: pytest.MonkeyPatch, timeout_ms: int) -> None:
+    use_rule_options(monkeypatch, RuleOptions(first_byte_timeout_ms=timeout_ms))
+
+
+async def _healthy_body():  # noqa: ANN202
+    yield b'data: {"id":"healthy"}\n\n'
+    yield b"data: [DONE]\n\n"
+
+
+@pytest.mark.asyncio
+async def test_stalled_stream_falls_over_after_first_byte_timeout(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    stalled_closed = asyncio.Event()
+
+    async def stalled_body():  # noqa: ANN202
+        try:
+            yield b": keep-alive\n\n"
+            await asyncio.sleep(5)
+            yield b'data: {"id":"stalled"}\n\n'
+        finally:
+            stalled_closed.set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        stalled = request.headers["Authorization"] == "Bearer sk-stalled"
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=stalled_body() if stalled else _healthy_body(),
+        )
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+    _set_first_byte_timeout(monkeypatch, 30)
+
+    response = await post_proxy(app, STREAM_BODY)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert response.content == b'data: {"id":"healthy"}\n\ndata: [DONE]\n\n'
+    assert stalled_closed.is_set()
+    assert attempt_outcomes(recorded) == {
+        31: ("fallback", "first_byte_timeout"),
+        33: ("success", None),
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_error_first_event_falls_over_before_commit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def error_body():  # noqa: ANN202
+        yield b'data: {"error":{"message":"overloaded"}}\n\n'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        failing = request.headers["Authorization"] == "Bearer sk-stalled"
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=error_body() if failing else _healthy_body(),
+        )
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+    _set_first_byte_timeout(monkeypatch, 1000)
+
+    response = await post_proxy(app, STREAM_BODY)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert response.content == b'data: {"id":"healthy"}\n\ndata: [DONE]\n\n'
+    assert attempt_outcomes(recorded) == {
+        31: ("fallback", "first_event_error"),
+        33: ("success", None),
+    }
+
+
+@pytest.mark.asyncio
+async def test_stalled_agent_stream_is_detached_and_falls_over(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    detached: list[str] = []
+
+    class StalledAgentManager:
+        async def send_request(self, agent_name: str, request) -> object:  # noqa: ANN001
+            stream = AgentStream(
+                request_id="agent-req",
+                on_close=lambda: detached.append(agent_name),
+                status_code=200,
+                headers={"content-type": "text/event-stream"},
+            )
+            stream._started.set()
+            return stream
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=_healthy_body(),
+        )
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(
+        monkeypatch,
+        _candidates(primary_agent="agent-west"),
+        upstream_client,
+        recorded,
+        agent_manager=StalledAgentManager(),
+    )
+    _set_first_byte_timeout(monkeypatch, 30)
+
+    response = await post_proxy(app, STREAM_BODY)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert response.content == b'data: {"id":"healthy"}\n\ndata: [DONE]\n\n'
+    assert detached == ["agent-west"]
+    assert attempt_outcomes(recorded) == {
+        31: ("fallback", "first_byte_timeout"),
+        33: ("success", None),
+    }
+
+
+def test_first_byte_timeout_option_parsing() -> None:
+    assert parse_rule_options('{"first_byte_timeout_ms": 1500}').first_byte_timeout_ms == 1500
+    assert parse_rule_options('{"first_byte_timeout_ms": 0}').first_byte_timeout_ms is None
+    assert parse_rule_options('{"first_byte_timeout_ms": "fast"}').first_byte_timeout_ms is None
+    options = RuleOptions(first_byte_timeout_ms=800)
+    assert options.updated({"hedge_enabled": True}).first_byte_timeout_ms == 800
+    assert options.updated({"first_byte_timeout_ms": None}).first_byte_timeout_ms is None
@@ -0,0 +1,145 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.hedging import HedgePolicy, get_hedge_budget
+from app.services.key_latency import observe_attempt_metrics
+from app.services.router import RouteCandidate
+from app.services.rule_options import RuleOptions, parse_rule_options
+from proxy_test_utils import (
+    STREAM_BODY,
+    attempt_metrics,
+    attempt_outcomes,
+    build_proxy_app,
+    post_proxy,
+    primary_and_fallback,
+    use_rule_options,
+)
+
+
+def _candidates() -> list[RouteCandidate]:
+    return primary_and_fallback(
+        20, primary_key="sk-slow", fallback_key="sk-fast", shared_endpoint=True
+    )
+
+
+def _enable_hedging(monkeypatch: pytest.MonkeyPatch, delay_ms: int) -> None:
+    use_rule_options(monkeypatch, RuleOptions(hedge=HedgePolicy(delay_ms=delay_ms)))
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_after_delay_and_cancels_slow_primary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    requested_keys: list[str] = []
+    slow_cancelled = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        key = request.headers["Authorization"]
+        requested_keys.append(key)
+        if key == "Bearer sk-slow":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                slow_cancelled.set()
+                raise
+        return httpx.Response(200, json={"id": key})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+    _enable_hedging(monkeypatch, delay_ms=20)
+    get_hedge_budget().tokens = 1.0
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert response.json() == {"id": "Bearer sk-fast"}
+    assert requested_keys == ["Bearer sk-slow", "Bearer sk-fast"]
+    assert slow_cancelled.is_set()
+    assert attempt_outcomes(recorded) == {
+        21: ("cancelled", "hedge_lost"),
+        22: ("success", None),
+    }
+    assert get_hedge_budget().tokens < 1.0
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_exhausted_waits_for_primary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    requested_keys: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requested_keys.append(request.headers["Authorization"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"id": "cmpl-primary"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+    _enable_hedging(monkeypatch, delay_ms=0)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert requested_keys == ["Bearer sk-slow"]
+
+
+@pytest.mark.asyncio
+async def test_stream_hedge_keeps_first_lane_to_emit_data(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    slow_closed = asyncio.Event()
+
+    async def slow_body():  # noqa: ANN202
+        try:
+            yield b": keep-alive\n\n"
+            await asyncio.sleep(5)
+            yield b'data: {"id":"slow"}\n\n'
+        finally:
+            slow_closed.set()
+
+    async def fast_body():  # noqa: ANN202
+        yield b'data: {"id":"fast"}\n\n'
+        yield b"data: [DONE]\n\n"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = slow_body() if request.headers["Authorization"] == "Bearer sk-slow" else fast_body()
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+    _enable_hedging(monkeypatch, delay_ms=20)
+    get_hedge_budget().tokens = 1.0
+
+    response = await post_proxy(app, STREAM_BODY)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert response.content == b'data: {"id":"fast"}\n\ndata: [DONE]\n\n'
+    assert slow_closed.is_set()
+    assert attempt_outcomes(recorded) == {
+        21: ("cancelled", "hedge_lost"),
+        22: ("success", None),
+    }
+    assert recorded["metrics"].api_key_id == 22
+
+
+def test_hedge_delay_uses_rule_delay_then_learned_p95() -> None:
+    assert parse_rule_options('{"strategy": "sequential"}').hedge is None
+    assert parse_rule_options('{"hedge_enabled": true, "hedge_delay_ms": 250}').hedge == (
+        HedgePolicy(delay_ms=250)
+    )
+    learned = parse_rule_options('{"hedge_enabled": true}').hedge
+    assert learned == HedgePolicy()
+
+    for latency_ms in range(100, 2100, 100):
+        observe_attempt_metrics(attempt_metrics(7, latency_ms=latency_ms))
+
+    assert HedgePolicy(delay_ms=250).delay_seconds(7, is_stream=False) == 0.25
+    assert learned.delay_seconds(7, is_stream=False) == pytest.approx(1.9)
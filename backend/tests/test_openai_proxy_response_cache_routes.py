@@ -0,0 +1,259 @@
+import httpx
+import pytest
+
+from app.core.config import Settings
+from app.services.access_key_cache import ResolvedAccessKey, get_access_key_cache
+from app.services.access_keys import hash_access_key
+from app.services import response_cache as response_cache_module
+from app.services.response_cache import (
+    CachedResponse,
+    ResponseCache,
+    response_cache_key,
+)
+from app.services.router import RouteCandidate
+from app.services.rule_options import RuleOptions
+from proxy_test_utils import build_proxy_app, post_proxy, proxy_candidate, use_rule_options
+
+
+def _candidate() -> RouteCandidate:
+    return proxy_candidate(81, "sk-cache", endpoint_id=80)
+
+
+def _enable_response_cache(monkeypatch: pytest.MonkeyPatch, ttl_seconds: int = 60) -> None:
+    use_rule_options(monkeypatch, RuleOptions(response_cache_ttl_seconds=ttl_seconds))
+
+
+async def _post_twice(app, body: dict) -> list[httpx.Response]:  # noqa: ANN001
+    return [await post_proxy(app, body) for _ in range(2)]
+
+
+@pytest.mark.asyncio
+async def test_deterministic_request_is_served_from_gateway_cache(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        return httpx.Response(200, json={"id": "cmpl-1", "choices": []})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _enable_response_cache(monkeypatch)
+
+    body = {
+        "model": "gpt-4o-mini",
+        "temperature": 0,
+        "messages": [{"role": "user", "content": "hi"}],
+    }
+    first, second = await _post_twice(app, {**body, "user": "alice"})
+    await upstream_client.aclose()
+
+    assert len(calls) == 1
+    assert first.headers["x-gateway-cache"] == "miss"
+    assert second.headers["x-gateway-cache"] == "hit"
+    assert second.json() == first.json()
+    metrics = recorded["metrics"]
+    assert metrics.gateway_cache_hit is True
+    assert (metrics.endpoint_id, metrics.api_key_id) == (80, 81)
+    assert metrics.total_tokens is None
+
+
+@pytest.mark.asyncio
+async def test_gateway_cache_is_scoped_to_the_caller_access_key(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        return httpx.Response(200, json={"id": f"cmpl-{len(calls)}", "choices": []})
+
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, {})
+    _enable_response_cache(monkeypatch)
+    cache = get_access_key_cache()
+    for access_key_id, token in ((1, "rk-alice"), (2, "rk-bob")):
+        cache.put(
+            hash_access_key(token),
+            ResolvedAccessKey(
+                rule_groups=("default",),
+                request_timeout_seconds=None,
+                access_key_id=access_key_id,
+            ),
+            generation=cache.generation,
+        )
+
+    body = {
+        "model": "gpt-4o-mini",
+        "temperature": 0,
+        "messages": [{"role": "user", "content": "hi"}],
+    }
+    responses = [
+        await post_proxy(app, body, headers={"Authorization": f"Bearer {token}"})
+        for token in ("rk-alice", "rk-bob", "rk-alice")
+    ]
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert [response.headers["x-gateway-cache"] for response in responses] == [
+        "miss",
+        "miss",
+        "hit",
+    ]
+    assert responses[1].json()["id"] != responses[0].json()["id"]
+    assert responses[2].json() == responses[0].json()
+
+
+@pytest.mark.asyncio
+async def test_sampled_request_bypasses_gateway_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        return httpx.Response(200, json={"id": "cmpl-1", "choices": []})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _enable_response_cache(monkeypatch)
+
+    responses = await _post_twice(
+        app,
+        {
+            "model": "gpt-4o-mini",
+            "temperature": 0.7,
+            "messages": [{"role": "user", "content": "hi"}],
+        },
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert all("x-gateway-cache" not in response.headers for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_semantic_failure_from_last_candidate_is_not_cached(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        return httpx.Response(200, json={"error": {"message": "upstream overloaded"}})
+
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, {})
+    _enable_response_cache(monkeypatch)
+
+    responses = await _post_twice(
+        app,
+        {
+            "model": "gpt-4o-mini",
+            "temperature": 0,
+            "messages": [{"role": "user", "content": "hi"}],
+        },
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 2
+    assert [response.status_code for response in responses] == [200, 200]
+    assert all("x-gateway-cache" not in response.headers for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_completed_stream_is_replayed_from_gateway_cache(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[bytes] = []
+    sse = (
+        b'data: {"id":"c1","choices":[{"delta":{"content":"hi"}}]}\n\n'
+        b"data: [DONE]\n\n"
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.content)
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse)
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidate(), upstream_client, recorded)
+    _enable_response_cache(monkeypatch)
+
+    first, second = await _post_twice(
+        app,
+        {
+            "model": "gpt-4o-mini",
+            "stream": True,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": "hi"}],
+        },
+    )
+    await upstream_client.aclose()
+
+    assert len(calls) == 1
+    assert second.headers["x-gateway-cache"] == "hit"
+    assert second.headers["content-type"].startswith("text/event-stream")
+    assert second.content == first.content == sse
+
+
+@pytest.mark.asyncio
+async def test_response_cache_memory_tier_is_byte_bounded(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings = Settings(response_cache_memory_bytes=10)
+    monkeypatch.setattr(response_cache_module, "get_settings", lambda: settings)
+    cache = ResponseCache()
+
+    def entry(body: bytes) -> CachedResponse:
+        return CachedResponse(
+            body=body, media_type="application/json", is_stream=False, endpoint_id=1, api_key_id=1
+        )
+
+    await cache.put(None, "a", entry(b"aaaa"), 60)
+    await cache.put(None, "b", entry(b"bbbb"), 60)
+    assert await cache.get(None, "a") is not None
+    await cache.put(None, "c", entry(b"cccc"), 60)
+
+    assert await cache.get(None, "b") is None
+    assert await cache.get(None, "a") is not None
+    assert cache.size_bytes == 8
+
+
+def test_response_cache_key_ignores_delivery_fields() -> None:
+    base = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "x"}]}
+    key = response_cache_key(
+        path="/v1/chat/completions",
+        model_alias="m",
+        rule_group="default",
+        exposure_format="openai",
+        is_stream=False,
+        payload=base,
+    )
+    assert key is not None
+    assert key == response_cache_key(
+        path="/v1/chat/completions",
+        model_alias="m",
+        rule_group="default",
+        exposure_format="openai",
+        is_stream=False,
+        payload={**base, "user": "u", "metadata": {"trace": "t"}},
+    )
+    assert response_cache_key(
+        path="/v1/chat/completions",
+        model_alias="m",
+        rule_group="default",
+        exposure_format="openai",
+        is_stream=False,
+        payload={**base, "n": 2},
+    ) is None
+    assert key != response_cache_key(
+        path="/v1/chat/completions",
+        model_alias="m",
+        rule_group="default",
+        exposure_format="openai",
+        is_stream=False,
+        payload=base,
+        access_key_id=7,
+    )
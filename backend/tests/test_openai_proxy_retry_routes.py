@@ -0,0 +1,132 @@
+import time
+
+import httpx
+import pytest
+
+from app.services.retry_policy import (
+    RETRY_BUDGET_MAX_TOKENS,
+    get_retry_budget,
+    rate_limit_reset_seconds,
+)
+from app.services.router import RouteCandidate
+from proxy_test_utils import build_proxy_app, post_proxy, primary_and_fallback
+
+
+def _candidates() -> list[RouteCandidate]:
+    return primary_and_fallback(50)
+
+
+def _retry_trail(recorded: dict) -> list[tuple[int, str, str | None, int | None]]:
+    return [
+        (attempt.api_key_id, attempt.outcome, attempt.retry_decision, attempt.retry_delay_ms)
+        for attempt in recorded["attempts"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retry_waits_for_provider_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        if len(calls) == 1:
+            return httpx.Response(
+                429, headers={"retry-after": "0.05"}, json={"error": "slow down"}
+            )
+        return httpx.Response(200, json={"id": "ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    started = time.perf_counter()
+    response = await post_proxy(app)
+    elapsed = time.perf_counter() - started
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert calls == ["Bearer sk-primary", "Bearer sk-primary"]
+    assert elapsed >= 0.05
+    assert _retry_trail(recorded) == [
+        (51, "retry", "retry_after", 50),
+        (51, "success", None, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retry_budget_falls_back_immediately(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    get_retry_budget().tokens[50] = 0.5
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        if request.headers["Authorization"] == "Bearer sk-primary":
+            return httpx.Response(503, json={"error": "overloaded"})
+        return httpx.Response(200, json={"id": "ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert calls == ["Bearer sk-primary", "Bearer sk-fallback"]
+    assert _retry_trail(recorded) == [
+        (51, "fallback", "budget_exhausted", None),
+        (53, "success", None, None),
+    ]
+    assert get_retry_budget().tokens[52] == RETRY_BUDGET_MAX_TOKENS
+
+
+@pytest.mark.asyncio
+async def test_long_rate_limit_reset_skips_same_candidate_retry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        if request.headers["Authorization"] == "Bearer sk-primary":
+            return httpx.Response(
+                429,
+                headers={"x-ratelimit-reset-requests": "6m0s"},
+                json={"error": "rate limited"},
+            )
+        return httpx.Response(200, json={"id": "ok"})
+
+    recorded: dict[str, object] = {}
+    upstream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app = build_proxy_app(monkeypatch, _candidates(), upstream_client, recorded)
+
+    response = await post_proxy(app)
+    await upstream_client.aclose()
+
+    assert response.status_code == 200
+    assert calls == ["Bearer sk-primary", "Bearer sk-fallback"]
+    assert _retry_trail(recorded)[0] == (51, "fallback", "delay_too_long", None)
+
+
+def test_rate_limit_reset_header_parsing() -> None:
+    assert rate_limit_reset_seconds({"Retry-After": "2"}) == 2.0
+    assert rate_limit_reset_seconds({"x-ratelimit-reset-tokens": "20ms"}) == pytest.approx(0.02)
+    assert rate_limit_reset_seconds({"x-ratelimit-reset-requests": "1m30s"}) == 90.0
+    assert rate_limit_reset_seconds(
+        {"retry-after": "1", "x-ratelimit-reset-requests": "3s"}
+    ) == 3.0
+    assert rate_limit_reset_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert rate_limit_reset_seconds({"retry-after": "soon"}) is None
+    assert rate_limit_reset_seconds({}) is None
+
+
+def test_retry_budget_refills_from_successes() -> None:
+    budget = get_retry_budget()
+    budget.tokens[7] = 0.0
+    assert budget.try_spend(7) is False
+    for _ in range(6):
+        budget.deposit(7)
+    assert budget.try_spend(7) is True
+    assert budget.try_spend(7) is False
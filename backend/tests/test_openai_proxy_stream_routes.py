@@ -4,6 +4,7 @@ import json
 import httpx
 import pytest
 
+from app.services.inflight import get_local_inflight
 from app.services.router import RouteCandidate
 from proxy_test_utils import APIKeyStub, EndpointStub, build_proxy_app
 
@@ -186,6 +187,7 @@ async def test_proxy_stream_path_records_usage_metrics(
     assert attempts[0].outcome == "success"
     assert attempts[0].failure_reason is None
     assert attempts[0].latency_ms >= metrics.ttft_ms
+    assert get_local_inflight([api_key.id]) == {api_key.id: 0}
     sent_payload = json.loads(requests[0].content)
     assert sent_payload["stream_options"]["include_usage"] is True
 
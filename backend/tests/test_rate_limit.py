@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.rate_limit import (
+    TOKEN_BUCKET_SCRIPT,
+    apply_token_bucket,
+    format_retry_after,
+    take_tokens,
+)
+from app.core.redis import MemoryRedis
+
+
+class EvalRedis:
+    """Runs TOKEN_BUCKET_SCRIPT's KEYS/ARGV contract in-process."""
+
+    def __init__(self) -> None:
+        self.store: dict[str, str] = {}
+        self.calls = 0
+
+    async def eval(self, script: str, numkeys: int, *args):  # noqa: ANN002, ANN201
+        assert script == TOKEN_BUCKET_SCRIPT
+        assert numkeys == 1
+        self.calls += 1
+        key, capacity, refill, cost, ttl_ms, force = args
+        assert int(ttl_ms) > 0
+        raw, result = apply_token_bucket(
+            self.store.get(key),
+            capacity=float(capacity),
+            refill_per_second=float(refill),
+            cost=float(cost),
+            now=time.time(),
+            force=force == 1,
+        )
+        self.store[key] = raw
+        return [
+            1 if result.allowed else 0,
+            f"{result.remaining:.6f}",
+            f"{result.retry_after_seconds:.6f}",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_take_tokens_uses_single_script_call_per_attempt() -> None:
+    redis = EvalRedis()
+
+    first = await take_tokens(redis, "rate:bucket:1", capacity=2, refill_per_second=1)
+    second = await take_tokens(redis, "rate:bucket:1", capacity=2, refill_per_second=1)
+    third = await take_tokens(redis, "rate:bucket:1", capacity=2, refill_per_second=1)
+
+    assert redis.calls == 3
+    assert (first.allowed, second.allowed, third.allowed) == (True, True, False)
+    assert third.retry_after_seconds == pytest.approx(1, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_memory_token_bucket_never_over_admits_under_concurrency() -> None:
+    redis = MemoryRedis()
+
+    results = await asyncio.gather(
+        *[
+            take_tokens(redis, "rate:bucket:1", capacity=10, refill_per_second=0.001)
+            for _ in range(50)
+        ]
+    )
+
+    assert sum(result.allowed for result in results) == 10
+
+
+@pytest.mark.asyncio
+async def test_take_tokens_denies_zero_limit_without_retry_after() -> None:
+    result = await take_tokens(MemoryRedis(), "rate:bucket:1", capacity=0, refill_per_second=0)
+
+    assert result.allowed is False
+    assert result.retry_after_seconds is None
+
+
+def test_format_retry_after_rounds_up_to_whole_seconds() -> None:
+    assert format_retry_after(0.01) == "1"
+    assert format_retry_after(2.3) == "3"
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import MemoryRedis
+from app.db.models import APIKey, Endpoint, ModelMap, RoutingRule
+from app.services import routing_snapshot as snapshot_module
+from app.services.router import ModelRouter
+from app.services.routing_snapshot import (
+    ROUTING_SNAPSHOT_VERSION_KEY,
+    get_routing_snapshot,
+    refresh_routing_snapshot,
+)
+
+
+class CircuitBreakerStub:
+    def __init__(self, redis: MemoryRedis) -> None:
+        self.redis = redis
+
+    async def are_available(self, api_key_ids: list[int]) -> dict[int, bool]:
+        return {api_key_id: True for api_key_id in api_key_ids}
+
+    def candidate_scopes(self, _candidate) -> list[object]:  # noqa: ANN001
+        return []
+
+    def route_states(self, state_keys: list[str], _states: list[str | None]) -> dict[str, str]:
+        return {state_key: "closed" for state_key in state_keys}
+
+
+class CountingSession:
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+        self.execute_count = 0
+
+    async def execute(self, *args, **kwargs):  # noqa: ANN002, ANN003
+        self.execute_count += 1
+        return await self._session.execute(*args, **kwargs)
+
+
+async def _seed_routes(session: AsyncSession) -> tuple[APIKey, APIKey]:
+    endpoint = Endpoint(name="Primary", base_url="https://api.example.com", is_active=True)
+    session.add(endpoint)
+    await session.flush()
+    first_key = APIKey(endpoint_id=endpoint.id, key="sk-first", is_active=True)
+    second_key = APIKey(endpoint_id=endpoint.id, key="sk-second", is_active=True)
+    first_key.assign_rule_groups(["team"])
+    second_key.assign_rule_groups(["team"])
+    session.add_all([first_key, second_key])
+    await session.flush()
+    session.add_all(
+        [
+            ModelMap(endpoint_id=endpoint.id, model_alias="gpt-4o", real_model="gpt-4o-real"),
+            RoutingRule(
+                model_pattern="^gpt-4o$",
+                group_name="team",
+                priority=10,
+                is_active=True,
+                target_key_ids_json=json.dumps(
+                    {"target_key_ids": [first_key.id], "strategy": "sequential"}
+                ),
+            ),
+        ]
+    )
+    await session.commit()
+    return first_key, second_key
+
+
+@pytest.mark.asyncio
+async def test_get_candidates_resolves_from_snapshot_without_queries(
+    db_session: AsyncSession,
+) -> None:
+    first_key, _ = await _seed_routes(db_session)
+    redis = MemoryRedis()
+    router = ModelRouter(CircuitBreakerStub(redis))
+    counting_session = CountingSession(db_session)
+
+    first, group = await router.get_candidates(counting_session, "gpt-4o", "team")
+    queries_after_build = counting_session.execute_count
+    second, _ = await router.get_candidates(counting_session, "gpt-4o", "team")
+
+    assert group == "team"
+    assert [candidate.api_key.id for candidate in first] == [first_key.id]
+    assert [candidate.api_key.id for candidate in second] == [first_key.id]
+    assert second[0].real_model == "gpt-4o-real"
+    assert queries_after_build > 0
+    assert counting_session.execute_count == queries_after_build
+
+
+@pytest.mark.asyncio
+async def test_refresh_publishes_new_version_and_peers_reload(
+    db_session: AsyncSession,
+) -> None:
+    first_key, second_key = await _seed_routes(db_session)
+    redis = MemoryRedis()
+    router = ModelRouter(CircuitBreakerStub(redis))
+    await router.get_candidates(db_session, "gpt-4o", "team")
+
+    await db_session.execute(
+        RoutingRule.__table__.update()
+        .where(RoutingRule.group_name == "team")
+        .values(
+            target_key_ids_json=json.dumps(
+                {"target_key_ids": [second_key.id], "strategy": "sequential"}
+            )
+        )
+    )
+    await db_session.commit()
+    await refresh_routing_snapshot(db_session, redis)
+
+    assert await redis.get(ROUTING_SNAPSHOT_VERSION_KEY) == "1"
+    candidates, _ = await router.get_candidates(db_session, "gpt-4o", "team")
+    assert [candidate.api_key.id for candidate in candidates] == [second_key.id]
+
+    # A peer worker bumps the version; this worker must notice and rebuild.
+    stale = await get_routing_snapshot(db_session, redis)
+    await redis.incr(ROUTING_SNAPSHOT_VERSION_KEY)
+    snapshot_module._version_checked_at = 0.0
+    reloaded = await get_routing_snapshot(db_session, redis)
+    assert reloaded is not stale
+    assert reloaded.version == "2"
+    assert first_key.id in {api_key.id for api_key, _ in reloaded.active_routes}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rows_are_detached_from_loading_session(
+    db_session: AsyncSession,
+) -> None:
+    first_key, _ = await _seed_routes(db_session)
+    snapshot = await get_routing_snapshot(db_session, MemoryRedis())
+
+    route = snapshot.routes_for_alias("gpt-4o")[0]
+    first_key.weight = 50
+
+    assert route.api_key is not first_key
+    assert route.api_key.weight == 1
+    assert snapshot.rules_for_group("team")[0].target_key_ids == (first_key.id,)
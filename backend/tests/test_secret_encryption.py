@@ -1,6 +1,8 @@
 import json
+import pickle
 
 import pytest
+from cryptography.fernet import Fernet
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
@@ -8,8 +10,10 @@ from app.core.config import Settings
 from app.db import migrations
 from app.db.base import Base
 from app.db.models import APIKey, Endpoint
+from app.services import secrets as secrets_module
 from app.services.secrets import (
     ENCRYPTED_SECRET_PREFIX,
+    SecretDecryptionError,
     decrypt_oauth_config,
     decrypt_secret_value,
     encrypt_oauth_config,
@@ -28,6 +32,41 @@ def test_secret_value_round_trip() -> None:
     assert decrypt_secret_value(encrypted, settings=settings) == "sk-secret"
 
 
+def test_decrypted_secret_is_cached_per_ciphertext(monkeypatch: pytest.MonkeyPatch) -> None:
+    settings = Settings(data_encryption_key="first-key")
+    encrypted = encrypt_secret_value("sk-cached", settings=settings)
+    decrypt_calls: list[bytes] = []
+    original_decrypt = Fernet.decrypt
+
+    def counting_decrypt(self, token, ttl=None):  # noqa: ANN001
+        decrypt_calls.append(token)
+        return original_decrypt(self, token, ttl)
+
+    monkeypatch.setattr(Fernet, "decrypt", counting_decrypt)
+
+    assert decrypt_secret_value(encrypted, settings=settings) == "sk-cached"
+    assert decrypt_secret_value(encrypted, settings=settings) == "sk-cached"
+    assert len(decrypt_calls) == 1
+
+    rotated = Settings(data_encryption_key="second-key")
+    with pytest.raises(SecretDecryptionError):
+        decrypt_secret_value(encrypted, settings=rotated)
+    assert len(secrets_module._decrypted_secrets) == 0
+
+
+def test_decrypted_secret_cache_is_bounded_and_never_serialized() -> None:
+    settings = Settings(data_encryption_key="bounded-key", secret_cache_max_entries=2)
+    for index in range(3):
+        encrypted = encrypt_secret_value(f"sk-{index}", settings=settings)
+        decrypt_secret_value(encrypted, settings=settings)
+
+    cache = secrets_module._decrypted_secrets
+    assert len(cache) == 2
+    assert "sk-" not in repr(cache)
+    with pytest.raises(TypeError):
+        pickle.dumps(cache)
+
+
 def test_oauth_config_encrypts_secret_fields_only() -> None:
     settings = Settings(master_auth_token="token")
 
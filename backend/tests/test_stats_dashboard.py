@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1.route_modules.stats_handlers import (
     admin_dump_search,
+    admin_stats_cache_by_strategy,
     admin_stats_distribution_groups,
     admin_stats_distribution_models,
     admin_stats_latency_percentiles,
@@ -72,6 +73,7 @@ async def test_admin_stats_dashboard_handlers(db_session: AsyncSession) -> None:
         api_key_id=api_key.id,
         requested_rule_group="gpt",
         rule_group="gpt",
+        routing_strategy="affinity",
         prompt_tokens=100,
         completion_tokens=20,
         total_tokens=120,
@@ -148,6 +150,13 @@ async def test_admin_stats_dashboard_handlers(db_session: AsyncSession) -> None:
     assert top_keys[0].cache_hit_rate == 100
     assert top_keys[0].avg_latency_ms == 250
 
+    strategies = await admin_stats_cache_by_strategy(
+        since=since, until=until, session=db_session
+    )
+    assert [(item.strategy, item.cache_hit_rate, item.cached_token_rate) for item in strategies] == [
+        ("affinity", 100, 80)
+    ]
+
     dumps = await admin_dump_search(
         since=since,
         until=until,
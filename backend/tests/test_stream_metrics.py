@@ -1,87 +1,141 @@
+import json
+
+import pytest
+
 from app.api.v1 import routes as routes_module
+from app.services import stream_inspection
+from app.services.stream_inspection import SSEStreamInspector
 
 
-def test_inspect_stream_chunk_tracks_usage_and_data() -> None:
-    (
-        buffer,
-        usage_payload,
-        data_seen,
-        stream_failed,
-        response_completed,
-    ) = routes_module._inspect_stream_chunk("", None, b'data: {"choices": []}\n\n')
-    assert data_seen is True
-    assert usage_payload is None
-    assert stream_failed is False
-    assert response_completed is False
-
-    (
-        buffer,
-        usage_payload,
-        data_seen,
-        stream_failed,
-        response_completed,
-    ) = routes_module._inspect_stream_chunk(
-        buffer, usage_payload, b'data: {"usage": {"completion_tokens": 12}}\n\n'
-    )
-    assert data_seen is True
-    assert usage_payload is not None
-    assert usage_payload["usage"]["completion_tokens"] == 12
-    assert stream_failed is False
-    assert response_completed is False
-
-    buffer, usage_payload, data_seen, stream_failed, response_completed = (
-        routes_module._inspect_stream_chunk(
-            buffer,
-            usage_payload,
-            b'data: {"metadata": {"total_usage": {"total_cached_tokens": 4}}}\n\n',
-        )
+def _inspect(*chunks: bytes) -> SSEStreamInspector:
+    inspector = SSEStreamInspector()
+    for chunk in chunks:
+        inspector.feed(chunk)
+    return inspector
+
+
+def test_stream_inspector_tracks_usage_and_data() -> None:
+    inspector = _inspect(b'data: {"choices": []}\n\n')
+    assert inspector.data_seen is True
+    assert inspector.usage_payload is None
+    assert inspector.failed is False
+    assert inspector.completed is False
+
+    inspector.feed(b'data: {"usage": {"completion_tokens": 12}}\n\n')
+    assert inspector.usage_payload is not None
+    assert inspector.usage_payload["usage"]["completion_tokens"] == 12
+
+    inspector.feed(b'data: {"metadata": {"total_usage": {"total_cached_tokens": 4}}}\n\n')
+    assert inspector.usage_payload["metadata"]["total_usage"]["total_cached_tokens"] == 4
+
+    inspector.feed(b'data: {"choices": [{"usage": {"cached_tokens": 5}}]}\n\n')
+    assert inspector.usage_payload["choices"][0]["usage"]["cached_tokens"] == 5
+    assert inspector.failed is False
+    assert inspector.completed is False
+
+    assert _inspect(b"data: [DONE]\n\n").data_seen is False
+
+    inspector = _inspect(b'data: {"type":"response.failed","response":{"error":{}}}\n\n')
+    assert inspector.data_seen is True
+    assert inspector.failed is True
+    assert inspector.completed is False
+
+    inspector = _inspect(
+        b'data: {"type":"response.completed","response":{"usage":{"total_tokens":9}}}\n\n'
     )
-    assert data_seen is True
-    assert usage_payload is not None
-    assert usage_payload["metadata"]["total_usage"]["total_cached_tokens"] == 4
-    assert stream_failed is False
-    assert response_completed is False
-
-    buffer, usage_payload, data_seen, stream_failed, response_completed = (
-        routes_module._inspect_stream_chunk(
-            buffer,
-            usage_payload,
-            b'data: {"choices": [{"usage": {"cached_tokens": 5}}]}\n\n',
-        )
+    assert inspector.failed is False
+    assert inspector.completed is True
+    assert inspector.usage_payload == {"usage": {"total_tokens": 9}}
+
+
+def test_stream_inspector_handles_split_chunks_and_crlf() -> None:
+    event = b'event: message\r\ndata: {"usageMetadata": {"totalTokenCount": 7}}\r\n\r\n'
+    inspector = SSEStreamInspector()
+
+    for index in range(len(event)):
+        inspector.feed(event[index : index + 1])
+
+    assert inspector.data_seen is True
+    assert inspector.usage_payload == {"usageMetadata": {"totalTokenCount": 7}}
+
+
+def test_stream_inspector_splits_multibyte_characters_across_chunks() -> None:
+    body = 'data: {"choices": [{"delta": {"content": "你好"}}], "usage": {"total_tokens": 3}}\n\n'
+    raw = body.encode()
+    split = raw.index("好".encode()) + 1
+
+    inspector = _inspect(raw[:split], raw[split:])
+
+    assert inspector.usage_payload["usage"] == {"total_tokens": 3}
+
+
+def test_stream_inspector_decodes_multi_line_events_when_they_end() -> None:
+    inspector = _inspect(b'data: {"type": "error",\ndata: "message": "overloaded"}\n')
+    assert inspector.data_seen is True
+    assert inspector.failed is False
+
+    inspector.feed(b"\n")
+    assert inspector.failed is True
+
+
+def test_stream_inspector_close_flushes_unterminated_line() -> None:
+    inspector = _inspect(b'data: {"type":"response.completed","response":{}}')
+    assert inspector.completed is False
+
+    inspector.close()
+
+    assert inspector.completed is True
+
+
+def test_stream_inspector_only_decodes_signal_events(monkeypatch: pytest.MonkeyPatch) -> None:
+    decoded: list[bytes] = []
+
+    def _loads(raw: bytes) -> object:
+        decoded.append(raw)
+        return json.loads(raw)
+
+    monkeypatch.setattr(stream_inspection, "loads_json", _loads)
+    inspector = _inspect(
+        b'data: {"choices": [{"delta": {"content": "hi"}}]}\n\n' * 50
+        + b'data: {"choices": [], "usage": {"total_tokens": 2}}\n\n'
     )
-    assert data_seen is True
-    assert usage_payload is not None
-    assert usage_payload["choices"][0]["usage"]["cached_tokens"] == 5
-    assert stream_failed is False
-    assert response_completed is False
 
-    buffer, usage_payload, data_seen, stream_failed, response_completed = (
-        routes_module._inspect_stream_chunk(buffer, usage_payload, b"data: [DONE]\n\n")
+    assert inspector.usage_payload == {"choices": [], "usage": {"total_tokens": 2}}
+    assert decoded == [b'{"choices": [], "usage": {"total_tokens": 2}}']
+
+
+def test_stream_inspector_skips_null_usage_from_include_usage(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    decoded: list[bytes] = []
+
+    def _loads(raw: bytes) -> object:
+        decoded.append(raw)
+        return json.loads(raw)
+
+    monkeypatch.setattr(stream_inspection, "loads_json", _loads)
+    inspector = _inspect(
+        b'data: {"choices": [{"delta": {"content": "hi"}}], "usage": null}\n\n' * 20
+        + b'data: {"choices":[{"delta":{"content":"hi"}}],"usage":null}\n\n' * 20
+        + b'data: {"choices": [], "usage": {"total_tokens": 2}}\n\n'
     )
-    assert data_seen is False
-    assert stream_failed is False
-    assert response_completed is False
-
-    _, _, data_seen, stream_failed, response_completed = (
-        routes_module._inspect_stream_chunk(
-            "", None, b'data: {"type":"response.failed","response":{"error":{}}}\n\n'
-        )
+
+    assert inspector.usage_payload == {"choices": [], "usage": {"total_tokens": 2}}
+    assert decoded == [b'{"choices": [], "usage": {"total_tokens": 2}}']
+
+
+def test_legacy_inspect_stream_chunk_carries_partial_lines() -> None:
+    buffer, usage, data_seen, failed, completed = routes_module._inspect_stream_chunk(
+        "", None, b'data: {"choices": []}\n\ndata: {"usage": {"total_'
     )
-    assert data_seen is True
-    assert stream_failed is True
-    assert response_completed is False
-
-    _, usage_payload, data_seen, stream_failed, response_completed = (
-        routes_module._inspect_stream_chunk(
-            "",
-            None,
-            b'data: {"type":"response.completed","response":{"usage":{"total_tokens":9}}}\n\n',
-        )
+    assert (usage, data_seen, failed, completed) == (None, True, False, False)
+
+    buffer, usage, data_seen, failed, completed = routes_module._inspect_stream_chunk(
+        buffer, usage, b'tokens": 4}}\n\n'
     )
+    assert buffer == b""
+    assert usage == {"usage": {"total_tokens": 4}}
     assert data_seen is True
-    assert stream_failed is False
-    assert response_completed is True
-    assert usage_payload == {"usage": {"total_tokens": 9}}
 
 
 def test_calculate_tps_handles_missing_values() -> None:
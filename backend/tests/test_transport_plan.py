@@ -0,0 +1,104 @@
+import pytest
+from fastapi import Request
+
+from app.api.v1.route_proxy_helpers import (
+    _apply_request_body_template,
+    _build_target_url,
+    _build_upstream_headers,
+)
+from app.services import transport_plan
+from app.services.transport_plan import (
+    endpoint_transport_plan,
+    render_body_template,
+    tokenize_body_template,
+)
+from proxy_test_utils import EndpointStub
+
+
+def _custom_endpoint(**overrides: object) -> EndpointStub:
+    fields = {
+        "id": 1,
+        "name": "Custom",
+        "base_url": "https://custom.example.com/api/",
+        "provider": "custom",
+        "auth_header_name": "X-Key",
+        "auth_header_prefix": "",
+        "extra_headers": '{"X-Tenant": "acme", "X-Retry": 2}',
+        "extra_cookies": "region=us",
+        "extra_query_params": '{"api-version": "2024-01"}',
+        "url_path_suffix": "generate",
+    }
+    fields.update(overrides)
+    return EndpointStub(**fields)
+
+
+def _request(path: str, query: bytes = b"") -> Request:
+    return Request(
+        {"type": "http", "method": "POST", "path": path, "query_string": query, "headers": []}
+    )
+
+
+def test_template_render_plan_matches_quoted_and_bare_placeholders() -> None:
+    tokens = tokenize_body_template(
+        '{"model": "{{model}}", "input": {{prompt}}, "keep": "{{unknown}}", "n": {{n}}}'
+    )
+
+    rendered = render_body_template(tokens, {"model": "m-1", "prompt": "hi \"you\"", "n": 2})
+
+    assert rendered == '{"model": "m-1", "input": "hi \\"you\\"", "keep": "{{unknown}}", "n": 2}'
+
+
+def test_template_does_not_re_render_placeholders_inside_user_text() -> None:
+    endpoint = _custom_endpoint(request_body_template='{"model": "{{model}}", "q": "{{prompt}}"}')
+
+    rendered = _apply_request_body_template(
+        endpoint, {"messages": [{"role": "user", "content": "say {{model}}"}]}, "real-model"
+    )
+
+    assert rendered == {"model": "real-model", "q": "say {{model}}"}
+
+
+def test_custom_endpoint_plan_builds_headers_and_url() -> None:
+    endpoint = _custom_endpoint()
+
+    headers = _build_upstream_headers({"Cookie": "a=1"}, endpoint, "sk-custom")
+    url = _build_target_url(
+        endpoint.base_url, _request("/openai/v1/chat", b"trace=1"), endpoint=endpoint
+    )
+
+    assert headers == {
+        "X-Key": "sk-custom",
+        "X-Tenant": "acme",
+        "X-Retry": "2",
+        "Cookie": "region=us",
+    }
+    assert url == "https://custom.example.com/api/generate?trace=1&api-version=2024-01"
+
+
+def test_transport_plan_is_reused_until_fields_or_snapshot_version_change(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    endpoint = _custom_endpoint()
+    plan = endpoint_transport_plan(endpoint)
+
+    assert endpoint_transport_plan(_custom_endpoint()) is plan
+
+    endpoint.extra_headers = '{"X-Tenant": "other"}'
+    edited = endpoint_transport_plan(endpoint)
+    assert edited is not plan
+    assert edited.extra_headers == (("X-Tenant", "other"),)
+
+    monkeypatch.setattr(transport_plan, "current_routing_snapshot_version", lambda: "7")
+    assert endpoint_transport_plan(endpoint) is not edited
+
+
+def test_standard_provider_ignores_custom_only_fields() -> None:
+    plan = endpoint_transport_plan(
+        _custom_endpoint(provider="openai", auth_header_name=None, auth_header_prefix="Bearer")
+    )
+
+    assert plan.is_custom is False
+    assert plan.auth_header_name == "Authorization"
+    assert plan.extra_headers == ()
+    assert plan.url_path_suffix is None
+    assert plan.body_template is None
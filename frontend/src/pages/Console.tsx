@@ -41,6 +41,7 @@ export const Console = () => {
     statsModelDistribution,
     statsGroupDistribution,
     statsTopKeys,
+    statsStrategyCache,
     dumpSearch,
     dumpSearchOffset,
     usageTrendUpdatedAt,
@@ -417,6 +418,7 @@ export const Console = () => {
             modelDistribution={statsModelDistribution}
             groupDistribution={statsGroupDistribution}
             topKeys={statsTopKeys}
+            strategyCache={statsStrategyCache}
             dumpSearch={dumpSearch}
             dumpSearchOffset={dumpSearchOffset}
             range={usageTrendRange}
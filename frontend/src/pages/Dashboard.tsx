@@ -649,11 +649,17 @@ export const Dashboard = () => {
                   {healthStatuses.map((item) => {
                     const probeLabel = probeStatusLabel(item.probe_status);
                     const circuitLabel =
-                      item.circuit_state === "open" ? "熔断中" : "正常";
+                      item.circuit_state === "open"
+                        ? "熔断中"
+                        : item.circuit_state === "half_open"
+                          ? "半开试探"
+                          : "正常";
                     const circuitClass =
                       item.circuit_state === "open"
                         ? "text-red-400"
-                        : "text-emerald-400";
+                        : item.circuit_state === "half_open"
+                          ? "text-amber-400"
+                          : "text-emerald-400";
 
                     return (
                       <tr
@@ -87,6 +87,8 @@ type RequestAttemptLog = {
   execution_mode: string | null;
   agent_node: string | null;
   upstream_url: string | null;
+  retry_decision: string | null;
+  retry_delay_ms: number | null;
   created_at: string;
 };
 
@@ -327,6 +329,8 @@ const parseRequestAttemptLog = (value: unknown): RequestAttemptLog | null => {
   if (!isRecord(value)) {
     return null;
   }
+  const retryDecision = value.retry_decision ?? null;
+  const retryDelayMs = value.retry_delay_ms ?? null;
   if (
     !isNumber(value.id) ||
     !isString(value.request_id) ||
@@ -342,6 +346,8 @@ const parseRequestAttemptLog = (value: unknown): RequestAttemptLog | null => {
     !isNullableString(value.execution_mode) ||
     !isNullableString(value.agent_node) ||
     !isNullableString(value.upstream_url) ||
+    !isNullableString(retryDecision) ||
+    !isNullableNumber(retryDelayMs) ||
     !isString(value.created_at)
   ) {
     return null;
@@ -361,6 +367,8 @@ const parseRequestAttemptLog = (value: unknown): RequestAttemptLog | null => {
     execution_mode: value.execution_mode,
     agent_node: value.agent_node,
     upstream_url: value.upstream_url,
+    retry_decision: retryDecision,
+    retry_delay_ms: retryDelayMs,
     created_at: value.created_at,
   };
 };
@@ -809,7 +817,9 @@ export const RouterLab = () => {
                           className={
                             item.circuit_state === "open"
                               ? "text-red-400"
-                              : "text-emerald-400"
+                              : item.circuit_state === "half_open"
+                                ? "text-amber-400"
+                                : "text-emerald-400"
                           }
                         >
                           {item.circuit_state ?? "closed"}
@@ -1101,7 +1111,14 @@ export const RouterLab = () => {
                       >
                         {attempt.outcome}
                       </td>
-                      <td>{attempt.failure_reason ?? "--"}</td>
+                      <td>
+                        {attempt.failure_reason ?? "--"}
+                        {attempt.retry_decision
+                          ? ` · ${attempt.retry_decision}${
+                              attempt.retry_delay_ms !== null ? ` ${attempt.retry_delay_ms} ms` : ""
+                            }`
+                          : ""}
+                      </td>
                       <td>{attempt.status_code ?? "--"}</td>
                       <td>{attempt.latency_ms} ms</td>
                       <td title={attempt.upstream_url ?? undefined}>
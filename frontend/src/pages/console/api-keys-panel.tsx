@@ -233,6 +233,7 @@ export const APIKeysView = ({
                   <td className="px-4 py-3 text-xs text-gray-300">
                     <div>Quota: {key.daily_limit ?? "--"}</div>
                     <div>RPM: {key.rpm_limit ?? "--"}</div>
+                    <div>TPM: {key.tpm_limit ?? "--"}</div>
                   </td>
                   <td className="px-4 py-3">
                     <span className={`text-xs px-2 py-0.5 rounded border ${status.className}`}>
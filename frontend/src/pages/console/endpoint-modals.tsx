@@ -118,6 +118,36 @@ const CodexKeyUsage = ({ usage }: { usage?: Record<string, unknown> | null }) =>
   );
 };
 
+const readQuotaRemaining = (
+  quota: Record<string, unknown> | null | undefined,
+  window: "requests" | "tokens"
+) => {
+  const raw = quota?.[window];
+  if (!raw || typeof raw !== "object" || Array.isArray(raw)) return null;
+  const remaining = (raw as Record<string, unknown>).remaining;
+  return typeof remaining === "number" && Number.isFinite(remaining) ? remaining : null;
+};
+
+const ProviderQuota = ({ quota }: { quota?: Record<string, unknown> | null }) => {
+  if (!quota) return null;
+  const requests = readQuotaRemaining(quota, "requests");
+  const tokens = readQuotaRemaining(quota, "tokens");
+  const cooldownUntil =
+    typeof quota.cooldown_until === "number" && Number.isFinite(quota.cooldown_until)
+      ? quota.cooldown_until
+      : null;
+  const cooldownSeconds =
+    cooldownUntil == null ? 0 : Math.ceil(cooldownUntil - Date.now() / 1000);
+  return (
+    <div className="mt-1 text-[10px] text-gray-500" aria-label="上游剩余额度">
+      上游剩余 {requests ?? "--"} / {tokens ?? "--"}
+      {cooldownSeconds > 0 && (
+        <span className="ml-1 text-yellow-300">冷却 {cooldownSeconds}s</span>
+      )}
+    </div>
+  );
+};
+
 const CodexCredentialInput = ({
   value,
   onChange,
@@ -721,6 +751,7 @@ export const KeyConfigModal = ({
   );
   const [dailyLimit, setDailyLimit] = useState(String(keyData?.daily_limit ?? ""));
   const [rpmLimit, setRpmLimit] = useState(String(keyData?.rpm_limit ?? ""));
+  const [tpmLimit, setTpmLimit] = useState(String(keyData?.tpm_limit ?? ""));
   const [isActive, setIsActive] = useState(keyData?.is_active ?? true);
   const [checkingGroup, setCheckingGroup] = useState<string | null>(null);
   const [groupNotice, setGroupNotice] = useState<string | null>(null);
@@ -859,6 +890,7 @@ export const KeyConfigModal = ({
     const normalizedRuleGroups = normalizeRuleGroups(ruleGroups, "default");
     const parsedDailyLimit = dailyLimit === "" ? null : Number(dailyLimit);
     const parsedRpmLimit = rpmLimit === "" ? null : Number(rpmLimit);
+    const parsedTpmLimit = tpmLimit === "" ? null : Number(tpmLimit);
 
     if (!keyData && !keyValue.trim()) {
       setFormError("API Key 不能为空");
@@ -887,6 +919,13 @@ export const KeyConfigModal = ({
       setFormError("RPM 需为非负数");
       return;
     }
+    if (
+      parsedTpmLimit !== null &&
+      (!Number.isFinite(parsedTpmLimit) || parsedTpmLimit < 0)
+    ) {
+      setFormError("TPM 需为非负数");
+      return;
+    }
 
     for (const group of normalizedRuleGroups) {
       if (group.toLowerCase() === "default") {
@@ -913,6 +952,7 @@ export const KeyConfigModal = ({
       rule_groups: normalizedRuleGroups,
       daily_limit: parsedDailyLimit,
       rpm_limit: parsedRpmLimit,
+      tpm_limit: parsedTpmLimit,
       is_active: isActive,
     });
     if (saved === false) {
@@ -1046,6 +1086,24 @@ export const KeyConfigModal = ({
                 disabled={!isAdmin}
               />
             </div>
+            <div>
+              <label className="block text-xs font-medium text-gray-400 mb-1">
+                Token 速率 (TPM)
+              </label>
+              <input
+                aria-label="TPM 限额"
+                value={tpmLimit}
+                onChange={(event) => {
+                  setTpmLimit(event.target.value);
+                  if (formError) {
+                    setFormError(null);
+                  }
+                }}
+                type="number"
+                className="w-full bg-gray-900 border border-gray-600 rounded p-2 text-sm text-white focus:border-green-500 outline-none"
+                disabled={!isAdmin}
+              />
+            </div>
           </div>
           <div className="flex items-center gap-2 mt-2">
             <input
@@ -1214,7 +1272,7 @@ export const ManageKeysModal = ({
                 <th className="px-4 py-3">分组</th>
                 <th className="px-4 py-3">每日限额 (Quota)</th>
                 <th className="px-4 py-3">今日已用</th>
-                <th className="px-4 py-3">速率 (RPM)</th>
+                <th className="px-4 py-3">速率 (RPM / TPM)</th>
                 {endpoint.provider === "codex" && (
                   <th className="px-4 py-3">Codex 用量</th>
                 )}
@@ -1266,7 +1324,10 @@ export const ManageKeysModal = ({
                         <span className="text-xs">{key.used_today}</span>
                       </div>
                     </td>
-                    <td className="px-4 py-3">{key.rpm_limit ?? "--"}</td>
+                    <td className="px-4 py-3">
+                      {key.rpm_limit ?? "--"} / {key.tpm_limit ?? "--"}
+                      <ProviderQuota quota={key.provider_quota} />
+                    </td>
                     {endpoint.provider === "codex" && (
                       <td className="px-4 py-3">
                         <CodexKeyUsage usage={key.codex_usage} />
@@ -20,6 +20,7 @@ export interface FactoryAccessKeyItem {
   key_preview: string;
   key: string | null;
   rule_groups: string[];
+  request_timeout_seconds: number | null;
   is_active: boolean;
   created_at: string;
 }
@@ -36,6 +37,9 @@ export interface FactoryAccessKeyIssue {
 const isStringList = (value: unknown): value is string[] =>
   Array.isArray(value) && value.every((item) => typeof item === "string");
 
+const parseRequestTimeoutSeconds = (value: unknown): number | null =>
+  typeof value === "number" && value > 0 ? value : null;
+
 const parseFactoryAccessKeyItem = (
   value: unknown
 ): FactoryAccessKeyItem | null => {
@@ -67,6 +71,7 @@ const parseFactoryAccessKeyItem = (
     key_preview: keyPreview as string,
     key: key as string | null,
     rule_groups: ruleGroups as string[],
+    request_timeout_seconds: parseRequestTimeoutSeconds(item.request_timeout_seconds),
     is_active: isActive,
     created_at: createdAt,
   };
@@ -169,13 +174,21 @@ export const FactoryKeysPanel = ({
     void loadKeys();
   }, [authToken]);
 
-  const createKey = async (name: string, ruleGroups: string[]) => {
+  const createKey = async (
+    name: string,
+    ruleGroups: string[],
+    requestTimeoutSeconds: number | null
+  ) => {
     if (!isAdmin) return;
     setError(null);
     const response = await fetch(`${apiBase}/admin/factory-keys`, {
       method: "POST",
       headers: buildHeaders(authToken, true),
-      body: JSON.stringify({ name: name.trim() || null, rule_groups: ruleGroups }),
+      body: JSON.stringify({
+        name: name.trim() || null,
+        rule_groups: ruleGroups,
+        request_timeout_seconds: requestTimeoutSeconds,
+      }),
     });
     if (!response.ok) {
       setError("创建访问 Key 失败");
@@ -192,7 +205,12 @@ export const FactoryKeysPanel = ({
 
   const updateKey = async (
     keyId: number,
-    payload: { name?: string | null; rule_groups?: string[]; is_active?: boolean }
+    payload: {
+      name?: string | null;
+      rule_groups?: string[];
+      request_timeout_seconds?: number | null;
+      is_active?: boolean;
+    }
   ) => {
     if (!isAdmin) return;
     const response = await fetch(`${apiBase}/admin/factory-keys/${keyId}`, {
@@ -460,14 +478,28 @@ const FactoryKeyEditorModal = ({
   keyItem: FactoryAccessKeyItem | null;
   ruleGroups: string[];
   isAdmin: boolean;
-  onCreate: (name: string, ruleGroups: string[]) => Promise<void>;
-  onUpdate: (keyId: number, payload: { name?: string | null; rule_groups?: string[] }) => Promise<void>;
+  onCreate: (
+    name: string,
+    ruleGroups: string[],
+    requestTimeoutSeconds: number | null
+  ) => Promise<void>;
+  onUpdate: (
+    keyId: number,
+    payload: {
+      name?: string | null;
+      rule_groups?: string[];
+      request_timeout_seconds?: number | null;
+    }
+  ) => Promise<void>;
   onClose: () => void;
 }) => {
   const [name, setName] = useState(keyItem?.name ?? "");
   const [selectedGroups, setSelectedGroups] = useState<Set<string>>(
     new Set(keyItem?.rule_groups ?? ["default"])
   );
+  const [requestTimeout, setRequestTimeout] = useState(
+    keyItem?.request_timeout_seconds != null ? String(keyItem.request_timeout_seconds) : ""
+  );
   const [saving, setSaving] = useState(false);
 
   const toggleGroup = (group: string) => {
@@ -485,10 +517,17 @@ const FactoryKeyEditorModal = ({
     setSaving(true);
     try {
       const groups = Array.from(selectedGroups);
+      const timeoutSeconds = Number(requestTimeout);
+      const requestTimeoutSeconds =
+        requestTimeout.trim() !== "" && timeoutSeconds > 0 ? timeoutSeconds : null;
       if (keyItem) {
-        await onUpdate(keyItem.id, { name: name.trim() || null, rule_groups: groups });
+        await onUpdate(keyItem.id, {
+          name: name.trim() || null,
+          rule_groups: groups,
+          request_timeout_seconds: requestTimeoutSeconds,
+        });
       } else {
-        await onCreate(name.trim() || null, groups);
+        await onCreate(name.trim() || null, groups, requestTimeoutSeconds);
       }
       onClose();
     } finally {
@@ -554,6 +593,19 @@ const FactoryKeyEditorModal = ({
               <p className="text-xs text-red-400 mt-2">请至少选择一个规则组</p>
             )}
           </div>
+
+          <div>
+            <label className="block text-xs text-gray-400 mb-1">默认请求超时（秒，可选）</label>
+            <input
+              value={requestTimeout}
+              onChange={(e) => setRequestTimeout(e.target.value)}
+              disabled={!isAdmin}
+              type="number"
+              min={0}
+              placeholder="留空不限制，请求头 X-Request-Timeout 优先"
+              className="w-full bg-gray-900 border border-gray-700 rounded p-2.5 text-sm text-white focus:border-blue-500 focus:outline-none disabled:opacity-50"
+            />
+          </div>
         </div>
 
         <div className="p-6 border-t border-gray-800 flex justify-end gap-2">
@@ -17,6 +17,7 @@ import type {
   StatsKpiValue,
   StatsLatencyBucket,
   StatsOverview,
+  StatsStrategyCache,
   StatsTimeseriesBucket,
   StatsTopKey,
   TelegramConfig,
@@ -150,6 +151,7 @@ const parseApiKey = (value: unknown): ApiKey | null => {
   const id = value.id;
   const keyPreview = value.key_preview;
   const rpmLimit = value.rpm_limit;
+  const tpmLimit = value.tpm_limit ?? null;
   const dailyLimit = value.daily_limit;
   const usedToday = value.used_today;
   const isActive = value.is_active;
@@ -157,6 +159,7 @@ const parseApiKey = (value: unknown): ApiKey | null => {
     !isNumber(id) ||
     !isString(keyPreview) ||
     !isNullableNumber(rpmLimit) ||
+    !isNullableNumber(tpmLimit) ||
     !isNullableNumber(dailyLimit) ||
     !isNumber(usedToday) ||
     !isBoolean(isActive)
@@ -174,11 +177,13 @@ const parseApiKey = (value: unknown): ApiKey | null => {
     rule_group: isString(value.rule_group) ? value.rule_group : undefined,
     rule_groups: ruleGroups ?? undefined,
     rpm_limit: rpmLimit,
+    tpm_limit: tpmLimit,
     daily_limit: dailyLimit,
     used_today: usedToday,
     is_active: isActive,
     name: isNullableString(value.name) ? value.name : undefined,
     codex_usage: isRecord(value.codex_usage) ? value.codex_usage : undefined,
+    provider_quota: isRecord(value.provider_quota) ? value.provider_quota : undefined,
   };
 };
 
@@ -339,6 +344,20 @@ export const parseRoutingRule = (value: unknown): RoutingRule | null => {
     is_active: value.is_active,
     dump_enabled: isBoolean(value.dump_enabled) ? value.dump_enabled : false,
     dump_path: isNullableString(value.dump_path) ? value.dump_path : null,
+    hedge_enabled: isBoolean(value.hedge_enabled) ? value.hedge_enabled : false,
+    hedge_delay_ms: isNullableNumber(value.hedge_delay_ms) ? value.hedge_delay_ms : null,
+    first_byte_timeout_ms: isNullableNumber(value.first_byte_timeout_ms)
+      ? value.first_byte_timeout_ms
+      : null,
+    response_cache_ttl_seconds: isNullableNumber(value.response_cache_ttl_seconds)
+      ? value.response_cache_ttl_seconds
+      : null,
+    embedding_batch_size: isNullableNumber(value.embedding_batch_size)
+      ? value.embedding_batch_size
+      : null,
+    embedding_batch_wait_ms: isNullableNumber(value.embedding_batch_wait_ms)
+      ? value.embedding_batch_wait_ms
+      : null,
     request_count: isNumber(value.request_count) ? value.request_count : 0,
     total_tokens: isNumber(value.total_tokens) ? value.total_tokens : 0,
     avg_ttft_ms: isNullableNumber(value.avg_ttft_ms) ? value.avg_ttft_ms : null,
@@ -594,11 +613,13 @@ export const parseStatsOverview = (value: unknown): StatsOverview | null => {
   const totalRequests = parseStatsKpiValue(value.total_requests);
   const totalTokens = parseStatsKpiValue(value.total_tokens);
   const cacheHitRate = parseStatsKpiValue(value.cache_hit_rate);
+  const gatewayCacheHitRate = parseStatsKpiValue(value.gateway_cache_hit_rate);
   const avgLatency = parseStatsKpiValue(value.avg_latency_ms);
   if (
     !totalRequests ||
     !totalTokens ||
     !cacheHitRate ||
+    !gatewayCacheHitRate ||
     !avgLatency ||
     !isNumber(value.prompt_tokens) ||
     !isNumber(value.completion_tokens) ||
@@ -612,6 +633,7 @@ export const parseStatsOverview = (value: unknown): StatsOverview | null => {
     total_requests: totalRequests,
     total_tokens: totalTokens,
     cache_hit_rate: cacheHitRate,
+    gateway_cache_hit_rate: gatewayCacheHitRate,
     avg_latency_ms: avgLatency,
     prompt_tokens: value.prompt_tokens,
     completion_tokens: value.completion_tokens,
@@ -728,6 +750,32 @@ const parseStatsTopKey = (value: unknown): StatsTopKey | null => {
 export const parseStatsTopKeyList = (value: unknown): StatsTopKey[] | null =>
   parseArray(value, parseStatsTopKey);
 
+const parseStatsStrategyCache = (value: unknown): StatsStrategyCache | null => {
+  if (
+    !isRecord(value) ||
+    !isString(value.strategy) ||
+    !isNumber(value.request_count) ||
+    !isNumber(value.prompt_tokens) ||
+    !isNumber(value.cached_tokens) ||
+    !isNumber(value.cache_hit_rate) ||
+    !isNumber(value.cached_token_rate)
+  ) {
+    return null;
+  }
+  return {
+    strategy: value.strategy,
+    request_count: value.request_count,
+    prompt_tokens: value.prompt_tokens,
+    cached_tokens: value.cached_tokens,
+    cache_hit_rate: value.cache_hit_rate,
+    cached_token_rate: value.cached_token_rate,
+  };
+};
+
+export const parseStatsStrategyCacheList = (
+  value: unknown
+): StatsStrategyCache[] | null => parseArray(value, parseStatsStrategyCache);
+
 const parseDumpSearchItem = (value: unknown): DumpSearchItem | null => {
   if (
     !isRecord(value) ||
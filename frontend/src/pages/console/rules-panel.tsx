@@ -38,6 +38,18 @@ const exposureFormatLabels = new Map<string, string>(
   exposureFormatOptions.map((option) => [option.value, option.label])
 );
 
+const strategyOptions = [
+  { value: "weighted_round_robin", label: "加权轮询" },
+  { value: "sequential", label: "顺序主备" },
+  { value: "least_latency", label: "最低延迟" },
+  { value: "least_inflight", label: "最少在途" },
+  { value: "affinity", label: "会话亲和" },
+] as const;
+
+const strategyLabels = new Map<string, string>(
+  strategyOptions.map((option) => [option.value, option.label])
+);
+
 export const RuleEditorModal = ({
   endpoints,
   rule,
@@ -70,6 +82,22 @@ export const RuleEditorModal = ({
   );
   const [dumpEnabled, setDumpEnabled] = useState(Boolean(rule?.dump_enabled));
   const [dumpPath, setDumpPath] = useState(rule?.dump_path ?? "");
+  const [hedgeEnabled, setHedgeEnabled] = useState(Boolean(rule?.hedge_enabled));
+  const [hedgeDelayMs, setHedgeDelayMs] = useState(
+    rule?.hedge_delay_ms != null ? String(rule.hedge_delay_ms) : ""
+  );
+  const [firstByteTimeoutMs, setFirstByteTimeoutMs] = useState(
+    rule?.first_byte_timeout_ms != null ? String(rule.first_byte_timeout_ms) : ""
+  );
+  const [responseCacheTtlSeconds, setResponseCacheTtlSeconds] = useState(
+    rule?.response_cache_ttl_seconds != null ? String(rule.response_cache_ttl_seconds) : ""
+  );
+  const [embeddingBatchSize, setEmbeddingBatchSize] = useState(
+    rule?.embedding_batch_size != null ? String(rule.embedding_batch_size) : ""
+  );
+  const [embeddingBatchWaitMs, setEmbeddingBatchWaitMs] = useState(
+    rule?.embedding_batch_wait_ms != null ? String(rule.embedding_batch_wait_ms) : ""
+  );
   const [selectedKeyIds, setSelectedKeyIds] = useState<Set<number>>(
     new Set(rule?.target_key_ids ?? [])
   );
@@ -447,8 +475,11 @@ export const RuleEditorModal = ({
                   className="w-full bg-gray-900 border border-gray-700 rounded p-2.5 text-sm text-white focus:border-yellow-500 focus:outline-none"
                   disabled={!isAdmin}
                 >
-                  <option value="weighted_round_robin">加权轮询</option>
-                  <option value="sequential">顺序主备</option>
+                  {strategyOptions.map((option) => (
+                    <option key={option.value} value={option.value}>
+                      {option.label}
+                    </option>
+                  ))}
                 </select>
               </div>
             </div>
@@ -513,6 +544,96 @@ export const RuleEditorModal = ({
                 开启后将按命中规则把请求/响应写入本地路径。未填写路径时不会写盘。
               </p>
             </div>
+            <div className="bg-gray-900/30 border border-gray-800 rounded-lg p-4 space-y-3">
+              <div className="flex items-center justify-between">
+                <label className="text-xs font-bold text-gray-500 uppercase">
+                  对冲请求
+                </label>
+                <label className="inline-flex items-center gap-2 text-xs text-gray-300">
+                  <input
+                    type="checkbox"
+                    checked={hedgeEnabled}
+                    onChange={(event) => setHedgeEnabled(event.target.checked)}
+                    disabled={!isAdmin}
+                  />
+                  启用
+                </label>
+              </div>
+              <input
+                value={hedgeDelayMs}
+                onChange={(event) => setHedgeDelayMs(event.target.value)}
+                type="number"
+                min={0}
+                placeholder="对冲延迟 ms，留空使用 Key 的 p95 延迟"
+                className="w-full bg-gray-950 border border-gray-800 rounded p-2.5 text-sm text-white font-mono focus:border-yellow-500 focus:outline-none disabled:opacity-40"
+                disabled={!isAdmin || !hedgeEnabled}
+              />
+              <p className="text-[11px] text-gray-500">
+                首个候选超过延迟仍未完成（流式为未收到首个数据事件）时，并发请求下一个候选，先成功者胜出，另一方被取消。
+              </p>
+            </div>
+            <div className="bg-gray-900/30 border border-gray-800 rounded-lg p-4 space-y-3">
+              <label className="text-xs font-bold text-gray-500 uppercase">
+                首字节超时
+              </label>
+              <input
+                value={firstByteTimeoutMs}
+                onChange={(event) => setFirstByteTimeoutMs(event.target.value)}
+                type="number"
+                min={0}
+                placeholder="首字节超时 ms，留空不限制"
+                className="w-full bg-gray-950 border border-gray-800 rounded p-2.5 text-sm text-white font-mono focus:border-yellow-500 focus:outline-none disabled:opacity-40"
+                disabled={!isAdmin}
+              />
+              <p className="text-[11px] text-gray-500">
+                流式请求在超时内未收到首个数据事件，或首个事件即为错误时，关闭该上游并切换到下一个候选。
+              </p>
+            </div>
+            <div className="bg-gray-900/30 border border-gray-800 rounded-lg p-4 space-y-3">
+              <label className="text-xs font-bold text-gray-500 uppercase">
+                响应缓存
+              </label>
+              <input
+                value={responseCacheTtlSeconds}
+                onChange={(event) => setResponseCacheTtlSeconds(event.target.value)}
+                type="number"
+                min={0}
+                placeholder="缓存 TTL 秒，留空不缓存"
+                className="w-full bg-gray-950 border border-gray-800 rounded p-2.5 text-sm text-white font-mono focus:border-yellow-500 focus:outline-none disabled:opacity-40"
+                disabled={!isAdmin}
+              />
+              <p className="text-[11px] text-gray-500">
+                temperature 为 0 的请求与 Embeddings 请求按请求体精确匹配缓存，命中时直接返回，不再访问上游。
+              </p>
+            </div>
+            <div className="bg-gray-900/30 border border-gray-800 rounded-lg p-4 space-y-3">
+              <label className="text-xs font-bold text-gray-500 uppercase">
+                Embeddings 合批
+              </label>
+              <div className="grid grid-cols-2 gap-3">
+                <input
+                  value={embeddingBatchSize}
+                  onChange={(event) => setEmbeddingBatchSize(event.target.value)}
+                  type="number"
+                  min={0}
+                  placeholder="每批最多输入数，留空不合批"
+                  className="w-full bg-gray-950 border border-gray-800 rounded p-2.5 text-sm text-white font-mono focus:border-yellow-500 focus:outline-none disabled:opacity-40"
+                  disabled={!isAdmin}
+                />
+                <input
+                  value={embeddingBatchWaitMs}
+                  onChange={(event) => setEmbeddingBatchWaitMs(event.target.value)}
+                  type="number"
+                  min={0}
+                  placeholder="最长等待 ms，默认 5"
+                  className="w-full bg-gray-950 border border-gray-800 rounded p-2.5 text-sm text-white font-mono focus:border-yellow-500 focus:outline-none disabled:opacity-40"
+                  disabled={!isAdmin}
+                />
+              </div>
+              <p className="text-[11px] text-gray-500">
+                参数相同的并发 Embeddings 请求合并为一次上游调用，结果按输入拆回各请求，用量按输入数分摊记录。
+              </p>
+            </div>
           </div>
 
           <div className="space-y-3">
@@ -703,6 +824,27 @@ export const RuleEditorModal = ({
                 target_key_ids: isDefaultRule ? [] : orderedSelectedKeyIds,
                 dump_enabled: dumpEnabled,
                 dump_path: dumpEnabled && dumpPath.trim() ? dumpPath.trim() : null,
+                hedge_enabled: hedgeEnabled,
+                hedge_delay_ms:
+                  hedgeEnabled && hedgeDelayMs.trim() !== ""
+                    ? Math.max(Number(hedgeDelayMs) || 0, 0)
+                    : null,
+                first_byte_timeout_ms:
+                  firstByteTimeoutMs.trim() !== ""
+                    ? Math.max(Number(firstByteTimeoutMs) || 0, 0) || null
+                    : null,
+                response_cache_ttl_seconds:
+                  responseCacheTtlSeconds.trim() !== ""
+                    ? Math.max(Number(responseCacheTtlSeconds) || 0, 0) || null
+                    : null,
+                embedding_batch_size:
+                  embeddingBatchSize.trim() !== ""
+                    ? Math.max(Number(embeddingBatchSize) || 0, 0) || null
+                    : null,
+                embedding_batch_wait_ms:
+                  embeddingBatchWaitMs.trim() !== ""
+                    ? Math.max(Number(embeddingBatchWaitMs) || 0, 0) || null
+                    : null,
               })
             }
             disabled={!isAdmin || selectedExposureFormats.length === 0}
@@ -1006,7 +1148,7 @@ export const RulesView = ({
                 <span className="flex items-center gap-1">
                   <RotateCw size={12} /> Strategy:
                   <b className="text-gray-300">
-                    {rule.strategy === "sequential" ? "顺序主备" : "加权轮询"}
+                    {strategyLabels.get(rule.strategy) ?? "加权轮询"}
                   </b>
                 </span>
                 <span className="text-gray-600">→</span>
@@ -15,11 +15,13 @@ export type ApiKey = {
   rule_group?: string;
   rule_groups?: string[];
   rpm_limit: number | null;
+  tpm_limit?: number | null;
   daily_limit: number | null;
   used_today: number;
   is_active: boolean;
   name?: string | null;
   codex_usage?: Record<string, unknown> | null;
+  provider_quota?: Record<string, unknown> | null;
 };
 
 export type HealthStatus = {
@@ -111,6 +113,12 @@ export type RoutingRule = {
   is_active: boolean;
   dump_enabled?: boolean;
   dump_path?: string | null;
+  hedge_enabled?: boolean;
+  hedge_delay_ms?: number | null;
+  first_byte_timeout_ms?: number | null;
+  response_cache_ttl_seconds?: number | null;
+  embedding_batch_size?: number | null;
+  embedding_batch_wait_ms?: number | null;
   request_count?: number;
   total_tokens?: number;
   avg_ttft_ms?: number | null;
@@ -128,6 +136,12 @@ export type RoutingRuleSavePayload = {
   is_active: boolean;
   dump_enabled: boolean;
   dump_path: string | null;
+  hedge_enabled: boolean;
+  hedge_delay_ms: number | null;
+  first_byte_timeout_ms: number | null;
+  response_cache_ttl_seconds: number | null;
+  embedding_batch_size: number | null;
+  embedding_batch_wait_ms: number | null;
 };
 
 export type RuleGroupEligibilityResult = {
@@ -207,6 +221,7 @@ export type StatsOverview = {
   total_requests: StatsKpiValue;
   total_tokens: StatsKpiValue;
   cache_hit_rate: StatsKpiValue;
+  gateway_cache_hit_rate: StatsKpiValue;
   avg_latency_ms: StatsKpiValue;
   prompt_tokens: number;
   completion_tokens: number;
@@ -251,6 +266,15 @@ export type StatsTopKey = {
   avg_latency_ms: number | null;
 };
 
+export type StatsStrategyCache = {
+  strategy: string;
+  request_count: number;
+  prompt_tokens: number;
+  cached_tokens: number;
+  cache_hit_rate: number;
+  cached_token_rate: number;
+};
+
 export type DumpSearchItem = {
   request_id: string;
   trace_id: string;
@@ -31,6 +31,7 @@ import {
   type StatsDistributionItem,
   type StatsLatencyBucket,
   type StatsOverview,
+  type StatsStrategyCache,
   type StatsTimeseriesBucket,
   type StatsTopKey,
   type UsageStats,
@@ -180,6 +181,7 @@ export const UsageStatsView = ({
   modelDistribution,
   groupDistribution,
   topKeys,
+  strategyCache,
   dumpSearch,
   dumpSearchOffset,
   range,
@@ -198,6 +200,7 @@ export const UsageStatsView = ({
   modelDistribution: StatsDistributionItem[];
   groupDistribution: StatsDistributionItem[];
   topKeys: StatsTopKey[];
+  strategyCache: StatsStrategyCache[];
   dumpSearch: DumpSearchResult | null;
   dumpSearchOffset: number;
   range: UsageTrendRange;
@@ -354,7 +357,9 @@ export const UsageStatsView = ({
           label="缓存命中率"
           value={formatPercent(overview?.cache_hit_rate.value)}
           change={overview?.cache_hit_rate.change_percent}
-          detail={`${formatTokens(overview?.cached_tokens ?? 0)} cached tokens`}
+          detail={`${formatTokens(overview?.cached_tokens ?? 0)} cached tokens · 网关缓存 ${formatPercent(
+            overview?.gateway_cache_hit_rate.value
+          )}`}
           icon={Database}
           accent="text-emerald-400"
         />
@@ -594,6 +599,51 @@ export const UsageStatsView = ({
         ) : null}
       </div>
 
+      <div className="rounded-xl border border-gray-800 bg-[#0f1117] p-5">
+        <h3 className="mb-4 text-sm font-bold text-gray-200">路由策略缓存命中</h3>
+        <div className="overflow-x-auto">
+          <table className="w-full text-left text-xs">
+            <thead className="border-b border-gray-800 text-gray-500">
+              <tr>
+                <th className="pb-2 font-medium">Strategy</th>
+                <th className="pb-2 text-right font-medium">Requests</th>
+                <th className="pb-2 text-right font-medium">Prompt Tokens</th>
+                <th className="pb-2 text-right font-medium">Cached Tokens</th>
+                <th className="pb-2 text-right font-medium">Cache%</th>
+                <th className="pb-2 text-right font-medium">Cached Token%</th>
+              </tr>
+            </thead>
+            <tbody className="divide-y divide-gray-800/50">
+              {strategyCache.map((row) => (
+                <tr key={row.strategy}>
+                  <td className="py-3 font-mono text-indigo-300">{row.strategy}</td>
+                  <td className="py-3 text-right text-gray-300">{row.request_count}</td>
+                  <td className="py-3 text-right text-gray-300">
+                    {formatTokens(row.prompt_tokens)}
+                  </td>
+                  <td className="py-3 text-right text-gray-200">
+                    {formatTokens(row.cached_tokens)}
+                  </td>
+                  <td className="py-3 text-right text-emerald-300">
+                    {formatPercent(row.cache_hit_rate)}
+                  </td>
+                  <td className="py-3 text-right text-emerald-300">
+                    {formatPercent(row.cached_token_rate)}
+                  </td>
+                </tr>
+              ))}
+              {strategyCache.length === 0 ? (
+                <tr>
+                  <td colSpan={6} className="py-5 text-center text-gray-600">
+                    暂无数据
+                  </td>
+                </tr>
+              ) : null}
+            </tbody>
+          </table>
+        </div>
+      </div>
+
       <div className="rounded-xl border border-gray-800 bg-[#0f1117] p-5">
         <div className="mb-4 flex flex-wrap items-center justify-between gap-3">
           <h3 className="text-sm font-bold text-gray-200">最近请求日志</h3>
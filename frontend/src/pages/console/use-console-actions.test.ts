@@ -36,6 +36,9 @@ const rulePayload: RoutingRuleSavePayload = {
   is_active: true,
   dump_enabled: false,
   dump_path: null,
+  hedge_enabled: false,
+  hedge_delay_ms: null,
+  first_byte_timeout_ms: null,
 };
 
 const savedRule = {
@@ -253,6 +253,7 @@ export const useConsoleActions = ({
           rule_group: payload.rule_group || "default",
           rule_groups: payload.rule_groups,
           rpm_limit: payload.rpm_limit,
+          tpm_limit: payload.tpm_limit,
           daily_limit: payload.daily_limit,
           used_today: payload.used_today ?? 0,
           total_usage: 0,
@@ -302,6 +303,7 @@ export const useConsoleActions = ({
           rule_group: payload.rule_group,
           rule_groups: payload.rule_groups,
           rpm_limit: payload.rpm_limit,
+          tpm_limit: payload.tpm_limit,
           daily_limit: payload.daily_limit,
           is_active: payload.is_active,
         }),
@@ -535,6 +537,12 @@ export const useConsoleActions = ({
           is_active: payload.is_active,
           dump_enabled: payload.dump_enabled,
           dump_path: payload.dump_path,
+          hedge_enabled: payload.hedge_enabled,
+          hedge_delay_ms: payload.hedge_delay_ms,
+          first_byte_timeout_ms: payload.first_byte_timeout_ms,
+          response_cache_ttl_seconds: payload.response_cache_ttl_seconds,
+          embedding_batch_size: payload.embedding_batch_size,
+          embedding_batch_wait_ms: payload.embedding_batch_wait_ms,
           target_key_ids: payload.target_key_ids,
         }),
       });
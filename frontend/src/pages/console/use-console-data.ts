@@ -14,6 +14,7 @@ import {
   type StatsDistributionItem,
   type StatsLatencyBucket,
   type StatsOverview,
+  type StatsStrategyCache,
   type StatsTimeseriesBucket,
   type StatsTopKey,
   type TelegramConfig,
@@ -31,6 +32,7 @@ import {
   parseStatsDistributionList,
   parseStatsLatencyBucketList,
   parseStatsOverview,
+  parseStatsStrategyCacheList,
   parseStatsTimeseriesBucketList,
   parseStatsTopKeyList,
   parseTelegramConfig,
@@ -54,6 +56,7 @@ export const useConsoleData = () => {
     StatsDistributionItem[]
   >([]);
   const [statsTopKeys, setStatsTopKeys] = useState<StatsTopKey[]>([]);
+  const [statsStrategyCache, setStatsStrategyCache] = useState<StatsStrategyCache[]>([]);
   const [dumpSearch, setDumpSearch] = useState<DumpSearchResult | null>(null);
   const [dumpSearchOffset, setDumpSearchOffset] = useState(0);
   const [usageTrendUpdatedAt, setUsageTrendUpdatedAt] = useState<string | null>(null);
@@ -231,6 +234,7 @@ export const useConsoleData = () => {
       setStatsModelDistribution([]);
       setStatsGroupDistribution([]);
       setStatsTopKeys([]);
+      setStatsStrategyCache([]);
       setDumpSearch(null);
       setUsageTrendUpdatedAt(null);
       setUsageTrendError(null);
@@ -258,6 +262,7 @@ export const useConsoleData = () => {
         modelDistributionPayload,
         groupDistributionPayload,
         topKeysPayload,
+        strategyCachePayload,
         dumpSearchPayload,
       ] = await Promise.all([
         fetchJson(`/admin/stats/overview?hours=${config.hours}`),
@@ -266,6 +271,7 @@ export const useConsoleData = () => {
         fetchJson(`/admin/stats/distribution/models?hours=${config.hours}`),
         fetchJson(`/admin/stats/distribution/groups?hours=${config.hours}`),
         fetchJson(`/admin/stats/top-keys?hours=${config.hours}&limit=10`),
+        fetchJson(`/admin/stats/cache/strategies?hours=${config.hours}`),
         fetchJson(`/admin/dump/search?hours=${config.hours}&limit=20&offset=${nextDumpOffset}`),
       ]);
       const overview = parseStatsOverview(overviewPayload);
@@ -274,6 +280,7 @@ export const useConsoleData = () => {
       const modelDistribution = parseStatsDistributionList(modelDistributionPayload);
       const groupDistribution = parseStatsDistributionList(groupDistributionPayload);
       const topKeys = parseStatsTopKeyList(topKeysPayload);
+      const strategyCache = parseStatsStrategyCacheList(strategyCachePayload);
       const dumpResult = parseDumpSearchResult(dumpSearchPayload);
       if (
         !overview ||
@@ -282,6 +289,7 @@ export const useConsoleData = () => {
         !modelDistribution ||
         !groupDistribution ||
         !topKeys ||
+        !strategyCache ||
         !dumpResult
       ) {
         throw new Error("invalid stats response");
@@ -292,6 +300,7 @@ export const useConsoleData = () => {
       setStatsModelDistribution(modelDistribution);
       setStatsGroupDistribution(groupDistribution);
       setStatsTopKeys(topKeys);
+      setStatsStrategyCache(strategyCache);
       setDumpSearch(dumpResult);
       setUsageTrendBuckets(
         timeseries.map((bucket) => ({
@@ -314,6 +323,7 @@ export const useConsoleData = () => {
       setStatsModelDistribution([]);
       setStatsGroupDistribution([]);
       setStatsTopKeys([]);
+      setStatsStrategyCache([]);
       setDumpSearch(null);
       setUsageTrendError("无法获取趋势数据");
     } finally {
@@ -599,6 +609,7 @@ export const useConsoleData = () => {
     statsModelDistribution,
     statsGroupDistribution,
     statsTopKeys,
+    statsStrategyCache,
     dumpSearch,
     dumpSearchOffset,
     usageTrendUpdatedAt,